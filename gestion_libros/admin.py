@@ -1,12 +1,23 @@
+from pathlib import Path
+
+from django.conf import settings
 from django.contrib import admin
-from .models import Libro, Ejemplar, Socio, Prestamo, Multa
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from .models import (
+    Libro, Ejemplar, Socio, Prestamo, Multa, Configuracion, PoliticaPrestamo,
+    PrestamoArchivado, MultaArchivada, Perfil, ConsultaLenta, Reserva, Notificacion,
+)
 
 
 @admin.register(Libro)
 class LibroAdmin(admin.ModelAdmin):
-    list_display = ['isbn', 'titulo', 'autor', 'editorial', 'año_publicacion', 'ejemplares_disponibles']
+    list_display = ['isbn', 'titulo', 'autor', 'editorial', 'año_publicacion', 'categoria', 'ejemplares_disponibles']
     search_fields = ['isbn', 'titulo', 'autor']
-    list_filter = ['editorial', 'año_publicacion']
+    list_filter = ['categoria', 'editorial', 'año_publicacion']
 
 
 @admin.register(Ejemplar)
@@ -19,9 +30,9 @@ class EjemplarAdmin(admin.ModelAdmin):
 
 @admin.register(Socio)
 class SocioAdmin(admin.ModelAdmin):
-    list_display = ['numero_socio', 'nombre', 'dni', 'email', 'telefono', 'activo', 'fecha_registro']
+    list_display = ['numero_socio', 'nombre', 'dni', 'email', 'telefono', 'categoria', 'activo', 'fecha_registro']
     search_fields = ['dni', 'numero_socio', 'nombre', 'email']
-    list_filter = ['activo', 'fecha_registro']
+    list_filter = ['activo', 'categoria', 'fecha_registro']
     list_editable = ['activo']
 
 
@@ -45,3 +56,166 @@ class MultaAdmin(admin.ModelAdmin):
     search_fields = ['socio__nombre', 'socio__dni', 'descripcion']
     list_editable = ['pagada']
     date_hierarchy = 'fecha'
+
+
+@admin.register(Reserva)
+class ReservaAdmin(admin.ModelAdmin):
+    """El estado lo maneja la cola (ver circulacion.asignar_reserva): solo lectura"""
+    list_display = ['id', 'socio', 'libro', 'fecha', 'estado', 'ejemplar', 'fecha_asignacion']
+    list_filter = ['estado', 'fecha']
+    search_fields = ['socio__nombre', 'socio__dni', 'libro__titulo', 'libro__isbn']
+    list_select_related = ['socio', 'libro', 'ejemplar']
+    readonly_fields = ['socio', 'libro', 'fecha', 'estado', 'ejemplar', 'fecha_asignacion']
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Notificacion)
+class NotificacionAdmin(admin.ModelAdmin):
+    """Outbox de avisos por correo (ver notificaciones.py): solo lectura, salvo reintentar"""
+    list_display = ['id', 'tipo', 'destinatario', 'fecha', 'estado', 'intentos', 'proximo_intento', 'fecha_envio']
+    list_filter = ['estado', 'tipo', 'fecha']
+    search_fields = ['destinatario', 'socio__nombre', 'socio__dni', 'clave']
+    readonly_fields = [
+        'clave', 'tipo', 'socio', 'destinatario', 'datos', 'fecha', 'estado', 'intentos',
+        'proximo_intento', 'fecha_envio', 'error',
+    ]
+    actions = ['reintentar']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def reintentar(self, request, queryset):
+        cantidad = queryset.exclude(estado='enviada').update(estado='pendiente', intentos=0, proximo_intento=timezone.now())
+        self.message_user(request, f'{cantidad} avisos vuelven a la cola del outbox.')
+    reintentar.short_description = 'Reintentar ahora los avisos seleccionados que no se enviaron'
+
+
+
+@admin.register(Configuracion)
+class ConfiguracionAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'tasa_multa_diaria_sugerida', 'dias_prestamo_default', 'max_prestamos_simultaneos', 'fecha_actualizacion']
+    readonly_fields = ['version', 'fecha_actualizacion']
+    
+    def has_add_permission(self, request):
+        # Hay una sola fila (creada por la migración)
+        return not Configuracion.objects.exists()
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PoliticaPrestamo)
+class PoliticaPrestamoAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'dias_prestamo', 'max_prestamos_simultaneos', 'tasa_multa_diaria', 'permite_prestamo']
+    list_filter = ['categoria_libro', 'categoria_socio']
+    
+    def delete_queryset(self, request, queryset):
+        # Borrar de a una para que cada baja genere una nueva versión de la configuración
+        for politica in queryset:
+            politica.delete()
+
+
+class ArchivoAdmin(admin.ModelAdmin):
+    """El archivo es de solo lectura: se llena con el comando archivar_historial"""
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PrestamoArchivado)
+class PrestamoArchivadoAdmin(ArchivoAdmin):
+    list_display = ['id', 'socio', 'ejemplar', 'fecha_inicio', 'fecha_devolucion_real', 'fecha_archivado']
+    search_fields = ['socio__nombre', 'socio__dni', 'ejemplar__codigo_ejemplar']
+    list_select_related = ['socio', 'ejemplar']
+    date_hierarchy = 'fecha_inicio'
+
+
+@admin.register(MultaArchivada)
+class MultaArchivadaAdmin(ArchivoAdmin):
+    list_display = ['id', 'socio', 'monto', 'motivo', 'fecha', 'fecha_pago', 'fecha_archivado']
+    search_fields = ['socio__nombre', 'socio__dni']
+    list_filter = ['motivo']
+    list_select_related = ['socio']
+
+
+@admin.register(Perfil)
+class PerfilAdmin(admin.ModelAdmin):
+    """Perfiles capturados con ?perfilar=1 (ver perfilador.py), con sus archivos para descargar"""
+    EXTENSIONES = ('prof', 'collapsed')
+    
+    list_display = ['fecha', 'metodo', 'url', 'usuario', 'estado', 'duracion_ms', 'consultas', 'tiempo_db_ms', 'descargas']
+    list_filter = ['metodo', 'usuario']
+    search_fields = ['url']
+    list_select_related = ['usuario']
+    date_hierarchy = 'fecha'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_urls(self):
+        return [
+            path(
+                '<int:perfil_id>/descargar/<str:extension>/',
+                self.admin_site.admin_view(self.descargar),
+                name='gestion_libros_perfil_descargar',
+            ),
+        ] + super().get_urls()
+    
+    def descargas(self, obj):
+        return format_html(
+            '<a href="{}">pstats</a> · <a href="{}">pilas</a>',
+            *(reverse('admin:gestion_libros_perfil_descargar', args=[obj.id, extension]) for extension in self.EXTENSIONES)
+        )
+    descargas.short_description = 'Archivos'
+    
+    def descargar(self, request, perfil_id, extension):
+        perfil = get_object_or_404(Perfil, id=perfil_id)
+        ruta = Path(settings.PERFILES_DIR) / f'{perfil.archivo}.{extension}'
+        if extension not in self.EXTENSIONES or not ruta.exists():
+            raise Http404('El archivo del perfil ya no existe.')
+        return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=ruta.name)
+    
+    def delete_model(self, request, obj):
+        self.borrar_archivos(obj)
+        super().delete_model(request, obj)
+    
+    def delete_queryset(self, request, queryset):
+        for perfil in queryset:
+            self.borrar_archivos(perfil)
+        super().delete_queryset(request, queryset)
+    
+    def borrar_archivos(self, perfil):
+        for extension in self.EXTENSIONES:
+            (Path(settings.PERFILES_DIR) / f'{perfil.archivo}.{extension}').unlink(missing_ok=True)
+
+
+@admin.register(ConsultaLenta)
+class ConsultaLentaAdmin(admin.ModelAdmin):
+    """Consultas que superaron CONSULTAS_LENTAS_MS (ver consultas_lentas.py)"""
+    list_display = ['sql_resumido', 'base', 'llamadas', 'p95_ms', 'max_ms', 'escaneo_completo', 'ultima_vez']
+    list_filter = ['escaneo_completo', 'base']
+    search_fields = ['sql', 'plan']
+    fields = ['sql', 'plan_formateado', 'escaneo_completo', 'base', 'llamadas', 'p95_ms', 'max_ms', 'primera_vez', 'ultima_vez']
+    readonly_fields = fields
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def sql_resumido(self, obj):
+        return obj.sql[:120]
+    sql_resumido.short_description = 'SQL'
+    
+    def plan_formateado(self, obj):
+        return format_html('<pre>{}</pre>', obj.plan or '(sin plan)')
+    plan_formateado.short_description = 'Plan de ejecución'
@@ -0,0 +1,270 @@
+"""
+Recursos de la API JSON (/api/v1/, vistas en views/api.py).
+
+Cada Recurso declara qué campos expone (nombre en la API → campo del ORM) y
+cómo se filtra. Las lecturas se arman con values_list: sin instancias de
+modelos ni plantillas, y solo con las columnas pedidas.
+
+    GET /api/v1/libros/?campos=isbn,titulo,disponibles&limite=100
+    GET /api/v1/libros/?cursor=<siguiente de la página anterior>
+    GET /api/v1/libros/?isbn=9780000000001,9780000000002
+
+- ?campos= elige los campos (todos si no se indica). Los calculados
+  (disponibles, deuda_pendiente) solo se agregan a la consulta si se piden.
+- La paginación es por cursor sobre la clave primaria (pk > último): cada
+  página cuesta lo mismo aunque sea la número mil, y una alta o baja entre
+  páginas no repite ni saltea filas.
+- ?<clave>=a,b,c busca varias filas por su clave con una sola consulta IN y
+  devuelve también las que no encontró.
+"""
+
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Ejemplar, Libro, Multa, Prestamo, Socio
+
+
+class ErrorAPI(Exception):
+    """Pedido inválido: se responde {"error": mensaje} con el estado HTTP indicado"""
+
+    def __init__(self, mensaje, estado=400):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+def _texto(valor):
+    return valor
+
+
+def _entero(valor):
+    try:
+        return int(valor)
+    except ValueError:
+        raise ErrorAPI(f'"{valor}" no es un número entero.')
+
+
+def _booleano(valor):
+    if valor.lower() in ('1', 'true', 'si', 'sí'):
+        return True
+    if valor.lower() in ('0', 'false', 'no'):
+        return False
+    raise ErrorAPI(f'"{valor}" no es un valor booleano (true/false).')
+
+
+class Recurso:
+    """
+    Un listado de la API.
+
+    campos: {nombre en la API: campo o lookup del ORM}
+    calculados: {nombre en la API: expresión}, se anotan solo si se piden
+    clave: (nombre en la API, conversión) del parámetro de búsqueda por lote
+    filtros: {parámetro: (lookup, conversión)}
+    """
+
+    def __init__(self, consulta, campos, clave, calculados=None, filtros=None):
+        self.consulta = consulta
+        self.campos = campos
+        self.calculados = calculados or {}
+        self.clave, self.convertir_clave = clave
+        self.filtros = filtros or {}
+
+    def elegir_campos(self, parametro):
+        """Los campos de ?campos= (todos si no viene), en el orden pedido"""
+        disponibles = [*self.campos, *self.calculados]
+        if not parametro:
+            return disponibles
+        pedidos = [nombre.strip() for nombre in parametro.split(',') if nombre.strip()]
+        desconocidos = [nombre for nombre in pedidos if nombre not in disponibles]
+        if desconocidos:
+            raise ErrorAPI(f'Campos desconocidos: {", ".join(desconocidos)}. Disponibles: {", ".join(disponibles)}.')
+        return list(dict.fromkeys(pedidos))
+
+    def filas(self, nombres, consulta=None):
+        """values_list de los campos pedidos; cada fila termina con la pk"""
+        consulta = self.consulta.all() if consulta is None else consulta
+        calculados = {nombre: self.calculados[nombre] for nombre in nombres if nombre in self.calculados}
+        if calculados:
+            consulta = consulta.annotate(**{f'api_{nombre}': expresion for nombre, expresion in calculados.items()})
+        lookups = [f'api_{nombre}' if nombre in calculados else self.campos[nombre] for nombre in nombres]
+        return consulta.values_list(*lookups, 'pk')
+
+    def filtrar(self, parametros):
+        consulta = self.consulta.all()
+        for parametro, (lookup, convertir) in self.filtros.items():
+            if parametro in parametros:
+                consulta = consulta.filter(**{lookup: convertir(parametros[parametro])})
+        return consulta
+
+    def pagina(self, parametros):
+        """(filas como diccionarios, cursor de la página siguiente o None)"""
+        nombres = self.elegir_campos(parametros.get('campos'))
+        limite = _limite(parametros.get('limite'))
+        consulta = self.filtrar(parametros).order_by('pk')
+        if parametros.get('cursor'):
+            consulta = consulta.filter(pk__gt=_leer_cursor(parametros['cursor'], self.consulta.model._meta.pk))
+
+        # Una fila de más dice si hay otra página sin contar el total
+        filas = list(self.filas(nombres, consulta)[:limite + 1])
+        siguiente = _cursor(filas[limite - 1][-1]) if len(filas) > limite else None
+        return [dict(zip(nombres, fila)) for fila in filas[:limite]], siguiente
+
+    def lote(self, parametros):
+        """(filas de las claves pedidas, claves que no existen): una sola consulta IN"""
+        nombres = self.elegir_campos(parametros.get('campos'))
+        claves = list(dict.fromkeys(valor.strip() for valor in parametros[self.clave].split(',') if valor.strip()))
+        if not claves:
+            raise ErrorAPI(f'?{self.clave}= no tiene valores.')
+        if len(claves) > settings.API_LIMITE_MAXIMO:
+            raise ErrorAPI(f'Se pueden buscar hasta {settings.API_LIMITE_MAXIMO} valores por pedido.')
+        valores = {clave: self.convertir_clave(clave) for clave in claves}
+
+        lookup = self.campos[self.clave]
+        consulta = self.filtrar(parametros).filter(**{f'{lookup}__in': list(valores.values())})
+        # La clave se lee siempre (aunque no se pida) para saber cuáles faltan
+        encontradas = {}
+        for *fila, _ in self.filas([*nombres, self.clave], consulta):
+            encontradas[str(fila[-1])] = dict(zip(nombres, fila))
+        datos = [encontradas[str(valor)] for valor in valores.values() if str(valor) in encontradas]
+        no_encontrados = [clave for clave, valor in valores.items() if str(valor) not in encontradas]
+        return datos, no_encontrados
+
+    def fila(self, pk, consulta=None):
+        """Una fila con todos los campos (para responder a las escrituras)"""
+        nombres = self.elegir_campos(None)
+        consulta = self.consulta.all() if consulta is None else consulta
+        *fila, _ = self.filas(nombres, consulta.filter(pk=pk)).get()
+        return dict(zip(nombres, fila))
+
+
+def _limite(valor):
+    if not valor:
+        return settings.API_LIMITE
+    limite = _entero(valor)
+    if not 1 <= limite <= settings.API_LIMITE_MAXIMO:
+        raise ErrorAPI(f'limite debe estar entre 1 y {settings.API_LIMITE_MAXIMO}.')
+    return limite
+
+
+def _cursor(pk):
+    return base64.urlsafe_b64encode(json.dumps(pk).encode('utf-8')).decode('ascii')
+
+
+def _leer_cursor(cursor, campo):
+    """La pk del cursor, validada con el campo de la pk: un cursor armado a mano no llega a la consulta"""
+    try:
+        pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise ErrorAPI('Cursor inválido.')
+    if not isinstance(pk, (int, str)) or isinstance(pk, bool):
+        raise ErrorAPI('Cursor inválido.')
+    try:
+        pk = campo.to_python(pk)
+        campo.run_validators(pk)
+    except ValidationError:
+        raise ErrorAPI('Cursor inválido.')
+    # Ninguna base guarda enteros de más de 64 bits (SQLite no valida el rango y da OverflowError)
+    if isinstance(pk, int) and not -2 ** 63 <= pk < 2 ** 63:
+        raise ErrorAPI('Cursor inválido.')
+    return pk
+
+
+LIBROS = Recurso(
+    Libro.objects,
+    campos={
+        'isbn': 'isbn',
+        'titulo': 'titulo',
+        'autor': 'autor',
+        'editorial': 'editorial',
+        'año_publicacion': 'año_publicacion',
+        'categoria': 'categoria',
+    },
+    calculados={
+        'disponibles': Count('ejemplares', filter=Q(ejemplares__estado='disponible', ejemplares__activo=True)),
+    },
+    clave=('isbn', _texto),
+    filtros={'categoria': ('categoria', _texto), 'autor': ('autor__icontains', _texto)},
+)
+
+EJEMPLARES = Recurso(
+    Ejemplar.objects,
+    campos={
+        'id': 'id',
+        'codigo_ejemplar': 'codigo_ejemplar',
+        'libro': 'libro_id',
+        'estado': 'estado',
+        'fecha_adquisicion': 'fecha_adquisicion',
+        'observaciones': 'observaciones',
+    },
+    clave=('codigo_ejemplar', _texto),
+    filtros={'libro': ('libro_id', _texto), 'estado': ('estado', _texto)},
+)
+
+SOCIOS = Recurso(
+    Socio.objects_all,
+    campos={
+        'id': 'id',
+        'dni': 'dni',
+        'numero_socio': 'numero_socio',
+        'nombre': 'nombre',
+        'email': 'email',
+        'telefono': 'telefono',
+        'categoria': 'categoria',
+        'activo': 'activo',
+        'fecha_registro': 'fecha_registro',
+    },
+    calculados={
+        'deuda_pendiente': Coalesce(
+            Sum('multas__monto', filter=Q(multas__pagada=False)),
+            Value(0), output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+    },
+    clave=('dni', _texto),
+    filtros={'activo': ('activo', _booleano), 'categoria': ('categoria', _texto)},
+)
+
+PRESTAMOS = Recurso(
+    Prestamo.objects,
+    campos={
+        'id': 'id',
+        'socio': 'socio__dni',
+        'ejemplar': 'ejemplar__codigo_ejemplar',
+        'libro': 'ejemplar__libro_id',
+        'fecha_inicio': 'fecha_inicio',
+        'fecha_devolucion_prevista': 'fecha_devolucion_prevista',
+        'fecha_devolucion_real': 'fecha_devolucion_real',
+        'observaciones': 'observaciones',
+    },
+    clave=('id', _entero),
+    filtros={
+        'socio': ('socio__dni', _texto),
+        'ejemplar': ('ejemplar__codigo_ejemplar', _texto),
+        'activos': ('fecha_devolucion_real__isnull', _booleano),
+    },
+)
+
+MULTAS = Recurso(
+    Multa.objects,
+    campos={
+        'id': 'id',
+        'socio': 'socio__dni',
+        'prestamo': 'prestamo_id',
+        'monto': 'monto',
+        'motivo': 'motivo',
+        'descripcion': 'descripcion',
+        'fecha': 'fecha',
+        'pagada': 'pagada',
+        'fecha_pago': 'fecha_pago',
+    },
+    clave=('id', _entero),
+    filtros={
+        'socio': ('socio__dni', _texto),
+        'pagada': ('pagada', _booleano),
+        'motivo': ('motivo', _texto),
+    },
+)
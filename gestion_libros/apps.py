@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class GestionLibrosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gestion_libros'
+
+    def ready(self):
+        from django.core.signals import request_finished, request_started
+        from django.db.backends.signals import connection_created
+        from .db import configurar_sqlite
+        from .consultas_lentas import instalar_captura, request_iniciado, request_terminado
+
+        connection_created.connect(configurar_sqlite, dispatch_uid='gestion_libros_sqlite')
+        connection_created.connect(instalar_captura, dispatch_uid='gestion_libros_consultas_lentas')
+        request_started.connect(request_iniciado, dispatch_uid='gestion_libros_consultas_lentas_inicio')
+        request_finished.connect(request_terminado, dispatch_uid='gestion_libros_consultas_lentas_fin')
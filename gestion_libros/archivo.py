@@ -0,0 +1,158 @@
+"""
+Archivo del historial de circulación.
+
+Los préstamos devueltos hace más de ARCHIVO_HORIZONTE_DIAS (y sus multas, si
+están todas pagadas) se mueven a PrestamoArchivado / MultaArchivada. Así las
+tablas que usan los listados, los conteos del inicio y las validaciones de cada
+préstamo quedan chicas.
+
+Para leer el historial completo (estado de cuenta, comprobantes, cierre de
+mes) se usan las funciones de este módulo, que combinan las dos tablas
+(historial_*, recorrer_ambas, buscar_* y, para las vistas async, abuscar_*).
+El listado de préstamos muestra solo la tabla actual y enlaza al archivo.
+"""
+
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .db import bloquear, con_reintentos
+from .models import Prestamo, Multa, PrestamoArchivado, MultaArchivada
+
+
+CAMPOS_PRESTAMO = [
+    'id', 'socio_id', 'ejemplar_id', 'fecha_inicio', 'fecha_devolucion_prevista',
+    'fecha_devolucion_real', 'observaciones',
+]
+CAMPOS_MULTA = [
+    'id', 'socio_id', 'prestamo_id', 'monto', 'motivo', 'descripcion', 'fecha',
+    'pagada', 'fecha_pago',
+]
+
+
+def prestamos_archivables(antes_de):
+    """Préstamos devueltos antes de la fecha indicada y sin multas pendientes"""
+    return Prestamo.objects.filter(fecha_devolucion_real__lt=antes_de).exclude(multas__pagada=False)
+
+
+def archivar_historial(antes_de=None, tamaño_lote=1000):
+    """
+    Mueve los préstamos archivables (y sus multas) al archivo, de a `tamaño_lote`
+    préstamos por transacción para no bloquear la base mientras tanto.
+
+    Returns:
+        tuple (prestamos, multas): cantidad de filas archivadas
+    """
+    if antes_de is None:
+        antes_de = timezone.now() - timedelta(days=settings.ARCHIVO_HORIZONTE_DIAS)
+
+    total_prestamos = total_multas = 0
+    while True:
+        prestamos, multas = _archivar_lote(antes_de, tamaño_lote)
+        if not prestamos:
+            return total_prestamos, total_multas
+        total_prestamos += prestamos
+        total_multas += multas
+
+
+@con_reintentos
+def _archivar_lote(antes_de, tamaño_lote):
+    """Copia un lote al archivo y lo borra de las tablas de circulación (una transacción)"""
+    # Las filas que otra transacción tiene tomadas quedan para el próximo lote
+    candidatos = bloquear(prestamos_archivables(antes_de).order_by('id'), saltear_bloqueadas=True)
+    ids = list(candidatos.values_list('id', flat=True)[:tamaño_lote])
+    if not ids:
+        return 0, 0
+
+    prestamos = Prestamo.objects.filter(id__in=ids)
+    multas = Multa.objects.filter(prestamo_id__in=ids)
+    filas_multas = list(multas.values(*CAMPOS_MULTA))
+
+    PrestamoArchivado.objects.bulk_create(
+        PrestamoArchivado(**fila) for fila in prestamos.values(*CAMPOS_PRESTAMO)
+    )
+    MultaArchivada.objects.bulk_create(MultaArchivada(**fila) for fila in filas_multas)
+
+    multas.delete()
+    prestamos.delete()
+    return len(ids), len(filas_multas)
+
+
+def historial_prestamos(socio, *campos, tamaño_lote=1000):
+    """
+    Filas (values_list con `campos`) de todos los préstamos del socio, en la
+    tabla de préstamos o en el archivo, ordenadas por fecha de inicio.
+    """
+    return _combinar(socio.prestamos, socio.prestamos_archivados, 'fecha_inicio', campos, tamaño_lote)
+
+
+def historial_multas(socio, *campos, tamaño_lote=1000):
+    """Igual que historial_prestamos, para las multas del socio (ordenadas por fecha)"""
+    return _combinar(socio.multas, socio.multas_archivadas, 'fecha', campos, tamaño_lote)
+
+
+def _combinar(actuales, archivadas, campo_fecha, campos, tamaño_lote):
+    """
+    Recorre las dos consultas a la vez, ya ordenadas por (fecha, id), e intercala
+    sus filas con heapq.merge: el resultado sale ordenado sin cargar todo en memoria.
+    Un id nunca está en las dos tablas, así que (fecha, id) no se repite.
+    """
+    consultas = [
+        consulta.order_by(campo_fecha, 'id')
+        .values_list(campo_fecha, 'id', *campos)
+        .iterator(chunk_size=tamaño_lote)
+        for consulta in (actuales, archivadas)
+    ]
+    for fila in heapq.merge(*consultas):
+        yield fila[2:]
+
+
+def recorrer_ambas(actuales, archivadas, campo_fecha, tamaño_lote=1000):
+    """
+    Las instancias de las dos consultas (la tabla actual y el archivo, con los
+    mismos filtros) intercaladas por (fecha, id), sin cargar todo en memoria.
+    """
+    consultas = [
+        ((getattr(fila, campo_fecha), fila.id, fila) for fila in consulta.order_by(campo_fecha, 'id').iterator(chunk_size=tamaño_lote))
+        for consulta in (actuales, archivadas)
+    ]
+    for _, _, fila in heapq.merge(*consultas):
+        yield fila
+
+
+def buscar_prestamo(prestamo_id):
+    """El préstamo con ese id (con socio y libro cargados), esté archivado o no"""
+    for modelo in (Prestamo, PrestamoArchivado):
+        prestamo = modelo.objects.select_related('socio', 'ejemplar__libro').filter(id=prestamo_id).first()
+        if prestamo is not None:
+            return prestamo
+    return None
+
+
+def buscar_multa(multa_id):
+    """La multa con ese id (con el socio cargado), esté archivada o no"""
+    for modelo in (Multa, MultaArchivada):
+        multa = modelo.objects.select_related('socio').filter(id=multa_id).first()
+        if multa is not None:
+            return multa
+    return None
+
+
+async def abuscar_prestamo(prestamo_id):
+    """buscar_prestamo para vistas async"""
+    for modelo in (Prestamo, PrestamoArchivado):
+        prestamo = await modelo.objects.select_related('socio', 'ejemplar__libro').filter(id=prestamo_id).afirst()
+        if prestamo is not None:
+            return prestamo
+    return None
+
+
+async def abuscar_multa(multa_id):
+    """buscar_multa para vistas async"""
+    for modelo in (Multa, MultaArchivada):
+        multa = await modelo.objects.select_related('socio').filter(id=multa_id).afirst()
+        if multa is not None:
+            return multa
+    return None
@@ -0,0 +1,69 @@
+"""
+Benchmarks de la aplicación.
+
+  - escenarios.py: un escenario por cada combinación de URL y filtros, con su
+    presupuesto de consultas SQL
+  - vistas.py: corre los escenarios con el cliente de pruebas de Django sobre
+    una biblioteca sintética y compara contra la línea base (linea_base.json)
+  - carga.py: mostradores virtuales que hacen requests HTTP concurrentes contra
+    un servidor real (asyncio)
+  - base_temporal(): base descartable para no tocar la real
+  - es_base_de_prueba(): si la base configurada es temporal o de benchmark
+
+Ver los comandos benchmark_vistas, prueba_carga y benchmark_circulacion.
+"""
+
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+
+@contextmanager
+def base_temporal(prefijo='benchmark_'):
+    """
+    Crea una base de prueba vacía (migrada) y la borra al salir. En SQLite es un
+    archivo en un directorio temporal; en PostgreSQL, la base de tests de siempre.
+    Solo se redirige `default`: mientras tanto no se lee de las réplicas
+    (REPLICAS_LECTURA vacía), que siguen apuntando a la base real.
+    """
+    directorio = tempfile.mkdtemp(prefix=prefijo)
+    nombre_original = connection.settings_dict['NAME']
+    if connection.vendor == 'sqlite':
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directorio, 'benchmark.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    sin_replicas = override_settings(REPLICAS_LECTURA=[])
+    sin_replicas.enable()
+    try:
+        yield directorio
+    finally:
+        sin_replicas.disable()
+        connections.close_all()
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = None
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+# Nombres de base que indican que es de prueba (en el archivo o la base de PostgreSQL)
+MARCAS_BASE_DE_PRUEBA = ('benchmark', 'carga', 'prueba', 'test')
+
+
+def es_base_de_prueba(conexion=connection):
+    """
+    Indica si la base configurada es temporal o de benchmark: un SQLite en
+    memoria o en el directorio temporal, o una base cuyo nombre lo dice (ver
+    MARCAS_BASE_DE_PRUEBA).
+    Las pruebas contra un servidor ya levantado solo corren sobre una de estas.
+    """
+    nombre = str(conexion.settings_dict['NAME'])
+    if conexion.vendor == 'sqlite':
+        if conexion.is_in_memory_db():
+            return True
+        temporal = os.path.realpath(tempfile.gettempdir()) + os.sep
+        if os.path.realpath(nombre).startswith(temporal):
+            return True
+    base = os.path.basename(nombre).lower()
+    return any(marca in base for marca in MARCAS_BASE_DE_PRUEBA)
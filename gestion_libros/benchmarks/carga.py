@@ -0,0 +1,406 @@
+"""
+Prueba de carga HTTP de la circulación: mostradores virtuales contra un
+servidor real (runserver, un servidor WSGI o uno ASGI) en localhost.
+
+Cada mostrador es una corrutina con su propio cliente HTTP (una conexión
+keep-alive y sus cookies de sesión): inicia sesión y repite su escenario con
+una pausa aleatoria entre pasos (el tiempo que tarda el bibliotecario). El
+cliente es HTTP/1.1 mínimo sobre asyncio, sin dependencias externas.
+
+Se cuenta como error:
+  - un 5xx o una conexión cortada
+  - un mensaje de error de Django en la respuesta: las vistas atrapan los
+    errores de base (ej: "database is locked") y redirigen con un mensaje, así
+    que el código 302 solo no alcanza. El mensaje llega en la cookie
+    `messages`, que se decodifica con el mismo SECRET_KEY del proyecto.
+"""
+
+import asyncio
+import json
+import math
+import random
+import re
+import secrets
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from django.contrib import messages
+from django.contrib.messages.storage.cookie import CookieStorage
+
+from ..consultas_lentas import percentil
+from ..metricas import BUCKETS_SEGUNDOS
+
+
+class ErrorHTTP(Exception):
+    pass
+
+
+class Respuesta:
+    def __init__(self, estado, headers, cuerpo):
+        self.estado = estado
+        self.headers = headers  # {nombre en minúsculas: [valores]}
+        self.cuerpo = cuerpo
+
+    def header(self, nombre, defecto=''):
+        return self.headers.get(nombre.lower(), [defecto])[-1]
+
+    @property
+    def texto(self):
+        return self.cuerpo.decode('utf-8', 'replace')
+
+
+class ClienteHTTP:
+    """HTTP/1.1 sobre una conexión keep-alive, con cookies y token CSRF"""
+
+    def __init__(self, host, puerto, timeout=60):
+        self.host = host
+        self.puerto = puerto
+        self.timeout = timeout
+        self.cookies = {}
+        self._lector = self._escritor = None
+
+    async def cerrar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            self._lector = self._escritor = None
+
+    async def pedir(self, metodo, ruta, datos=None):
+        cuerpo = urlencode(datos or {}).encode() if metodo == 'POST' else b''
+        lineas = [f'{metodo} {ruta} HTTP/1.1', f'Host: {self.host}:{self.puerto}', f'Content-Length: {len(cuerpo)}']
+        if self.cookies:
+            lineas.append('Cookie: ' + '; '.join(f'{nombre}={valor}' for nombre, valor in self.cookies.items()))
+        if metodo == 'POST':
+            lineas.append('Content-Type: application/x-www-form-urlencoded')
+            lineas.append(f'X-CSRFToken: {self.cookies.get("csrftoken", "")}')
+        pedido = ('\r\n'.join(lineas) + '\r\n\r\n').encode('latin-1') + cuerpo
+
+        # Si el servidor cerró la conexión reutilizada, se reintenta una vez con una nueva
+        for intento in range(2):
+            reutilizada = self._escritor is not None
+            try:
+                if not reutilizada:
+                    self._lector, self._escritor = await asyncio.open_connection(self.host, self.puerto)
+                self._escritor.write(pedido)
+                await self._escritor.drain()
+                respuesta = await asyncio.wait_for(self._leer(), self.timeout)
+                break
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                await self.cerrar()
+                if not reutilizada or intento:
+                    raise ErrorHTTP(f'Conexión cortada: {e}') from e
+            except asyncio.TimeoutError as e:
+                await self.cerrar()
+                raise ErrorHTTP(f'Sin respuesta en {self.timeout} s') from e
+
+        for valor in respuesta.headers.get('set-cookie', []):
+            for nombre, morsel in SimpleCookie(valor).items():
+                if morsel.value and morsel['max-age'] != '0':
+                    self.cookies[nombre] = morsel.value
+                else:
+                    self.cookies.pop(nombre, None)
+        if respuesta.header('connection').lower() == 'close':
+            await self.cerrar()
+        return respuesta
+
+    async def _leer(self):
+        linea = await self._lector.readuntil(b'\r\n')
+        estado = int(linea.split(b' ', 2)[1])
+        headers = defaultdict(list)
+        while (linea := await self._lector.readuntil(b'\r\n')) != b'\r\n':
+            nombre, _, valor = linea.decode('latin-1').partition(':')
+            headers[nombre.strip().lower()].append(valor.strip())
+
+        if 'content-length' in headers:
+            cuerpo = await self._lector.readexactly(int(headers['content-length'][-1]))
+        elif headers.get('transfer-encoding', [''])[-1].lower() == 'chunked':
+            partes = []
+            while tamaño := int((await self._lector.readuntil(b'\r\n')).split(b';')[0], 16):
+                partes.append(await self._lector.readexactly(tamaño))
+                await self._lector.readuntil(b'\r\n')
+            await self._lector.readuntil(b'\r\n')
+            cuerpo = b''.join(partes)
+        else:
+            # Sin largo (ej: PDF en streaming con runserver): el servidor cierra al terminar
+            cuerpo = await self._lector.read()
+            headers['connection'] = ['close']
+        return Respuesta(estado, dict(headers), cuerpo)
+
+
+def mensajes_de_error(cliente):
+    """Los mensajes de nivel error que dejó la última respuesta (y los saca de las cookies)"""
+    valor = cliente.cookies.pop('messages', None)
+    if not valor:
+        return []
+    mensajes = CookieStorage(None)._decode(valor.strip('"')) or []
+    return [str(m) for m in mensajes if m.level >= messages.ERROR]
+
+
+class Resultados:
+    """Latencias y errores por operación"""
+
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(Counter)
+        self.inicio = time.monotonic()
+        self.fin = None
+
+    def registrar(self, operacion, segundos, error=None):
+        if error:
+            self.errores[operacion][error] += 1
+        else:
+            self.latencias[operacion].append(segundos)
+
+    @property
+    def duracion(self):
+        return (self.fin or time.monotonic()) - self.inicio
+
+    def resumen(self):
+        """{operacion: {cantidad, por_segundo, errores, p50_ms, p95_ms, p99_ms, max_ms}}"""
+        resumen = {}
+        for operacion in sorted(set(self.latencias) | set(self.errores)):
+            latencias = self.latencias.get(operacion, [])
+            errores = sum(self.errores.get(operacion, {}).values())
+            ms = [segundos * 1000 for segundos in latencias]
+            resumen[operacion] = {
+                'cantidad': len(latencias),
+                'por_segundo': len(latencias) / self.duracion,
+                'errores': errores,
+                'tasa_error': errores / ((len(latencias) + errores) or 1),
+                'p50_ms': percentil(ms, 50) if ms else 0,
+                'p95_ms': percentil(ms, 95) if ms else 0,
+                'p99_ms': percentil(ms, 99) if ms else 0,
+                'max_ms': max(ms, default=0),
+            }
+        return resumen
+
+    def histograma(self, operacion, buckets=BUCKETS_SEGUNDOS):
+        """[(límite en segundos, cantidad)] por bucket (no acumulativo, el último es +Inf)"""
+        conteo = Counter()
+        limites = tuple(buckets) + (math.inf,)
+        for segundos in self.latencias.get(operacion, []):
+            conteo[next(limite for limite in limites if segundos <= limite)] += 1
+        return [(limite, conteo[limite]) for limite in limites]
+
+
+def clasificar(error):
+    """Tipo de error para el informe: lo que importa separar es la base bloqueada"""
+    texto = str(error).lower()
+    if 'locked' in texto or 'busy' in texto:
+        return 'base bloqueada'
+    return texto[:80]
+
+
+class Mostrador:
+    """Un puesto de atención: un bibliotecario con su socio y sus ejemplares"""
+
+    def __init__(self, cliente, resultados, socio_dni, ejemplares, multas, pausa, azar):
+        self.cliente = cliente
+        self.resultados = resultados
+        self.socio_dni = socio_dni
+        self.ejemplares = ejemplares
+        self.multas = multas
+        self.pausa = pausa
+        self.azar = azar
+
+    async def esperar(self):
+        """Tiempo del bibliotecario entre pasos (exponencial, con media `pausa`)"""
+        if self.pausa:
+            await asyncio.sleep(self.azar.expovariate(1 / self.pausa))
+
+    async def operacion(self, nombre, metodo, ruta, datos=None, destino=None):
+        """Hace el pedido, lo mide y lo registra. Devuelve la respuesta, o None si falló."""
+        inicio = time.perf_counter()
+        try:
+            respuesta = await self.cliente.pedir(metodo, ruta, datos)
+        except ErrorHTTP as e:
+            self.resultados.registrar(nombre, 0, clasificar(e))
+            return None
+        duracion = time.perf_counter() - inicio
+
+        errores = mensajes_de_error(self.cliente)
+        if respuesta.estado >= 500:
+            error = 'base bloqueada' if b'database is locked' in respuesta.cuerpo else f'HTTP {respuesta.estado}'
+        elif errores:
+            error = clasificar(errores[0])
+        elif destino and not respuesta.header('location').endswith(destino):
+            error = f'redirigió a {respuesta.header("location")}'
+        else:
+            error = None
+        self.resultados.registrar(nombre, duracion, error)
+        return None if error else respuesta
+
+    async def iniciar_sesion(self, usuario, clave):
+        await self.cliente.pedir('GET', '/accounts/login/')
+        respuesta = await self.cliente.pedir('POST', '/accounts/login/', {'username': usuario, 'password': clave})
+        if respuesta.estado != 302:
+            raise ErrorHTTP(f'No se pudo iniciar sesión como {usuario} (HTTP {respuesta.estado})')
+
+    async def buscar(self):
+        palabra = self.azar.choice(['historia', 'noche', 'ciudad', 'memoria', 'viaje', 'mar'])
+        await self.operacion('buscar', 'GET', '/libros/?' + urlencode({'q': palabra, 'filtro': 'titulo'}))
+
+    async def prestar(self):
+        """Presta el ejemplar siguiente; devuelve su código si se prestó"""
+        codigo = self.ejemplares[0]
+        self.ejemplares.rotate(-1)
+        datos = {'socio_id': self.socio_dni, 'ejemplar_id': codigo}
+        if await self.operacion('prestar', 'POST', '/prestamos/nuevo/', datos, destino='/prestamos/'):
+            return codigo
+        return None
+
+    async def devolver(self, codigo):
+        """Busca el préstamo activo del ejemplar (como en el mostrador) y lo devuelve"""
+        consulta = urlencode({'q': codigo, 'filtro': 'ejemplar', 'estado': 'activos'})
+        respuesta = await self.operacion('buscar_prestamo', 'GET', f'/prestamos/?{consulta}')
+        if respuesta is None:
+            return
+        encontrado = re.search(r'/prestamos/(\d+)/devolver/', respuesta.texto)
+        if encontrado is None:
+            self.resultados.registrar('devolver', 0, 'préstamo no encontrado')
+            return
+        await self.operacion(
+            'devolver', 'POST', f'/prestamos/{encontrado.group(1)}/devolver/', {'estado_fisico': 'bueno'}
+        )
+
+    async def pagar(self):
+        if self.multas:
+            await self.operacion('pagar_multa', 'POST', f'/multas/{self.multas.pop()}/pagar/')
+
+    async def consultar(self):
+        """Las consultas de solo lectura async: indicadores, autocompletado, disponibilidad y un comprobante"""
+        await self.operacion('estadisticas', 'GET', '/consultas/estadisticas/')
+        palabra = self.azar.choice(['his', 'noc', 'ciu', 'mem', 'via', 'mar'])
+        consulta = urlencode({'tipo': 'libros', 'q': palabra})
+        respuesta = await self.operacion('autocompletar', 'GET', f'/consultas/autocompletar/?{consulta}')
+        if respuesta is not None:
+            libros = json.loads(respuesta.cuerpo)['resultados']
+            if libros:
+                isbn = self.azar.choice(libros)['isbn']
+                await self.operacion('disponibilidad', 'GET', f'/consultas/disponibilidad/{isbn}/')
+        if self.multas:
+            await self.operacion('comprobante', 'GET', f'/multas/{self.azar.choice(self.multas)}/pdf/')
+
+
+async def mostrador(puesto):
+    """Atención completa: busca en el catálogo, presta, devuelve y cobra una multa"""
+    await puesto.buscar()
+    await puesto.esperar()
+    codigo = await puesto.prestar()
+    await puesto.esperar()
+    if codigo:
+        await puesto.devolver(codigo)
+        await puesto.esperar()
+    await puesto.pagar()
+    await puesto.esperar()
+
+
+async def circulacion(puesto):
+    """Solo préstamo y devolución, sin búsquedas: mide la escritura"""
+    codigo = await puesto.prestar()
+    await puesto.esperar()
+    if codigo:
+        await puesto.devolver(codigo)
+        await puesto.esperar()
+
+
+async def consulta(puesto):
+    """Solo búsquedas en el catálogo: mide la lectura"""
+    await puesto.buscar()
+    await puesto.esperar()
+
+
+async def lecturas(puesto):
+    """Solo las vistas async de solo lectura: compara servidores ASGI y WSGI"""
+    await puesto.consultar()
+    await puesto.esperar()
+
+
+ESCENARIOS = {'mostrador': mostrador, 'circulacion': circulacion, 'consulta': consulta, 'lecturas': lecturas}
+
+
+async def correr_carga(host, puerto, puestos, escenario, duracion, usuario, clave, pausa, semilla=42):
+    """
+    puestos: [(socio_dni, [códigos de ejemplar], [ids de multas pendientes])], uno por mostrador.
+    Corre `escenario` en todos a la vez durante `duracion` segundos.
+    """
+    resultados = Resultados()
+    paso = ESCENARIOS[escenario]
+
+    async def atender(numero, socio_dni, ejemplares, multas):
+        puesto = Mostrador(
+            ClienteHTTP(host, puerto), resultados, socio_dni, deque(ejemplares), list(multas), pausa,
+            random.Random(semilla + numero),
+        )
+        try:
+            await puesto.iniciar_sesion(usuario, clave)
+            while time.monotonic() < fin:
+                await paso(puesto)
+        finally:
+            await puesto.cliente.cerrar()
+
+    fin = time.monotonic() + duracion
+    resultados.inicio = time.monotonic()
+    await asyncio.gather(*(atender(numero, *puesto) for numero, puesto in enumerate(puestos)))
+    resultados.fin = time.monotonic()
+    return resultados
+
+
+@contextmanager
+def puestos_de_prueba(cantidad, ejemplares_por_puesto=5, multas_por_puesto=20):
+    """
+    Crea lo que usa la carga, solo para esta corrida (marcado con un id
+    aleatorio): un usuario staff con clave aleatoria, un libro con sus
+    ejemplares, y por mostrador un socio que presta y otro con multas
+    pendientes para cobrar. Los mostradores no compiten por las mismas filas y
+    no tocan las de la biblioteca. Al salir se borra todo, junto con lo que
+    generó la carga (préstamos, multas, eventos, avisos).
+
+    Yields:
+        tuple (puestos, usuario, clave): puestos = [(socio_dni, [códigos de
+        ejemplar], [ids de multas])], uno por mostrador, para correr_carga
+    """
+    from django.contrib.auth import get_user_model
+    from ..models import Ejemplar, Libro, Multa, Socio
+
+    if not 1 <= cantidad <= 999:
+        raise ValueError('La prueba admite de 1 a 999 mostradores.')
+    corrida = secrets.token_hex(3)
+    usuario, clave = f'carga-{corrida}', secrets.token_urlsafe(16)
+    prestan = [f'C{corrida}{numero:03d}' for numero in range(cantidad)]
+    # Un socio con multas pendientes no puede prestar: las multas que se cobran son de otro socio
+    deben = [f'D{corrida}{numero:03d}' for numero in range(cantidad)]
+
+    get_user_model().objects.create_user(username=usuario, password=clave, is_staff=True)
+    libro = Libro.objects.create(
+        isbn=f'CARGA{corrida}', titulo=f'Prueba de carga {corrida}', autor='Prueba de carga', categoria='general'
+    )
+    try:
+        Ejemplar.objects.bulk_create([
+            Ejemplar(libro=libro, codigo_ejemplar=f'CARGA-{corrida}-{numero:05d}')
+            for numero in range(cantidad * ejemplares_por_puesto)
+        ])
+        Socio.objects.bulk_create([
+            Socio(dni=dni, numero_socio=f'CARGA-{dni}', nombre=f'Prueba de carga {dni}') for dni in prestan + deben
+        ])
+        Multa.objects.bulk_create([
+            Multa(socio=deudor, monto=1, motivo='otro', descripcion=f'Prueba de carga {corrida}')
+            for deudor in Socio.objects_all.filter(dni__in=deben)
+            for _ in range(multas_por_puesto)
+        ])
+        multas = defaultdict(list)
+        for dni, multa_id in Multa.objects.filter(socio__dni__in=deben).order_by('id').values_list('socio__dni', 'id'):
+            multas[dni].append(multa_id)
+        codigos = list(libro.ejemplares.order_by('id').values_list('codigo_ejemplar', flat=True))
+        puestos = [
+            (dni, codigos[numero::cantidad], multas[deudor])
+            for numero, (dni, deudor) in enumerate(zip(prestan, deben))
+        ]
+        yield puestos, usuario, clave
+    finally:
+        # En cascada: préstamos, multas, reservas, avisos, ejemplares y eventos de la corrida
+        Socio.objects_all.filter(dni__in=prestan + deben).delete()
+        Libro.objects_all.filter(pk=libro.pk).delete()
+        get_user_model().objects.filter(username=usuario).delete()
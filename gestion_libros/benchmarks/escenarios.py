@@ -0,0 +1,272 @@
+"""
+Escenarios del benchmark de vistas: cada URL de gestion_libros/urls.py, los
+listados con cada combinación de filtro y estado, y los procesos de
+circulación (préstamo, devolución, pago de multa) y los PDFs.
+
+Cada escenario declara su presupuesto de consultas SQL por request (incluidas
+las de sesión y usuario). El presupuesto no depende del tamaño de la base: si
+un listado pasa a hacer una consulta por fila, lo excede con cualquier dataset.
+
+Los escenarios "(304)" repiten el GET con el ETag de la respuesta anterior,
+como un navegador que recarga la página sin que cambien los datos.
+"""
+
+from django.db import transaction
+from django.db.models import Count
+from django.urls import reverse
+
+from ..circulacion import asignar_reserva
+from ..models import Ejemplar, Libro, Multa, Prestamo, Reserva, Socio
+
+
+# Término de búsqueda por filtro: todos encuentran filas en la biblioteca sintética
+TERMINOS = {
+    'todos': 'historia',
+    'isbn': '978000',
+    'titulo': 'historia',
+    'autor': 'García',
+    'editorial': 'Planeta',
+    'dni': '2000',
+    'numero_socio': 'SOC-00',
+    'nombre': 'Ana',
+    'email': 'socio1',
+    'socio': 'Ana',
+    'libro': 'historia',
+    'ejemplar': 'EJ-978000',
+}
+
+
+class Escenario:
+    """
+    Un request a medir. `pedido(n)` devuelve (método, url, datos) para la
+    repetición n: los escenarios que modifican datos eligen otra fila cada vez.
+    """
+
+    def __init__(self, nombre, presupuesto, pedido, estado=200, revalidar=False, json=False):
+        self.nombre = nombre
+        self.presupuesto = presupuesto
+        self.pedido = pedido
+        self.estado = estado
+        self.revalidar = revalidar
+        # Los POST de la API mandan los datos como cuerpo JSON
+        self.contenido = {'content_type': 'application/json'} if json else {}
+
+    def __repr__(self):
+        return f'<Escenario {self.nombre}>'
+
+
+def _get(url, **parametros):
+    return lambda n: ('get', url, parametros)
+
+
+def _listado(nombre_url, presupuesto, filtros=(), estados=()):
+    """Un escenario sin búsqueda y uno por cada combinación de filtro y estado"""
+    url = reverse(nombre_url)
+    escenarios = [Escenario(nombre_url, presupuesto, _get(url))]
+    for filtro in filtros or [None]:
+        for estado in estados or [None]:
+            parametros = {}
+            if filtro:
+                parametros.update(q=TERMINOS[filtro], filtro=filtro)
+            if estado:
+                parametros['estado'] = estado
+            sufijo = ','.join(f'{clave}={valor}' for clave, valor in parametros.items() if clave != 'q')
+            escenarios.append(Escenario(f'{nombre_url}?{sufijo}', presupuesto, _get(url, **parametros)))
+    return escenarios
+
+
+def _revalidacion(nombre_url, presupuesto):
+    return Escenario(f'{nombre_url} (304)', presupuesto, _get(reverse(nombre_url)), estado=304, revalidar=True)
+
+
+def _primero(consulta):
+    """La primera fila de la consulta (que se reevalúa en cada repetición)"""
+    fila = consulta.order_by('pk').first()
+    if fila is None:
+        raise LookupError(f'No hay filas para el escenario ({consulta.model.__name__})')
+    return fila
+
+
+def _socio_nuevo(prefijo, n):
+    # Un socio nuevo por repetición: sin multas, préstamos ni reservas que lo frenen
+    return Socio.objects.create(dni=f'{prefijo}{n:07d}', numero_socio=f'{prefijo}-{n:06d}', nombre=f'Benchmark {n}')
+
+
+def _prestar(n):
+    socio = _socio_nuevo('BV', n)
+    ejemplar = _primero(Ejemplar.objects.filter(estado='disponible', libro__categoria='general'))
+    return 'post', reverse('realizar_prestamo'), {'socio_id': socio.dni, 'ejemplar_id': ejemplar.codigo_ejemplar}
+
+
+def _devolver(n):
+    prestamo = _primero(Prestamo.objects.filter(fecha_devolucion_real__isnull=True))
+    return 'post', reverse('devolver_libro', args=[prestamo.id]), {'estado_fisico': 'bueno'}
+
+
+def _pagar(n):
+    multa = _primero(Multa.objects.filter(pagada=False))
+    return 'post', reverse('pagar_multa', args=[multa.id]), {}
+
+
+def _comprobante_multa(n):
+    return 'get', reverse('comprobante_multa_pdf', args=[_primero(Multa.objects.filter(pagada=True)).id]), {}
+
+
+def _comprobante_prestamo(n):
+    prestamo = _primero(Prestamo.objects.filter(fecha_devolucion_real__isnull=False))
+    return 'get', reverse('comprobante_prestamo_pdf', args=[prestamo.id]), {}
+
+
+def _estado_cuenta(n):
+    # El socio con más historial: el PDF más largo
+    socio = Socio.objects.annotate(cantidad=Count('prestamos')).order_by('-cantidad', 'id').first()
+    return 'get', reverse('estado_cuenta_socio_pdf', args=[socio.id]), {}
+
+
+def _api_prestar(n):
+    socio = _socio_nuevo('BA', n)
+    ejemplar = _primero(Ejemplar.objects.filter(estado='disponible', libro__categoria='general'))
+    return 'post', reverse('api_prestamos'), {'socio': socio.dni, 'ejemplar': ejemplar.codigo_ejemplar}
+
+
+def _api_devolver(n):
+    prestamo = _primero(Prestamo.objects.filter(fecha_devolucion_real__isnull=True))
+    return 'post', reverse('api_devolucion', args=[prestamo.id]), {'estado_fisico': 'bueno'}
+
+
+def _api_pagar(n):
+    return 'post', reverse('api_pago_multa', args=[_primero(Multa.objects.filter(pagada=False)).id]), {}
+
+
+def _libro_reservado():
+    """
+    Un libro propio de los escenarios de reservas, sin ejemplares (se puede
+    reservar). No es de los 979 que dan de baja los escenarios de bajas.
+    """
+    libro, _ = Libro.objects.get_or_create(
+        isbn='9770000000000', defaults={'titulo': 'Benchmark reservas', 'autor': 'Benchmark', 'año_publicacion': 2020}
+    )
+    return libro
+
+
+def _reservar(n):
+    socio = _socio_nuevo('BR', n)
+    return 'post', reverse('registrar_reserva'), {'socio_id': socio.dni, 'libro_isbn': _libro_reservado().isbn}
+
+
+def _cancelar_reserva(n):
+    # Un ejemplar nuevo apartado para la cabeza de la cola: al cancelarla pasa a la siguiente
+    libro = _libro_reservado()
+    with transaction.atomic():
+        ejemplar = Ejemplar.objects.create(libro=libro, codigo_ejemplar=f'BR-{n:06d}', estado='mantenimiento')
+        asignar_reserva(ejemplar)
+        ejemplar.save()
+    reserva = _primero(Reserva.objects.filter(libro=libro, estado='asignada'))
+    return 'post', reverse('cancelar_reserva', args=[reserva.id]), {}
+
+
+def _api_lote(n):
+    isbns = Libro.objects.order_by('pk').values_list('isbn', flat=True)[:100]
+    return 'get', reverse('api_libros'), {'isbn': ','.join(isbns), 'campos': 'isbn,titulo,disponibles'}
+
+
+def _disponibilidad(n):
+    return 'get', reverse('disponibilidad', args=[_primero(Libro.objects.all()).isbn]), {}
+
+
+def _registrar_socio(n):
+    return 'post', reverse('registrar_socio'), {'dni': f'BS{n:07d}', 'nombre': f'Socio {n}', 'email': f'bs{n}@example.com'}
+
+
+def _registrar_libro(n):
+    datos = {'isbn': f'979{n:010d}', 'titulo': f'Benchmark {n}', 'autor': 'Benchmark', 'año_publicacion': '2020'}
+    return 'post', reverse('registrar_libro'), datos
+
+
+def _registrar_ejemplar(n):
+    return 'post', reverse('registrar_ejemplar'), {'libro_isbn': _primero(Libro.objects.all()).isbn}
+
+
+def _editar_libro(n):
+    libro = _primero(Libro.objects.all())
+    datos = {'titulo': libro.titulo, 'autor': libro.autor, 'editorial': libro.editorial or '', 'categoria': libro.categoria}
+    return 'post', reverse('editar_libro', args=[libro.isbn]), datos
+
+
+def _editar_ejemplar(n):
+    ejemplar = _primero(Ejemplar.objects.filter(estado='disponible'))
+    datos = {'estado': 'disponible', 'observaciones': f'Revisado ({n})'}
+    return 'post', reverse('editar_ejemplar', args=[ejemplar.codigo_ejemplar]), datos
+
+
+def _dar_baja_libro(n):
+    # Los libros que creó el escenario registrar_libro: no tienen préstamos
+    libro = _primero(Libro.objects.filter(isbn__startswith='979'))
+    return 'post', reverse('dar_baja_libro', args=[libro.isbn]), {}
+
+
+def _dar_baja_ejemplar(n):
+    ejemplar = _primero(Ejemplar.objects.filter(estado='disponible', prestamos__isnull=True))
+    return 'post', reverse('dar_baja_ejemplar', args=[ejemplar.codigo_ejemplar]), {}
+
+
+def escenarios():
+    """Todos los escenarios, en el orden en que se corren (los de alta van antes que las bajas)"""
+    return [
+        Escenario('index', 10, _get(reverse('index'))),
+        *_listado('listar_libros', 6, filtros=['todos', 'isbn', 'titulo', 'autor', 'editorial']),
+        *_listado(
+            'listar_socios', 5,
+            filtros=['todos', 'dni', 'numero_socio', 'nombre', 'email'], estados=['todos', 'activos', 'inactivos'],
+        ),
+        *_listado(
+            'listar_prestamos', 8,
+            filtros=['todos', 'socio', 'libro', 'ejemplar', 'isbn'],
+            estados=['todos', 'activos', 'devueltos', 'retrasados'],
+        ),
+        *_listado('listar_multas', 6, estados=['todos', 'pendientes', 'pagadas']),
+        *_listado('listar_reservas', 4, estados=['pendientes', 'asignadas']),
+        # Sesión, usuario y la consulta del ETag: la vista no se ejecuta
+        *[
+            _revalidacion(nombre, 3)
+            for nombre in ('index', 'listar_libros', 'listar_socios', 'listar_prestamos', 'listar_multas', 'listar_reservas')
+        ],
+        # Los movimientos de ejemplares publican un evento (eventos.publicar): disponibles e insert,
+        # más la purga de eventos viejos cada eventos.PURGA_CADA. La devolución con retraso
+        # encola además el aviso de la multa (notificaciones.encolar: un insert)
+        Escenario('realizar_prestamo', 13, _prestar, estado=302),
+        Escenario('devolver_libro', 11, _devolver, estado=302),
+        Escenario('pagar_multa', 5, _pagar, estado=302),
+        # Reservas del libro propio del benchmark: la asignación es una lectura del índice de la cola
+        Escenario('registrar_reserva', 8, _reservar, estado=302),
+        Escenario('cancelar_reserva', 12, _cancelar_reserva, estado=302),
+        Escenario('comprobante_multa_pdf', 3, _comprobante_multa),
+        Escenario('comprobante_prestamo_pdf', 3, _comprobante_prestamo),
+        # El historial se lee en lotes de 500 filas: el socio más activo de la biblioteca por defecto usa 11
+        Escenario('estado_cuenta_socio_pdf', 13, _estado_cuenta),
+        Escenario('registrar_socio', 5, _registrar_socio, estado=302),
+        Escenario('registrar_libro', 4, _registrar_libro, estado=302),
+        Escenario('registrar_ejemplar', 9, _registrar_ejemplar, estado=302),
+        Escenario('editar_libro', 4, _editar_libro, estado=302),
+        Escenario('editar_ejemplar', 9, _editar_ejemplar, estado=302),
+        Escenario('dar_baja_libro', 10, _dar_baja_libro, estado=302),
+        Escenario('dar_baja_ejemplar', 9, _dar_baja_ejemplar, estado=302),
+        Escenario('metricas', 2, _get(reverse('metricas'))),
+        # API JSON: sesión, usuario y una consulta por página o por lote
+        Escenario('api_libros', 3, _get(reverse('api_libros'), campos='isbn,titulo,disponibles', limite=500)),
+        Escenario('api_prestamos?activos', 3, _get(reverse('api_prestamos'), activos='true', limite=500)),
+        Escenario('api_libros?isbn', 3, _api_lote),
+        Escenario('api_ejemplares', 3, _get(reverse('api_ejemplares'), limite=500)),
+        Escenario('api_socios', 3, _get(reverse('api_socios'), campos='dni,nombre,deuda_pendiente', limite=500)),
+        Escenario('api_multas', 3, _get(reverse('api_multas'), limite=500)),
+        # Escrituras de la API: las mismas consultas que el proceso, más la fila de la respuesta
+        Escenario('api_prestamos (POST)', 13, _api_prestar, estado=201, json=True),
+        Escenario('api_devolucion', 13, _api_devolver, json=True),
+        Escenario('api_pago_multa', 5, _api_pagar, json=True),
+        # Vistas async: sesión, usuario y las consultas de la vista
+        Escenario('estadisticas', 9, _get(reverse('estadisticas'))),
+        Escenario('autocompletar', 3, _get(reverse('autocompletar'), tipo='socios', q=TERMINOS['nombre'])),
+        Escenario('disponibilidad', 4, _disponibilidad),
+        # Con WSGI (el cliente de pruebas) el flujo de eventos responde 204 sin consultar los eventos
+        Escenario('eventos_ejemplares', 2, _get(reverse('eventos_ejemplares')), estado=204),
+    ]
@@ -0,0 +1,112 @@
+"""
+Benchmark de vistas: corre los escenarios con el cliente de pruebas de Django,
+mide la latencia (p50, p95, máximo) y las consultas SQL de cada uno, y los
+compara contra la línea base guardada en JSON.
+
+Un escenario falla si:
+  - responde con otro código de estado o deja un mensaje de error
+  - hace más consultas que su presupuesto (escenarios.py)
+  - su p50 supera al de la línea base en más de la tolerancia
+
+Los tiempos dependen de la máquina: la línea base se regenera (--guardar) en
+la misma máquina en la que después se compara.
+"""
+
+import json
+import time
+from pathlib import Path
+
+from django.contrib import messages
+from django.contrib.messages import get_messages
+from django.test import Client
+
+from ..consultas_lentas import percentil
+from ..instrumentacion import Medicion, medir_consultas
+
+
+LINEA_BASE = Path(__file__).with_name('linea_base.json')
+
+
+class ErrorEscenario(Exception):
+    """El escenario no respondió lo esperado (no es una regresión de rendimiento)"""
+
+
+def medir(cliente, escenario, repeticiones, calentamiento=1):
+    """Corre el escenario y devuelve {'consultas', 'p50_ms', 'p95_ms', 'max_ms'}"""
+    duraciones = []
+    consultas = 0
+    etag = None
+    if escenario.revalidar:
+        # Lo que ya tiene el navegador: el calentamiento se mide contra este ETag
+        metodo, url, datos = escenario.pedido(0)
+        etag = getattr(cliente, metodo)(url, datos, **escenario.contenido).get('ETag')
+    for n in range(calentamiento + repeticiones):
+        metodo, url, datos = escenario.pedido(n)
+        encabezados = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        medicion = Medicion()
+        with medir_consultas(medicion):
+            response = getattr(cliente, metodo)(url, datos, **escenario.contenido, **encabezados)
+            if response.streaming:
+                # Los PDFs en streaming se generan recién al leerlos
+                b''.join(response.streaming_content)
+        duracion = time.perf_counter() - medicion.inicio
+
+        if response.status_code != escenario.estado:
+            raise ErrorEscenario(f'{escenario.nombre}: {metodo.upper()} {url} respondió {response.status_code}')
+        errores = [str(m) for m in get_messages(response.wsgi_request) if m.level >= messages.ERROR]
+        if errores:
+            raise ErrorEscenario(f'{escenario.nombre}: {errores[0]}')
+
+        if n >= calentamiento:
+            duraciones.append(duracion * 1000)
+            consultas = max(consultas, medicion.consultas)
+
+    return {
+        'consultas': consultas,
+        'p50_ms': round(percentil(duraciones, 50), 2),
+        'p95_ms': round(percentil(duraciones, 95), 2),
+        'max_ms': round(max(duraciones), 2),
+    }
+
+
+def correr(escenarios, usuario, repeticiones=5, al_medir=None):
+    """Mide todos los escenarios con `usuario` logueado y devuelve {nombre: resultado}"""
+    cliente = Client()
+    cliente.force_login(usuario)
+    resultados = {}
+    for escenario in escenarios:
+        resultados[escenario.nombre] = medir(cliente, escenario, repeticiones)
+        if al_medir:
+            al_medir(escenario, resultados[escenario.nombre])
+    return resultados
+
+
+def comparar(escenarios, resultados, linea_base, tolerancia):
+    """Lista de fallas: presupuestos excedidos y regresiones de p50 contra la línea base"""
+    fallas = []
+    for escenario in escenarios:
+        resultado = resultados[escenario.nombre]
+        if resultado['consultas'] > escenario.presupuesto:
+            fallas.append(
+                f'{escenario.nombre}: {resultado["consultas"]} consultas (presupuesto {escenario.presupuesto})'
+            )
+        base = linea_base.get(escenario.nombre)
+        if base and resultado['p50_ms'] > base['p50_ms'] * (1 + tolerancia):
+            fallas.append(
+                f'{escenario.nombre}: p50 {resultado["p50_ms"]:.1f} ms '
+                f'(línea base {base["p50_ms"]:.1f} ms, tolerancia {tolerancia:.0%})'
+            )
+    return fallas
+
+
+def leer_linea_base(ruta=LINEA_BASE):
+    """{'datos': tamaños de la biblioteca, 'escenarios': {nombre: resultado}} (vacía si no existe)"""
+    ruta = Path(ruta)
+    if not ruta.exists():
+        return {'datos': None, 'escenarios': {}}
+    return json.loads(ruta.read_text(encoding='utf-8'))
+
+
+def guardar_linea_base(resultados, datos, ruta=LINEA_BASE):
+    contenido = {'datos': datos, 'escenarios': resultados}
+    Path(ruta).write_text(json.dumps(contenido, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
@@ -0,0 +1,110 @@
+"""
+Cache HTTP de las páginas de solo lectura: GET condicional y compresión.
+
+`@condicional(fuentes)` agrega un ETag calculado con una sola consulta: para
+cada fuente (queryset, campos...) la cantidad de filas y el máximo de cada
+campo. Si el cliente manda ese ETag en If-None-Match se responde 304 sin
+ejecutar la vista. Los campos son fecha_actualizacion (que también actualiza
+update(), ver models/managers.py) o, en préstamos y multas, el id (altas) y la
+fecha de devolución o de pago; la cantidad cubre las filas borradas. Todos
+tienen índice: cada parte de la consulta lee el extremo de un índice, no la tabla.
+
+El ETag también depende de lo que cambia por usuario aunque no cambien los
+datos: el usuario, el token CSRF de sus formularios (Django lo rota al iniciar
+sesión) y la fecha (los préstamos pasan a retrasados solos). Con mensajes
+pendientes (los del redirect después de un POST) no se manda ETag: la página
+tiene que mostrarlos.
+"""
+
+import functools
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.db.models import CharField, Count, Max, Value
+from django.db.models.functions import Cast
+from django.middleware.csrf import get_token
+from django.middleware.gzip import GZipMiddleware
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+
+def consulta_version(fuentes):
+    """
+    Consulta con un (parte, valor) por agregado de cada fuente (UNION ALL).
+    Un solo agregado por parte: así SQLite resuelve COUNT(*) y MAX(campo) con
+    el índice en lugar de recorrer la tabla.
+    """
+    partes = []
+    for i, (consulta, *campos) in enumerate(fuentes):
+        agregados = [Count('*')] + [Max(campo) for campo in campos]
+        partes += [
+            consulta.order_by()
+            .annotate(parte=Value(f'{i}.{j}'))
+            .values('parte')
+            .annotate(valor=Cast(agregado, CharField()))
+            .values_list('parte', 'valor')
+            for j, agregado in enumerate(agregados)
+        ]
+    return partes[0].union(*partes[1:], all=True)
+
+
+def etag(request, consulta):
+    """ETag de la página para este usuario, o None si no se puede responder 304"""
+    if len(get_messages(request)):
+        return None
+    # get_token crea el secreto CSRF si es la primera visita: el ETag ya es el de la cookie que se envía
+    get_token(request)
+    partes = [
+        request.user.pk,
+        request.user.get_username(),
+        request.META['CSRF_COOKIE'],
+        timezone.localdate().isoformat(),
+        *sorted(consulta.all()),  # .all(): cada request vuelve a ejecutarla
+    ]
+    return hashlib.sha256('\x1f'.join(str(parte) for parte in partes).encode('utf-8')).hexdigest()[:32]
+
+
+def condicional(fuentes):
+    """
+    Decorador de vistas GET: ETag a partir de `fuentes` y 304 si el cliente ya
+    tiene la página. `fuentes` es una lista de (queryset, campos...) o
+    una función que la arma con los argumentos de la URL.
+    """
+    # Armar la consulta cuesta más que ejecutarla: si las fuentes son fijas se arma una vez
+    fija = None if callable(fuentes) else consulta_version(fuentes)
+
+    def calcular_etag(request, *args, **kwargs):
+        consulta = fija if fija is not None else consulta_version(fuentes(*args, **kwargs))
+        return etag(request, consulta)
+
+    def decorador(vista):
+        condicionada = condition(etag_func=calcular_etag)(vista)
+
+        @functools.wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            response = condicionada(request, *args, **kwargs)
+            # Privada (datos de socios) y revalidada en cada visita: el 304 es barato
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return envoltura
+    return decorador
+
+
+class CompresionMiddleware(GZipMiddleware):
+    """
+    GZip solo para HTML, texto y JSON. Los PDFs ya vienen comprimidos (Flate)
+    y volver a comprimirlos solo gasta CPU. El token CSRF cambia de máscara en
+    cada respuesta, así que comprimir páginas con formularios no expone el
+    secreto (BREACH). Los Server-Sent Events tampoco: gzip acumula los eventos
+    hasta llenar un bloque y el navegador los recibiría tarde.
+    """
+
+    TIPOS_COMPRIMIBLES = ('text/', 'application/json', 'application/javascript')
+    TIPOS_SIN_COMPRIMIR = ('text/event-stream',)
+
+    def process_response(self, request, response):
+        tipo = response.get('Content-Type', '')
+        if not tipo.startswith(self.TIPOS_COMPRIMIBLES) or tipo.startswith(self.TIPOS_SIN_COMPRIMIR):
+            return response
+        return super().process_response(request, response)
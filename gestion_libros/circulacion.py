@@ -0,0 +1,357 @@
+"""
+Servicio de circulación: préstamo, devolución y reservas.
+
+prestar(), devolver(), reservar() y cancelar_reserva() aplican las reglas de
+negocio (socio activo, multas, políticas, montos, cola de reservas) y las usan
+tanto las vistas HTML como la API JSON; las vistas solo leen el formulario y
+arman los mensajes. Las funciones registrar_* escriben el movimiento, en una
+transacción que se reintenta si choca con otra (ver db.con_reintentos).
+
+Cuando un ejemplar vuelve a circular y su libro tiene reservas en espera, se
+aparta para la primera en la misma transacción (asignar_reserva): queda
+"reservado" y solo ese socio se lo puede llevar.
+
+Los avisos al socio (ejemplar apartado, multa) se encolan en la misma
+transacción y se envían después, fuera del request (ver notificaciones.py).
+
+En SQLite cada transacción empieza escribiendo, así toma el lock de escritura de
+entrada y no queda a mitad de camino entre una lectura y una escritura cuando
+otro mostrador ya está escribiendo. En PostgreSQL se bloquean las filas
+involucradas (siempre en el mismo orden: ejemplar y después socio).
+"""
+
+from datetime import timedelta
+
+from django.db import IntegrityError
+from django.utils import timezone
+
+from . import notificaciones
+from .db import bloquear, con_reintentos, soporta_bloqueo_de_filas
+from .eventos import publicar
+from .metricas import DEVOLUCIONES, MULTAS, PRESTAMOS, RESERVAS
+from .models import Ejemplar, Prestamo, Multa, Reserva, Socio
+from .singleton import obtener_configuracion
+
+
+# Estado en que queda el ejemplar según su condición física al devolverlo
+ESTADOS_DEVOLUCION = {
+    'bueno': 'disponible',
+    'dañado': 'mantenimiento',
+    'perdido': 'perdido',
+}
+
+
+# Rango admitido para los días de préstamo pedidos a mano
+DIAS_PRESTAMO_MINIMO = 1
+DIAS_PRESTAMO_MAXIMO = 90
+
+
+class ErrorCirculacion(Exception):
+    """El movimiento no se puede registrar (una regla de negocio lo impide u otro mostrador se adelantó)"""
+
+
+class DatosInvalidos(ErrorCirculacion):
+    """Los datos del movimiento son inválidos (estado físico, monto)"""
+
+
+def prestar(socio, ejemplar, dias_prestamo=None):
+    """
+    PROCESO 1: valida el préstamo y lo registra.
+    1. El socio está activo
+    2. No tiene multas pendientes
+    3. El ejemplar está disponible (o apartado para este socio por una reserva)
+    4. La política de la categoría permite el préstamo
+    5. El socio no excede el límite de préstamos simultáneos
+    Sin dias_prestamo (o fuera de 1 a 90) se usan los días de la política.
+    El ejemplar tiene que venir con el libro cargado.
+
+    Raises:
+        ErrorCirculacion: con el motivo del rechazo
+    """
+    if not socio.activo:
+        raise ErrorCirculacion(f'El socio {socio.nombre} no está activo.')
+
+    if socio.tiene_multas_pendientes():
+        raise ErrorCirculacion(
+            f'El socio {socio.nombre} tiene multas pendientes por ${socio.monto_total_multas()}. '
+            'Debe saldarlas antes de realizar un nuevo préstamo.'
+        )
+
+    reserva = None
+    if ejemplar.estado == 'reservado' and ejemplar.activo:
+        reserva = Reserva.objects.select_related('socio').filter(ejemplar=ejemplar, estado='asignada').first()
+        if reserva is not None and reserva.socio_id != socio.pk:
+            raise ErrorCirculacion(
+                f'El ejemplar {ejemplar.codigo_ejemplar} está apartado para {reserva.socio.nombre}, '
+                'que lo había reservado.'
+            )
+    if reserva is None and not ejemplar.esta_disponible():
+        raise ErrorCirculacion(
+            f'El ejemplar {ejemplar.codigo_ejemplar} no está disponible. '
+            f'Estado actual: {ejemplar.get_estado_display()}.'
+        )
+
+    # Condiciones según la categoría del libro y del socio (tabla ya compilada, sin consultas)
+    terminos = obtener_configuracion().terminos(ejemplar.libro.categoria, socio.categoria)
+    if not terminos.permite_prestamo:
+        raise ErrorCirculacion(
+            f'Los libros de categoría "{ejemplar.libro.get_categoria_display()}" no se prestan '
+            f'a socios de categoría "{socio.get_categoria_display()}" (solo consulta en sala).'
+        )
+
+    if socio.prestamos_activos().count() >= terminos.max_prestamos_simultaneos:
+        raise ErrorCirculacion(
+            f'El socio {socio.nombre} ya tiene {terminos.max_prestamos_simultaneos} préstamos activos. '
+            'Debe devolver al menos uno antes de realizar un nuevo préstamo.'
+        )
+
+    if dias_prestamo is None or not DIAS_PRESTAMO_MINIMO <= dias_prestamo <= DIAS_PRESTAMO_MAXIMO:
+        dias_prestamo = terminos.dias_prestamo
+
+    prestamo = registrar_prestamo(
+        socio, ejemplar, dias_prestamo, max_prestamos=terminos.max_prestamos_simultaneos, reserva=reserva
+    )
+    PRESTAMOS.inc()
+    if reserva is not None:
+        RESERVAS.inc(evento='cumplida')
+    return prestamo
+
+
+def devolver(prestamo, estado_fisico, monto=None, observaciones=''):
+    """
+    PROCESO 2: valida la devolución y la registra.
+    Daño y pérdida llevan el monto de la multa que ingresa el bibliotecario
+    (texto, se valida con la configuración). El préstamo tiene que venir con
+    socio y ejemplar__libro cargados.
+
+    Returns:
+        tuple (multa_retraso, multa_estado): las multas creadas (o None)
+
+    Raises:
+        DatosInvalidos: estado físico o monto inválidos
+        ErrorCirculacion: el préstamo ya fue devuelto
+    """
+    if not prestamo.esta_activo():
+        raise ErrorCirculacion('Este préstamo ya fue devuelto anteriormente.')
+    if estado_fisico not in ESTADOS_DEVOLUCION:
+        raise DatosInvalidos('Estado físico del libro inválido.')
+
+    config = obtener_configuracion()
+    terminos = config.terminos_prestamo(prestamo)
+
+    # Se valida antes de tocar la base (usando el singleton - DRY)
+    if estado_fisico in ('dañado', 'perdido'):
+        es_valido, monto, mensaje_error = config.validar_monto_multa(monto)
+        if not es_valido:
+            motivo = 'daño' if estado_fisico == 'dañado' else 'pérdida'
+            raise DatosInvalidos(f'Monto inválido para la multa por {motivo}: {mensaje_error}')
+    else:
+        monto = None
+
+    multas = registrar_devolucion(prestamo, estado_fisico, terminos, monto=monto, observaciones=observaciones)
+    DEVOLUCIONES.inc(estado=estado_fisico)
+    if prestamo.ejemplar.estado == 'reservado':
+        RESERVAS.inc(evento='asignada')
+    for multa in multas:
+        if multa:
+            MULTAS.inc(motivo=multa.motivo)
+    return multas
+
+
+@con_reintentos
+def registrar_prestamo(socio, ejemplar, dias_prestamo, max_prestamos=None, reserva=None):
+    """
+    Presta el ejemplar al socio por la cantidad de días indicada.
+    El ejemplar se marca como prestado solo si sigue disponible, y si se indica
+    max_prestamos se vuelve a verificar el límite del socio dentro de la transacción.
+    Con `reserva`, el ejemplar es el que se le apartó al socio: la reserva tiene
+    que seguir asignada y queda cumplida.
+    """
+    no_disponible = ErrorCirculacion(f'El ejemplar {ejemplar.codigo_ejemplar} ya no está disponible.')
+    if reserva is not None:
+        if not Reserva.objects.filter(pk=reserva.pk, estado='asignada').update(estado='cumplida'):
+            raise no_disponible
+        reserva.estado = 'cumplida'
+    disponible = Ejemplar.objects.filter(pk=ejemplar.pk, estado='reservado' if reserva else 'disponible')
+    # Si otro mostrador lo está prestando en este momento no se lo espera: se rechaza
+    if soporta_bloqueo_de_filas() and not bloquear(disponible, saltear_bloqueadas=True).exists():
+        raise no_disponible
+    if not disponible.update(estado='prestado'):
+        raise no_disponible
+    ejemplar.estado = 'prestado'
+    publicar(ejemplar)
+
+    if max_prestamos is not None:
+        # Serializa los préstamos del mismo socio para que dos mostradores no superen el límite
+        if soporta_bloqueo_de_filas():
+            bloquear(Socio.objects.filter(pk=socio.pk)).exists()
+        if socio.prestamos_activos().count() >= max_prestamos:
+            raise ErrorCirculacion(
+                f'El socio {socio.nombre} ya tiene {max_prestamos} préstamos activos.'
+            )
+
+    return Prestamo.objects.create(
+        socio=socio,
+        ejemplar=ejemplar,
+        fecha_devolucion_prevista=timezone.now().date() + timedelta(days=dias_prestamo)
+    )
+
+
+@con_reintentos
+def registrar_devolucion(prestamo, estado_fisico, terminos, monto=None, observaciones=''):
+    """
+    Cierra el préstamo, actualiza el ejemplar y aplica las multas que correspondan:
+      - bueno: solo multa por retraso
+      - dañado: multa por daño (monto) y por retraso
+      - perdido: multa por pérdida (monto)
+
+    Returns:
+        tuple (multa_retraso, multa_estado): las multas creadas (o None)
+    """
+    ahora = timezone.now()
+    cerrados = Prestamo.objects.filter(
+        pk=prestamo.pk, fecha_devolucion_real__isnull=True
+    ).update(fecha_devolucion_real=ahora, observaciones=observaciones or prestamo.observaciones)
+    if not cerrados:
+        raise ErrorCirculacion('Este préstamo ya fue devuelto anteriormente.')
+    prestamo.fecha_devolucion_real = ahora
+    if observaciones:
+        prestamo.observaciones = observaciones
+
+    ejemplar = prestamo.ejemplar
+    libro = ejemplar.libro
+    ejemplar.estado = ESTADOS_DEVOLUCION[estado_fisico]
+    if ejemplar.estado == 'disponible':
+        # Si el libro tiene reservas en espera, el ejemplar se aparta para la primera
+        asignar_reserva(ejemplar)
+    if estado_fisico == 'dañado':
+        ejemplar.observaciones = f'Dañado en devolución - {ahora.date()}'
+    elif estado_fisico == 'perdido':
+        ejemplar.observaciones = f'Reportado como perdido - {ahora.date()}'
+    ejemplar.save()
+    publicar(ejemplar)
+
+    multa_estado = None
+    if estado_fisico == 'dañado':
+        multa_estado = Multa.objects.create(
+            socio=prestamo.socio,
+            prestamo=prestamo,
+            monto=monto,
+            motivo='daño',
+            descripcion=f'Libro "{libro.titulo}" devuelto con daños. {observaciones}'
+        )
+    elif estado_fisico == 'perdido':
+        multa_estado = Multa.objects.create(
+            socio=prestamo.socio,
+            prestamo=prestamo,
+            monto=monto,
+            motivo='perdida',
+            descripcion=f'Libro "{libro.titulo}" reportado como perdido. {observaciones}'
+        )
+
+    # Un libro perdido no se cobra además por retraso
+    multa_retraso = None
+    if estado_fisico != 'perdido' and prestamo.tiene_retraso():
+        dias_retraso = prestamo.dias_retraso()
+        multa_retraso = Multa.objects.create(
+            socio=prestamo.socio,
+            prestamo=prestamo,
+            monto=terminos.calcular_multa_retraso(dias_retraso),
+            motivo='retraso',
+            descripcion=f'Retraso de {dias_retraso} días en la devolución del libro "{libro.titulo}"'
+        )
+
+    notificaciones.multas_generadas(prestamo, (multa_retraso, multa_estado))
+    return multa_retraso, multa_estado
+
+
+def reservar(socio, libro):
+    """
+    PROCESO 5: pone al socio en la cola de reservas del libro.
+    1. El socio está activo
+    2. El libro no tiene ejemplares disponibles (si tiene, se presta)
+    3. El socio no tiene ya una reserva activa del libro
+
+    Raises:
+        ErrorCirculacion: con el motivo del rechazo
+    """
+    if not socio.activo:
+        raise ErrorCirculacion(f'El socio {socio.nombre} no está activo.')
+    if Ejemplar.objects.filter(libro=libro, estado='disponible').exists():
+        raise ErrorCirculacion(f'El libro "{libro.titulo}" tiene ejemplares disponibles: se puede prestar ahora.')
+
+    reserva = registrar_reserva(socio, libro)
+    RESERVAS.inc(evento='registrada')
+    return reserva
+
+
+@con_reintentos
+def registrar_reserva(socio, libro):
+    """Agrega la reserva al final de la cola del libro (una activa por socio y libro)"""
+    try:
+        return Reserva.objects.create(socio=socio, libro=libro)
+    except IntegrityError:
+        raise ErrorCirculacion(f'El socio {socio.nombre} ya tiene una reserva activa de "{libro.titulo}".')
+
+
+def cancelar_reserva(reserva):
+    """
+    Cancela una reserva activa. Si ya tenía un ejemplar apartado, el ejemplar
+    pasa a la siguiente reserva de la cola o queda disponible.
+
+    Raises:
+        ErrorCirculacion: la reserva ya fue cumplida o cancelada
+    """
+    ejemplar = registrar_cancelacion(reserva)
+    RESERVAS.inc(evento='cancelada')
+    if ejemplar is not None and ejemplar.estado == 'reservado':
+        RESERVAS.inc(evento='asignada')
+    return ejemplar
+
+
+@con_reintentos
+def registrar_cancelacion(reserva):
+    """Cancela la reserva y libera su ejemplar apartado; devuelve ese ejemplar (o None)"""
+    actual = Reserva.objects.select_related('ejemplar__libro').filter(pk=reserva.pk, estado__in=Reserva.ACTIVAS).first()
+    if actual is None:
+        raise ErrorCirculacion('La reserva ya fue cumplida o cancelada.')
+    Reserva.objects.filter(pk=reserva.pk).update(estado='cancelada')
+    reserva.estado = 'cancelada'
+
+    ejemplar = actual.ejemplar if actual.estado == 'asignada' else None
+    if ejemplar is not None and ejemplar.estado == 'reservado':
+        asignar_reserva(ejemplar)
+        ejemplar.save()
+        publicar(ejemplar)
+    return ejemplar
+
+
+def asignar_reserva(ejemplar):
+    """
+    El ejemplar vuelve a circular: se aparta para la primera reserva en espera
+    de su libro (queda "reservado") o, si no hay, queda disponible. La cabeza
+    de la cola es una sola lectura del índice parcial (libro, fecha, id); las
+    reservas de socios dados de baja se saltean.
+    Se llama dentro de la transacción que modifica el ejemplar, que lo guarda
+    después; el aviso al socio se encola en la misma transacción.
+
+    Returns:
+        La reserva asignada, o None
+    """
+    cola = Reserva.objects.filter(
+        libro_id=ejemplar.libro_id, estado='pendiente', socio__activo=True
+    ).order_by('fecha', 'id')
+    # Dos devoluciones del mismo libro a la vez no apartan ambas para la misma reserva
+    reserva = bloquear(cola, saltear_bloqueadas=True).first()
+    if reserva is None:
+        ejemplar.estado = 'disponible'
+        return None
+    reserva.estado = 'asignada'
+    reserva.ejemplar = ejemplar
+    reserva.fecha_asignacion = timezone.now()
+    Reserva.objects.filter(pk=reserva.pk).update(
+        estado=reserva.estado, ejemplar=ejemplar, fecha_asignacion=reserva.fecha_asignacion
+    )
+    ejemplar.estado = 'reservado'
+    notificaciones.reserva_asignada(reserva, ejemplar)
+    return reserva
@@ -0,0 +1,283 @@
+"""
+Generación de comprobantes PDF (multas y préstamos).
+
+Un comprobante en estado final (multa pagada, préstamo devuelto) nunca cambia,
+así que su PDF se guarda en cache bajo una huella calculada a partir de los
+datos que se imprimen. Los estados que todavía pueden cambiar (multa pendiente,
+préstamo activo) se renderizan siempre de nuevo.
+"""
+
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+
+# Se incrementa cuando cambia el diseño del PDF para invalidar lo cacheado
+VERSION_FORMATO = 1
+
+# Paleta de colores compartida por todos los comprobantes
+COLOR_TITULO = '#3E2723'
+COLOR_ETIQUETA = '#6B5B4D'
+COLOR_OK = '#5A9E8B'
+COLOR_ALERTA = '#F0AD4E'
+COLOR_ERROR = '#E06055'
+COLOR_LINEA = '#E5DDD1'
+COLOR_FONDO = '#FAF8F5'
+COLOR_PIE = '#999999'
+
+
+class Comprobante:
+    """
+    Datos de un comprobante listos para renderizar.
+    Si es inmutable, `huella` identifica su contenido y sirve como ETag.
+    """
+
+    def __init__(self, tipo, objeto_id, titulo, estado_texto, estado_color, filas,
+                 fila_destacada, nota, fecha_emision, inmutable,
+                 nota_color=COLOR_ETIQUETA, nota_fuente='Helvetica-Oblique'):
+        self.tipo = tipo
+        self.objeto_id = objeto_id
+        self.titulo = titulo
+        self.estado_texto = estado_texto
+        self.estado_color = estado_color
+        self.filas = filas
+        self.fila_destacada = fila_destacada
+        self.nota = nota
+        self.nota_color = nota_color
+        self.nota_fuente = nota_fuente
+        self.fecha_emision = fecha_emision
+        self.inmutable = inmutable
+        self.huella = self._calcular_huella() if inmutable else None
+
+    @property
+    def nombre_archivo(self):
+        return f'comprobante_{self.tipo}_{self.objeto_id}.pdf'
+
+    @property
+    def clave_cache(self):
+        return f'comprobante:{self.tipo}:{self.objeto_id}:{self.huella}'
+
+    def _calcular_huella(self):
+        """Hash de todo lo que se imprime: si algo cambia, cambia la huella"""
+        partes = [
+            VERSION_FORMATO, self.tipo, self.objeto_id, self.titulo,
+            self.estado_texto, self.nota, self.fecha_emision.isoformat(),
+        ]
+        partes.extend(f'{etiqueta}={valor}' for etiqueta, valor in self.filas)
+        contenido = '\x1f'.join(str(parte) for parte in partes)
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:32]
+
+
+def comprobante_multa(multa):
+    """Arma el comprobante de una multa (inmutable una vez pagada)"""
+    if multa.pagada:
+        estado_texto, estado_color = "PAGADA", COLOR_OK
+        nota = "Este comprobante certifica que la multa ha sido pagada en su totalidad."
+    else:
+        estado_texto, estado_color = "PENDIENTE", COLOR_ERROR
+        nota = "Este comprobante debe ser presentado al momento del pago de la multa."
+
+    filas = [
+        ['Nº de Comprobante:', f'#{multa.id}'],
+        ['Fecha de Emisión:', _formatear(multa.fecha, '%d/%m/%Y %H:%M')],
+        ['Socio:', multa.socio.nombre],
+        ['DNI:', multa.socio.dni],
+        ['Nº Socio:', multa.socio.numero_socio],
+        ['', ''],
+        ['Motivo:', multa.get_motivo_display()],
+        ['Descripción:', multa.descripcion or 'N/A'],
+        ['', ''],
+        ['MONTO:', f'$ {multa.monto}'],
+    ]
+    if multa.pagada:
+        filas.append(['Fecha de Pago:', _formatear(multa.fecha_pago, '%d/%m/%Y %H:%M')])
+
+    return Comprobante(
+        tipo='multa',
+        objeto_id=multa.id,
+        titulo="COMPROBANTE DE MULTA",
+        estado_texto=estado_texto,
+        estado_color=estado_color,
+        filas=filas,
+        fila_destacada=9,
+        nota=nota,
+        # Un comprobante pagado se "emite" en la fecha de pago, así el PDF es estable
+        fecha_emision=multa.fecha_pago if multa.pagada else timezone.now(),
+        inmutable=multa.pagada,
+    )
+
+
+def comprobante_prestamo(prestamo):
+    """Arma el comprobante de un préstamo (inmutable una vez devuelto)"""
+    activo = prestamo.esta_activo()
+    retrasado = activo and prestamo.tiene_retraso()
+
+    if retrasado:
+        estado_texto, estado_color = "RETRASADO", COLOR_ALERTA
+        nota = "ATENCIÓN: Este préstamo está vencido. Por favor devolver el ejemplar a la brevedad para evitar multas adicionales."
+    elif activo:
+        estado_texto, estado_color = "ACTIVO", COLOR_OK
+        nota = f"Este préstamo es válido hasta el {prestamo.fecha_devolucion_prevista.strftime('%d/%m/%Y')}. Por favor devolver antes de esa fecha."
+    else:
+        estado_texto, estado_color = "DEVUELTO", COLOR_ETIQUETA
+        nota = "Este préstamo ha sido devuelto satisfactoriamente."
+
+    libro = prestamo.ejemplar.libro
+    filas = [
+        ['Nº de Préstamo:', f'#{prestamo.id}'],
+        ['Fecha de Préstamo:', _formatear(prestamo.fecha_inicio, '%d/%m/%Y')],
+        ['', ''],
+        ['Socio:', prestamo.socio.nombre],
+        ['DNI:', prestamo.socio.dni],
+        ['Nº Socio:', prestamo.socio.numero_socio],
+        ['', ''],
+        ['Libro:', libro.titulo],
+        ['Autor:', libro.autor],
+        ['Editorial:', libro.editorial or 'N/A'],
+        ['ISBN:', libro.isbn],
+        ['Código Ejemplar:', prestamo.ejemplar.codigo_ejemplar],
+        ['', ''],
+        ['FECHA DE DEVOLUCIÓN:', prestamo.fecha_devolucion_prevista.strftime('%d/%m/%Y')],
+    ]
+    if not activo:
+        filas.append(['Devuelto el:', _formatear(prestamo.fecha_devolucion_real, '%d/%m/%Y')])
+
+    return Comprobante(
+        tipo='prestamo',
+        objeto_id=prestamo.id,
+        titulo="COMPROBANTE DE PRÉSTAMO",
+        estado_texto=estado_texto,
+        estado_color=estado_color,
+        filas=filas,
+        fila_destacada=13,
+        nota=nota,
+        nota_color=COLOR_ERROR if retrasado else COLOR_ETIQUETA,
+        nota_fuente='Helvetica-Bold' if retrasado else 'Helvetica-Oblique',
+        fecha_emision=timezone.now() if activo else prestamo.fecha_devolucion_real,
+        inmutable=not activo,
+    )
+
+
+def obtener_pdf(comprobante):
+    """
+    Retorna los bytes del PDF.
+    Los comprobantes inmutables se buscan primero en cache (y se guardan sin vencimiento).
+    """
+    pdf = pdf_cacheado(comprobante)
+    if pdf is None:
+        pdf = renderizar_pdf(comprobante)
+        if comprobante.inmutable:
+            caches[settings.COMPROBANTES_CACHE].set(comprobante.clave_cache, pdf, timeout=None)
+    return pdf
+
+
+def pdf_cacheado(comprobante):
+    """Los bytes del PDF si ya están en cache (solo los inmutables se guardan), o None"""
+    if not comprobante.inmutable:
+        return None
+    return caches[settings.COMPROBANTES_CACHE].get(comprobante.clave_cache)
+
+
+def renderizar_pdf(comprobante):
+    """Construye el PDF del comprobante y retorna sus bytes"""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    doc.build(elementos_comprobante(comprobante))
+    return buffer.getvalue()
+
+
+def renderizar_lote(comprobantes):
+    """
+    Renderiza varios comprobantes y retorna pares (nombre_archivo, bytes).
+    Pensada para correr en otro proceso: no accede a la base de datos.
+    """
+    return [(c.nombre_archivo, renderizar_pdf(c)) for c in comprobantes]
+
+
+def elementos_comprobante(comprobante):
+    """Lista de flowables de reportlab que forman el comprobante"""
+    styles = getSampleStyleSheet()
+    elements = []
+
+    # Título
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor(COLOR_TITULO),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+    elements.append(Paragraph(comprobante.titulo, title_style))
+    elements.append(Spacer(1, 0.2*inch))
+
+    # Estado
+    estado_style = ParagraphStyle(
+        'Estado',
+        parent=styles['Normal'],
+        fontSize=16,
+        textColor=colors.HexColor(comprobante.estado_color),
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+    elements.append(Paragraph(f"Estado: {comprobante.estado_texto}", estado_style))
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Tabla de datos con la fila destacada (monto o fecha de devolución)
+    destacada = comprobante.fila_destacada
+    table = Table(comprobante.filas, colWidths=[2.5*inch, 4*inch])
+    table.setStyle(TableStyle([
+        ('FONT', (0, 0), (-1, -1), 'Helvetica', 11),
+        ('FONT', (0, destacada), (-1, destacada), 'Helvetica-Bold', 14),
+        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor(COLOR_ETIQUETA)),
+        ('TEXTCOLOR', (0, destacada), (-1, destacada), colors.HexColor(COLOR_TITULO)),
+        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LINEBELOW', (0, destacada - 1), (-1, destacada - 1), 1, colors.HexColor(COLOR_LINEA)),
+        ('LINEABOVE', (0, destacada), (-1, destacada), 2, colors.HexColor(COLOR_TITULO)),
+        ('BACKGROUND', (0, destacada), (-1, destacada), colors.HexColor(COLOR_FONDO)),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ]))
+    elements.append(table)
+    elements.append(Spacer(1, 0.4*inch))
+
+    # Nota al pie
+    nota_style = ParagraphStyle(
+        'Nota',
+        parent=styles['Normal'],
+        fontSize=9,
+        textColor=colors.HexColor(comprobante.nota_color),
+        alignment=TA_CENTER,
+        fontName=comprobante.nota_fuente
+    )
+    elements.append(Paragraph(comprobante.nota, nota_style))
+    elements.append(Spacer(1, 0.2*inch))
+
+    # Fecha de emisión del comprobante
+    fecha_style = ParagraphStyle(
+        'Fecha',
+        parent=styles['Normal'],
+        fontSize=8,
+        textColor=colors.HexColor(COLOR_PIE),
+        alignment=TA_RIGHT
+    )
+    fecha_emision = _formatear(comprobante.fecha_emision, '%d/%m/%Y %H:%M:%S')
+    elements.append(Paragraph(f"Comprobante generado el {fecha_emision}", fecha_style))
+
+    return elements
+
+
+def _formatear(fecha_hora, formato):
+    """Formatea un datetime en la zona horaria local de la biblioteca"""
+    return timezone.localtime(fecha_hora).strftime(formato)
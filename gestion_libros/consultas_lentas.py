@@ -0,0 +1,183 @@
+"""
+Captura de consultas lentas con su plan de ejecución.
+
+Cada conexión lleva un execute_wrapper que mide las consultas. Las que tardan
+más de CONSULTAS_LENTAS_MS se agrupan por huella (el SQL sin valores: mismas
+consultas con otros parámetros o listas IN de otro largo cuentan juntas) en la
+tabla ConsultaLenta, con llamadas, p95 y máximo. La primera vez que aparece una
+huella se guarda su plan (EXPLAIN QUERY PLAN en SQLite, EXPLAIN en PostgreSQL);
+si el plan recorre una tabla entera se marca, así un filtro sin índice sobre
+Prestamo o Multa aparece solo en el admin.
+
+Durante un request las consultas lentas solo se anotan en memoria (anotar) y
+se escriben al terminar, después de mandar la respuesta (request_finished):
+el request no espera la escritura en el primario, y si su transacción se
+deshace la consulta igual queda registrada. Fuera de un request (comandos)
+se escriben enseguida.
+
+La tabla guarda como mucho CONSULTAS_LENTAS_MAX huellas (se descartan las que
+hace más tiempo no aparecen). Con CONSULTAS_LENTAS_MS = None no se mide nada.
+"""
+
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+
+
+logger = logging.getLogger('gestion_libros.consultas_lentas')
+
+# Duraciones que se guardan por huella para calcular el p95
+VENTANA = 100
+
+_TEXTOS = re.compile(r"'(?:[^']|'')*'")
+_NUMEROS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LISTAS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ESPACIOS = re.compile(r'\s+')
+
+# Mientras se registra una consulta lenta no se miden las consultas propias;
+# `requests` cuenta los requests en curso en el hilo
+_estado = threading.local()
+
+# Consultas lentas anotadas y todavía no escritas: (alias, sql, params, duración en ms)
+_pendientes = []
+_lock = threading.Lock()
+
+
+def normalizar(sql):
+    """El SQL sin valores: literales y placeholders pasan a ?, las listas (?, ?, ...) a (...)"""
+    sql = _TEXTOS.sub('?', sql)
+    sql = _NUMEROS.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _LISTAS.sub('(...)', sql)
+    return _ESPACIOS.sub(' ', sql).strip()
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[max(math.ceil(len(ordenados) * p / 100) - 1, 0)]
+
+
+def recorre_tabla(plan):
+    """El plan lee una tabla completa (SQLite: 'SCAN tabla' sin índice; PostgreSQL: 'Seq Scan')"""
+    for linea in plan.splitlines():
+        linea = linea.strip()
+        if 'Seq Scan' in linea:
+            return True
+        if linea.startswith('SCAN ') and ' USING ' not in linea and 'CONSTANT ROW' not in linea:
+            return True
+    return False
+
+
+def explicar(connection, sql, params):
+    """Plan de ejecución de la consulta ('' si no se puede explicar)"""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH', 'UPDATE', 'DELETE')):
+        return ''
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return '\n'.join(str(fila[-1]) for fila in cursor.fetchall())
+    except DatabaseError:
+        return ''
+
+
+def registrar(connection, sql, params, duracion_ms):
+    """Suma la consulta a su huella (la crea con el plan si es nueva)"""
+    from .models import ConsultaLenta
+
+    normalizado = normalizar(sql)
+    duracion_ms = round(duracion_ms, 2)
+    huella = hashlib.sha1(f'{connection.alias}:{normalizado}'.encode()).hexdigest()
+
+    _estado.capturando = True
+    try:
+        # Siempre en el primario (aunque la consulta lenta haya sido en una réplica) y en
+        # un savepoint: si algo falla, la transacción de la vista sigue intacta
+        consultas = ConsultaLenta.objects.using('default')
+        with transaction.atomic(using='default'):
+            consulta = consultas.filter(huella=huella).first()
+            nueva = consulta is None
+            if nueva:
+                plan = explicar(connection, sql, params)
+                consulta = ConsultaLenta(
+                    huella=huella, base=connection.alias, sql=normalizado,
+                    plan=plan, escaneo_completo=recorre_tabla(plan),
+                )
+            consulta.llamadas += 1
+            consulta.duraciones = (consulta.duraciones + [duracion_ms])[-VENTANA:]
+            consulta.p95_ms = percentil(consulta.duraciones, 95)
+            consulta.max_ms = max(consulta.max_ms, duracion_ms)
+            consulta.save(using='default')
+
+            if nueva:
+                viejas = consultas.order_by('-ultima_vez').values_list('id', flat=True)
+                viejas = list(viejas[settings.CONSULTAS_LENTAS_MAX:])
+                if viejas:
+                    consultas.filter(id__in=viejas).delete()
+    except DatabaseError:
+        logger.warning('No se pudo registrar la consulta lenta', exc_info=True)
+    finally:
+        _estado.capturando = False
+
+
+def anotar(connection, sql, params, duracion_ms):
+    """Guarda la consulta para escribirla al terminar el request (o enseguida, fuera de uno)"""
+    with _lock:
+        _pendientes.append((connection.alias, sql, tuple(params or ()), duracion_ms))
+    if not getattr(_estado, 'requests', 0):
+        volcar()
+
+
+def volcar():
+    """Escribe las consultas lentas anotadas"""
+    # Con la transacción del primario rota no se puede escribir: quedan para la próxima vez
+    if connections['default'].needs_rollback:
+        return
+    with _lock:
+        pendientes = _pendientes[:]
+        del _pendientes[:]
+    for alias, sql, params, duracion_ms in pendientes:
+        registrar(connections[alias], sql, params, duracion_ms)
+
+
+def request_iniciado(sender, **kwargs):
+    """Receptor de request_started: lo que se anote hasta que termine espera a la respuesta"""
+    _estado.requests = getattr(_estado, 'requests', 0) + 1
+
+
+def request_terminado(sender, **kwargs):
+    """Receptor de request_finished: la respuesta ya salió, se escribe lo anotado"""
+    _estado.requests = max(getattr(_estado, 'requests', 0) - 1, 0)
+    volcar()
+
+
+class CapturaConsultasLentas:
+    """execute_wrapper que mide cada consulta y registra las que superan el umbral"""
+
+    def __call__(self, execute, sql, params, many, context):
+        umbral = settings.CONSULTAS_LENTAS_MS
+        if umbral is None or getattr(_estado, 'capturando', False):
+            return execute(sql, params, many, context)
+
+        inicio = time.perf_counter()
+        resultado = execute(sql, params, many, context)
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+
+        # executemany no se puede explicar
+        if duracion_ms >= umbral and not many:
+            anotar(context['connection'], sql, params, duracion_ms)
+        return resultado
+
+
+def instalar_captura(sender, connection, **kwargs):
+    """Receptor de connection_created: agrega la captura a la conexión (una sola vez)"""
+    if any(isinstance(envoltura, CapturaConsultasLentas) for envoltura in connection.execute_wrappers):
+        return
+    # Al principio de la lista: execute_wrapper() saca la última envoltura al salir, y la
+    # conexión puede abrirse dentro de uno de esos bloques (ej: InstrumentacionMiddleware)
+    connection.execute_wrappers.insert(0, CapturaConsultasLentas())
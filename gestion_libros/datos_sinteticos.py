@@ -0,0 +1,342 @@
+"""
+Generador de una biblioteca sintética grande, para benchmarks y pruebas de carga.
+
+Los datos imitan la circulación real:
+  - popularidad despareja: pocos libros (y pocos socios) concentran la mayoría
+    de los préstamos (pesos de Zipf)
+  - los préstamos se generan en orden cronológico sobre los últimos dos años y
+    un ejemplar no se presta dos veces a la vez: los libros populares se agotan
+  - la mayoría se devuelve a tiempo; hay una cola de retrasos (exponencial),
+    daños y pérdidas, con sus multas (las viejas casi siempre pagadas)
+  - los préstamos que todavía no terminaron quedan activos, algunos vencidos
+  - los libros que se quedaron sin ejemplares disponibles tienen reservas en espera
+  - una parte de libros, ejemplares y socios está dada de baja
+
+Con la misma semilla se generan los mismos datos (relativos a la fecha de hoy).
+
+simular_biblioteca arma las filas como tuplas (con los ids ya asignados) y
+escribir_biblioteca las inserta con executemany: bulk_create arma una instancia
+del modelo y prepara cada valor por separado, y eso lo limita a unas 10.000
+filas por segundo en SQLite; así se escriben entre 75.000 y 90.000 (en una
+máquina de un núcleo). Las fechas se manejan en UTC sin zona horaria, que es
+como las guarda Django. Al final se ajustan las secuencias de ids (PostgreSQL).
+"""
+
+import bisect
+import itertools
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .models import Libro, Ejemplar, Socio, Prestamo, Multa, PrestamoArchivado, MultaArchivada, Reserva, Notificacion
+from .singleton import obtener_configuracion
+
+
+NOMBRES = [
+    'Ana', 'Juan', 'María', 'Carlos', 'Lucía', 'Martín', 'Sofía', 'Diego', 'Valentina', 'Jorge',
+    'Camila', 'Pablo', 'Florencia', 'Nicolás', 'Julieta', 'Federico', 'Paula', 'Matías', 'Agustina', 'Tomás',
+]
+APELLIDOS = [
+    'García', 'Rodríguez', 'González', 'Fernández', 'López', 'Martínez', 'Pérez', 'Gómez', 'Díaz', 'Sánchez',
+    'Romero', 'Sosa', 'Álvarez', 'Torres', 'Ruiz', 'Ramírez', 'Flores', 'Acosta', 'Benítez', 'Medina',
+]
+PALABRAS = [
+    'historia', 'noche', 'ciudad', 'tiempo', 'memoria', 'río', 'silencio', 'casa', 'viaje', 'guerra',
+    'jardín', 'mar', 'sombra', 'ciencia', 'código', 'arte', 'invierno', 'isla', 'camino', 'fuego',
+]
+EDITORIALES = ['Sudamericana', 'Planeta', 'Anagrama', 'Alfaguara', 'Siglo XXI', 'Eudeba', 'Paidós', None]
+
+# (valor, peso)
+CATEGORIAS_LIBRO = [('general', 85), ('novedad', 10), ('referencia', 5)]
+CATEGORIAS_SOCIO = [('estandar', 70), ('estudiante', 20), ('investigador', 10)]
+
+PROPORCION_LIBROS_INACTIVOS = 0.03
+PROPORCION_EJEMPLARES_INACTIVOS = 0.02
+PROPORCION_SOCIOS_INACTIVOS = 0.05
+PROBABILIDAD_RETRASO = 0.15
+DIAS_RETRASO_PROMEDIO = 7
+PROBABILIDAD_DAÑO = 0.01
+PROBABILIDAD_PERDIDA = 0.005
+DIAS_MANTENIMIENTO = 14
+HISTORIA_DIAS = 730
+INTENTOS_POR_PRESTAMO = 5
+RESERVAS_POR_LIBRO_AGOTADO = 4  # máximo; cada libro agotado tiene entre 0 y este número
+DIAS_RESERVAS = 30
+
+
+def _isbn(numero):
+    """ISBN-13 válido (prefijo 978) a partir de un número de secuencia"""
+    base = f'978{numero:09d}'
+    suma = sum(int(digito) * (1 if i % 2 == 0 else 3) for i, digito in enumerate(base))
+    return f'{base}{(10 - suma % 10) % 10}'
+
+
+def _elegir_categoria(azar, categorias):
+    valores, pesos = zip(*categorias)
+    return azar.choices(valores, weights=pesos)[0]
+
+
+def _pesos_zipf(cantidad, exponente):
+    """Pesos acumulados de Zipf: el elemento i se elige con probabilidad proporcional a 1/i^exponente"""
+    return list(itertools.accumulate(1 / (rango ** exponente) for rango in range(1, cantidad + 1)))
+
+
+def _elegir(azar, elementos, pesos_acumulados):
+    return elementos[bisect.bisect(pesos_acumulados, azar.uniform(0, pesos_acumulados[-1])) - 1]
+
+
+def _insertar(modelo, campos, filas, tamaño_lote):
+    """
+    INSERT de las tuplas `filas` (valores de `campos`, en ese orden) con executemany.
+    Las fechas llegan en UTC sin zona horaria: PostgreSQL las recibe tal cual y en
+    SQLite se guardan como texto ISO, igual que lo hace el ORM. Los campos auto_now
+    (fecha_actualizacion) que no vienen en las tuplas se completan con el momento
+    de la carga, como lo haría save().
+    """
+    campos = [modelo._meta.get_field(nombre) for nombre in campos]
+    automaticos = [
+        campo for campo in modelo._meta.concrete_fields
+        if getattr(campo, 'auto_now', False) and campo not in campos
+    ]
+    if automaticos:
+        ahora = (timezone.now().replace(tzinfo=None),) * len(automaticos)
+        campos += automaticos
+        filas = [tuple(fila) + ahora for fila in filas]
+    fechas = [i for i, campo in enumerate(campos) if isinstance(campo, models.DateField)]
+    if fechas and connection.vendor == 'sqlite':
+        filas = [list(fila) for fila in filas]
+        for fila in filas:
+            for i in fechas:
+                if fila[i] is not None:
+                    fila[i] = str(fila[i])
+
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(modelo._meta.db_table),
+        ', '.join(quote(campo.column) for campo in campos),
+        ', '.join(['%s'] * len(campos)),
+    )
+    with connection.cursor() as cursor:
+        for desde in range(0, len(filas), tamaño_lote):
+            cursor.executemany(sql, filas[desde:desde + tamaño_lote])
+    return len(filas)
+
+
+def _siguiente_id(modelo):
+    return (modelo._default_manager.aggregate(maximo=models.Max('id'))['maximo'] or 0) + 1
+
+
+def borrar_datos():
+    """Borra toda la circulación y el catálogo (no la configuración ni las políticas)"""
+    for modelo in (Notificacion, Reserva, MultaArchivada, PrestamoArchivado, Multa, Prestamo, Ejemplar, Libro, Socio):
+        # _default_manager incluye lo dado de baja (objects_all)
+        modelo._default_manager.all().delete()
+
+
+def generar_datos(libros, ejemplares_por_libro, socios, prestamos, semilla=42, tamaño_lote=5000):
+    """
+    Genera la biblioteca y devuelve la cantidad de filas creadas por tabla.
+    Los ISBN, DNI y números de socio son fijos: las tablas de libros y socios
+    deben estar vacías (ver borrar_datos).
+    """
+    filas = simular_biblioteca(libros, ejemplares_por_libro, socios, prestamos, semilla)
+    return escribir_biblioteca(filas, tamaño_lote)
+
+
+def simular_biblioteca(libros, ejemplares_por_libro, socios, prestamos, semilla=42):
+    """Filas de cada tabla ({modelo: [tupla, ...]}), sin tocar la base salvo para leer los ids libres"""
+    azar = random.Random(semilla)
+    # UTC sin zona horaria: se adapta mucho más rápido al insertar (ver _insertar)
+    ahora = timezone.now().replace(tzinfo=None)
+    hoy = ahora.date()
+    config = obtener_configuracion()
+
+    # === Catálogo ===
+    # (isbn, titulo, autor, editorial, año_publicacion, categoria, activo)
+    filas_libros = []
+    for i in range(libros):
+        palabras = azar.sample(PALABRAS, azar.randint(1, 3))
+        filas_libros.append((
+            _isbn(i + 1),
+            ' '.join(palabras).capitalize(),
+            f'{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)}',
+            azar.choice(EDITORIALES),
+            azar.randint(1950, hoy.year),
+            _elegir_categoria(azar, CATEGORIAS_LIBRO),
+            azar.random() >= PROPORCION_LIBROS_INACTIVOS,
+        ))
+
+    # Los ejemplares son listas: el estado (índice 3) cambia durante la simulación
+    # [id, libro_id, codigo_ejemplar, estado, fecha_adquisicion, activo]
+    ejemplares = []
+    ejemplares_por_isbn = {}
+    id_ejemplar = _siguiente_id(Ejemplar)
+    for isbn, titulo, autor, editorial, año, categoria, activo in filas_libros:
+        for numero in range(1, ejemplares_por_libro + 1):
+            ejemplar = [
+                id_ejemplar, isbn, f'EJ-{isbn}-{numero:03d}', 'disponible',
+                hoy - timedelta(days=azar.randint(HISTORIA_DIAS, 3 * HISTORIA_DIAS)),
+                activo and azar.random() >= PROPORCION_EJEMPLARES_INACTIVOS,
+            ]
+            ejemplares.append(ejemplar)
+            if ejemplar[5]:
+                ejemplares_por_isbn.setdefault(isbn, []).append(ejemplar)
+            id_ejemplar += 1
+
+    # (id, dni, numero_socio, nombre, email, fecha_registro, activo, categoria)
+    filas_socios = []
+    id_socio = _siguiente_id(Socio)
+    for i in range(socios):
+        filas_socios.append((
+            id_socio + i,
+            str(20_000_000 + i),
+            f'SOC-{i + 1:06d}',
+            f'{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)}',
+            f'socio{i + 1}@example.com',
+            hoy - timedelta(days=azar.randint(0, 3 * HISTORIA_DIAS)),
+            azar.random() >= PROPORCION_SOCIOS_INACTIVOS,
+            _elegir_categoria(azar, CATEGORIAS_SOCIO),
+        ))
+
+    # === Circulación ===
+    # El orden de libros y socios en la curva de popularidad es aleatorio
+    prestables = [(isbn, categoria) for isbn, _, _, _, _, categoria, activo in filas_libros if activo]
+    azar.shuffle(prestables)
+    socios_activos = [(fila[0], fila[7]) for fila in filas_socios if fila[6]]
+    azar.shuffle(socios_activos)
+    pesos_libros = _pesos_zipf(len(prestables), 1.1)
+    pesos_socios = _pesos_zipf(len(socios_activos), 0.8)
+
+    # Fecha desde la que cada ejemplar vuelve a estar libre
+    libre_desde = {ejemplar[0]: ahora - timedelta(days=HISTORIA_DIAS + 1) for ejemplar in ejemplares}
+    nunca = ahora + timedelta(days=HISTORIA_DIAS)
+    if not prestables or not socios_activos:
+        prestamos = 0
+    inicios = sorted(ahora - timedelta(seconds=azar.uniform(0, HISTORIA_DIAS * 86400)) for _ in range(prestamos))
+
+    # (id, socio_id, ejemplar_id, fecha_inicio, fecha_devolucion_prevista, fecha_devolucion_real)
+    filas_prestamos = []
+    multas = []  # (prestamo_id, socio_id, motivo, monto, fecha)
+    id_prestamo = _siguiente_id(Prestamo)
+    for inicio in inicios:
+        socio_id, categoria_socio = _elegir(azar, socios_activos, pesos_socios)
+        # Si el libro es de consulta en sala o no tiene ejemplares libres, el socio
+        # prueba con otro (hasta INTENTOS_POR_PRESTAMO veces)
+        for _ in range(INTENTOS_POR_PRESTAMO):
+            isbn, categoria_libro = _elegir(azar, prestables, pesos_libros)
+            terminos = config.terminos(categoria_libro, categoria_socio)
+            libres = [e for e in ejemplares_por_isbn.get(isbn, ()) if libre_desde[e[0]] <= inicio]
+            if terminos.permite_prestamo and libres:
+                break
+        else:
+            continue
+        ejemplar = azar.choice(libres)
+
+        prevista = (inicio + timedelta(days=terminos.dias_prestamo)).date()
+        suerte = azar.random()
+        if suerte < PROBABILIDAD_PERDIDA:
+            resultado, dias = 'perdido', terminos.dias_prestamo + azar.randint(1, 30)
+        elif suerte < PROBABILIDAD_PERDIDA + PROBABILIDAD_DAÑO:
+            resultado, dias = 'dañado', azar.randint(1, terminos.dias_prestamo)
+        elif suerte < PROBABILIDAD_PERDIDA + PROBABILIDAD_DAÑO + PROBABILIDAD_RETRASO:
+            resultado = 'bueno'
+            dias = terminos.dias_prestamo + 1 + int(azar.expovariate(1 / DIAS_RETRASO_PROMEDIO))
+        else:
+            resultado, dias = 'bueno', azar.randint(1, terminos.dias_prestamo)
+        devolucion = inicio + timedelta(days=dias, seconds=azar.randint(0, 8 * 3600))
+
+        if devolucion > ahora:
+            # Todavía no volvió: préstamo activo (vencido si la fecha prevista ya pasó)
+            filas_prestamos.append((id_prestamo, socio_id, ejemplar[0], inicio, prevista, None))
+            ejemplar[3] = 'prestado'
+            libre_desde[ejemplar[0]] = nunca
+            id_prestamo += 1
+            continue
+
+        filas_prestamos.append((id_prestamo, socio_id, ejemplar[0], inicio, prevista, devolucion))
+        dias_retraso = (devolucion.date() - prevista).days
+        if dias_retraso > 0:
+            multas.append((id_prestamo, socio_id, 'retraso', terminos.tasa_multa_diaria * dias_retraso, devolucion))
+        if resultado == 'perdido':
+            ejemplar[3] = 'perdido'
+            libre_desde[ejemplar[0]] = nunca
+            multas.append((id_prestamo, socio_id, 'perdida', Decimal(azar.randint(5000, 30000)), devolucion))
+        elif resultado == 'dañado':
+            fin_mantenimiento = devolucion + timedelta(days=DIAS_MANTENIMIENTO)
+            ejemplar[3] = 'mantenimiento' if fin_mantenimiento > ahora else 'disponible'
+            libre_desde[ejemplar[0]] = fin_mantenimiento
+            multas.append((id_prestamo, socio_id, 'daño', Decimal(azar.randint(500, 5000)), devolucion))
+        else:
+            ejemplar[3] = 'disponible'
+            libre_desde[ejemplar[0]] = devolucion
+        id_prestamo += 1
+
+    # (id, socio_id, prestamo_id, monto, motivo, fecha, pagada, fecha_pago)
+    filas_multas = []
+    id_multa = _siguiente_id(Multa)
+    for prestamo_id, socio_id, motivo, monto, fecha in multas:
+        # Las multas viejas casi siempre están pagadas; las recientes, menos
+        antigüedad = (ahora - fecha).days
+        pagada = azar.random() < (0.95 if antigüedad > 60 else 0.4)
+        fecha_pago = fecha + timedelta(days=azar.randint(0, min(antigüedad, 30))) if pagada else None
+        filas_multas.append((id_multa, socio_id, prestamo_id, monto, motivo, fecha, pagada, fecha_pago))
+        id_multa += 1
+
+    # === Reservas ===
+    # Los libros prestables que quedaron sin ejemplares disponibles tienen socios en la cola
+    # (id, socio_id, libro_id, fecha, estado)
+    filas_reservas = []
+    id_reserva = _siguiente_id(Reserva)
+    for isbn, _ in prestables:
+        ejemplares_libro = ejemplares_por_isbn.get(isbn, ())
+        if not ejemplares_libro or any(e[3] == 'disponible' for e in ejemplares_libro):
+            continue
+        cola = azar.sample(socios_activos, min(azar.randint(0, RESERVAS_POR_LIBRO_AGOTADO), len(socios_activos)))
+        fechas = sorted(ahora - timedelta(seconds=azar.uniform(0, DIAS_RESERVAS * 86400)) for _ in cola)
+        for (socio_id, _), fecha in zip(cola, fechas):
+            filas_reservas.append((id_reserva, socio_id, isbn, fecha, 'pendiente'))
+            id_reserva += 1
+
+    return {
+        Libro: filas_libros,
+        Ejemplar: ejemplares,
+        Socio: filas_socios,
+        Prestamo: filas_prestamos,
+        Multa: filas_multas,
+        Reserva: filas_reservas,
+    }
+
+
+# Columnas de las tuplas que arma simular_biblioteca, por modelo
+COLUMNAS = {
+    Libro: ['isbn', 'titulo', 'autor', 'editorial', 'año_publicacion', 'categoria', 'activo'],
+    Ejemplar: ['id', 'libro', 'codigo_ejemplar', 'estado', 'fecha_adquisicion', 'activo'],
+    Socio: ['id', 'dni', 'numero_socio', 'nombre', 'email', 'fecha_registro', 'activo', 'categoria'],
+    Prestamo: ['id', 'socio', 'ejemplar', 'fecha_inicio', 'fecha_devolucion_prevista', 'fecha_devolucion_real'],
+    Multa: ['id', 'socio', 'prestamo', 'monto', 'motivo', 'fecha', 'pagada', 'fecha_pago'],
+    Reserva: ['id', 'socio', 'libro', 'fecha', 'estado'],
+}
+
+
+def escribir_biblioteca(filas, tamaño_lote=5000):
+    """
+    Inserta las filas de simular_biblioteca en una transacción y devuelve la cantidad por tabla.
+    Las claves foráneas se verifican una sola vez al final, no fila por fila (en
+    SQLite solo se puede desactivar la verificación fuera de una transacción).
+    """
+    with connection.constraint_checks_disabled(), transaction.atomic():
+        creados = {
+            modelo._meta.verbose_name_plural.lower(): _insertar(modelo, COLUMNAS[modelo], filas[modelo], tamaño_lote)
+            for modelo in COLUMNAS
+        }
+        connection.check_constraints(table_names=[modelo._meta.db_table for modelo in COLUMNAS])
+
+        # Los ids se asignaron a mano: la secuencia tiene que seguir desde el último
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Ejemplar, Socio, Prestamo, Multa, Reserva]):
+                cursor.execute(sql)
+    return creados
@@ -0,0 +1,99 @@
+"""
+Ajustes de la conexión a la base de datos y manejo de contención de escritura.
+
+SQLite admite un solo escritor a la vez. Con el journal por defecto (rollback)
+los lectores también bloquean al escritor, y con varios mostradores prestando y
+devolviendo a la vez aparecen errores "database is locked". PostgreSQL bloquea
+por fila, pero dos transacciones pueden trabarse entre sí (deadlock). Por eso:
+  - configurar_sqlite: aplica SQLITE_PRAGMAS (WAL, busy_timeout, etc.) a cada conexión nueva
+  - con_reintentos: repite una transacción de escritura si chocó con otra
+  - bloquear: SELECT ... FOR UPDATE [SKIP LOCKED] cuando la base lo soporta
+"""
+
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+
+
+def configurar_sqlite(sender, connection, **kwargs):
+    """Receptor de connection_created: aplica los pragmas configurados a las conexiones SQLite"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for nombre, valor in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {nombre} = {valor}')
+
+
+# Mensajes de error que indican un choque con otra transacción (vale la pena reintentar)
+ERRORES_DE_BLOQUEO = (
+    'database is locked',  # SQLite
+    'database table is locked',  # SQLite
+    'deadlock detected',  # PostgreSQL
+    'could not serialize access',  # PostgreSQL
+)
+
+
+def es_bloqueo(error):
+    """Indica si un OperationalError se debe a que otra transacción tiene tomados los datos"""
+    mensaje = str(error).lower()
+    return any(texto in mensaje for texto in ERRORES_DE_BLOQUEO)
+
+
+def soporta_bloqueo_de_filas(using='default'):
+    """SQLite no tiene SELECT ... FOR UPDATE: ahí la transacción ya serializa las escrituras"""
+    return connections[using].features.has_select_for_update
+
+
+def bloquear(queryset, saltear_bloqueadas=False):
+    """
+    Bloquea las filas del queryset hasta el fin de la transacción (select_for_update).
+    Con saltear_bloqueadas, las filas que otra transacción ya tiene tomadas se omiten
+    en lugar de esperar (SKIP LOCKED), si la base lo soporta.
+    En bases sin bloqueo de filas devuelve el queryset sin cambios.
+    """
+    features = connections[queryset.db].features
+    if not features.has_select_for_update:
+        return queryset
+    if saltear_bloqueadas and features.has_select_for_update_skip_locked:
+        return queryset.select_for_update(skip_locked=True)
+    return queryset.select_for_update()
+
+
+def con_reintentos(funcion=None, *, using='default'):
+    """
+    Ejecuta la función dentro de transaction.atomic() y, si la base está bloqueada,
+    la vuelve a intentar con espera exponencial (con variación aleatoria para que
+    los reintentos de distintos hilos no coincidan).
+
+    Se intenta hasta TRANSACCIONES_REINTENTOS veces. Si ya hay una transacción
+    abierta no se reintenta: el bloqueo invalida la transacción de afuera y
+    repetir solo la parte interna no tendría sentido.
+
+    Uso:
+        @con_reintentos
+        def registrar_algo(...):
+            ...
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            intentos = settings.TRANSACCIONES_REINTENTOS
+            espera = settings.TRANSACCIONES_ESPERA_INICIAL
+            anidada = connections[using].in_atomic_block
+            for intento in range(1, intentos + 1):
+                try:
+                    with transaction.atomic(using=using):
+                        return funcion(*args, **kwargs)
+                except OperationalError as error:
+                    if not es_bloqueo(error) or intento == intentos or anidada:
+                        raise
+                time.sleep(espera * random.uniform(0.5, 1.5))
+                espera *= 2
+        return envoltura
+
+    if funcion is not None:
+        return decorador(funcion)
+    return decorador
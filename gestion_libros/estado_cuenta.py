@@ -0,0 +1,381 @@
+"""
+Estado de cuenta de un socio en PDF (todos sus préstamos y multas).
+
+Un socio puede tener miles de movimientos, así que el PDF no se arma con
+SimpleDocTemplate (que conserva todo el documento hasta el final): se escribe
+objeto por objeto y cada página se entrega apenas se completa. Las filas se
+leen de la base con iteradores por lotes, y la memoria queda acotada a una
+página más la tabla de offsets del PDF.
+
+Usa la misma tipografía y paleta que los comprobantes (ver comprobantes.py).
+"""
+
+import zlib
+
+from django.db import models
+from django.utils import timezone
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from .archivo import historial_multas, historial_prestamos
+from .comprobantes import (
+    COLOR_TITULO, COLOR_ETIQUETA, COLOR_OK, COLOR_ALERTA, COLOR_ERROR,
+    COLOR_LINEA, COLOR_FONDO, COLOR_PIE,
+)
+
+# Fuentes estándar de PDF (no hace falta embeberlas)
+FUENTES = {
+    'Helvetica': b'F1',
+    'Helvetica-Bold': b'F2',
+    'Helvetica-Oblique': b'F3',
+}
+
+MARGEN = 40
+ALTO_FILA = 15
+TAMAÑO_LOTE = 500
+
+COLUMNAS_PRESTAMOS = [
+    # (título, ancho, alineación)
+    ('Nº', 40, 'derecha'),
+    ('Inicio', 58, 'izquierda'),
+    ('Libro', 190, 'izquierda'),
+    ('Ejemplar', 100, 'izquierda'),
+    ('Vence', 58, 'izquierda'),
+    ('Devolución', 86, 'izquierda'),
+]
+
+COLUMNAS_MULTAS = [
+    ('Nº', 40, 'derecha'),
+    ('Fecha', 62, 'izquierda'),
+    ('Préstamo', 56, 'derecha'),
+    ('Motivo', 150, 'izquierda'),
+    ('Monto', 80, 'derecha'),
+    ('Estado', 72, 'izquierda'),
+    ('Pago', 72, 'izquierda'),
+]
+
+
+class EscritorPDF:
+    """
+    Escritor de PDF incremental.
+    Cada método retorna los bytes a enviar; solo se recuerdan los offsets de los
+    objetos (para la tabla xref) y los números de las páginas.
+    """
+
+    # Objetos fijos: 1 catálogo, 2 árbol de páginas, 3.. fuentes
+    CATALOGO = 1
+    PAGINAS = 2
+
+    def __init__(self, tamaño_pagina=letter):
+        self.ancho, self.alto = tamaño_pagina
+        self._offsets = {}
+        self._posicion = 0
+        self._paginas = []
+        self._fuentes = {alias: 3 + i for i, alias in enumerate(FUENTES.values())}
+        self._siguiente = 3 + len(FUENTES)
+
+    def encabezado(self):
+        return self._emitir_bytes(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def pagina(self, contenido):
+        """Emite el contenido de una página (operadores PDF) y la página en sí"""
+        comprimido = zlib.compress(contenido)
+        num_contenido = self._nuevo_objeto()
+        num_pagina = self._nuevo_objeto()
+        self._paginas.append(num_pagina)
+
+        fuentes = b' '.join(b'/%s %d 0 R' % (alias, num) for alias, num in self._fuentes.items())
+        return (
+            self._objeto(num_contenido,
+                         b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(comprimido)
+                         + comprimido + b'\nendstream')
+            + self._objeto(num_pagina,
+                           b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] '
+                           b'/Resources << /Font << %s >> >> /Contents %d 0 R >>'
+                           % (self.PAGINAS, self.ancho, self.alto, fuentes, num_contenido))
+        )
+
+    def cierre(self):
+        """Emite fuentes, árbol de páginas, catálogo, xref y trailer"""
+        datos = b''
+        for nombre, alias in FUENTES.items():
+            datos += self._objeto(
+                self._fuentes[alias],
+                b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>'
+                % nombre.encode('ascii')
+            )
+        hijos = b' '.join(b'%d 0 R' % num for num in self._paginas)
+        datos += self._objeto(self.PAGINAS, b'<< /Type /Pages /Kids [%s] /Count %d >>'
+                              % (hijos, len(self._paginas)))
+        datos += self._objeto(self.CATALOGO, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGINAS)
+
+        inicio_xref = self._posicion
+        total = self._siguiente
+        xref = [b'xref\n0 %d\n' % total, b'0000000000 65535 f \n']
+        xref.extend(b'%010d 00000 n \n' % self._offsets[num] for num in range(1, total))
+        xref.append(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                    % (total, self.CATALOGO, inicio_xref))
+        return datos + self._emitir_bytes(b''.join(xref))
+
+    def _nuevo_objeto(self):
+        numero = self._siguiente
+        self._siguiente += 1
+        return numero
+
+    def _objeto(self, numero, cuerpo):
+        self._offsets[numero] = self._posicion
+        return self._emitir_bytes(b'%d 0 obj\n' % numero + cuerpo + b'\nendobj\n')
+
+    def _emitir_bytes(self, datos):
+        self._posicion += len(datos)
+        return datos
+
+
+class Pagina:
+    """Acumula los operadores de dibujo de una página"""
+
+    def __init__(self):
+        self._operadores = []
+
+    def texto(self, x, y, texto, fuente='Helvetica', tamaño=9, color=COLOR_ETIQUETA,
+              alineacion='izquierda', ancho_maximo=None):
+        texto = str(texto)
+        if ancho_maximo is not None:
+            texto = _recortar(texto, fuente, tamaño, ancho_maximo)
+        if alineacion == 'derecha':
+            x -= stringWidth(texto, fuente, tamaño)
+        elif alineacion == 'centro':
+            x -= stringWidth(texto, fuente, tamaño) / 2
+        self._operadores.append(
+            b'BT %s /%s %g Tf %.2f %.2f Td (%s) Tj ET'
+            % (_color(color), FUENTES[fuente], tamaño, x, y, _escapar(texto))
+        )
+
+    def linea(self, x1, y1, x2, y2, color=COLOR_LINEA, grosor=1):
+        self._operadores.append(
+            b'%s %g w %.2f %.2f m %.2f %.2f l S'
+            % (_color(color).replace(b'rg', b'RG'), grosor, x1, y1, x2, y2)
+        )
+
+    def rectangulo(self, x, y, ancho, alto, color=COLOR_FONDO):
+        self._operadores.append(b'%s %.2f %.2f %.2f %.2f re f' % (_color(color), x, y, ancho, alto))
+
+    def contenido(self):
+        return b'\n'.join(self._operadores)
+
+
+class MaquetadorEstadoCuenta:
+    """
+    Distribuye encabezado, secciones y filas en páginas.
+    Los métodos retornan los bytes de las páginas que se completaron (o b'').
+    """
+
+    def __init__(self, escritor, socio, emitido):
+        self.escritor = escritor
+        self.socio = socio
+        self.emitido = emitido
+        self.numero_pagina = 0
+        self.pagina = None
+        self.y = 0
+        self.columnas = None
+
+    def portada(self, resumen):
+        """Primera página: título, datos del socio y resumen de la cuenta"""
+        self._abrir_pagina()
+        ancho = self.escritor.ancho
+        self.pagina.texto(ancho / 2, self.y, 'ESTADO DE CUENTA', 'Helvetica-Bold', 22,
+                          COLOR_TITULO, 'centro')
+        self.y -= 34
+
+        datos = [
+            ('Socio:', self.socio.nombre),
+            ('DNI:', self.socio.dni),
+            ('Nº Socio:', self.socio.numero_socio),
+            ('Estado:', 'Activo' if self.socio.activo else 'Inactivo'),
+        ]
+        datos.extend(resumen)
+        for etiqueta, valor in datos:
+            self.pagina.texto(MARGEN + 140, self.y, etiqueta, tamaño=11, alineacion='derecha')
+            self.pagina.texto(MARGEN + 150, self.y, valor, 'Helvetica-Bold', 11, COLOR_TITULO)
+            self.y -= 18
+        self.y -= 10
+        return b''
+
+    def seccion(self, titulo, columnas):
+        """Abre una sección (tabla) nueva; si no entra el encabezado, pasa de página"""
+        datos = b''
+        if self.y - 3 * ALTO_FILA < MARGEN + 20:
+            datos += self._abrir_pagina()
+        self.columnas = columnas
+        self.y -= 6
+        self.pagina.texto(MARGEN, self.y, titulo, 'Helvetica-Bold', 14, COLOR_OK)
+        self.y -= 20
+        self._encabezado_tabla()
+        return datos
+
+    def fila(self, valores, color=COLOR_TITULO):
+        datos = b''
+        if self.y < MARGEN + 20:
+            datos += self._abrir_pagina()
+            self._encabezado_tabla()
+        x = MARGEN
+        for (_, ancho, alineacion), valor in zip(self.columnas, valores):
+            x_texto = x + ancho - 4 if alineacion == 'derecha' else x + 2
+            self.pagina.texto(x_texto, self.y, valor, color=color,
+                              alineacion=alineacion, ancho_maximo=ancho - 6)
+            x += ancho
+        self.pagina.linea(MARGEN, self.y - 4, x, self.y - 4, grosor=0.5)
+        self.y -= ALTO_FILA
+        return datos
+
+    def mensaje(self, texto):
+        """Línea de texto suelta dentro de una sección (ej: 'sin movimientos')"""
+        datos = b''
+        if self.y < MARGEN + 20:
+            datos += self._abrir_pagina()
+            self._encabezado_tabla()
+        self.pagina.texto(MARGEN + 2, self.y, texto, 'Helvetica-Oblique', 9)
+        self.y -= ALTO_FILA
+        return datos
+
+    def terminar(self):
+        return self._cerrar_pagina()
+
+    def _abrir_pagina(self):
+        datos = self._cerrar_pagina()
+        self.numero_pagina += 1
+        self.pagina = Pagina()
+        self.y = self.escritor.alto - MARGEN - 10
+
+        # Pie de página (el total de páginas no se conoce mientras se transmite)
+        emitido = timezone.localtime(self.emitido).strftime('%d/%m/%Y %H:%M:%S')
+        self.pagina.texto(MARGEN, MARGEN - 16,
+                          f'{self.socio.nombre} ({self.socio.numero_socio}) - Generado el {emitido}',
+                          tamaño=8, color=COLOR_PIE)
+        self.pagina.texto(self.escritor.ancho - MARGEN, MARGEN - 16, f'Página {self.numero_pagina}',
+                          tamaño=8, color=COLOR_PIE, alineacion='derecha')
+        return datos
+
+    def _cerrar_pagina(self):
+        if self.pagina is None:
+            return b''
+        datos = self.escritor.pagina(self.pagina.contenido())
+        self.pagina = None
+        return datos
+
+    def _encabezado_tabla(self):
+        ancho_total = sum(ancho for _, ancho, _ in self.columnas)
+        self.pagina.rectangulo(MARGEN, self.y - 5, ancho_total, ALTO_FILA + 2)
+        self.pagina.linea(MARGEN, self.y - 5, MARGEN + ancho_total, self.y - 5, COLOR_TITULO, 1.5)
+        x = MARGEN
+        for titulo, ancho, alineacion in self.columnas:
+            x_texto = x + ancho - 4 if alineacion == 'derecha' else x + 2
+            self.pagina.texto(x_texto, self.y, titulo, 'Helvetica-Bold', 9, alineacion=alineacion)
+            x += ancho
+        self.y -= ALTO_FILA + 4
+
+
+def generar_estado_cuenta(socio, tamaño_lote=TAMAÑO_LOTE):
+    """
+    Generador con los bytes del PDF del estado de cuenta.
+    Pensado para StreamingHttpResponse: cada página se entrega apenas se completa.
+    """
+    escritor = EscritorPDF()
+    maquetador = MaquetadorEstadoCuenta(escritor, socio, timezone.now())
+    hoy = timezone.localdate()
+
+    yield escritor.encabezado()
+    yield maquetador.portada(_resumen(socio))
+
+    # === PRÉSTAMOS ===
+    yield maquetador.seccion('Préstamos', COLUMNAS_PRESTAMOS)
+    # Incluye los préstamos archivados (ver archivo.py)
+    prestamos = historial_prestamos(
+        socio, 'id', 'fecha_inicio', 'ejemplar__libro__titulo', 'ejemplar__codigo_ejemplar',
+        'fecha_devolucion_prevista', 'fecha_devolucion_real', tamaño_lote=tamaño_lote,
+    )
+    hay_filas = False
+    for id_, inicio, titulo, codigo, vence, devuelto in prestamos:
+        hay_filas = True
+        if devuelto:
+            estado, color = _fecha(devuelto), COLOR_TITULO
+        elif vence < hoy:
+            estado, color = 'Retrasado', COLOR_ALERTA
+        else:
+            estado, color = 'Activo', COLOR_OK
+        datos = maquetador.fila(
+            [id_, _fecha(inicio), titulo, codigo, vence.strftime('%d/%m/%Y'), estado], color
+        )
+        if datos:
+            yield datos
+    if not hay_filas:
+        yield maquetador.mensaje('El socio no registra préstamos.')
+
+    # === MULTAS ===
+    yield maquetador.seccion('Multas', COLUMNAS_MULTAS)
+    motivos = dict(socio.multas.model.MOTIVOS)
+    multas = historial_multas(
+        socio, 'id', 'fecha', 'prestamo_id', 'motivo', 'monto', 'pagada', 'fecha_pago',
+        tamaño_lote=tamaño_lote,
+    )
+    hay_filas = False
+    for id_, fecha, prestamo_id, motivo, monto, pagada, fecha_pago in multas:
+        hay_filas = True
+        datos = maquetador.fila(
+            [id_, _fecha(fecha), prestamo_id or '-', motivos.get(motivo, motivo), f'$ {monto}',
+             'Pagada' if pagada else 'Pendiente', _fecha(fecha_pago) if fecha_pago else '-'],
+            COLOR_TITULO if pagada else COLOR_ERROR,
+        )
+        if datos:
+            yield datos
+    if not hay_filas:
+        yield maquetador.mensaje('El socio no registra multas.')
+
+    yield maquetador.terminar()
+    yield escritor.cierre()
+
+
+def _resumen(socio):
+    """Totales de la cuenta, calculados con agregados (sin recorrer filas)"""
+    prestamos = socio.prestamos.aggregate(
+        total=models.Count('id'),
+        activos=models.Count('id', filter=models.Q(fecha_devolucion_real__isnull=True)),
+    )
+    multas = socio.multas.aggregate(
+        pendiente=models.Sum('monto', filter=models.Q(pagada=False)),
+        pagado=models.Sum('monto', filter=models.Q(pagada=True)),
+    )
+    # Lo archivado está devuelto y pagado
+    prestamos_archivados = socio.prestamos_archivados.count()
+    pagado_archivado = socio.multas_archivadas.aggregate(total=models.Sum('monto'))['total'] or 0
+    return [
+        ('Préstamos:', f"{prestamos['total'] + prestamos_archivados} ({prestamos['activos']} activos)"),
+        ('Multas pendientes:', f"$ {multas['pendiente'] or 0}"),
+        ('Multas pagadas:', f"$ {(multas['pagado'] or 0) + pagado_archivado}"),
+    ]
+
+
+def _fecha(fecha_hora):
+    return timezone.localtime(fecha_hora).strftime('%d/%m/%Y')
+
+
+def _recortar(texto, fuente, tamaño, ancho_maximo):
+    """Recorta el texto con '...' para que entre en la columna"""
+    if stringWidth(texto, fuente, tamaño) <= ancho_maximo:
+        return texto
+    while texto and stringWidth(texto + '...', fuente, tamaño) > ancho_maximo:
+        texto = texto[:-1]
+    return texto + '...'
+
+
+def _escapar(texto):
+    """Codifica en WinAnsi (cp1252) y escapa los caracteres especiales de PDF"""
+    datos = texto.encode('cp1252', 'replace')
+    return datos.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _color(hexadecimal):
+    """'#3E2723' -> b'0.243 0.153 0.137 rg' (color de relleno)"""
+    hexadecimal = hexadecimal.lstrip('#')
+    r, g, b = (int(hexadecimal[i:i + 2], 16) / 255 for i in (0, 2, 4))
+    return b'%.3f %.3f %.3f rg' % (r, g, b)
@@ -0,0 +1,276 @@
+"""
+Disponibilidad en vivo: los cambios de los ejemplares por Server-Sent Events.
+
+Cada préstamo, devolución, alta, edición o baja de un ejemplar escribe un
+EventoEjemplar en la misma transacción (publicar): si la transacción se
+deshace el evento tampoco existe, y su id ordena los cambios. Las pantallas
+abiertas (catálogo, préstamos) tienen una conexión EventSource a
+/eventos/ejemplares/ que recibe los eventos nuevos y actualiza la página sin
+recargarla.
+
+La tabla es el canal: cada conexión lee los eventos con id mayor al último
+que mandó, así funcionan también con varios procesos o servidores. Dentro del
+mismo proceso, al confirmarse la transacción se despierta a las conexiones
+abiertas (avisar) para que lean enseguida; los eventos de otros procesos
+llegan en la siguiente lectura periódica (EVENTOS_INTERVALO).
+
+Los ids se asignan al insertar, no al confirmar: en PostgreSQL una
+transacción con un id mayor puede confirmarse antes que otra con uno menor.
+Por eso cada conexión recuerda los ids salteados (Cursor) y los vuelve a
+buscar durante HUECO_ESPERA segundos; pasado ese tiempo el id se da por
+perdido (una transacción deshecha también consume su id). En SQLite hay un
+solo escritor y los ids se confirman en orden.
+
+Si el navegador pierde la conexión se reconecta solo y manda Last-Event-ID:
+recibe lo que se perdió. El id de cada mensaje es desde dónde retomar: el
+anterior al primer hueco que todavía se espera, así que al reconectarse
+puede recibir de nuevo algún evento ya enviado, siempre en orden. Si ese
+evento ya se purgó (se conservan los últimos EVENTOS_RETENCION) se le manda
+"recargar".
+
+Con ASGI cada conexión es una corrutina que espera sin ocupar un hilo y dura
+EVENTOS_DURACION. Con WSGI ocuparía un hilo o worker del servidor por cada
+pestaña abierta: las páginas no cargan disponibilidad.js y el endpoint
+responde 204 (el navegador no se reconecta), salvo con EVENTOS_WSGI. En ese
+caso cada conexión dura EVENTOS_DURACION_WSGI y el navegador se reconecta.
+"""
+
+import asyncio
+import contextlib
+import json
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Min, Q
+
+from .models import Ejemplar, EventoEjemplar
+
+
+# Cada cuántos eventos se borran los que exceden la retención
+PURGA_CADA = 100
+
+# Eventos que se leen por consulta
+LOTE = 200
+
+# Segundos que se sigue buscando un id salteado (su transacción puede no haberse confirmado todavía)
+HUECO_ESPERA = 30
+
+# Ids salteados que se recuerdan como máximo por conexión
+MAX_HUECOS = 1000
+
+# Segundos sin mandar nada tras los que se manda un comentario, para que
+# proxies y servidores no corten la conexión y detecten clientes que se fueron
+LATIDO = 15
+
+# Campos de cada evento que recibe el navegador
+CAMPOS = ('id', 'codigo_ejemplar', 'libro_id', 'libro__titulo', 'libro__autor', 'estado', 'activo', 'disponibles')
+
+
+def en_vivo(request):
+    """Si el request puede tener el flujo abierto: con ASGI siempre, con WSGI solo con EVENTOS_WSGI"""
+    return isinstance(request, ASGIRequest) or settings.EVENTOS_WSGI
+
+
+def publicar(ejemplar):
+    """
+    Registra el estado actual del ejemplar y la cantidad de disponibles de su
+    libro. Se llama dentro de la transacción que lo modificó.
+    """
+    disponibles = Ejemplar.objects.filter(libro_id=ejemplar.libro_id, estado='disponible').count()
+    evento = EventoEjemplar.objects.create(
+        libro_id=ejemplar.libro_id,
+        codigo_ejemplar=ejemplar.codigo_ejemplar,
+        estado=ejemplar.estado,
+        activo=ejemplar.activo,
+        disponibles=disponibles,
+    )
+    if evento.pk % PURGA_CADA == 0:
+        EventoEjemplar.objects.filter(pk__lte=evento.pk - settings.EVENTOS_RETENCION).delete()
+    transaction.on_commit(avisar)
+    return evento
+
+
+class _Suscriptor:
+    """Una conexión abierta esperando eventos (sincrónica: threading.Event)"""
+
+    def __init__(self):
+        self.aviso = threading.Event()
+
+    def avisar(self):
+        self.aviso.set()
+
+    def esperar(self, segundos):
+        self.aviso.wait(segundos)
+
+
+class _SuscriptorAsync:
+    """Una conexión abierta esperando eventos en un event loop (asyncio.Event)"""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.aviso = asyncio.Event()
+
+    def avisar(self):
+        # avisar() corre en el hilo que confirmó la transacción, no en el del loop
+        with contextlib.suppress(RuntimeError):  # el loop ya se cerró
+            self.loop.call_soon_threadsafe(self.aviso.set)
+
+    async def esperar(self, segundos):
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self.aviso.wait(), segundos)
+
+
+_suscriptores = set()
+_candado = threading.Lock()
+
+
+def avisar():
+    """Despierta a las conexiones abiertas en este proceso (después del commit)"""
+    with _candado:
+        suscriptores = list(_suscriptores)
+    for suscriptor in suscriptores:
+        suscriptor.avisar()
+
+
+@contextlib.contextmanager
+def suscripcion(suscriptor):
+    with _candado:
+        _suscriptores.add(suscriptor)
+    try:
+        yield suscriptor
+    finally:
+        with _candado:
+            _suscriptores.discard(suscriptor)
+
+
+def ultimo_id():
+    evento = EventoEjemplar.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return evento or 0
+
+
+def perdidos(desde):
+    """Indica si entre `desde` y el evento más antiguo que queda hubo eventos purgados"""
+    minimo = EventoEjemplar.objects.aggregate(minimo=Min('pk'))['minimo']
+    return minimo is not None and minimo > desde + 1
+
+
+class Cursor:
+    """
+    Posición de una conexión en la tabla de eventos: el último id enviado y
+    los ids salteados que todavía pueden aparecer (id: momento en que se vio
+    el hueco).
+    """
+
+    def __init__(self, ultimo):
+        self.ultimo = ultimo
+        self.huecos = {}
+
+    def condicion(self):
+        condicion = Q(pk__gt=self.ultimo)
+        if self.huecos:
+            condicion |= Q(pk__in=list(self.huecos))
+        return condicion
+
+    def recibir(self, pk):
+        """Registra un evento enviado; devuelve el id desde el que se retoma (Last-Event-ID)"""
+        if pk in self.huecos:
+            del self.huecos[pk]
+        elif pk > self.ultimo:
+            ahora = time.monotonic()
+            for salteado in range(max(self.ultimo + 1, pk - MAX_HUECOS), pk):
+                self.huecos[salteado] = ahora
+            self.ultimo = pk
+        return self.retomar()
+
+    def vencer(self):
+        """Da por perdidos los huecos que se esperan hace más de HUECO_ESPERA"""
+        limite = time.monotonic() - HUECO_ESPERA
+        self.huecos = {pk: visto for pk, visto in self.huecos.items() if visto > limite}
+
+    def retomar(self):
+        return min(self.huecos) - 1 if self.huecos else self.ultimo
+
+
+def leer(cursor):
+    """Los eventos posteriores al cursor y los que llenan sus huecos, en orden (hasta LOTE)"""
+    cursor.vencer()
+    return list(EventoEjemplar.objects.filter(cursor.condicion()).order_by('pk').values(*CAMPOS)[:LOTE])
+
+
+def mensaje(evento, retomar):
+    datos = {
+        'codigo': evento['codigo_ejemplar'],
+        'isbn': evento['libro_id'],
+        'titulo': evento['libro__titulo'],
+        'autor': evento['libro__autor'],
+        'estado': evento['estado'],
+        'activo': evento['activo'],
+        'disponibles': evento['disponibles'],
+    }
+    return f'id: {retomar}\nevent: ejemplar\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n'
+
+
+def _inicio(desde):
+    """(último id ya enviado, mensaje inicial) de una conexión nueva"""
+    inicio = f'retry: {int(settings.EVENTOS_INTERVALO * 1000)}\n\n'
+    if desde is None:
+        # Conexión nueva: la página ya muestra el estado actual
+        return ultimo_id(), inicio
+    if perdidos(desde):
+        return None, inicio + 'event: recargar\ndata: {}\n\n'
+    return desde, inicio
+
+
+def transmitir(desde, duracion):
+    """Generador de la respuesta con WSGI: espera en el hilo del request"""
+    ultimo, inicio = _inicio(desde)
+    yield inicio
+    if ultimo is None:
+        return
+    cursor = Cursor(ultimo)
+    fin = time.monotonic() + duracion
+    enviado = time.monotonic()
+    with suscripcion(_Suscriptor()) as suscriptor:
+        while True:
+            # Se limpia antes de leer: un aviso que llega durante la lectura no se pierde
+            suscriptor.aviso.clear()
+            eventos = leer(cursor)
+            if eventos:
+                enviado = time.monotonic()
+                yield ''.join(mensaje(evento, cursor.recibir(evento['id'])) for evento in eventos)
+            elif time.monotonic() - enviado >= LATIDO:
+                enviado = time.monotonic()
+                yield ': latido\n\n'
+            if time.monotonic() >= fin:
+                return
+            if len(eventos) < LOTE:
+                suscriptor.esperar(min(settings.EVENTOS_INTERVALO, fin - time.monotonic()))
+
+
+async def atransmitir(desde, duracion):
+    """Generador de la respuesta con ASGI: espera en el event loop"""
+    ultimo, inicio = await sync_to_async(_inicio)(desde)
+    yield inicio
+    if ultimo is None:
+        return
+    cursor = Cursor(ultimo)
+    fin = time.monotonic() + duracion
+    enviado = time.monotonic()
+    with suscripcion(_SuscriptorAsync()) as suscriptor:
+        while True:
+            suscriptor.aviso.clear()
+            eventos = await sync_to_async(leer)(cursor)
+            if eventos:
+                enviado = time.monotonic()
+                yield ''.join(mensaje(evento, cursor.recibir(evento['id'])) for evento in eventos)
+            elif time.monotonic() - enviado >= LATIDO:
+                enviado = time.monotonic()
+                yield ': latido\n\n'
+            if time.monotonic() >= fin:
+                return
+            if len(eventos) < LOTE:
+                await suscriptor.esperar(min(settings.EVENTOS_INTERVALO, fin - time.monotonic()))
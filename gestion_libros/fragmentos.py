@@ -0,0 +1,91 @@
+"""
+Cache de fragmentos de plantilla versionados (tag {% fragmento %}).
+
+    {% load fragmentos %}
+    {% fragmento 'tabla_libros' version_libros %}
+        {% for libro in libros %}
+            {% fragmento 'fila_libro' libro.isbn libro.fecha_actualizacion %}...{% endfragmento %}
+        {% endfor %}
+    {% endfragmento %}
+
+La clave de cada fragmento es su nombre más los valores que se le pasan, que
+tienen que incluir la versión de lo que se muestra (fecha_actualizacion de la
+fila, o version() de todas las filas de la tabla). Nada se invalida a mano: al
+guardar una fila cambia su fecha_actualizacion (save() por auto_now, update()
+por VersionadoQuerySet), cambia la clave y la versión vieja deja de pedirse.
+
+Los fragmentos se anidan ("muñeca rusa"): si la tabla cambió porque cambió una
+fila, la tabla se vuelve a armar pero las demás filas salen de la cache.
+
+Los formularios de las filas llevan {% csrf_token %}, que es distinto en cada
+sesión: se guarda una marca en su lugar y se reemplaza por el token del request
+al servir el fragmento.
+
+Hits y misses se cuentan en metricas.FRAGMENTOS, con una sola escritura por
+página (al cerrar el fragmento más externo).
+"""
+
+import hashlib
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metricas
+
+
+MARCA_CSRF = '\x1ecsrf-token\x1e'
+
+# Hits/misses de la página que se está renderizando (None fuera de un fragmento)
+_conteo = ContextVar('conteo_fragmentos', default=None)
+
+
+def version(filas):
+    """Huella de una lista de filas (pk y versión de cada una): cambia si cambia, entra o sale alguna"""
+    contenido = '\x1f'.join('\x1e'.join(str(valor) for valor in fila) for fila in filas)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:32]
+
+
+def clave(nombre, partes):
+    return f'fragmento:{nombre}:{version([partes])}'
+
+
+def renderizar(context, nombre, partes, render):
+    """
+    Devuelve el fragmento desde la cache o lo renderiza con `render()` y lo guarda.
+    Sin cache configurada (FRAGMENTOS_CACHE = None) siempre renderiza.
+    """
+    if settings.FRAGMENTOS_CACHE is None:
+        return render()
+
+    conteo = _conteo.get()
+    externo = conteo is None
+    if externo:
+        conteo = Counter()
+        token_conteo = _conteo.set(conteo)
+    try:
+        return _leer_o_renderizar(context, nombre, partes, render, conteo)
+    finally:
+        if externo:
+            _conteo.reset(token_conteo)
+            metricas.FRAGMENTOS.inc_lote(
+                ({'fragmento': fragmento, 'resultado': resultado}, cantidad)
+                for (fragmento, resultado), cantidad in sorted(conteo.items())
+            )
+
+
+def _leer_o_renderizar(context, nombre, partes, render, conteo):
+    cache = caches[settings.FRAGMENTOS_CACHE]
+    clave_fragmento = clave(nombre, partes)
+    csrf = str(context.get('csrf_token') or '')
+
+    contenido = cache.get(clave_fragmento)
+    if contenido is not None:
+        conteo[nombre, 'hit'] += 1
+        return contenido.replace(MARCA_CSRF, csrf)
+
+    conteo[nombre, 'miss'] += 1
+    contenido = render()
+    cache.set(clave_fragmento, contenido.replace(csrf, MARCA_CSRF) if csrf else contenido)
+    return contenido
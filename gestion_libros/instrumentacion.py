@@ -0,0 +1,184 @@
+"""
+Instrumentación de requests: consultas SQL, tiempo de base, de templates y total.
+
+InstrumentacionMiddleware mide cada request y:
+  - agrega el header Server-Timing (se ve en la pestaña Network del navegador)
+  - registra en el log 'gestion_libros.instrumentacion' los requests que superan
+    INSTRUMENTACION_UMBRAL_MS o INSTRUMENTACION_UMBRAL_CONSULTAS, con las
+    consultas más repetidas (así aparecen los N+1 de los templates)
+
+Se activa con INSTRUMENTACION_ACTIVA. Apagada, Django descarta el middleware al
+arrancar (MiddlewareNotUsed) y el backend de templates solo consulta una ContextVar.
+
+Con ASGI el middleware atiende en modo async (no fuerza a Django a pasar el
+request a un hilo). Las consultas del ORM async se ejecutan en el hilo del
+request (sync_to_async), que tiene sus propias conexiones: medir_consultas_async
+instala la medición en ese hilo.
+"""
+
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+
+logger = logging.getLogger('gestion_libros.instrumentacion')
+
+# Medición del request en curso (None si la instrumentación está apagada)
+_medicion_actual = ContextVar('medicion_actual', default=None)
+
+
+class Medicion:
+    """Acumula lo que pasa durante un request"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.tiempo_templates = 0.0
+        self.sql = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper: se ejecuta alrededor de cada consulta"""
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo_db += time.perf_counter() - inicio
+            self.consultas += 1
+            # El SQL llega con placeholders: la misma consulta con otros parámetros cuenta junta
+            self.sql[sql] += 1
+
+    def repetidas(self, cantidad=5):
+        """Las consultas que más se repitieron (más de una vez)"""
+        return [(sql, veces) for sql, veces in self.sql.most_common(cantidad) if veces > 1]
+
+    def server_timing(self, total):
+        return (
+            f'db;dur={self.tiempo_db * 1000:.1f};desc="{self.consultas} consultas", '
+            f'tpl;dur={self.tiempo_templates * 1000:.1f}, '
+            f'total;dur={total * 1000:.1f}'
+        )
+
+
+@contextmanager
+def medir_consultas(medicion):
+    """Suma a `medicion` las consultas que se hagan dentro del bloque, en cualquier base"""
+    with ExitStack() as pila:
+        for conexion in connections.all():
+            pila.enter_context(conexion.execute_wrapper(medicion))
+        yield medicion
+
+
+@asynccontextmanager
+async def medir_consultas_async(medicion):
+    """medir_consultas para código async: mide en las conexiones del hilo del request"""
+    pila = ExitStack()
+    await sync_to_async(pila.enter_context)(medir_consultas(medicion))
+    try:
+        yield medicion
+    finally:
+        await sync_to_async(pila.close)()
+
+
+def medicion_actual():
+    """La medición del request en curso, o None"""
+    return _medicion_actual.get()
+
+
+class InstrumentacionMiddleware:
+    """
+    Mide consultas, tiempo de base, de templates y total de cada request.
+    Conviene ponerlo primero en MIDDLEWARE para incluir sesión y autenticación.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTACION_ACTIVA:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion = Medicion()
+        token = _medicion_actual.set(medicion)
+        try:
+            with medir_consultas(medicion):
+                response = self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self.terminar(request, response, medicion)
+
+    async def __acall__(self, request):
+        medicion = Medicion()
+        token = _medicion_actual.set(medicion)
+        try:
+            async with medir_consultas_async(medicion):
+                response = await self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self.terminar(request, response, medicion)
+
+    def terminar(self, request, response, medicion):
+        total = time.perf_counter() - medicion.inicio
+        response['Server-Timing'] = medicion.server_timing(total)
+        request.medicion = medicion
+
+        if (total * 1000 >= settings.INSTRUMENTACION_UMBRAL_MS
+                or medicion.consultas >= settings.INSTRUMENTACION_UMBRAL_CONSULTAS):
+            self.registrar_lento(request, medicion, total)
+        return response
+
+    def registrar_lento(self, request, medicion, total):
+        lineas = [
+            f'{request.method} {request.get_full_path()}: {total * 1000:.0f} ms, '
+            f'{medicion.consultas} consultas ({medicion.tiempo_db * 1000:.0f} ms), '
+            f'templates {medicion.tiempo_templates * 1000:.0f} ms'
+        ]
+        for sql, veces in medicion.repetidas():
+            lineas.append(f'  {veces}x {sql[:300]}')
+        logger.warning('\n'.join(lineas))
+
+
+class PlantillaMedida(Template):
+    """Template que suma su tiempo de render a la medición del request"""
+
+    def render(self, context=None, request=None):
+        medicion = _medicion_actual.get()
+        if medicion is None:
+            return super().render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            medicion.tiempo_templates += time.perf_counter() - inicio
+
+
+class DjangoTemplatesMedidos(DjangoTemplates):
+    """
+    Backend de templates de Django que mide el render de cada template principal
+    (los {% include %} quedan dentro del tiempo del template que los incluye).
+    """
+
+    def from_string(self, template_code):
+        return PlantillaMedida(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return PlantillaMedida(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,50 @@
+"""
+Comando para mover al archivo los préstamos devueltos hace tiempo (y sus multas pagadas).
+
+Uso:
+    python manage.py archivar_historial
+    python manage.py archivar_historial --dias 365 --lote 500
+    python manage.py archivar_historial --simular
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ...archivo import archivar_historial, prestamos_archivables
+
+
+class Command(BaseCommand):
+    help = 'Archiva los préstamos devueltos antes del horizonte configurado, junto con sus multas pagadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=settings.ARCHIVO_HORIZONTE_DIAS,
+            help=f'Antigüedad mínima de la devolución (por defecto: {settings.ARCHIVO_HORIZONTE_DIAS})'
+        )
+        parser.add_argument('--lote', type=int, default=1000, help='Préstamos por transacción')
+        parser.add_argument('--simular', action='store_true', help='Solo cuenta lo que se archivaría')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 0 or options['lote'] < 1:
+            raise CommandError('--dias no puede ser negativo y --lote debe ser mayor a cero.')
+
+        antes_de = timezone.now() - timedelta(days=options['dias'])
+        if options['simular']:
+            cantidad = prestamos_archivables(antes_de).count()
+            self.stdout.write(f'Se archivarían {cantidad} préstamos devueltos antes del {antes_de:%d/%m/%Y}.')
+            return
+
+        inicio = time.perf_counter()
+        prestamos, multas = archivar_historial(antes_de, tamaño_lote=options['lote'])
+        duracion = time.perf_counter() - inicio
+
+        if not prestamos:
+            self.stdout.write(self.style.WARNING('No hay préstamos para archivar.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {prestamos} préstamos y {multas} multas archivados en {duracion:.1f}s'
+        ))
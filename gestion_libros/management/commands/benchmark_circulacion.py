@@ -0,0 +1,162 @@
+"""
+Mide cuántos préstamos y devoluciones por segundo soporta la base con varios
+mostradores trabajando a la vez.
+
+Uso:
+    python manage.py benchmark_circulacion
+    python manage.py benchmark_circulacion --hilos 16 --lectores 4 --segundos 20
+    python manage.py benchmark_circulacion --modo ajustado
+
+Corre sobre una base SQLite temporal (no toca la base real). Con --modo ambos
+(por defecto) se compara la configuración original de Django (journal de
+rollback, sin reintentos) contra la ajustada (SQLITE_PRAGMAS + reintentos).
+"""
+
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.test.utils import override_settings
+
+from ...benchmarks import base_temporal
+from ...circulacion import registrar_devolucion, registrar_prestamo
+from ...models import Ejemplar, Libro, Prestamo, Socio
+from ...singleton import obtener_configuracion
+
+
+# Lo que hace Django sin ajustes: journal de rollback y el timeout por defecto de sqlite3 (5 s)
+PRAGMAS_ORIGINALES = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+
+class Command(BaseCommand):
+    help = 'Mide el rendimiento de préstamos/devoluciones concurrentes sobre una base SQLite temporal'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help='Mostradores prestando y devolviendo a la vez')
+        parser.add_argument('--lectores', type=int, default=2, help='Hilos que consultan listados mientras tanto')
+        parser.add_argument('--segundos', type=float, default=10, help='Duración de cada medición')
+        parser.add_argument('--modo', choices=['ambos', 'original', 'ajustado'], default='ambos')
+
+    def handle(self, *args, **opciones):
+        if connection.vendor != 'sqlite':
+            raise CommandError('El benchmark está pensado para SQLite (la base configurada es otra).')
+        if opciones['hilos'] < 1:
+            raise CommandError('Se necesita al menos un hilo.')
+
+        modos = ['original', 'ajustado'] if opciones['modo'] == 'ambos' else [opciones['modo']]
+        resultados = {}
+        for modo in modos:
+            if modo == 'original':
+                ajustes = override_settings(SQLITE_PRAGMAS=PRAGMAS_ORIGINALES, TRANSACCIONES_REINTENTOS=1)
+            else:
+                ajustes = override_settings()
+            with ajustes:
+                resultados[modo] = self.medir(modo, opciones)
+
+        if len(resultados) == 2:
+            antes = resultados['original']['por_segundo']
+            despues = resultados['ajustado']['por_segundo']
+            if antes:
+                self.stdout.write(self.style.SUCCESS(f'Mejora: x{despues / antes:.1f} operaciones por segundo'))
+
+    def medir(self, modo, opciones):
+        """Crea una base temporal, corre la carga durante el tiempo pedido y muestra el resultado"""
+        with base_temporal(prefijo='benchmark_circulacion_'):
+            socios, ejemplares = self.preparar_datos(opciones['hilos'])
+            resultado = self.correr_carga(socios, ejemplares, opciones)
+
+        self.mostrar(modo, resultado)
+        return resultado
+
+    def preparar_datos(self, hilos):
+        """Un socio y un ejemplar por hilo: compiten por la base, no por los mismos libros"""
+        libro = Libro.objects.create(isbn='0000000000001', titulo='Benchmark', autor='Benchmark')
+        socios = Socio.objects.bulk_create(
+            Socio(dni=f'B{i:07d}', numero_socio=f'BENCH-{i:04d}', nombre=f'Socio {i}')
+            for i in range(hilos)
+        )
+        ejemplares = Ejemplar.objects.bulk_create(
+            Ejemplar(libro=libro, codigo_ejemplar=f'BENCH-{i:04d}', estado='disponible')
+            for i in range(hilos)
+        )
+        # bulk_create no asigna el libro cargado: evita una consulta por devolución
+        for ejemplar in ejemplares:
+            ejemplar.libro = libro
+        return socios, ejemplares
+
+    def correr_carga(self, socios, ejemplares, opciones):
+        terminos = obtener_configuracion().terminos('general', 'estandar')
+        fin = time.monotonic() + opciones['segundos']
+        latencias = []
+        errores = []
+        lecturas = [0]
+        lock = threading.Lock()
+
+        def mostrador(socio, ejemplar):
+            propias = []
+            fallidas = 0
+            try:
+                while time.monotonic() < fin:
+                    inicio = time.perf_counter()
+                    try:
+                        prestamo = registrar_prestamo(socio, ejemplar, terminos.dias_prestamo)
+                        registrar_devolucion(prestamo, 'bueno', terminos)
+                    except DatabaseError:
+                        fallidas += 1
+                        # Si el préstamo quedó abierto, se libera el ejemplar para seguir
+                        Ejemplar.objects.filter(pk=ejemplar.pk).update(estado='disponible')
+                        Prestamo.objects.filter(ejemplar=ejemplar, fecha_devolucion_real__isnull=True).delete()
+                        continue
+                    propias.append(time.perf_counter() - inicio)
+            except DatabaseError:
+                fallidas += 1
+            finally:
+                connection.close()
+                with lock:
+                    latencias.extend(propias)
+                    errores.append(fallidas)
+
+        def lector():
+            cantidad = 0
+            try:
+                while time.monotonic() < fin:
+                    list(Prestamo.objects.select_related('socio', 'ejemplar__libro')
+                         .order_by('-fecha_inicio')[:50])
+                    cantidad += 1
+            except DatabaseError:
+                pass
+            finally:
+                connection.close()
+                with lock:
+                    lecturas[0] += cantidad
+
+        hilos = [threading.Thread(target=mostrador, args=par) for par in zip(socios, ejemplares)]
+        hilos += [threading.Thread(target=lector) for _ in range(opciones['lectores'])]
+        inicio = time.monotonic()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.monotonic() - inicio
+
+        latencias.sort()
+        return {
+            'operaciones': len(latencias),
+            'errores': sum(errores),
+            'lecturas': lecturas[0],
+            'duracion': duracion,
+            'por_segundo': len(latencias) / duracion,
+            'p50': statistics.median(latencias) if latencias else 0,
+            'p95': latencias[int(len(latencias) * 0.95)] if latencias else 0,
+        }
+
+    def mostrar(self, modo, resultado):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Modo {modo}:'))
+        self.stdout.write(
+            f'  {resultado["operaciones"]} préstamos+devoluciones en {resultado["duracion"]:.1f} s '
+            f'({resultado["por_segundo"]:.0f}/s), {resultado["errores"]} fallidos por base bloqueada\n'
+            f'  latencia p50 {resultado["p50"] * 1000:.1f} ms, p95 {resultado["p95"] * 1000:.1f} ms; '
+            f'{resultado["lecturas"]} listados leídos'
+        )
@@ -0,0 +1,88 @@
+"""
+Mide la latencia y las consultas SQL de cada vista sobre una biblioteca sintética.
+
+Uso:
+    python manage.py benchmark_vistas
+    python manage.py benchmark_vistas --guardar          # actualiza la línea base
+    python manage.py benchmark_vistas --solo listar_prestamos --repeticiones 10
+    python manage.py benchmark_vistas --prestamos 50000 --tolerancia 0.5
+
+Corre sobre una base temporal (no toca la base real) y termina con error si
+alguna vista excede su presupuesto de consultas o empeora más de --tolerancia
+respecto de la línea base. Ver benchmarks/vistas.py.
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from ...benchmarks import base_temporal
+from ...benchmarks.escenarios import escenarios
+from ...benchmarks.vistas import LINEA_BASE, ErrorEscenario, comparar, correr, guardar_linea_base, leer_linea_base
+from ...datos_sinteticos import generar_datos
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia y consultas SQL de cada vista y las compara contra la línea base'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--libros', type=int, default=1000)
+        parser.add_argument('--ejemplares-por-libro', type=int, default=3)
+        parser.add_argument('--socios', type=int, default=500)
+        parser.add_argument('--prestamos', type=int, default=10000)
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--repeticiones', type=int, default=5, help='Requests medidos por escenario')
+        parser.add_argument('--tolerancia', type=float, default=0.25, help='Regresión de p50 admitida (0.25 = 25%%)')
+        parser.add_argument('--solo', help='Corre solo los escenarios cuyo nombre contiene este texto')
+        parser.add_argument('--linea-base', default=str(LINEA_BASE), help='Archivo JSON de la línea base')
+        parser.add_argument('--guardar', action='store_true', help='Guarda los resultados como nueva línea base')
+
+    def handle(self, *args, **opciones):
+        if opciones['repeticiones'] < 1:
+            raise CommandError('--repeticiones debe ser mayor a cero.')
+        datos = {clave: opciones[clave] for clave in ('libros', 'ejemplares_por_libro', 'socios', 'prestamos', 'semilla')}
+        linea_base = leer_linea_base(opciones['linea_base'])
+
+        ajustes = override_settings(
+            DEBUG=False,  # con DEBUG, Django guarda cada consulta en connection.queries
+            ALLOWED_HOSTS=['testserver'],
+            CONSULTAS_LENTAS_MS=None,  # registrarlas sumaría consultas a la vista medida
+            INSTRUMENTACION_ACTIVA=False,  # el informe es este; sin logs de requests lentos
+            METRICAS_ARCHIVO=Path(tempfile.gettempdir()) / 'benchmark_vistas_metricas.sqlite3',
+        )
+        with ajustes, base_temporal(prefijo='benchmark_vistas_'):
+            inicio = time.perf_counter()
+            generar_datos(**datos)
+            usuario = get_user_model().objects.create_superuser('benchmark', password='benchmark')
+            self.stdout.write(f'Biblioteca sintética generada en {time.perf_counter() - inicio:.1f}s')
+
+            lista = [e for e in escenarios() if not opciones['solo'] or opciones['solo'] in e.nombre]
+            try:
+                resultados = correr(lista, usuario, opciones['repeticiones'], al_medir=self.mostrar)
+            except (ErrorEscenario, LookupError) as e:
+                raise CommandError(str(e))
+
+        if linea_base['datos'] not in (None, datos):
+            self.stdout.write(self.style.WARNING('La línea base se midió con otro tamaño de datos.'))
+        fallas = comparar(lista, resultados, linea_base['escenarios'], opciones['tolerancia'])
+        if opciones['guardar']:
+            if opciones['solo']:
+                resultados = {**linea_base['escenarios'], **resultados}
+            guardar_linea_base(resultados, datos, opciones['linea_base'])
+            self.stdout.write(self.style.SUCCESS(f'Línea base guardada en {opciones["linea_base"]}'))
+
+        if fallas:
+            for falla in fallas:
+                self.stderr.write(f'  ✗ {falla}')
+            raise CommandError(f'{len(fallas)} escenario(s) fuera de presupuesto o con regresión.')
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(lista)} escenarios dentro del presupuesto'))
+
+    def mostrar(self, escenario, resultado):
+        self.stdout.write(
+            f'  {escenario.nombre:<55} {resultado["consultas"]:>3}/{escenario.presupuesto:<3} consultas  '
+            f'p50 {resultado["p50_ms"]:>8.1f} ms  p95 {resultado["p95_ms"]:>8.1f} ms'
+        )
@@ -0,0 +1,56 @@
+"""
+Comando que envía a cada socio un recordatorio con sus préstamos vencidos y por vencer.
+
+Uso:
+    python manage.py enviar_recordatorios                  # una vez por día, desde cron
+    python manage.py enviar_recordatorios --dias-antes 3 --lote 1000
+    python manage.py enviar_recordatorios --simular
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils import timezone
+
+from ...recordatorios import enviar_recordatorios, prestamos_a_recordar
+
+
+class Command(BaseCommand):
+    help = 'Envía un recordatorio por socio con los préstamos vencidos o que vencen en los próximos días'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias-antes', type=int, default=settings.RECORDATORIOS_DIAS_ANTES,
+            help=f'Incluir los préstamos que vencen en estos días (por defecto: {settings.RECORDATORIOS_DIAS_ANTES})'
+        )
+        parser.add_argument(
+            '--lote', type=int, default=settings.RECORDATORIOS_LOTE,
+            help=f'Correos por envío al servidor (por defecto: {settings.RECORDATORIOS_LOTE})'
+        )
+        parser.add_argument('--simular', action='store_true', help='Solo cuenta los recordatorios que se enviarían')
+
+    def handle(self, *args, **options):
+        if options['dias_antes'] < 0 or options['lote'] < 1:
+            raise CommandError('--dias-antes no puede ser negativo y --lote debe ser mayor a cero.')
+
+        if options['simular']:
+            totales = prestamos_a_recordar(timezone.localdate(), options['dias_antes']).aggregate(
+                prestamos=Count('id'), socios=Count('socio_id', distinct=True)
+            )
+            self.stdout.write(f'Se enviarían {totales["socios"]} recordatorios ({totales["prestamos"]} préstamos).')
+            return
+
+        inicio = time.perf_counter()
+        enviados, fallidos, prestamos = enviar_recordatorios(dias_antes=options['dias_antes'], tamaño_lote=options['lote'])
+        duracion = time.perf_counter() - inicio
+
+        if not enviados and not fallidos:
+            self.stdout.write(self.style.WARNING('No hay préstamos vencidos ni por vencer.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {enviados} recordatorios enviados ({prestamos} préstamos) en {duracion:.1f}s'
+        ))
+        if fallidos:
+            raise CommandError(f'{fallidos} recordatorios no se pudieron enviar.')
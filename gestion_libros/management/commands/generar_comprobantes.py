@@ -0,0 +1,197 @@
+"""
+Comando para generar en lote los comprobantes de un período (cierre de mes).
+
+Uso:
+    python manage.py generar_comprobantes --desde 2025-10-01 --hasta 2025-10-31
+    python manage.py generar_comprobantes --desde 2025-10-01 --hasta 2025-10-31 --tipo multas --formato pdf
+
+Con --formato zip la memoria no depende del período (lotes acotados en
+vuelo). Con --formato pdf reportlab arma el documento entero en memoria: se
+rechaza un período con más de --maximo-pdf comprobantes (MAXIMO_PDF_UNICO
+por defecto) y hay que usar el ZIP o partir el período.
+"""
+
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, PageBreak
+
+from ...archivo import recorrer_ambas
+from ...models import Multa, MultaArchivada, Prestamo, PrestamoArchivado
+from ...comprobantes import (
+    comprobante_multa, comprobante_prestamo, elementos_comprobante, renderizar_lote
+)
+
+
+# Comprobantes por PDF único: cada uno son unos pocos flowables, todos en memoria hasta build()
+MAXIMO_PDF_UNICO = 2000
+
+
+class Command(BaseCommand):
+    help = 'Genera los comprobantes de multas pagadas y préstamos iniciados en un rango de fechas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', required=True, help='Fecha inicial (AAAA-MM-DD), inclusive')
+        parser.add_argument('--hasta', required=True, help='Fecha final (AAAA-MM-DD), inclusive')
+        parser.add_argument(
+            '--tipo', choices=['todos', 'multas', 'prestamos'], default='todos',
+            help='Qué comprobantes generar (por defecto: todos)'
+        )
+        parser.add_argument(
+            '--formato', choices=['zip', 'pdf'], default='zip',
+            help='zip: un PDF por comprobante en paralelo. pdf: un único PDF con todos, en un proceso'
+        )
+        parser.add_argument('--salida', help='Archivo de salida (por defecto: comprobantes_DESDE_HASTA.zip|pdf)')
+        parser.add_argument(
+            '--procesos', type=int, default=os.cpu_count() or 1,
+            help='Cantidad de procesos para renderizar (por defecto: núcleos disponibles)'
+        )
+        parser.add_argument('--lote', type=int, default=100, help='Comprobantes por tarea enviada al pool')
+        parser.add_argument(
+            '--maximo-pdf', type=int, default=MAXIMO_PDF_UNICO,
+            help=f'Con --formato pdf, falla si el período tiene más comprobantes (por defecto: {MAXIMO_PDF_UNICO})'
+        )
+
+    def handle(self, *args, **options):
+        desde = parse_date(options['desde'])
+        hasta = parse_date(options['hasta'])
+        if desde is None or hasta is None:
+            raise CommandError('Las fechas deben tener el formato AAAA-MM-DD.')
+        if desde > hasta:
+            raise CommandError('La fecha --desde no puede ser posterior a --hasta.')
+        if options['procesos'] < 1 or options['lote'] < 1 or options['maximo_pdf'] < 1:
+            raise CommandError('--procesos, --lote y --maximo-pdf deben ser mayores a cero.')
+
+        salida = options['salida'] or f"comprobantes_{desde:%Y%m%d}_{hasta:%Y%m%d}.{options['formato']}"
+        comprobantes = self._seleccionar(desde, hasta, options['tipo'], options['lote'])
+
+        inicio = time.perf_counter()
+        if options['formato'] == 'zip':
+            total = self._generar_zip(comprobantes, salida, options['procesos'], options['lote'])
+        else:
+            total = self._generar_pdf_unico(comprobantes, salida, options['maximo_pdf'])
+        duracion = time.perf_counter() - inicio
+
+        if total == 0:
+            self.stdout.write(self.style.WARNING('No hay comprobantes en el rango indicado.'))
+            if os.path.exists(salida):
+                os.remove(salida)
+            return
+
+        velocidad = total / duracion if duracion > 0 else float(total)
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {total} comprobantes generados en {duracion:.1f}s ({velocidad:.1f} docs/s) → {salida}'
+        ))
+
+    def _seleccionar(self, desde, hasta, tipo, lote):
+        """
+        Generador de comprobantes del período, de las tablas actuales y del
+        archivo (ver archivo.py). Se recorre con iterator() para no cargar
+        decenas de miles de filas en memoria.
+        """
+        inicio = timezone.make_aware(datetime.combine(desde, datetime.min.time()))
+        fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), datetime.min.time()))
+
+        if tipo in ('todos', 'multas'):
+            multas = [
+                modelo.objects.filter(pagada=True, fecha_pago__gte=inicio, fecha_pago__lt=fin).select_related('socio')
+                for modelo in (Multa, MultaArchivada)
+            ]
+            for multa in recorrer_ambas(*multas, 'fecha_pago', tamaño_lote=lote * 10):
+                yield comprobante_multa(multa)
+
+        if tipo in ('todos', 'prestamos'):
+            prestamos = [
+                modelo.objects.filter(fecha_inicio__gte=inicio, fecha_inicio__lt=fin).select_related('socio', 'ejemplar__libro')
+                for modelo in (Prestamo, PrestamoArchivado)
+            ]
+            for prestamo in recorrer_ambas(*prestamos, 'fecha_inicio', tamaño_lote=lote * 10):
+                yield comprobante_prestamo(prestamo)
+
+    def _generar_zip(self, comprobantes, salida, procesos, lote):
+        """
+        Reparte el renderizado entre procesos y va escribiendo el ZIP a medida
+        que terminan los lotes. Se limita la cantidad de lotes en vuelo para que
+        la memoria no crezca con el tamaño del período.
+
+        Los procesos arrancan con spawn para no heredar la conexión a la base del
+        proceso padre; solo necesitan django.setup() por la zona horaria.
+        """
+        total = 0
+        max_en_vuelo = procesos * 2
+        pendientes = set()
+
+        with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_STORED) as archivo_zip, \
+                ProcessPoolExecutor(
+                    max_workers=procesos,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=django.setup,
+                ) as pool:
+
+            def escribir_terminados(bloquear):
+                nonlocal total, pendientes
+                if not pendientes:
+                    return
+                terminados, pendientes = wait(
+                    pendientes, timeout=None if bloquear else 0, return_when=FIRST_COMPLETED
+                )
+                for futuro in terminados:
+                    for nombre, pdf in futuro.result():
+                        # Los PDFs ya vienen comprimidos, no tiene sentido deflatearlos
+                        archivo_zip.writestr(nombre, pdf)
+                        total += 1
+
+            for tanda in _en_lotes(comprobantes, lote):
+                pendientes.add(pool.submit(renderizar_lote, tanda))
+                escribir_terminados(bloquear=len(pendientes) >= max_en_vuelo)
+
+            while pendientes:
+                escribir_terminados(bloquear=True)
+
+        return total
+
+    def _generar_pdf_unico(self, comprobantes, salida, maximo):
+        """
+        Un único PDF con un comprobante por página.
+        Se arma en un solo documento de reportlab, por eso no usa el pool:
+        unir PDFs ya renderizados requeriría una dependencia extra. Los
+        elementos quedan en memoria hasta build(): pasados `maximo`
+        comprobantes se corta antes de escribir nada.
+        """
+        elementos = []
+        total = 0
+        for comprobante in comprobantes:
+            if total == maximo:
+                raise CommandError(
+                    f'El período tiene más de {maximo} comprobantes: usá --formato zip, '
+                    'partí el período o subí --maximo-pdf.'
+                )
+            if total:
+                elementos.append(PageBreak())
+            elementos.extend(elementos_comprobante(comprobante))
+            total += 1
+
+        if total:
+            SimpleDocTemplate(salida, pagesize=letter).build(elementos)
+        return total
+
+
+def _en_lotes(iterable, tamaño):
+    """Agrupa un iterable en listas de `tamaño` elementos"""
+    tanda = []
+    for elemento in iterable:
+        tanda.append(elemento)
+        if len(tanda) == tamaño:
+            yield tanda
+            tanda = []
+    if tanda:
+        yield tanda
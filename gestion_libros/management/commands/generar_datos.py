@@ -0,0 +1,58 @@
+"""
+Comando para generar una biblioteca sintética grande (benchmarks y pruebas de carga).
+
+Uso:
+    python manage.py generar_datos
+    python manage.py generar_datos --libros 20000 --ejemplares-por-libro 3 --socios 10000 --prestamos 200000
+    python manage.py generar_datos --semilla 7 --borrar
+
+Ver datos_sinteticos.py para la distribución de los datos.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...datos_sinteticos import borrar_datos, escribir_biblioteca, simular_biblioteca
+from ...models import Libro, Socio
+
+
+class Command(BaseCommand):
+    help = 'Genera libros, ejemplares, socios, préstamos y multas sintéticos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--libros', type=int, default=5000)
+        parser.add_argument('--ejemplares-por-libro', type=int, default=3)
+        parser.add_argument('--socios', type=int, default=2000)
+        parser.add_argument('--prestamos', type=int, default=50000)
+        parser.add_argument('--semilla', type=int, default=42, help='Misma semilla, mismos datos')
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por INSERT')
+        parser.add_argument('--borrar', action='store_true', help='Borra antes el catálogo y la circulación existentes')
+
+    def handle(self, *args, **opciones):
+        cantidades = [opciones[clave] for clave in ('libros', 'ejemplares_por_libro', 'socios', 'prestamos')]
+        if min(cantidades) < 0 or opciones['lote'] < 1:
+            raise CommandError('Las cantidades no pueden ser negativas y --lote debe ser mayor a cero.')
+
+        if opciones['borrar']:
+            borrar_datos()
+        elif Libro.objects_all.exists() or Socio.objects_all.exists():
+            raise CommandError('La base ya tiene libros o socios. Usá --borrar para reemplazarlos.')
+
+        inicio = time.perf_counter()
+        filas = simular_biblioteca(
+            opciones['libros'], opciones['ejemplares_por_libro'], opciones['socios'], opciones['prestamos'],
+            semilla=opciones['semilla'],
+        )
+        simulacion = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        creados = escribir_biblioteca(filas, tamaño_lote=opciones['lote'])
+        escritura = time.perf_counter() - inicio
+
+        total = sum(creados.values())
+        detalle = ', '.join(f'{cantidad} {tabla}' for tabla, cantidad in creados.items())
+        self.stdout.write(f'Simulación de la circulación: {simulacion:.1f}s')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {total} filas escritas en {escritura:.1f}s ({total / max(escritura, 1e-9):,.0f} filas/s): {detalle}'
+        ))
@@ -0,0 +1,61 @@
+"""
+Comando que envía los avisos por correo encolados en el outbox (ver notificaciones.py).
+
+Uso:
+    python manage.py procesar_outbox                  # envía lo pendiente y termina (cron)
+    python manage.py procesar_outbox --continuo       # queda esperando avisos nuevos
+    python manage.py procesar_outbox --lote 500 --intervalo 10
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...notificaciones import procesar
+
+
+class Command(BaseCommand):
+    help = 'Envía por correo los avisos pendientes del outbox, en lotes y con reintentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=settings.NOTIFICACIONES_LOTE,
+            help=f'Avisos por lote (por defecto: {settings.NOTIFICACIONES_LOTE})'
+        )
+        parser.add_argument('--continuo', action='store_true', help='No termina: revisa el outbox cada --intervalo segundos')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre revisiones con --continuo')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1 or options['intervalo'] <= 0:
+            raise CommandError('--lote y --intervalo deben ser mayores a cero.')
+
+        try:
+            while True:
+                totales = self.vaciar(options['lote'])
+                if not options['continuo']:
+                    if not any(totales):
+                        self.stdout.write(self.style.WARNING('No hay avisos pendientes.'))
+                    return
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('Interrumpido: los avisos tomados y no enviados se retoman al vencer el reclamo.')
+
+    def vaciar(self, lote):
+        """Envía lotes hasta que no quedan avisos vencidos; devuelve (enviados, reintentos, fallidos)"""
+        totales = (0, 0, 0)
+        while True:
+            resultado = procesar(lote)
+            totales = tuple(total + cantidad for total, cantidad in zip(totales, resultado))
+            # Un lote sin ningún envío: el servidor de correo no responde, se espera al próximo intento
+            if sum(resultado) < lote or not resultado[0]:
+                break
+
+        enviados, reintentos, fallidos = totales
+        if enviados:
+            self.stdout.write(self.style.SUCCESS(f'✓ {enviados} avisos enviados'))
+        if reintentos:
+            self.stdout.write(self.style.WARNING(f'{reintentos} avisos no se pudieron enviar: se reintentan más tarde'))
+        if fallidos:
+            self.stdout.write(self.style.ERROR(f'{fallidos} avisos agotaron los reintentos (ver admin: Notificaciones)'))
+        return totales
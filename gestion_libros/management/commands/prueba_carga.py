@@ -0,0 +1,221 @@
+"""
+Prueba de carga HTTP: cuántos préstamos y devoluciones por segundo sostiene
+un servidor, con varios mostradores atendiendo a la vez.
+
+Uso:
+    python manage.py prueba_carga
+    python manage.py prueba_carga --mostradores 16 --pausa 0 --duracion 60
+    python manage.py prueba_carga --escenario circulacion --servidor "gunicorn proyecto_biblioteca.wsgi -w 1 -b 127.0.0.1:{puerto}"
+    python manage.py prueba_carga --url http://127.0.0.1:8000
+    python manage.py prueba_carga --escenario lecturas --pausa 0 --mostradores 32 \
+        --servidor "gunicorn proyecto_biblioteca.wsgi -w 4 -b 127.0.0.1:{puerto}" \
+        --servidor "uvicorn proyecto_biblioteca.asgi:application --workers 4 --port {puerto}"
+
+Sin --url, genera una biblioteca sintética en una base SQLite temporal, levanta
+el servidor (runserver por defecto, o el comando de --servidor) apuntando a esa
+base y lo detiene al terminar. Con --url se usa un servidor ya levantado: debe
+usar la misma base que este comando (DATABASE_URL), y esa base tiene que ser
+temporal o de benchmark (ver benchmarks.es_base_de_prueba), nunca la de
+producción. Ahí se crean, solo para la corrida, un usuario con clave aleatoria,
+los socios, el libro y las multas de la prueba, y se borran al terminar (ver
+benchmarks/carga.py: puestos_de_prueba).
+
+Con varios --servidor se corre la misma carga contra cada uno (de a uno, sobre
+la misma base) y se comparan: así se mide cuánto rinden las vistas async con
+un servidor ASGI frente a los workers WSGI.
+
+Escenarios (ver benchmarks/carga.py): mostrador (buscar, prestar, devolver,
+cobrar multa), circulacion (prestar y devolver), consulta (buscar) y lecturas
+(las vistas async de views/consultas.py y los comprobantes).
+"""
+
+import asyncio
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import time
+from contextlib import ExitStack, closing
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from ...benchmarks import base_temporal, es_base_de_prueba
+from ...benchmarks.carga import ESCENARIOS, correr_carga, puestos_de_prueba
+from ...datos_sinteticos import generar_datos
+
+
+
+class Command(BaseCommand):
+    help = 'Prueba de carga HTTP con mostradores concurrentes (throughput, errores y latencias)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escenario', choices=sorted(ESCENARIOS), default='mostrador')
+        parser.add_argument('--mostradores', type=int, default=8, help='Clientes concurrentes')
+        parser.add_argument('--duracion', type=float, default=30, help='Segundos de carga')
+        parser.add_argument('--pausa', type=float, default=0.5, help='Pausa media entre pasos, en segundos (0: sin pausa)')
+        parser.add_argument('--url', help='Servidor ya levantado (ej: http://127.0.0.1:8000)')
+        parser.add_argument(
+            '--servidor', action='append',
+            help='Comando del servidor a levantar; {puerto} se reemplaza (default: runserver). Repetido: compara servidores',
+        )
+        parser.add_argument('--libros', type=int, default=2000)
+        parser.add_argument('--socios', type=int, default=1000)
+        parser.add_argument('--prestamos', type=int, default=20000)
+
+    def handle(self, *args, **opciones):
+        if opciones['mostradores'] < 1:
+            raise CommandError('Se necesita al menos un mostrador.')
+        if opciones['url'] and opciones['servidor']:
+            raise CommandError('--url y --servidor no se combinan.')
+
+        comparacion = {}
+        with ExitStack() as pila:
+            if opciones['url']:
+                if not es_base_de_prueba():
+                    raise CommandError(
+                        f'--url crea y borra datos en la base configurada ({connection.settings_dict["NAME"]}): '
+                        'solo se permite con una base temporal o de benchmark (DATABASE_URL).'
+                    )
+                partes = urlsplit(opciones['url'])
+                host, puerto = partes.hostname, partes.port or 80
+            else:
+                if connection.vendor != 'sqlite':
+                    raise CommandError('Sin --url la prueba usa una base SQLite temporal (la configurada es otra).')
+                pila.enter_context(base_temporal(prefijo='prueba_carga_'))
+                generar_datos(opciones['libros'], 3, opciones['socios'], opciones['prestamos'])
+
+            try:
+                puestos, usuario, clave = pila.enter_context(puestos_de_prueba(opciones['mostradores']))
+            except ValueError as e:
+                raise CommandError(str(e))
+            credenciales = usuario, clave
+            # El servidor tiene que ver los datos: nada de conexiones abiertas de este proceso
+            connections.close_all()
+
+            if opciones['url']:
+                resultados = self.correr(opciones, puestos, credenciales, host, puerto)
+                self.mostrar(resultados)
+                return
+            for comando in opciones['servidor'] or [None]:
+                puerto = puerto_libre()
+                with servidor(comando, puerto, connection.settings_dict['NAME']):
+                    resultados = self.correr(opciones, puestos, credenciales, '127.0.0.1', puerto, comando)
+                self.mostrar(resultados)
+                comparacion[comando or 'runserver'] = resultados
+
+        if len(comparacion) > 1:
+            self.comparar(comparacion)
+
+    def correr(self, opciones, puestos, credenciales, host, puerto, comando=None):
+        self.stdout.write(
+            f'{opciones["mostradores"]} mostradores, escenario {opciones["escenario"]}, '
+            f'{opciones["duracion"]:.0f} s contra {host}:{puerto}{f" ({comando})" if comando else ""}...'
+        )
+        return asyncio.run(correr_carga(
+            host, puerto, puestos, opciones['escenario'], opciones['duracion'], *credenciales, opciones['pausa'],
+        ))
+
+    def comparar(self, comparacion):
+        """Requests por segundo, errores y p95 de cada servidor, contra el primero"""
+        self.stdout.write(self.style.MIGRATE_HEADING('\nComparación de servidores:'))
+        referencia = None
+        for comando, resultados in comparacion.items():
+            resumen = resultados.resumen()
+            por_segundo = sum(datos['cantidad'] for datos in resumen.values()) / resultados.duracion
+            errores = sum(datos['errores'] for datos in resumen.values())
+            p95 = max((datos['p95_ms'] for datos in resumen.values()), default=0)
+            referencia = referencia or por_segundo or 1
+            self.stdout.write(
+                f'  {por_segundo:>8.1f} req/s  ×{por_segundo / referencia:<5.2f} '
+                f'{errores:>6} errores  p95 máx {p95:>8.1f} ms  {comando}'
+            )
+
+    def mostrar(self, resultados):
+        resumen = resultados.resumen()
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\nResultados ({resultados.duracion:.1f} s):'))
+        self.stdout.write(
+            f'  {"operación":<16} {"cantidad":>8} {"por s":>7} {"errores":>8} '
+            f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"máx ms":>8}'
+        )
+        for operacion, datos in resumen.items():
+            self.stdout.write(
+                f'  {operacion:<16} {datos["cantidad"]:>8} {datos["por_segundo"]:>7.1f} '
+                f'{datos["errores"]:>8} {datos["p50_ms"]:>8.1f} {datos["p95_ms"]:>8.1f} '
+                f'{datos["p99_ms"]:>8.1f} {datos["max_ms"]:>8.1f}'
+            )
+
+        circulacion = sum(resumen[o]['cantidad'] for o in ('prestar', 'devolver') if o in resumen)
+        total = sum(datos['cantidad'] + datos['errores'] for datos in resumen.values())
+        errores = sum(datos['errores'] for datos in resumen.values())
+        if 'prestar' in resumen or 'devolver' in resumen:
+            self.stdout.write(self.style.SUCCESS(
+                f'\n  Préstamos + devoluciones: {circulacion / resultados.duracion:.1f} por segundo'
+            ))
+        self.stdout.write(f'  Tasa de error: {errores / (total or 1):.2%} ({errores} de {total} requests)')
+        for operacion, tipos in resultados.errores.items():
+            for tipo, cantidad in tipos.most_common():
+                estilo = self.style.ERROR if tipo == 'base bloqueada' else str
+                self.stdout.write(estilo(f'    {operacion}: {cantidad} × {tipo}'))
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\nHistogramas de latencia:'))
+        for operacion in resumen:
+            histograma = resultados.histograma(operacion)
+            # Solo desde el primer bucket con datos hasta el último
+            ocupados = [i for i, (_, cantidad) in enumerate(histograma) if cantidad]
+            if not ocupados:
+                continue
+            histograma = histograma[ocupados[0]:ocupados[-1] + 1]
+            mayor = max(cantidad for _, cantidad in histograma) or 1
+            self.stdout.write(f'  {operacion}')
+            for limite, cantidad in histograma:
+                etiqueta = f'≤ {limite * 1000:g} ms' if limite != float('inf') else '> 10000 ms'
+                self.stdout.write(f'    {etiqueta:>12} {cantidad:>7} {"█" * round(40 * cantidad / mayor)}')
+
+
+def puerto_libre():
+    with closing(socket.socket()) as prueba:
+        prueba.bind(('127.0.0.1', 0))
+        return prueba.getsockname()[1]
+
+
+class servidor:
+    """Levanta el servidor contra la base `nombre_base` y espera a que acepte conexiones"""
+
+    def __init__(self, comando, puerto, nombre_base):
+        manage = os.path.join(settings.BASE_DIR, 'manage.py')
+        comando = comando or f'{shlex.quote(sys.executable)} {shlex.quote(manage)} runserver 127.0.0.1:{{puerto}} --noreload'
+        self.argumentos = shlex.split(comando.format(puerto=puerto))
+        self.puerto = puerto
+        # Sin DATABASE_REPLICA_URL: el servidor lee de la base temporal, no de la réplica de la real
+        self.entorno = {
+            **os.environ, 'DATABASE_URL': f'sqlite:///{nombre_base}', 'DATABASE_REPLICA_URL': '', 'INSTRUMENTACION': '0'
+        }
+        self.proceso = None
+
+    def __enter__(self):
+        self.proceso = subprocess.Popen(
+            self.argumentos, cwd=settings.BASE_DIR, env=self.entorno,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            if self.proceso.poll() is not None:
+                raise CommandError(f'El servidor terminó al arrancar: {" ".join(self.argumentos)}')
+            try:
+                socket.create_connection(('127.0.0.1', self.puerto), timeout=1).close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise CommandError('El servidor no aceptó conexiones en 30 s.')
+
+    def __exit__(self, *exc):
+        self.proceso.terminate()
+        try:
+            self.proceso.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proceso.kill()
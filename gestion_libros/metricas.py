@@ -0,0 +1,322 @@
+"""
+Métricas de operación (préstamos, devoluciones, multas, PDFs, tiempo por vista).
+
+Registro en proceso de contadores e histogramas con buckets fijos. Los valores
+se acumulan en un archivo SQLite aparte (METRICAS_ARCHIVO), así todos los
+procesos del servidor suman sobre los mismos números sin depender de un
+servicio externo. La vista `metricas` los exporta en formato de texto de
+Prometheus (las tasas por minuto las calcula Prometheus con rate()).
+
+No se usa la conexión de Django: las métricas no cuentan como consultas del
+request ni participan de sus transacciones. Cada proceso acumula las muestras
+en memoria y las escribe juntas cada METRICAS_VOLCADO segundos: observar un
+histograma son unas 13 filas y el request no espera ese UPSERT cada vez. Un
+hilo de fondo escribe lo pendiente al vencer el intervalo aunque no lleguen
+más muestras, así un proceso que queda ocioso no se guarda lo último.
+"""
+
+import atexit
+import functools
+import logging
+import math
+import sqlite3
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .instrumentacion import Medicion, medir_consultas, medir_consultas_async
+
+
+logger = logging.getLogger('gestion_libros.metricas')
+
+REGISTRO = {}
+
+# Segundos: de 5 ms a 10 s
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Almacen:
+    """
+    Suma los valores de las métricas en un archivo SQLite compartido entre
+    procesos. Las muestras se acumulan en memoria y se escriben con un solo
+    UPSERT cada METRICAS_VOLCADO segundos (desde un hilo de fondo si no llegan
+    más muestras), al leer y al terminar el proceso.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pendientes = {}  # (nombre, etiquetas, le): valor
+        self._ruta = None  # archivo al que van las pendientes
+        self._volcado = time.monotonic()
+        self._temporizador = None  # threading.Timer que vuelca lo pendiente
+        atexit.register(self.volcar)
+
+    def _conexion(self, ruta):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None or self._local.ruta != ruta:
+            conexion = sqlite3.connect(ruta, timeout=5)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            # Perder las últimas muestras si se cae la máquina es aceptable
+            conexion.execute('PRAGMA synchronous=OFF')
+            conexion.execute(
+                'CREATE TABLE IF NOT EXISTS muestras ('
+                ' nombre TEXT NOT NULL, etiquetas TEXT NOT NULL, le TEXT NOT NULL,'
+                ' valor REAL NOT NULL, PRIMARY KEY (nombre, etiquetas, le))'
+            )
+            self._local.conexion, self._local.ruta = conexion, ruta
+        return conexion
+
+    def _tomar(self):
+        """Las muestras pendientes y su archivo; las deja vacías (con el lock tomado)"""
+        pendientes, ruta = self._pendientes, self._ruta
+        self._pendientes, self._volcado = {}, time.monotonic()
+        if self._temporizador is not None:
+            # Ya no hay nada que volcar: el próximo lo programa la próxima muestra
+            self._temporizador.cancel()
+            self._temporizador = None
+        return pendientes, ruta
+
+    def _escribir(self, pendientes, ruta):
+        """Un error acá no debe romper el request"""
+        if not pendientes:
+            return
+        try:
+            conexion = self._conexion(ruta)
+            with conexion:
+                conexion.executemany(
+                    'INSERT INTO muestras (nombre, etiquetas, le, valor) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (nombre, etiquetas, le) DO UPDATE SET valor = valor + excluded.valor',
+                    [(*clave, valor) for clave, valor in pendientes.items()]
+                )
+        except sqlite3.Error:
+            logger.warning('No se pudieron guardar las métricas', exc_info=True)
+
+    def sumar(self, filas):
+        """filas: (nombre, etiquetas, le, valor). Se escriben al pasar METRICAS_VOLCADO segundos."""
+        ruta = str(settings.METRICAS_ARCHIVO)
+        volcar = []
+        with self._lock:
+            if ruta != self._ruta:
+                # Cambió el archivo (tests): lo acumulado va al anterior
+                volcar.append(self._tomar())
+                self._ruta = ruta
+            for nombre, etiquetas, le, valor in filas:
+                clave = (nombre, etiquetas, le)
+                self._pendientes[clave] = self._pendientes.get(clave, 0) + valor
+            if time.monotonic() - self._volcado >= settings.METRICAS_VOLCADO:
+                volcar.append(self._tomar())
+            elif self._pendientes:
+                self._programar()
+        for pendientes, ruta_pendientes in volcar:
+            self._escribir(pendientes, ruta_pendientes)
+
+    def _programar(self):
+        """Con el lock tomado: vuelca lo pendiente al vencer el intervalo aunque no lleguen más muestras"""
+        # Después de un fork el hilo del proceso padre no existe: is_alive() da False
+        if self._temporizador is not None and self._temporizador.is_alive():
+            return
+        restante = settings.METRICAS_VOLCADO - (time.monotonic() - self._volcado)
+        self._temporizador = threading.Timer(max(restante, 0), self.volcar)
+        self._temporizador.daemon = True
+        self._temporizador.start()
+
+    def volcar(self):
+        """Escribe ya lo acumulado por este proceso"""
+        with self._lock:
+            pendientes, ruta = self._tomar()
+        self._escribir(pendientes, ruta)
+
+    def leer(self):
+        """{nombre: [(etiquetas, le, valor), ...]}"""
+        self.volcar()
+        muestras = {}
+        filas = self._conexion(str(settings.METRICAS_ARCHIVO)).execute('SELECT nombre, etiquetas, le, valor FROM muestras')
+        for nombre, etiquetas, le, valor in filas:
+            muestras.setdefault(nombre, []).append((etiquetas, le, valor))
+        return muestras
+
+    def reiniciar(self):
+        with self._lock:
+            self._tomar()
+        with self._conexion(str(settings.METRICAS_ARCHIVO)) as conexion:
+            conexion.execute('DELETE FROM muestras')
+
+
+almacen = Almacen()
+
+
+@receiver(setting_changed)
+def archivo_cambiado(setting, **kwargs):
+    """Tests: lo acumulado va al archivo anterior mientras todavía existe"""
+    if setting == 'METRICAS_ARCHIVO':
+        almacen.volcar()
+
+
+def _etiquetas(etiquetas):
+    """{'vista': 'x'} -> 'vista="x"' (ordenadas, con los caracteres escapados)"""
+    return ','.join(
+        '{}="{}"'.format(clave, str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for clave, valor in sorted(etiquetas.items())
+    )
+
+
+def _numero(valor):
+    if math.isinf(valor):
+        return '+Inf'
+    return repr(int(valor)) if valor == int(valor) else repr(valor)
+
+
+class Metrica:
+    tipo = None
+
+    def __init__(self, nombre, descripcion):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        REGISTRO[nombre] = self
+
+    def exportar(self, muestras):
+        lineas = [f'# HELP {self.nombre} {self.descripcion}', f'# TYPE {self.nombre} {self.tipo}']
+        return lineas + self.lineas(muestras)
+
+
+class Contador(Metrica):
+    """Valor que solo crece (ej: préstamos registrados)"""
+    tipo = 'counter'
+
+    def inc(self, cantidad=1, **etiquetas):
+        almacen.sumar([(self.nombre, _etiquetas(etiquetas), '', cantidad)])
+
+    def inc_lote(self, cantidades):
+        """Suma varias series en una sola escritura: cantidades = [(etiquetas, cantidad), ...]"""
+        filas = [(self.nombre, _etiquetas(etiquetas), '', cantidad) for etiquetas, cantidad in cantidades]
+        if filas:
+            almacen.sumar(filas)
+
+    def lineas(self, muestras):
+        filas = sorted(muestras.get(self.nombre, []))
+        if not filas:
+            # Sin muestras todavía: 0, así rate() tiene desde dónde partir
+            return [f'{self.nombre} 0']
+        return [
+            f'{self.nombre}{{{etiquetas}}} {_numero(valor)}' if etiquetas else f'{self.nombre} {_numero(valor)}'
+            for etiquetas, le, valor in filas
+        ]
+
+
+class Histograma(Metrica):
+    """Distribución de valores en buckets fijos (ej: latencia en segundos)"""
+    tipo = 'histogram'
+
+    def __init__(self, nombre, descripcion, buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nombre, descripcion)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observar(self, valor, **etiquetas):
+        etiquetas = _etiquetas(etiquetas)
+        # Buckets acumulativos: el valor cuenta en todos los `le` mayores o iguales
+        filas = [
+            (f'{self.nombre}_bucket', etiquetas, _numero(limite), 1)
+            for limite in self.buckets if valor <= limite
+        ]
+        filas.append((f'{self.nombre}_sum', etiquetas, '', valor))
+        filas.append((f'{self.nombre}_count', etiquetas, '', 1))
+        almacen.sumar(filas)
+
+    def lineas(self, muestras):
+        lineas = []
+        buckets = {(etiquetas, le): valor for etiquetas, le, valor in muestras.get(f'{self.nombre}_bucket', [])}
+        # Se exportan todos los buckets de cada serie, también los que quedaron en 0
+        for etiquetas in sorted({etiquetas for etiquetas, le, valor in muestras.get(f'{self.nombre}_count', [])}):
+            separador = ',' if etiquetas else ''
+            for limite in self.buckets:
+                le = _numero(limite)
+                valor = buckets.get((etiquetas, le), 0)
+                lineas.append(f'{self.nombre}_bucket{{{etiquetas}{separador}le="{le}"}} {_numero(valor)}')
+        for sufijo in ('_sum', '_count'):
+            for etiquetas, le, valor in sorted(muestras.get(self.nombre + sufijo, [])):
+                nombre = self.nombre + sufijo
+                lineas.append(f'{nombre}{{{etiquetas}}} {_numero(valor)}' if etiquetas else f'{nombre} {_numero(valor)}')
+        return lineas
+
+
+def exportar():
+    """Todas las métricas registradas, en formato de texto de Prometheus"""
+    muestras = almacen.leer()
+    lineas = []
+    for metrica in REGISTRO.values():
+        lineas.extend(metrica.exportar(muestras))
+    return '\n'.join(lineas) + '\n'
+
+
+# === Métricas de la biblioteca ===
+
+PRESTAMOS = Contador('biblioteca_prestamos_total', 'Préstamos registrados.')
+DEVOLUCIONES = Contador('biblioteca_devoluciones_total', 'Devoluciones registradas, por estado físico.')
+MULTAS = Contador('biblioteca_multas_total', 'Multas generadas, por motivo.')
+MULTAS_PAGADAS = Contador('biblioteca_multas_pagadas_total', 'Multas pagadas.')
+RESERVAS = Contador('biblioteca_reservas_total', 'Reservas registradas, asignadas, cumplidas y canceladas, por evento.')
+RECORDATORIOS = Contador('biblioteca_recordatorios_total', 'Recordatorios de devolución enviados o fallidos, por resultado.')
+NOTIFICACIONES = Contador('biblioteca_notificaciones_total', 'Correos del outbox enviados, reprogramados o fallidos, por resultado.')
+PDF_SEGUNDOS = Histograma('biblioteca_pdf_segundos', 'Tiempo de generación de los PDFs, por vista.')
+VISTA_SEGUNDOS = Histograma('biblioteca_vista_segundos', 'Tiempo total de la vista.')
+VISTA_DB_SEGUNDOS = Histograma('biblioteca_vista_db_segundos', 'Tiempo en la base de datos de la vista.')
+FRAGMENTOS = Contador('biblioteca_fragmentos_total', 'Fragmentos de plantilla leídos de la cache (hit) o renderizados (miss).')
+
+
+def medir_vista(vista):
+    """
+    Decorador: registra el tiempo total y el tiempo de base de la vista.
+    En las respuestas en streaming (estado de cuenta) mide hasta enviar el último byte.
+    Si la vista lanza una excepción (ej: Http404) también se registra.
+    Las vistas async (sin streaming) registran fuera del event loop: escribir
+    en el archivo de métricas puede bloquear.
+    """
+    nombre = vista.__name__
+    es_pdf = nombre.startswith('generar_')
+
+    def registrar(medicion):
+        total = time.perf_counter() - medicion.inicio
+        VISTA_SEGUNDOS.observar(total, vista=nombre)
+        VISTA_DB_SEGUNDOS.observar(medicion.tiempo_db, vista=nombre)
+        if es_pdf:
+            PDF_SEGUNDOS.observar(total, vista=nombre)
+
+    def transmitir(contenido, medicion):
+        try:
+            with medir_consultas(medicion):
+                yield from contenido
+        finally:
+            registrar(medicion)
+
+    if iscoroutinefunction(vista):
+        @functools.wraps(vista)
+        async def envoltura_async(request, *args, **kwargs):
+            medicion = Medicion()
+            try:
+                async with medir_consultas_async(medicion):
+                    return await vista(request, *args, **kwargs)
+            finally:
+                await sync_to_async(registrar)(medicion)
+        return envoltura_async
+
+    @functools.wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        medicion = Medicion()
+        try:
+            with medir_consultas(medicion):
+                response = vista(request, *args, **kwargs)
+        except BaseException:
+            registrar(medicion)
+            raise
+        if response.streaming:
+            response.streaming_content = transmitir(response.streaming_content, medicion)
+        else:
+            registrar(medicion)
+        return response
+
+    return envoltura
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:54
+
+from decimal import Decimal
+import django.core.validators
+from django.db import migrations, models
+
+
+def crear_configuracion_inicial(apps, schema_editor):
+    """Fila única con los valores que antes estaban fijos en singleton.py"""
+    Configuracion = apps.get_model('gestion_libros', 'Configuracion')
+    Configuracion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_libros', '0002_ejemplar_activo_libro_activo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Configuracion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tasa_multa_diaria_sugerida', models.DecimalField(decimal_places=2, default=Decimal('0.50'), help_text='Monto sugerido por cada día de retraso', max_digits=8, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Tasa de Multa Diaria')),
+                ('dias_prestamo_default', models.PositiveIntegerField(default=15, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Días de Préstamo por Defecto')),
+                ('max_prestamos_simultaneos', models.PositiveIntegerField(default=3, help_text='Préstamos activos permitidos por socio', validators=[django.core.validators.MinValueValidator(1)], verbose_name='Máximo de Préstamos Simultáneos')),
+                ('monto_multa_minimo', models.DecimalField(decimal_places=2, default=Decimal('0.01'), max_digits=10, verbose_name='Monto Mínimo de Multa')),
+                ('monto_multa_maximo', models.DecimalField(decimal_places=2, default=Decimal('999999.99'), max_digits=10, verbose_name='Monto Máximo de Multa')),
+                ('version', models.PositiveIntegerField(default=1, editable=False, help_text='Se incrementa en cada cambio para que todos los procesos recarguen')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+            ],
+            options={
+                'verbose_name': 'Configuración',
+                'verbose_name_plural': 'Configuración',
+            },
+        ),
+        migrations.RunPython(crear_configuracion_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.25 on 2026-10-19 07:55
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_libros', '0003_configuracion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PoliticaPrestamo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categoria_libro', models.CharField(blank=True, choices=[('general', 'General'), ('referencia', 'Obra de Referencia'), ('novedad', 'Novedad')], help_text='Vacío = todas las categorías', max_length=20, verbose_name='Categoría de Libro')),
+                ('categoria_socio', models.CharField(blank=True, choices=[('estandar', 'Estándar'), ('estudiante', 'Estudiante'), ('investigador', 'Investigador')], help_text='Vacío = todas las categorías', max_length=20, verbose_name='Categoría de Socio')),
+                ('dias_prestamo', models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Días de Préstamo')),
+                ('max_prestamos_simultaneos', models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Máximo de Préstamos Simultáneos')),
+                ('tasa_multa_diaria', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Tasa de Multa Diaria')),
+                ('permite_prestamo', models.BooleanField(blank=True, help_text='No = obras de consulta en sala. Vacío = heredar', null=True, verbose_name='Permite Préstamo')),
+            ],
+            options={
+                'verbose_name': 'Política de Préstamo',
+                'verbose_name_plural': 'Políticas de Préstamo',
+                'ordering': ['categoria_libro', 'categoria_socio'],
+            },
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='categoria',
+            field=models.CharField(choices=[('general', 'General'), ('referencia', 'Obra de Referencia'), ('novedad', 'Novedad')], default='general', help_text='Determina las condiciones de préstamo (ver Políticas de Préstamo)', max_length=20, verbose_name='Categoría'),
+        ),
+        migrations.AddField(
+            model_name='socio',
+            name='categoria',
+            field=models.CharField(choices=[('estandar', 'Estándar'), ('estudiante', 'Estudiante'), ('investigador', 'Investigador')], default='estandar', help_text='Determina las condiciones de préstamo (ver Políticas de Préstamo)', max_length=20, verbose_name='Categoría'),
+        ),
+        migrations.AddConstraint(
+            model_name='politicaprestamo',
+            constraint=models.UniqueConstraint(fields=('categoria_libro', 'categoria_socio'), name='politica_unica_por_categorias'),
+        ),
+    ]
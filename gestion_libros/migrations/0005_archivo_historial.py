@@ -0,0 +1,60 @@
+# Generated by Django 4.2.25 on 2026-10-19 08:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_libros', '0004_politicas_prestamo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrestamoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha_inicio', models.DateTimeField(verbose_name='Fecha de Préstamo')),
+                ('fecha_devolucion_prevista', models.DateField(verbose_name='Fecha de Devolución Prevista')),
+                ('fecha_devolucion_real', models.DateTimeField(verbose_name='Fecha de Devolución Real')),
+                ('observaciones', models.TextField(blank=True, null=True)),
+                ('fecha_archivado', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Archivado')),
+                ('ejemplar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prestamos_archivados', to='gestion_libros.ejemplar', verbose_name='Ejemplar')),
+                ('socio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prestamos_archivados', to='gestion_libros.socio', verbose_name='Socio')),
+            ],
+            options={
+                'verbose_name': 'Préstamo Archivado',
+                'verbose_name_plural': 'Préstamos Archivados',
+                'ordering': ['-fecha_inicio'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MultaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Monto')),
+                ('motivo', models.CharField(choices=[('retraso', 'Retraso en Devolución'), ('daño', 'Daño al Libro'), ('perdida', 'Pérdida del Libro'), ('otro', 'Otro Motivo')], max_length=20, verbose_name='Motivo')),
+                ('descripcion', models.TextField(blank=True, null=True, verbose_name='Descripción Detallada')),
+                ('fecha', models.DateTimeField(verbose_name='Fecha de la Multa')),
+                ('pagada', models.BooleanField(default=True, verbose_name='Pagada')),
+                ('fecha_pago', models.DateTimeField(verbose_name='Fecha de Pago')),
+                ('fecha_archivado', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Archivado')),
+                ('prestamo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='multas', to='gestion_libros.prestamoarchivado', verbose_name='Préstamo Asociado')),
+                ('socio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='multas_archivadas', to='gestion_libros.socio', verbose_name='Socio')),
+            ],
+            options={
+                'verbose_name': 'Multa Archivada',
+                'verbose_name_plural': 'Multas Archivadas',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='prestamoarchivado',
+            index=models.Index(fields=['socio', 'fecha_inicio'], name='prestamo_arch_socio_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='multaarchivada',
+            index=models.Index(fields=['socio', 'fecha'], name='multa_arch_socio_fecha'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.25 on 2026-10-19 08:06
+
+from django.db import migrations, models
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_libros', '0005_archivo_historial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='ejemplar',
+            options={'default_manager_name': 'objects_all', 'ordering': ['libro', 'codigo_ejemplar'], 'verbose_name': 'Ejemplar', 'verbose_name_plural': 'Ejemplares'},
+        ),
+        migrations.AlterModelOptions(
+            name='libro',
+            options={'default_manager_name': 'objects_all', 'ordering': ['titulo'], 'verbose_name': 'Libro', 'verbose_name_plural': 'Libros'},
+        ),
+        migrations.AlterModelOptions(
+            name='socio',
+            options={'default_manager_name': 'objects_all', 'ordering': ['nombre'], 'verbose_name': 'Socio', 'verbose_name_plural': 'Socios'},
+        ),
+        migrations.AlterModelManagers(
+            name='ejemplar',
+            managers=[
+                ('objects_all', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='libro',
+            managers=[
+                ('objects_all', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='socio',
+            managers=[
+                ('objects_all', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ejemplar',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['libro', 'estado'], name='ejemplar_activo_libro_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ejemplar',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['estado'], name='ejemplar_activo_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['titulo'], name='libro_activo_titulo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='socio',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['nombre'], name='socio_activo_nombre_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.25 on 2026-10-19 08:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gestion_libros', '0006_managers_activos_indices_parciales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Perfil',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('metodo', models.CharField(max_length=10, verbose_name='Método')),
+                ('url', models.CharField(max_length=500, verbose_name='URL')),
+                ('estado', models.PositiveSmallIntegerField(verbose_name='Código HTTP')),
+                ('duracion_ms', models.FloatField(verbose_name='Duración (ms)')),
+                ('consultas', models.PositiveIntegerField(verbose_name='Consultas SQL')),
+                ('tiempo_db_ms', models.FloatField(verbose_name='Tiempo en base (ms)')),
+                ('muestras', models.PositiveIntegerField(default=0, verbose_name='Muestras de pila')),
+                ('archivo', models.CharField(max_length=100, verbose_name='Archivo')),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='perfiles', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Perfil de Request',
+                'verbose_name_plural': 'Perfiles de Requests',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
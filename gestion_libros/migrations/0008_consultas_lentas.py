@@ -0,0 +1,36 @@
+# Generated by Django 4.2.25 on 2026-10-19 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_libros', '0007_perfiles_requests'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsultaLenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('huella', models.CharField(max_length=40, unique=True, verbose_name='Huella')),
+                ('base', models.CharField(max_length=50, verbose_name='Base de datos')),
+                ('sql', models.TextField(verbose_name='SQL normalizado')),
+                ('plan', models.TextField(blank=True, verbose_name='Plan de ejecución')),
+                ('escaneo_completo', models.BooleanField(default=False, help_text='El plan recorre una tabla entera: probablemente falta un índice', verbose_name='Recorre la tabla')),
+                ('llamadas', models.PositiveIntegerField(default=0, verbose_name='Llamadas lentas')),
+                ('duraciones', models.JSONField(default=list, verbose_name='Últimas duraciones (ms)')),
+                ('p95_ms', models.FloatField(default=0, verbose_name='p95 (ms)')),
+                ('max_ms', models.FloatField(default=0, verbose_name='Máximo (ms)')),
+                ('primera_vez', models.DateTimeField(auto_now_add=True, verbose_name='Primera vez')),
+                ('ultima_vez', models.DateTimeField(auto_now=True, verbose_name='Última vez')),
+            ],
+            options={
+                'verbose_name': 'Consulta Lenta',
+                'verbose_name_plural': 'Consultas Lentas',
+                'ordering': ['-p95_ms'],
+                'indexes': [models.Index(fields=['ultima_vez'], name='consulta_lenta_ultima_idx')],
+            },
+        ),
+    ]
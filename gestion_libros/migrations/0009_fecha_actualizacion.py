@@ -0,0 +1,28 @@
+# Generated by Django 4.2.25 on 2026-10-19 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_libros', '0008_consultas_lentas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ejemplar',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, db_index=True, help_text='Versión de la fila: las claves de los fragmentos cacheados la incluyen', verbose_name='Última Actualización'),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, db_index=True, help_text='Versión de la fila: las claves de los fragmentos cacheados la incluyen', verbose_name='Última Actualización'),
+        ),
+        migrations.AddField(
+            model_name='socio',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, db_index=True, help_text='Versión de la fila: las claves de los fragmentos cacheados la incluyen', verbose_name='Última Actualización'),
+        ),
+    ]
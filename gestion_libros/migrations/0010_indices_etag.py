@@ -0,0 +1,21 @@
+# Generated by Django 4.2.25 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_libros', '0009_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='multa',
+            index=models.Index(fields=['fecha_pago'], name='multa_pago_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['fecha_devolucion_real'], name='prestamo_devolucion_idx'),
+        ),
+    ]
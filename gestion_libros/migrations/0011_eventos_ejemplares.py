@@ -0,0 +1,31 @@
+# Generated by Django 4.2.25 on 2026-10-19 09:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_libros', '0010_indices_etag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoEjemplar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('codigo_ejemplar', models.CharField(max_length=50, verbose_name='Código de Ejemplar')),
+                ('estado', models.CharField(max_length=20, verbose_name='Estado')),
+                ('activo', models.BooleanField(verbose_name='Activo')),
+                ('disponibles', models.PositiveIntegerField(help_text='Ejemplares disponibles del libro después del cambio', verbose_name='Disponibles')),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion_libros.libro', verbose_name='Libro')),
+            ],
+            options={
+                'verbose_name': 'Evento de Ejemplar',
+                'verbose_name_plural': 'Eventos de Ejemplares',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.25 on 2026-10-19 09:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_libros', '0011_eventos_ejemplares'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ejemplar',
+            name='estado',
+            field=models.CharField(choices=[('disponible', 'Disponible'), ('prestado', 'Prestado'), ('reservado', 'Reservado'), ('mantenimiento', 'En Mantenimiento'), ('perdido', 'Perdido')], default='disponible', max_length=20, verbose_name='Estado'),
+        ),
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(auto_now_add=True, help_text='Orden en la cola del libro', verbose_name='Fecha de Reserva')),
+                ('estado', models.CharField(choices=[('pendiente', 'En Espera'), ('asignada', 'Ejemplar Apartado'), ('cumplida', 'Cumplida'), ('cancelada', 'Cancelada')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('fecha_asignacion', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Asignación')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, db_index=True, help_text='Versión de la fila (ETag del listado de reservas)', verbose_name='Última Actualización')),
+                ('ejemplar', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservas', to='gestion_libros.ejemplar', verbose_name='Ejemplar Apartado')),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='gestion_libros.libro', verbose_name='Libro')),
+                ('socio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='gestion_libros.socio', verbose_name='Socio')),
+            ],
+            options={
+                'verbose_name': 'Reserva',
+                'verbose_name_plural': 'Reservas',
+                'ordering': ['fecha', 'id'],
+                'indexes': [models.Index(condition=models.Q(('estado', 'pendiente')), fields=['libro', 'fecha', 'id'], name='reserva_cola_idx'), models.Index(condition=models.Q(('estado', 'asignada')), fields=['ejemplar'], name='reserva_asignada_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reserva',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['pendiente', 'asignada'])), fields=('socio', 'libro'), name='reserva_activa_unica'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.25 on 2026-10-19 09:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_libros', '0012_reservas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(help_text='Identifica el aviso (tipo y fila que lo origina): el mismo aviso no se encola dos veces', max_length=100, unique=True, verbose_name='Clave')),
+                ('tipo', models.CharField(choices=[('reserva_asignada', 'Ejemplar Apartado por Reserva'), ('multa', 'Multa Generada')], max_length=30, verbose_name='Tipo')),
+                ('destinatario', models.EmailField(max_length=254, verbose_name='Destinatario')),
+                ('datos', models.JSONField(default=dict, help_text='Contexto de la plantilla del correo, tomado al momento del movimiento', verbose_name='Datos')),
+                ('fecha', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviada', 'Enviada'), ('fallida', 'Fallida')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('intentos', models.PositiveIntegerField(default=0, verbose_name='Intentos')),
+                ('proximo_intento', models.DateTimeField(help_text='No se envía antes: espera entre reintentos y reclamo de un worker en curso', verbose_name='Próximo Intento')),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Envío')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Último Error')),
+                ('socio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones', to='gestion_libros.socio', verbose_name='Socio')),
+            ],
+            options={
+                'verbose_name': 'Notificación',
+                'verbose_name_plural': 'Notificaciones',
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('estado', 'pendiente')), fields=['proximo_intento', 'id'], name='notificacion_pendiente_idx')],
+            },
+        ),
+    ]
@@ -6,5 +6,15 @@ from .libro import Libro, Ejemplar
 from .socio import Socio
 from .prestamo import Prestamo
 from .multa import Multa
+from .configuracion import Configuracion
+from .politica import PoliticaPrestamo
+from .archivo import PrestamoArchivado, MultaArchivada
+from .perfil import Perfil
+from .consulta_lenta import ConsultaLenta
+from .evento import EventoEjemplar
+from .reserva import Reserva
+from .notificacion import Notificacion
 
-__all__ = ['Libro', 'Ejemplar', 'Socio', 'Prestamo', 'Multa']
\ No newline at end of file
+__all__ = ['Libro', 'Ejemplar', 'Socio', 'Prestamo', 'Multa', 'Configuracion', 'PoliticaPrestamo',
+           'PrestamoArchivado', 'MultaArchivada', 'Perfil',
+           'ConsultaLenta', 'EventoEjemplar', 'Reserva', 'Notificacion']
\ No newline at end of file
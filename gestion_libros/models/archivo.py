@@ -0,0 +1,84 @@
+from django.db import models
+
+from .prestamo import Prestamo
+from .multa import Multa
+
+
+class PrestamoArchivado(models.Model):
+    """
+    Préstamo devuelto hace tiempo, movido fuera de la tabla de préstamos
+    (ver archivo.archivar_historial). Conserva el id original, así los
+    comprobantes y el estado de cuenta lo siguen encontrando.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    socio = models.ForeignKey(
+        'Socio',
+        on_delete=models.CASCADE,
+        related_name='prestamos_archivados',
+        verbose_name="Socio"
+    )
+    ejemplar = models.ForeignKey(
+        'Ejemplar',
+        on_delete=models.CASCADE,
+        related_name='prestamos_archivados',
+        verbose_name="Ejemplar"
+    )
+    fecha_inicio = models.DateTimeField(verbose_name="Fecha de Préstamo")
+    fecha_devolucion_prevista = models.DateField(verbose_name="Fecha de Devolución Prevista")
+    fecha_devolucion_real = models.DateTimeField(verbose_name="Fecha de Devolución Real")
+    observaciones = models.TextField(blank=True, null=True)
+    fecha_archivado = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Archivado")
+
+    # Un préstamo archivado siempre está devuelto: mismos cálculos que Prestamo
+    esta_activo = Prestamo.esta_activo
+    dias_retraso = Prestamo.dias_retraso
+    tiene_retraso = Prestamo.tiene_retraso
+    archivado = True
+
+    class Meta:
+        verbose_name = "Préstamo Archivado"
+        verbose_name_plural = "Préstamos Archivados"
+        ordering = ['-fecha_inicio']
+        indexes = [
+            models.Index(fields=['socio', 'fecha_inicio'], name='prestamo_arch_socio_fecha'),
+        ]
+
+    def __str__(self):
+        return f"Préstamo archivado #{self.id} de {self.ejemplar.libro.titulo} a {self.socio.nombre}"
+
+
+class MultaArchivada(models.Model):
+    """Multa pagada de un préstamo archivado (se archiva junto con él)"""
+    id = models.BigIntegerField(primary_key=True)
+    socio = models.ForeignKey(
+        'Socio',
+        on_delete=models.CASCADE,
+        related_name='multas_archivadas',
+        verbose_name="Socio"
+    )
+    prestamo = models.ForeignKey(
+        PrestamoArchivado,
+        on_delete=models.CASCADE,
+        related_name='multas',
+        verbose_name="Préstamo Asociado"
+    )
+    monto = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Monto")
+    motivo = models.CharField(max_length=20, choices=Multa.MOTIVOS, verbose_name="Motivo")
+    descripcion = models.TextField(blank=True, null=True, verbose_name="Descripción Detallada")
+    fecha = models.DateTimeField(verbose_name="Fecha de la Multa")
+    pagada = models.BooleanField(default=True, verbose_name="Pagada")
+    fecha_pago = models.DateTimeField(verbose_name="Fecha de Pago")
+    fecha_archivado = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Archivado")
+
+    archivado = True
+
+    class Meta:
+        verbose_name = "Multa Archivada"
+        verbose_name_plural = "Multas Archivadas"
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['socio', 'fecha'], name='multa_arch_socio_fecha'),
+        ]
+
+    def __str__(self):
+        return f"Multa archivada de ${self.monto} a {self.socio.nombre}"
@@ -0,0 +1,95 @@
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.core.validators import MinValueValidator
+
+
+class Configuracion(models.Model):
+    """
+    Parámetros globales de la biblioteca persistidos en la base (una sola fila).
+    No se usa directamente: se lee a través del Singleton ConfiguracionBiblioteca,
+    que la mantiene en memoria y detecta los cambios por el número de versión.
+    """
+    tasa_multa_diaria_sugerida = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        default=Decimal('0.50'),
+        validators=[MinValueValidator(0)],
+        verbose_name="Tasa de Multa Diaria",
+        help_text="Monto sugerido por cada día de retraso"
+    )
+    dias_prestamo_default = models.PositiveIntegerField(
+        default=15,
+        validators=[MinValueValidator(1)],
+        verbose_name="Días de Préstamo por Defecto"
+    )
+    max_prestamos_simultaneos = models.PositiveIntegerField(
+        default=3,
+        validators=[MinValueValidator(1)],
+        verbose_name="Máximo de Préstamos Simultáneos",
+        help_text="Préstamos activos permitidos por socio"
+    )
+    monto_multa_minimo = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0.01'),
+        verbose_name="Monto Mínimo de Multa"
+    )
+    monto_multa_maximo = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('999999.99'),
+        verbose_name="Monto Máximo de Multa"
+    )
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        help_text="Se incrementa en cada cambio para que todos los procesos recarguen"
+    )
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Última Actualización"
+    )
+
+    class Meta:
+        verbose_name = "Configuración"
+        verbose_name_plural = "Configuración"
+
+    def __str__(self):
+        return f"Configuración de la biblioteca (versión {self.version})"
+
+    def como_diccionario(self):
+        """Valores que expone el Singleton (sin metadatos), incluidas las políticas de préstamo"""
+        from .politica import PoliticaPrestamo
+
+        return {
+            'tasa_multa_diaria_sugerida': self.tasa_multa_diaria_sugerida,
+            'dias_prestamo_default': self.dias_prestamo_default,
+            'max_prestamos_simultaneos': self.max_prestamos_simultaneos,
+            'monto_multa_minimo': self.monto_multa_minimo,
+            'monto_multa_maximo': self.monto_multa_maximo,
+            'politicas': list(PoliticaPrestamo.objects.values(
+                'categoria_libro', 'categoria_socio', 'dias_prestamo',
+                'max_prestamos_simultaneos', 'tasa_multa_diaria', 'permite_prestamo',
+            )),
+        }
+
+    def save(self, *args, **kwargs):
+        """
+        Siempre se guarda la fila 1 e incrementa la versión en el mismo UPDATE:
+        la versión que había en memoria nunca se escribe, así un cambio de otro
+        proceso no se pisa con una versión vieja.
+        Al confirmar la transacción se publica la nueva versión al Singleton.
+        """
+        from ..singleton import ConfiguracionBiblioteca
+
+        self.pk = 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        with transaction.atomic():
+            if not self._state.adding or Configuracion.objects.filter(pk=self.pk).exists():
+                self.version = models.F('version') + 1
+            super().save(*args, **kwargs)
+            self.refresh_from_db(fields=['version'])
+        transaction.on_commit(lambda: ConfiguracionBiblioteca.publicar(self))
+
@@ -0,0 +1,35 @@
+from django.db import models
+
+
+class ConsultaLenta(models.Model):
+    """
+    Consulta SQL que superó CONSULTAS_LENTAS_MS, agrupada por huella (el SQL
+    normalizado, sin valores). Se guarda el plan de ejecución de la primera vez
+    y las últimas duraciones para calcular el p95 (ver consultas_lentas.py).
+    """
+    huella = models.CharField(max_length=40, unique=True, verbose_name="Huella")
+    base = models.CharField(max_length=50, verbose_name="Base de datos")
+    sql = models.TextField(verbose_name="SQL normalizado")
+    plan = models.TextField(blank=True, verbose_name="Plan de ejecución")
+    escaneo_completo = models.BooleanField(
+        default=False,
+        verbose_name="Recorre la tabla",
+        help_text="El plan recorre una tabla entera: probablemente falta un índice"
+    )
+    llamadas = models.PositiveIntegerField(default=0, verbose_name="Llamadas lentas")
+    duraciones = models.JSONField(default=list, verbose_name="Últimas duraciones (ms)")
+    p95_ms = models.FloatField(default=0, verbose_name="p95 (ms)")
+    max_ms = models.FloatField(default=0, verbose_name="Máximo (ms)")
+    primera_vez = models.DateTimeField(auto_now_add=True, verbose_name="Primera vez")
+    ultima_vez = models.DateTimeField(auto_now=True, verbose_name="Última vez")
+
+    class Meta:
+        verbose_name = "Consulta Lenta"
+        verbose_name_plural = "Consultas Lentas"
+        ordering = ['-p95_ms']
+        indexes = [
+            models.Index(fields=['ultima_vez'], name='consulta_lenta_ultima_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sql[:80]} (p95 {self.p95_ms:.0f} ms)"
@@ -0,0 +1,31 @@
+from django.db import models
+
+
+class EventoEjemplar(models.Model):
+    """
+    Cambio de estado de un ejemplar (préstamo, devolución, edición, alta o baja).
+    Se escribe en la misma transacción que el cambio y las pantallas abiertas lo
+    reciben por Server-Sent Events, leyendo por id (ver eventos.py).
+    """
+    fecha = models.DateTimeField(auto_now_add=True, verbose_name="Fecha")
+    libro = models.ForeignKey(
+        'Libro',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Libro"
+    )
+    codigo_ejemplar = models.CharField(max_length=50, verbose_name="Código de Ejemplar")
+    estado = models.CharField(max_length=20, verbose_name="Estado")
+    activo = models.BooleanField(verbose_name="Activo")
+    disponibles = models.PositiveIntegerField(
+        verbose_name="Disponibles",
+        help_text="Ejemplares disponibles del libro después del cambio"
+    )
+
+    class Meta:
+        verbose_name = "Evento de Ejemplar"
+        verbose_name_plural = "Eventos de Ejemplares"
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.id} {self.codigo_ejemplar}: {self.estado}"
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+
+from .managers import ActivoManager, VersionadoManager
 
 
 class Libro(models.Model):
@@ -6,6 +8,12 @@ class Libro(models.Model):
     Representa un libro en el catálogo de la biblioteca.
     El ISBN es único y sirve como identificador principal.
     """
+    CATEGORIAS = [
+        ('general', 'General'),
+        ('referencia', 'Obra de Referencia'),
+        ('novedad', 'Novedad'),
+    ]
+    
     isbn = models.CharField(
         max_length=13, 
         unique=True, 
@@ -17,16 +25,38 @@ class Libro(models.Model):
     autor = models.CharField(max_length=100, verbose_name="Autor")
     editorial = models.CharField(max_length=100, blank=True, null=True)
     año_publicacion = models.IntegerField(blank=True, null=True)
+    categoria = models.CharField(
+        max_length=20,
+        choices=CATEGORIAS,
+        default='general',
+        verbose_name="Categoría",
+        help_text="Determina las condiciones de préstamo (ver Políticas de Préstamo)"
+    )
     activo = models.BooleanField(
         default=True,
         verbose_name="Activo",
         help_text="Indica si el libro está activo en el sistema (soft delete)"
     )
+
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name="Última Actualización",
+        help_text="Versión de la fila: las claves de los fragmentos cacheados la incluyen"
+    )
+    
+    objects = ActivoManager()
+    objects_all = VersionadoManager()
     
     class Meta:
         verbose_name = "Libro"
         verbose_name_plural = "Libros"
         ordering = ['titulo']
+        default_manager_name = 'objects_all'
+        indexes = [
+            # Índices parciales: solo las filas activas, que son las que se listan
+            models.Index(fields=['titulo'], condition=models.Q(activo=True), name='libro_activo_titulo_idx'),
+        ]
     
     def __str__(self):
         return f"{self.titulo} - {self.autor} (ISBN: {self.isbn})"
@@ -36,11 +66,20 @@ class Libro(models.Model):
         return self.ejemplares.filter(estado='disponible', activo=True).count()
     
     def dar_de_baja(self):
-        """Marca el libro como inactivo (soft delete)"""
-        self.activo = False
-        self.save()
-        # También damos de baja todos los ejemplares del libro
-        self.ejemplares.filter(activo=True).update(activo=False)
+        """
+        Marca el libro y todos sus ejemplares como inactivos (soft delete), en una transacción.
+        
+        Returns:
+            list: los ejemplares que estaban activos, ya con activo=False (para publicar sus eventos)
+        """
+        with transaction.atomic():
+            self.activo = False
+            self.save(update_fields=['activo', 'fecha_actualizacion'])
+            ejemplares = list(self.ejemplares.filter(activo=True))
+            self.ejemplares.filter(pk__in=[ejemplar.pk for ejemplar in ejemplares]).update(activo=False)
+            for ejemplar in ejemplares:
+                ejemplar.activo = False
+        return ejemplares
     
     def reactivar(self):
         """Reactiva el libro"""
@@ -56,6 +95,7 @@ class Ejemplar(models.Model):
     ESTADOS = [
         ('disponible', 'Disponible'),
         ('prestado', 'Prestado'),
+        ('reservado', 'Reservado'),
         ('mantenimiento', 'En Mantenimiento'),
         ('perdido', 'Perdido'),
     ]
@@ -88,11 +128,27 @@ class Ejemplar(models.Model):
         verbose_name="Activo",
         help_text="Indica si el ejemplar está activo en el sistema (soft delete)"
     )
+
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name="Última Actualización",
+        help_text="Versión de la fila: las claves de los fragmentos cacheados la incluyen"
+    )
+    
+    objects = ActivoManager()
+    objects_all = VersionadoManager()
     
     class Meta:
         verbose_name = "Ejemplar"
         verbose_name_plural = "Ejemplares"
         ordering = ['libro', 'codigo_ejemplar']
+        default_manager_name = 'objects_all'
+        indexes = [
+            # Ejemplares disponibles de un libro y conteo por estado (solo activos)
+            models.Index(fields=['libro', 'estado'], condition=models.Q(activo=True), name='ejemplar_activo_libro_idx'),
+            models.Index(fields=['estado'], condition=models.Q(activo=True), name='ejemplar_activo_estado_idx'),
+        ]
     
     def __str__(self):
         return f"{self.libro.titulo} - Ejemplar {self.codigo_ejemplar} ({self.get_estado_display()})"
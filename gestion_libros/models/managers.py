@@ -0,0 +1,32 @@
+from django.db import models
+from django.utils import timezone
+
+
+class VersionadoQuerySet(models.QuerySet):
+    """
+    QuerySet de los modelos con `fecha_actualizacion`. `save()` la actualiza
+    solo (auto_now), pero `update()` no pasa por save(): acá se agrega al
+    UPDATE, así una baja masiva o un cambio de estado también invalida los
+    fragmentos cacheados de esas filas (ver gestion_libros/fragmentos.py).
+    """
+
+    def update(self, **kwargs):
+        kwargs.setdefault('fecha_actualizacion', timezone.now())
+        return super().update(**kwargs)
+
+    update.alters_data = True
+
+
+VersionadoManager = models.Manager.from_queryset(VersionadoQuerySet)
+
+
+class ActivoManager(VersionadoManager):
+    """
+    Manager que solo devuelve las filas activas (las dadas de baja quedan afuera).
+    Se usa como `objects` en Libro, Ejemplar y Socio; para ver también las
+    inactivas está `objects_all`, que además es el manager por defecto del
+    modelo (admin, relaciones inversas, dumpdata), así Django no pierde filas.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(activo=True)
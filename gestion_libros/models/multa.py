@@ -60,10 +60,17 @@ class Multa(models.Model):
         verbose_name="Fecha de Pago"
     )
     
+    # Las filas viejas se mueven a MultaArchivada (ver archivo.py)
+    archivado = False
+    
     class Meta:
         verbose_name = "Multa"
         verbose_name_plural = "Multas"
         ordering = ['-fecha']
+        indexes = [
+            # Último pago, para el ETag de los listados (ver cache_http.py)
+            models.Index(fields=['fecha_pago'], name='multa_pago_idx'),
+        ]
     
     def __str__(self):
         estado = "Pagada" if self.pagada else "Pendiente"
@@ -0,0 +1,66 @@
+from django.db import models
+
+
+class Notificacion(models.Model):
+    """
+    Correo pendiente de enviar a un socio (outbox). Se escribe en la misma
+    transacción que el movimiento que lo origina (ejemplar apartado por una
+    reserva, multa): si la transacción se deshace, el aviso tampoco existe.
+    `python manage.py procesar_outbox` los envía (ver notificaciones.py): el
+    request no espera al servidor de correo.
+    """
+    TIPOS = [
+        ('reserva_asignada', 'Ejemplar Apartado por Reserva'),
+        ('multa', 'Multa Generada'),
+    ]
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('enviada', 'Enviada'),
+        ('fallida', 'Fallida'),
+    ]
+
+    clave = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name="Clave",
+        help_text="Identifica el aviso (tipo y fila que lo origina): el mismo aviso no se encola dos veces"
+    )
+    tipo = models.CharField(max_length=30, choices=TIPOS, verbose_name="Tipo")
+    socio = models.ForeignKey(
+        'Socio',
+        on_delete=models.CASCADE,
+        related_name='notificaciones',
+        verbose_name="Socio"
+    )
+    destinatario = models.EmailField(verbose_name="Destinatario")
+    datos = models.JSONField(
+        default=dict,
+        verbose_name="Datos",
+        help_text="Contexto de la plantilla del correo, tomado al momento del movimiento"
+    )
+    fecha = models.DateTimeField(auto_now_add=True, verbose_name="Fecha")
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADOS,
+        default='pendiente',
+        verbose_name="Estado"
+    )
+    intentos = models.PositiveIntegerField(default=0, verbose_name="Intentos")
+    proximo_intento = models.DateTimeField(
+        verbose_name="Próximo Intento",
+        help_text="No se envía antes: espera entre reintentos y reclamo de un worker en curso"
+    )
+    fecha_envio = models.DateTimeField(blank=True, null=True, verbose_name="Fecha de Envío")
+    error = models.TextField(blank=True, default='', verbose_name="Último Error")
+
+    class Meta:
+        verbose_name = "Notificación"
+        verbose_name_plural = "Notificaciones"
+        ordering = ['id']
+        indexes = [
+            # Lo que el worker tiene que enviar ahora: no recorre las ya enviadas
+            models.Index(fields=['proximo_intento', 'id'], condition=models.Q(estado='pendiente'), name='notificacion_pendiente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} a {self.destinatario} ({self.get_estado_display()})"
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.db import models
+
+
+class Perfil(models.Model):
+    """
+    Request perfilado a pedido de un usuario staff (ver perfilador.py).
+    Los datos del perfil quedan en PERFILES_DIR: `<archivo>.prof` (pstats de
+    cProfile) y `<archivo>.collapsed` (pilas muestreadas, para flamegraph.pl
+    o speedscope).
+    """
+    fecha = models.DateTimeField(auto_now_add=True, verbose_name="Fecha")
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='perfiles',
+        verbose_name="Usuario"
+    )
+    metodo = models.CharField(max_length=10, verbose_name="Método")
+    url = models.CharField(max_length=500, verbose_name="URL")
+    estado = models.PositiveSmallIntegerField(verbose_name="Código HTTP")
+    duracion_ms = models.FloatField(verbose_name="Duración (ms)")
+    consultas = models.PositiveIntegerField(verbose_name="Consultas SQL")
+    tiempo_db_ms = models.FloatField(verbose_name="Tiempo en base (ms)")
+    muestras = models.PositiveIntegerField(default=0, verbose_name="Muestras de pila")
+    archivo = models.CharField(max_length=100, verbose_name="Archivo")
+
+    class Meta:
+        verbose_name = "Perfil de Request"
+        verbose_name_plural = "Perfiles de Requests"
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"{self.metodo} {self.url} ({self.duracion_ms:.0f} ms)"
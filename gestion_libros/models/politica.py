@@ -0,0 +1,87 @@
+from django.db import models, transaction
+from django.core.validators import MinValueValidator
+
+from .libro import Libro
+from .socio import Socio
+
+
+class PoliticaPrestamo(models.Model):
+    """
+    Regla de préstamo para una combinación de categoría de libro y de socio.
+    Una categoría vacía significa "todas". Los campos vacíos heredan el valor
+    de una regla más general o, en último caso, de la Configuración global.
+    """
+    categoria_libro = models.CharField(
+        max_length=20,
+        choices=Libro.CATEGORIAS,
+        blank=True,
+        verbose_name="Categoría de Libro",
+        help_text="Vacío = todas las categorías"
+    )
+    categoria_socio = models.CharField(
+        max_length=20,
+        choices=Socio.CATEGORIAS,
+        blank=True,
+        verbose_name="Categoría de Socio",
+        help_text="Vacío = todas las categorías"
+    )
+    dias_prestamo = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(1)],
+        verbose_name="Días de Préstamo"
+    )
+    max_prestamos_simultaneos = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(1)],
+        verbose_name="Máximo de Préstamos Simultáneos"
+    )
+    tasa_multa_diaria = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(0)],
+        verbose_name="Tasa de Multa Diaria"
+    )
+    permite_prestamo = models.BooleanField(
+        blank=True,
+        null=True,
+        verbose_name="Permite Préstamo",
+        help_text="No = obras de consulta en sala. Vacío = heredar"
+    )
+
+    class Meta:
+        verbose_name = "Política de Préstamo"
+        verbose_name_plural = "Políticas de Préstamo"
+        ordering = ['categoria_libro', 'categoria_socio']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['categoria_libro', 'categoria_socio'],
+                name='politica_unica_por_categorias'
+            ),
+        ]
+
+    def __str__(self):
+        libro = self.get_categoria_libro_display() or 'Todos los libros'
+        socio = self.get_categoria_socio_display() or 'todos los socios'
+        return f"{libro} / {socio}"
+
+    def save(self, *args, **kwargs):
+        """Cada cambio genera una nueva versión de la configuración (la tabla se recompila)"""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._nueva_version_configuracion()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            resultado = super().delete(*args, **kwargs)
+            self._nueva_version_configuracion()
+        return resultado
+
+    @staticmethod
+    def _nueva_version_configuracion():
+        from .configuracion import Configuracion
+
+        Configuracion.objects.get_or_create(pk=1)[0].save()
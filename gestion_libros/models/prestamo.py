@@ -38,10 +38,17 @@ class Prestamo(models.Model):
         help_text="Observaciones sobre el préstamo o devolución"
     )
     
+    # Las filas viejas se mueven a PrestamoArchivado (ver archivo.py)
+    archivado = False
+    
     class Meta:
         verbose_name = "Préstamo"
         verbose_name_plural = "Préstamos"
         ordering = ['-fecha_inicio']
+        indexes = [
+            # Préstamos activos (IS NULL) y última devolución, para el ETag de los listados
+            models.Index(fields=['fecha_devolucion_real'], name='prestamo_devolucion_idx'),
+        ]
     
     def __str__(self):
         estado = "Devuelto" if self.fecha_devolucion_real else "Activo"
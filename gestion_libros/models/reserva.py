@@ -0,0 +1,97 @@
+from django.db import models
+
+from .managers import VersionadoManager
+
+
+class Reserva(models.Model):
+    """
+    Pedido de un socio por un libro sin ejemplares disponibles.
+    Las reservas en espera de cada libro forman una cola por orden de llegada:
+    cuando un ejemplar vuelve a circular (devolución, reparación, alta) se
+    aparta para la primera (ver circulacion.asignar_reserva) y solo ese socio
+    puede llevárselo.
+    """
+    ESTADOS = [
+        ('pendiente', 'En Espera'),
+        ('asignada', 'Ejemplar Apartado'),
+        ('cumplida', 'Cumplida'),
+        ('cancelada', 'Cancelada'),
+    ]
+    ACTIVAS = ('pendiente', 'asignada')
+
+    socio = models.ForeignKey(
+        'Socio',
+        on_delete=models.CASCADE,
+        related_name='reservas',
+        verbose_name="Socio"
+    )
+    libro = models.ForeignKey(
+        'Libro',
+        on_delete=models.CASCADE,
+        related_name='reservas',
+        verbose_name="Libro"
+    )
+    fecha = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Fecha de Reserva",
+        help_text="Orden en la cola del libro"
+    )
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADOS,
+        default='pendiente',
+        verbose_name="Estado"
+    )
+    ejemplar = models.ForeignKey(
+        'Ejemplar',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='reservas',
+        verbose_name="Ejemplar Apartado"
+    )
+    fecha_asignacion = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Fecha de Asignación"
+    )
+
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name="Última Actualización",
+        help_text="Versión de la fila (ETag del listado de reservas)"
+    )
+
+    objects = VersionadoManager()
+
+    class Meta:
+        verbose_name = "Reserva"
+        verbose_name_plural = "Reservas"
+        ordering = ['fecha', 'id']
+        indexes = [
+            # Cabeza de la cola de un libro: una lectura del índice, sin recorrer las reservas viejas
+            models.Index(fields=['libro', 'fecha', 'id'], condition=models.Q(estado='pendiente'), name='reserva_cola_idx'),
+            # La reserva que apartó un ejemplar (al prestarlo o cancelarla)
+            models.Index(fields=['ejemplar'], condition=models.Q(estado='asignada'), name='reserva_asignada_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['socio', 'libro'],
+                condition=models.Q(estado__in=['pendiente', 'asignada']),
+                name='reserva_activa_unica',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.socio.nombre} - {self.libro.titulo} ({self.get_estado_display()})"
+
+    def esta_activa(self):
+        return self.estado in self.ACTIVAS
+
+    def posicion(self):
+        """Lugar en la cola del libro (1: la próxima en recibir un ejemplar)"""
+        anteriores = Reserva.objects.filter(libro_id=self.libro_id, estado='pendiente').filter(
+            models.Q(fecha__lt=self.fecha) | models.Q(fecha=self.fecha, id__lt=self.id)
+        )
+        return anteriores.count() + 1
@@ -1,11 +1,19 @@
 from django.db import models
 
+from .managers import ActivoManager, VersionadoManager
+
 
 class Socio(models.Model):
     """
     Representa un socio/miembro de la biblioteca.
     El DNI es único y sirve como identificador principal.
     """
+    CATEGORIAS = [
+        ('estandar', 'Estándar'),
+        ('estudiante', 'Estudiante'),
+        ('investigador', 'Investigador'),
+    ]
+    
     dni = models.CharField(
         max_length=10, 
         unique=True,
@@ -31,11 +39,32 @@ class Socio(models.Model):
         verbose_name="Activo",
         help_text="Indica si el socio puede realizar préstamos"
     )
+    categoria = models.CharField(
+        max_length=20,
+        choices=CATEGORIAS,
+        default='estandar',
+        verbose_name="Categoría",
+        help_text="Determina las condiciones de préstamo (ver Políticas de Préstamo)"
+    )
+
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name="Última Actualización",
+        help_text="Versión de la fila: las claves de los fragmentos cacheados la incluyen"
+    )
+    
+    objects = ActivoManager()
+    objects_all = VersionadoManager()
     
     class Meta:
         verbose_name = "Socio"
         verbose_name_plural = "Socios"
         ordering = ['nombre']
+        default_manager_name = 'objects_all'
+        indexes = [
+            models.Index(fields=['nombre'], condition=models.Q(activo=True), name='socio_activo_nombre_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} (DNI: {self.dni} - Socio: {self.numero_socio})"
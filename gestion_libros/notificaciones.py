@@ -0,0 +1,217 @@
+"""
+Avisos por correo a los socios, con un outbox transaccional.
+
+Los movimientos de circulación no mandan correos: escriben una Notificacion
+en la misma transacción (encolar) y `python manage.py procesar_outbox` los
+envía después. Así el mostrador no espera al servidor de correo, un correo
+caído no frena un préstamo, y si la transacción se deshace el aviso tampoco
+existe.
+
+    Ejemplar apartado por una reserva    circulacion.asignar_reserva
+    Multa generada en una devolución     circulacion.registrar_devolucion
+
+El worker toma los avisos vencidos en lotes (reclamar): los corre
+NOTIFICACIONES_RECLAMO segundos hacia adelante para que otro worker no los
+tome mientras se envían, los manda por una sola conexión del backend de
+correo (EMAIL_BACKEND) y registra el resultado. Un lote puede tardar más que
+el reclamo (cada envío hasta EMAIL_TIMEOUT): antes de cada correo, si el
+reclamo podría vencer durante el envío, se extiende para los que faltan. Un envío fallido se reintenta
+con espera exponencial desde NOTIFICACIONES_ESPERA_INICIAL hasta
+NOTIFICACIONES_REINTENTOS veces; después queda "fallida" (se puede reintentar
+desde el admin).
+
+Idempotencia: la clave única (tipo e id de la fila que lo origina) impide
+encolar dos veces el mismo aviso, y un aviso enviado no se vuelve a tomar. Si
+el worker se corta entre el envío y el registro, el aviso se manda de nuevo
+al vencer el reclamo, con el mismo Message-ID: el servidor o el cliente de
+correo lo reconocen como duplicado.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.utils import DNS_NAME
+from django.db.models import F
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .db import bloquear, con_reintentos
+from .metricas import NOTIFICACIONES
+from .models import Notificacion
+
+
+# tipo: (asunto, plantilla del cuerpo); el asunto se completa con los datos del aviso
+CORREOS = {
+    'reserva_asignada': (
+        'Tu reserva de "{titulo}" está lista para retirar',
+        'gestion_libros/correos/reserva_asignada.txt',
+    ),
+    'multa': (
+        'Se registró una multa por {motivo}',
+        'gestion_libros/correos/multa.txt',
+    ),
+}
+
+
+def encolar(avisos):
+    """
+    Agrega los avisos [(clave, tipo, socio, datos)] al outbox con un solo
+    INSERT. Se llama dentro de la transacción del movimiento. Los socios sin
+    email no reciben avisos y una clave ya encolada se ignora.
+    """
+    ahora = timezone.now()
+    filas = [
+        Notificacion(
+            clave=clave, tipo=tipo, socio=socio, destinatario=socio.email, datos=datos, proximo_intento=ahora
+        )
+        for clave, tipo, socio, datos in avisos
+        if socio.email
+    ]
+    if filas:
+        Notificacion.objects.bulk_create(filas, ignore_conflicts=True)
+
+
+def reserva_asignada(reserva, ejemplar):
+    """El ejemplar quedó apartado para la reserva: el socio puede pasar a retirarlo"""
+    encolar([(
+        f'reserva_asignada:{reserva.pk}',
+        'reserva_asignada',
+        reserva.socio,
+        {
+            'nombre': reserva.socio.nombre,
+            'titulo': ejemplar.libro.titulo,
+            'codigo_ejemplar': ejemplar.codigo_ejemplar,
+        },
+    )])
+
+
+def multas_generadas(prestamo, multas):
+    """Las multas que generó la devolución del préstamo (las None se omiten)"""
+    encolar([
+        (
+            f'multa:{multa.pk}',
+            'multa',
+            prestamo.socio,
+            {
+                'nombre': prestamo.socio.nombre,
+                'motivo': multa.get_motivo_display(),
+                'monto': str(multa.monto),
+                'descripcion': multa.descripcion,
+            },
+        )
+        for multa in multas
+        if multa
+    ])
+
+
+@con_reintentos
+def reclamar(lote):
+    """
+    Los primeros `lote` avisos pendientes y vencidos. Se corren
+    NOTIFICACIONES_RECLAMO segundos: si el worker se corta, se vuelven a tomar
+    después; mientras tanto, otro worker no los toma.
+    """
+    vencidos = Notificacion.objects.filter(estado='pendiente', proximo_intento__lte=timezone.now())
+    avisos = list(bloquear(vencidos.order_by('proximo_intento', 'id'), saltear_bloqueadas=True)[:lote])
+    extender_reclamo(avisos)
+    return avisos
+
+
+@con_reintentos
+def extender_reclamo(avisos):
+    """Corre el próximo intento de los avisos NOTIFICACIONES_RECLAMO segundos desde ahora"""
+    Notificacion.objects.filter(pk__in=[aviso.pk for aviso in avisos], estado='pendiente').update(
+        proximo_intento=timezone.now() + timedelta(seconds=settings.NOTIFICACIONES_RECLAMO)
+    )
+
+
+def mensaje(aviso, plantillas):
+    """El correo del aviso; `plantillas` guarda las plantillas ya cargadas por tipo"""
+    asunto, nombre_plantilla = CORREOS[aviso.tipo]
+    if aviso.tipo not in plantillas:
+        plantillas[aviso.tipo] = get_template(nombre_plantilla)
+    return EmailMessage(
+        subject=asunto.format(**aviso.datos),
+        body=plantillas[aviso.tipo].render(aviso.datos),
+        to=[aviso.destinatario],
+        # El mismo en cada reintento: un reenvío se reconoce como duplicado
+        headers={'Message-ID': f'<notificacion-{aviso.pk}@{DNS_NAME}>'},
+    )
+
+
+def entregar(avisos):
+    """
+    Envía los avisos por una sola conexión del backend de correo.
+
+    Returns:
+        tuple (enviados, fallidos): los avisos enviados y [(aviso, error)]
+    """
+    enviados, fallidos = [], []
+    plantillas = {}
+    vence = time.monotonic() + settings.NOTIFICACIONES_RECLAMO
+    try:
+        with get_connection() as conexion:
+            for posicion, aviso in enumerate(avisos):
+                # Otro worker no debe tomar los que faltan mientras este envío espera al servidor
+                if time.monotonic() + (settings.EMAIL_TIMEOUT or 0) >= vence:
+                    extender_reclamo(avisos[posicion:])
+                    vence = time.monotonic() + settings.NOTIFICACIONES_RECLAMO
+                try:
+                    conexion.send_messages([mensaje(aviso, plantillas)])
+                except Exception as error:
+                    fallidos.append((aviso, error))
+                else:
+                    enviados.append(aviso)
+    except Exception as error:
+        # No se pudo abrir o cerrar la conexión: lo que no salió se reintenta
+        resueltos = {aviso.pk for aviso in enviados} | {aviso.pk for aviso, _ in fallidos}
+        fallidos += [(aviso, error) for aviso in avisos if aviso.pk not in resueltos]
+    return enviados, fallidos
+
+
+def espera(intentos):
+    """Segundos hasta el próximo intento después de `intentos` fallidos"""
+    return settings.NOTIFICACIONES_ESPERA_INICIAL * 2 ** (intentos - 1)
+
+
+@con_reintentos
+def registrar_resultados(enviados, fallidos):
+    """Marca los enviados y reprograma (o da por fallidos) los que no se pudieron enviar"""
+    ahora = timezone.now()
+    Notificacion.objects.filter(pk__in=[aviso.pk for aviso in enviados], estado='pendiente').update(
+        estado='enviada', fecha_envio=ahora, intentos=F('intentos') + 1, error=''
+    )
+    # Los fallidos son la excepción: uno por uno, cada uno con su cantidad de intentos
+    for aviso, error in fallidos:
+        aviso.intentos += 1
+        if aviso.intentos >= settings.NOTIFICACIONES_REINTENTOS:
+            aviso.estado = 'fallida'
+        else:
+            aviso.proximo_intento = ahora + timedelta(seconds=espera(aviso.intentos))
+        aviso.error = f'{type(error).__name__}: {error}'
+        aviso.save(update_fields=['estado', 'intentos', 'proximo_intento', 'error'])
+
+
+def procesar(lote=None):
+    """
+    Envía un lote de avisos vencidos y registra el resultado.
+
+    Returns:
+        tuple (enviados, reintentos, fallidos): cantidades del lote
+    """
+    avisos = reclamar(lote or settings.NOTIFICACIONES_LOTE)
+    if not avisos:
+        return 0, 0, 0
+    enviados, fallidos = entregar(avisos)
+    registrar_resultados(enviados, fallidos)
+
+    agotados = sum(1 for aviso, _ in fallidos if aviso.estado == 'fallida')
+    resultado = (len(enviados), len(fallidos) - agotados, agotados)
+    NOTIFICACIONES.inc_lote([
+        ({'resultado': nombre}, cantidad)
+        for nombre, cantidad in zip(('enviada', 'reintento', 'fallida'), resultado)
+        if cantidad
+    ])
+    return resultado
@@ -0,0 +1,125 @@
+"""
+Perfilado a pedido de requests de producción.
+
+Un usuario staff agrega `?perfilar=1` a la URL (o el header `X-Perfilar: 1`) y
+ese request corre bajo cProfile mientras un hilo muestrea su pila cada
+PERFILADOR_INTERVALO segundos. Se guardan en PERFILES_DIR:
+
+  - `<archivo>.prof`: estadísticas de cProfile (python -m pstats, snakeviz)
+  - `<archivo>.collapsed`: pilas muestreadas en formato "a;b;c cantidad",
+    listas para flamegraph.pl o speedscope
+
+y un registro Perfil con la URL, el usuario, la duración y las consultas SQL,
+que se ve en el admin. La respuesta lleva el header X-Perfil con su id.
+"""
+
+import cProfile
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .instrumentacion import Medicion, medir_consultas
+from .models import Perfil
+
+
+class MuestreadorPila(threading.Thread):
+    """Toma la pila de un hilo cada `intervalo` segundos y cuenta cada pila distinta"""
+
+    def __init__(self, hilo_id, intervalo):
+        super().__init__(daemon=True)
+        self.hilo_id = hilo_id
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self._detener = threading.Event()
+
+    def run(self):
+        while not self._detener.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo_id)
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append(f'{codigo.co_name} ({Path(codigo.co_filename).name}:{codigo.co_firstlineno})')
+                frame = frame.f_back
+            if pila:
+                self.pilas[';'.join(reversed(pila))] += 1
+
+    def detener(self):
+        self._detener.set()
+        self.join()
+
+
+def pide_perfil(request):
+    """El request pide ser perfilado y lo hace un usuario staff"""
+    pedido = request.GET.get('perfilar') == '1' or request.headers.get('X-Perfilar') == '1'
+    return pedido and request.user.is_staff
+
+
+class PerfiladorMiddleware:
+    """
+    Va después de AuthenticationMiddleware (necesita request.user).
+    El muestreador sigue al hilo del request: con ASGI (modo async) los requests
+    no tienen un hilo propio y no se perfilan; se perfila con runserver o WSGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERFILADOR_ACTIVO:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.get_response(request)
+        if not pide_perfil(request):
+            return self.get_response(request)
+
+        medicion = Medicion()
+        perfil = cProfile.Profile()
+        muestreador = MuestreadorPila(threading.get_ident(), settings.PERFILADOR_INTERVALO)
+        muestreador.start()
+        try:
+            with medir_consultas(medicion):
+                response = perfil.runcall(self.get_response, request)
+        finally:
+            muestreador.detener()
+        duracion = time.perf_counter() - medicion.inicio
+
+        registro = guardar_perfil(request, response, perfil, muestreador.pilas, medicion, duracion)
+        response['X-Perfil'] = str(registro.id)
+        return response
+
+
+def guardar_perfil(request, response, perfil, pilas, medicion, duracion):
+    """Escribe los archivos del perfil y crea su registro"""
+    directorio = Path(settings.PERFILES_DIR)
+    directorio.mkdir(parents=True, exist_ok=True)
+    archivo = f"{timezone.now():%Y%m%d-%H%M%S-%f}-{slugify(request.path)[:50] or 'inicio'}"
+
+    perfil.dump_stats(directorio / f'{archivo}.prof')
+    with open(directorio / f'{archivo}.collapsed', 'w', encoding='utf-8') as salida:
+        for pila, cantidad in pilas.most_common():
+            salida.write(f'{pila} {cantidad}\n')
+
+    return Perfil.objects.create(
+        usuario=request.user,
+        metodo=request.method,
+        url=request.get_full_path()[:500],
+        estado=response.status_code,
+        duracion_ms=duracion * 1000,
+        consultas=medicion.consultas,
+        tiempo_db_ms=medicion.tiempo_db * 1000,
+        muestras=sum(pilas.values()),
+        archivo=archivo,
+    )
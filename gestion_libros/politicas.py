@@ -0,0 +1,59 @@
+"""
+Motor de políticas de préstamo por categoría de libro y de socio.
+
+Las reglas (modelo PoliticaPrestamo) se compilan en una tabla con una entrada
+por cada combinación de categorías, ya resuelta. Así, al prestar o devolver,
+obtener las condiciones es una búsqueda en un diccionario, sin consultas extra.
+"""
+
+from collections import namedtuple
+from decimal import Decimal
+from itertools import product
+
+from .models import Libro, Socio
+
+
+class TerminosPrestamo(namedtuple('TerminosPrestamo', [
+        'dias_prestamo', 'max_prestamos_simultaneos', 'tasa_multa_diaria', 'permite_prestamo'])):
+    """Condiciones de préstamo ya resueltas para una combinación de categorías"""
+    __slots__ = ()
+
+    def calcular_multa_retraso(self, dias_retraso):
+        return self.tasa_multa_diaria * dias_retraso
+
+
+def compilar_politicas(valores, politicas):
+    """
+    Resuelve las reglas para cada (categoría de libro, categoría de socio).
+
+    Orden de precedencia (la última gana, campo por campo):
+      1. Configuración global
+      2. Regla para todos los libros y todos los socios
+      3. Regla por categoría de libro
+      4. Regla por categoría de socio
+      5. Regla para la combinación exacta
+    Un campo vacío en una regla no pisa el valor anterior.
+    """
+    base = TerminosPrestamo(
+        dias_prestamo=valores['dias_prestamo_default'],
+        max_prestamos_simultaneos=valores['max_prestamos_simultaneos'],
+        tasa_multa_diaria=Decimal(valores['tasa_multa_diaria_sugerida']),
+        permite_prestamo=True,
+    )
+    reglas = {(p['categoria_libro'], p['categoria_socio']): p for p in politicas}
+
+    tabla = {}
+    for categoria_libro, categoria_socio in product(
+            (c for c, _ in Libro.CATEGORIAS), (c for c, _ in Socio.CATEGORIAS)):
+        terminos = base
+        for clave in [('', ''), (categoria_libro, ''), ('', categoria_socio),
+                      (categoria_libro, categoria_socio)]:
+            regla = reglas.get(clave)
+            if regla is not None:
+                terminos = terminos._replace(**{
+                    campo: valor for campo, valor in regla.items()
+                    if campo in TerminosPrestamo._fields and valor is not None
+                })
+        tabla[(categoria_libro, categoria_socio)] = terminos
+
+    return base, tabla
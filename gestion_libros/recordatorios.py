@@ -0,0 +1,193 @@
+"""
+Recordatorios de devolución: un correo por socio con sus préstamos vencidos y
+los que vencen en los próximos días (`python manage.py enviar_recordatorios`,
+una vez por día desde cron).
+
+Pensado para decenas de miles de recordatorios por corrida:
+  - una sola consulta, ordenada por socio y leída por partes (iterator): los
+    préstamos de cada socio llegan juntos y se agrupan sin cargar todo en memoria
+  - la plantilla se carga una vez y se reutiliza para cada correo
+  - los correos salen por una sola conexión al servidor (get_connection), en
+    lotes de RECORDATORIOS_LOTE; dentro del lote se envían de a uno, así un
+    error cuenta como fallido solo ese correo (una dirección rechazada no
+    frena a los demás socios)
+  - si el error es de la conexión (el servidor la cortó), se reabre y se
+    reintenta el mismo correo una vez; si no se puede reabrir o vuelve a
+    cortarse, lo que falta cuenta como fallido (las métricas se registran igual)
+
+A diferencia de los avisos del outbox (notificaciones.py), no se guarda nada
+por correo: la corrida del día siguiente vuelve a recordar lo que sigue sin
+devolver.
+"""
+
+import smtplib
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .metricas import RECORDATORIOS
+from .models import Prestamo
+
+
+PLANTILLA = 'gestion_libros/correos/recordatorio.txt'
+
+CAMPOS = (
+    'socio_id', 'socio__nombre', 'socio__email',
+    'ejemplar__codigo_ejemplar', 'ejemplar__libro__titulo', 'fecha_devolucion_prevista',
+)
+
+
+def prestamos_a_recordar(hoy, dias_antes):
+    """Préstamos activos que vencen hasta `dias_antes` días después de hoy, de socios con email, por socio"""
+    return Prestamo.objects.filter(
+        fecha_devolucion_real__isnull=True,
+        fecha_devolucion_prevista__lte=hoy + timedelta(days=dias_antes),
+        socio__activo=True,
+        socio__email__isnull=False,
+    ).exclude(socio__email='').order_by('socio_id', 'fecha_devolucion_prevista', 'id').values(*CAMPOS)
+
+
+def resumenes(prestamos, hoy):
+    """Un resumen por socio: (email, contexto de la plantilla, cantidad de préstamos)"""
+    for _, filas in groupby(prestamos, key=itemgetter('socio_id')):
+        filas = list(filas)
+        vencidos, por_vencer = [], []
+        for fila in filas:
+            dias = (fila['fecha_devolucion_prevista'] - hoy).days
+            prestamo = {
+                'titulo': fila['ejemplar__libro__titulo'],
+                'codigo_ejemplar': fila['ejemplar__codigo_ejemplar'],
+                'vence': fila['fecha_devolucion_prevista'].strftime('%d/%m/%Y'),
+                'dias': abs(dias),
+            }
+            (vencidos if dias < 0 else por_vencer).append(prestamo)
+        contexto = {'nombre': filas[0]['socio__nombre'], 'vencidos': vencidos, 'por_vencer': por_vencer}
+        yield filas[0]['socio__email'], contexto, len(filas)
+
+
+def asunto(contexto):
+    if contexto['vencidos']:
+        return f'Tenés {len(contexto["vencidos"])} préstamo(s) vencido(s) para devolver'
+    return 'Recordatorio: tenés préstamos que vencen pronto'
+
+
+def mensajes(resumenes_socios, plantilla):
+    """(correo, cantidad de préstamos) de cada resumen, con la plantilla ya cargada"""
+    for email, contexto, cantidad in resumenes_socios:
+        yield EmailMessage(subject=asunto(contexto), body=plantilla.render(contexto), to=[email]), cantidad
+
+
+def lotes(elementos, tamaño):
+    """Agrupa los elementos en listas de hasta `tamaño`, a medida que llegan"""
+    lote = []
+    for elemento in elementos:
+        lote.append(elemento)
+        if len(lote) == tamaño:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def abrir(conexion):
+    """Abre (o reabre) la conexión al servidor de correo; None si no responde"""
+    try:
+        conexion.close()
+        conexion.open()
+    except Exception:
+        return None
+    return conexion
+
+
+def error_de_conexion(error):
+    """Si el error es de la conexión (hay que reabrirla) y no del correo (ej: una dirección rechazada)"""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    # SMTPException también es OSError: solo cuentan los errores del socket
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def enviar(conexion, mensaje):
+    """
+    Envía un correo; si se cortó la conexión la reabre y lo reintenta una vez.
+
+    Returns:
+        tuple (enviado, conexion): la conexión queda en None si no se pudo
+        reabrir o se volvió a cortar
+    """
+    try:
+        conexion.send_messages([mensaje])
+        return True, conexion
+    except Exception as error:
+        if not error_de_conexion(error):
+            return False, conexion
+    conexion = abrir(conexion)
+    if conexion is None:
+        return False, None
+    try:
+        conexion.send_messages([mensaje])
+        return True, conexion
+    except Exception as error:
+        return False, None if error_de_conexion(error) else conexion
+
+
+def enviar_lote(conexion, lote):
+    """
+    Envía los correos del lote de a uno por la conexión abierta.
+
+    Returns:
+        tuple (enviados, prestamos, conexion): la conexión queda en None si se
+        perdió; los correos que no salieron son len(lote) - enviados
+    """
+    enviados = prestamos = 0
+    for mensaje, cantidad in lote:
+        if conexion is None:
+            break
+        enviado, conexion = enviar(conexion, mensaje)
+        if enviado:
+            enviados += 1
+            prestamos += cantidad
+    return enviados, prestamos, conexion
+
+
+def enviar_recordatorios(hoy=None, dias_antes=None, tamaño_lote=None):
+    """
+    Envía un recordatorio a cada socio con préstamos vencidos o por vencer.
+
+    Returns:
+        tuple (enviados, fallidos, prestamos): correos enviados, correos que no
+        se pudieron enviar y préstamos incluidos en los enviados
+    """
+    hoy = hoy or timezone.localdate()
+    dias_antes = settings.RECORDATORIOS_DIAS_ANTES if dias_antes is None else dias_antes
+    tamaño_lote = tamaño_lote or settings.RECORDATORIOS_LOTE
+    plantilla = get_template(PLANTILLA)
+    consulta = prestamos_a_recordar(hoy, dias_antes).iterator(chunk_size=tamaño_lote)
+
+    enviados = fallidos = prestamos = 0
+    conexion = abrir(get_connection())
+    for lote in lotes(mensajes(resumenes(consulta, hoy), plantilla), tamaño_lote):
+        if conexion is None:
+            fallidos += len(lote)
+            continue
+        enviados_lote, prestamos_lote, conexion = enviar_lote(conexion, lote)
+        enviados += enviados_lote
+        fallidos += len(lote) - enviados_lote
+        prestamos += prestamos_lote
+    if conexion is not None:
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+    RECORDATORIOS.inc_lote([
+        ({'resultado': resultado}, cantidad)
+        for resultado, cantidad in (('enviado', enviados), ('fallido', fallidos))
+        if cantidad
+    ])
+    return enviados, fallidos, prestamos
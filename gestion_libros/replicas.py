@@ -0,0 +1,170 @@
+"""
+Lecturas desde réplicas de la base de datos.
+
+Los listados, el inicio y los PDFs solo leen; con @solo_lectura sus consultas
+van a una de las réplicas de REPLICAS_LECTURA y no compiten con los préstamos y
+devoluciones que escriben en 'default'.
+
+Como una réplica puede estar unos instantes atrasada, la sesión que acaba de
+escribir (por ejemplo, el redirect a listar_prestamos después de un préstamo)
+sigue leyendo del primario durante REPLICA_LECTURA_PROPIA_SEGUNDOS: así el
+bibliotecario siempre ve lo que acaba de registrar.
+"""
+
+import functools
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+
+# Alias de la réplica que usa la vista en curso (None = primario).
+# ContextVar y no threading.local: cada request (hilo o tarea async) tiene el suyo.
+_alias_lectura = ContextVar('alias_lectura', default=None)
+# Registro de escrituras del request en curso (lo completa el router)
+_escrituras = ContextVar('escrituras', default=None)
+
+CLAVE_SESION = 'primario_hasta'
+
+# Apps que siempre se leen del primario (la sesión recién creada puede no estar en la réplica)
+APPS_SOLO_PRIMARIO = {'sessions'}
+
+
+class RouterReplicas:
+    """Router de bases de datos: lecturas a la réplica elegida por @solo_lectura, escrituras al primario"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in APPS_SOLO_PRIMARIO:
+            return 'default'
+        return _alias_lectura.get()
+
+    def db_for_write(self, model, **hints):
+        escrituras = _escrituras.get()
+        if escrituras is not None and model._meta.app_label not in APPS_SOLO_PRIMARIO:
+            escrituras.add(model._meta.label)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas y primario tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # El esquema de las réplicas llega por la replicación, no por migrate
+        if db in settings.REPLICAS_LECTURA:
+            return False
+        return None
+
+
+def _leer_de(alias, contenido):
+    """Itera el contenido (respuesta en streaming) con las lecturas dirigidas a `alias`"""
+    iterador = iter(contenido)
+    while True:
+        token = _alias_lectura.set(alias)
+        try:
+            parte = next(iterador)
+        except StopIteration:
+            return
+        finally:
+            _alias_lectura.reset(token)
+        yield parte
+
+
+def alias_para(request):
+    """Réplica que le corresponde al request, o None si debe leer del primario"""
+    if not settings.REPLICAS_LECTURA:
+        return None
+    sesion = getattr(request, 'session', None)
+    if sesion is not None and sesion.get(CLAVE_SESION, 0) > time.time():
+        return None
+    return random.choice(settings.REPLICAS_LECTURA)
+
+
+def solo_lectura(vista):
+    """
+    Decorador para vistas que solo leen: sus consultas van a una réplica
+    (salvo que la sesión haya escrito hace poco). Si la respuesta es en
+    streaming, el contenido también se genera leyendo de la réplica.
+    Sirve también para vistas async: la réplica elegida sigue a las consultas
+    que se hacen con sync_to_async (copian la ContextVar).
+    """
+    if iscoroutinefunction(vista):
+        @functools.wraps(vista)
+        async def envoltura_async(request, *args, **kwargs):
+            # Leer la sesión es una consulta: solo si hay réplicas
+            alias = await sync_to_async(alias_para)(request) if settings.REPLICAS_LECTURA else None
+            token = _alias_lectura.set(alias)
+            try:
+                return await vista(request, *args, **kwargs)
+            finally:
+                _alias_lectura.reset(token)
+        return envoltura_async
+
+    @functools.wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        alias = alias_para(request)
+        if alias is None:
+            return vista(request, *args, **kwargs)
+
+        token = _alias_lectura.set(alias)
+        try:
+            response = vista(request, *args, **kwargs)
+        finally:
+            _alias_lectura.reset(token)
+
+        if isinstance(response, StreamingHttpResponse):
+            response.streaming_content = _leer_de(alias, response.streaming_content)
+        return response
+    return envoltura
+
+
+class LecturaPropiaMiddleware:
+    """
+    Si el request escribió en la base, la sesión lee del primario durante
+    REPLICA_LECTURA_PROPIA_SEGUNDOS. Debe ir después de SessionMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.REPLICAS_LECTURA:
+            return self.get_response(request)
+
+        escrituras = set()
+        token = _escrituras.set(escrituras)
+        try:
+            response = self.get_response(request)
+        finally:
+            _escrituras.reset(token)
+
+        if escrituras and hasattr(request, 'session'):
+            request.session[CLAVE_SESION] = time.time() + settings.REPLICA_LECTURA_PROPIA_SEGUNDOS
+        return response
+
+    async def __acall__(self, request):
+        if not settings.REPLICAS_LECTURA:
+            return await self.get_response(request)
+
+        escrituras = set()
+        token = _escrituras.set(escrituras)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _escrituras.reset(token)
+
+        if escrituras and hasattr(request, 'session'):
+            # Escribir en la sesión puede cargarla de la base
+            await sync_to_async(request.session.__setitem__)(
+                CLAVE_SESION, time.time() + settings.REPLICA_LECTURA_PROPIA_SEGUNDOS
+            )
+        return response
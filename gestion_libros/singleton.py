@@ -1,44 +1,170 @@
+import threading
+import time
 from decimal import Decimal, InvalidOperation
 
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError
+
+from .politicas import compilar_politicas
+
+
+# Valores usados hasta que se lee la configuración de la base (o si la tabla no existe todavía)
+VALORES_POR_DEFECTO = {
+    'tasa_multa_diaria_sugerida': Decimal('0.50'),  # Sugerencia: $0.50 por día de retraso
+    'dias_prestamo_default': 15,  # 15 días de préstamo por defecto
+    'max_prestamos_simultaneos': 3,  # Máximo de préstamos activos por socio
+    'monto_multa_minimo': Decimal('0.01'),  # Monto mínimo permitido para multas
+    'monto_multa_maximo': Decimal('999999.99'),  # Monto máximo permitido para multas
+    'politicas': [],  # Reglas por categoría de libro/socio (modelo PoliticaPrestamo)
+}
+# NOTA: Los montos de multas por daño/pérdida los ingresa el bibliotecario dinámicamente
+
+CLAVE_VERSION = 'configuracion:version'
+TIMEOUT_VALORES = 60 * 60 * 24
+
+
+def _valor(nombre):
+    """Propiedad de solo lectura sobre el diccionario de valores vigente"""
+    return property(lambda self: self._valores[nombre])
+
 
 class ConfiguracionBiblioteca:
     """
     Patrón Singleton para la configuración global de la biblioteca.
     Garantiza que solo exista una instancia de configuración en toda la aplicación.
+
+    Los valores se persisten en el modelo Configuracion. Cada proceso los guarda
+    en memoria junto con su versión y, como mucho cada CONFIGURACION_REFRESCO_SEGUNDOS,
+    consulta la versión vigente (primero en la cache, si no en la base). Solo si
+    cambió vuelve a leer los valores, así que no hay una consulta por request.
     """
     _instancia = None
-    _inicializado = False
-    
+    _lock = threading.Lock()
+
     def __new__(cls):
+        # Doble verificación: la instancia se publica recién cuando está inicializada
         if cls._instancia is None:
-            cls._instancia = super(ConfiguracionBiblioteca, cls).__new__(cls)
+            with cls._lock:
+                if cls._instancia is None:
+                    instancia = super(ConfiguracionBiblioteca, cls).__new__(cls)
+                    instancia._valores = _preparar(VALORES_POR_DEFECTO)
+                    instancia._version = None
+                    instancia._verificado_en = None
+                    instancia._lock_recarga = threading.Lock()
+                    cls._instancia = instancia
         return cls._instancia
-    
-    def __init__(self):
-        # Solo inicializar una vez
-        if not ConfiguracionBiblioteca._inicializado:
-            self.tasa_multa_diaria_sugerida = 0.50  # Sugerencia: $0.50 por día de retraso
-            self.dias_prestamo_default = 15  # 15 días de préstamo por defecto
-            self.max_prestamos_simultaneos = 3  # Máximo de préstamos activos por socio
-            self.monto_multa_maximo = Decimal('999999.99')  # Monto máximo permitido para multas
-            self.monto_multa_minimo = Decimal('0.01')  # Monto mínimo permitido para multas
-            # NOTA: Los montos de multas por daño/pérdida los ingresa el bibliotecario dinámicamente
-            ConfiguracionBiblioteca._inicializado = True
-    
+
+    tasa_multa_diaria_sugerida = _valor('tasa_multa_diaria_sugerida')
+    dias_prestamo_default = _valor('dias_prestamo_default')
+    max_prestamos_simultaneos = _valor('max_prestamos_simultaneos')
+    monto_multa_minimo = _valor('monto_multa_minimo')
+    monto_multa_maximo = _valor('monto_multa_maximo')
+
+    @property
+    def version(self):
+        return self._version
+
+    def refrescar(self):
+        """
+        Recarga los valores si la versión persistida cambió.
+        Se saltea si ya se verificó hace menos del intervalo configurado.
+        """
+        intervalo = settings.CONFIGURACION_REFRESCO_SEGUNDOS
+        ahora = time.monotonic()
+        if self._verificado_en is not None and ahora - self._verificado_en < intervalo:
+            return
+
+        # Un solo hilo verifica; el resto sigue usando los valores vigentes.
+        # La primera carga sí espera, para no responder con los valores por defecto.
+        if not self._lock_recarga.acquire(blocking=self._version is None):
+            return
+        try:
+            self._verificado_en = ahora
+            version = self._leer_version(intervalo)
+            if version is not None and version != self._version:
+                valores, version = self._leer_valores(version)
+                # Se reemplaza el diccionario entero: los lectores nunca ven una mezcla
+                self._valores = _preparar(valores)
+                self._version = version
+        except DatabaseError:
+            # Tabla todavía no migrada: se siguen usando los valores por defecto
+            pass
+        finally:
+            self._lock_recarga.release()
+
+    def recargar(self):
+        """Fuerza la verificación de la versión en el próximo acceso"""
+        self._verificado_en = None
+
+    @classmethod
+    def publicar(cls, configuracion):
+        """
+        Publica una configuración recién guardada: la deja en la cache para los
+        demás procesos y actualiza la instancia de este proceso sin esperar.
+        """
+        cache = caches[settings.CONFIGURACION_CACHE]
+        valores = configuracion.como_diccionario()
+        cache.set(f'configuracion:v{configuracion.version}', valores, TIMEOUT_VALORES)
+        cache.set(CLAVE_VERSION, configuracion.version, settings.CONFIGURACION_REFRESCO_SEGUNDOS)
+
+        instancia = cls()
+        instancia._valores = _preparar(valores)
+        instancia._version = configuracion.version
+
+    def _leer_version(self, intervalo):
+        """Versión vigente: de la cache si está, si no de la base (y se cachea por `intervalo`)"""
+        from .models import Configuracion
+
+        cache = caches[settings.CONFIGURACION_CACHE]
+        version = cache.get(CLAVE_VERSION)
+        if version is None:
+            version = Configuracion.objects.values_list('version', flat=True).first()
+            if version is not None:
+                cache.set(CLAVE_VERSION, version, intervalo)
+        return version
+
+    def _leer_valores(self, version):
+        """Valores de una versión: de la cache si están, si no de la base"""
+        from .models import Configuracion
+
+        cache = caches[settings.CONFIGURACION_CACHE]
+        valores = cache.get(f'configuracion:v{version}')
+        if valores is not None:
+            return valores, version
+
+        configuracion = Configuracion.objects.get(pk=1)
+        valores = configuracion.como_diccionario()
+        # Se cachea con la versión real de la fila (puede ser más nueva que la pedida)
+        cache.set(f'configuracion:v{configuracion.version}', valores, TIMEOUT_VALORES)
+        return valores, configuracion.version
+
+    def terminos(self, categoria_libro, categoria_socio):
+        """
+        Condiciones de préstamo (días, límite, tasa de multa) para una combinación
+        de categorías. Es una búsqueda en la tabla ya compilada: O(1), sin consultas.
+        """
+        valores = self._valores
+        return valores['tabla_terminos'].get((categoria_libro, categoria_socio), valores['terminos_base'])
+
+    def terminos_prestamo(self, prestamo):
+        """Condiciones que aplican a un préstamo (requiere socio y ejemplar__libro cargados)"""
+        return self.terminos(prestamo.ejemplar.libro.categoria, prestamo.socio.categoria)
+
     def calcular_multa_retraso(self, dias_retraso):
         """
         Calcula el monto de multa por días de retraso usando la tasa sugerida.
         """
         return self.tasa_multa_diaria_sugerida * dias_retraso
-    
+
     def validar_monto_multa(self, monto_str):
         """
         Valida que un monto de multa sea válido.
         Centraliza la lógica de validación de montos para evitar duplicación (DRY).
-        
+
         Args:
             monto_str: String con el monto a validar (viene del formulario)
-            
+
         Returns:
             tuple (es_valido: bool, monto: Decimal o None, mensaje_error: str o None)
         """
@@ -46,30 +172,38 @@ class ConfiguracionBiblioteca:
             # Validar que no esté vacío
             if not monto_str or str(monto_str).strip() == '':
                 return False, None, "El monto no puede estar vacío"
-            
+
             # Convertir a Decimal
             monto = Decimal(str(monto_str))
-            
+
             # Validar rango mínimo
             if monto < self.monto_multa_minimo:
                 return False, None, f"El monto debe ser mayor a ${self.monto_multa_minimo}"
-            
+
             # Validar rango máximo
             if monto > self.monto_multa_maximo:
                 return False, None, f"El monto es demasiado grande (máximo: ${self.monto_multa_maximo})"
-            
+
             return True, monto, None
-            
+
         except (ValueError, InvalidOperation):
             return False, None, "El formato del monto es inválido"
-    
+
     def __str__(self):
         return f"Configuración Biblioteca - Tasa multa sugerida: ${self.tasa_multa_diaria_sugerida}/día"
 
 
+def _preparar(valores):
+    """Agrega a los valores la tabla de políticas compilada"""
+    terminos_base, tabla_terminos = compilar_politicas(valores, valores['politicas'])
+    return dict(valores, terminos_base=terminos_base, tabla_terminos=tabla_terminos)
+
+
 # Función auxiliar para obtener la instancia
 def obtener_configuracion():
     """
-    Retorna la única instancia de ConfiguracionBiblioteca.
+    Retorna la única instancia de ConfiguracionBiblioteca, con los valores al día.
     """
-    return ConfiguracionBiblioteca()
\ No newline at end of file
+    configuracion = ConfiguracionBiblioteca()
+    configuracion.refrescar()
+    return configuracion
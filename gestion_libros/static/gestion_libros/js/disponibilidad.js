@@ -0,0 +1,98 @@
+/**
+ * Disponibilidad en vivo: escucha /eventos/ejemplares/ (Server-Sent Events)
+ * y actualiza la página cuando otro mostrador presta, devuelve o edita un ejemplar
+ *
+ * Se usa en el catálogo (badge de disponibles y estado de cada ejemplar) y en
+ * préstamos (lista de ejemplares disponibles del formulario). El script se
+ * incluye con data-url apuntando al flujo de eventos.
+ */
+
+(function() {
+    const script = document.currentScript;
+
+    // Clase del badge según el estado del ejemplar (igual que en listar_libros.html)
+    const CLASES_ESTADO = {
+        disponible: 'bg-success',
+        prestado: 'bg-warning',
+        reservado: 'bg-secondary',
+        mantenimiento: 'bg-info',
+        perdido: 'bg-danger',
+    };
+    const NOMBRES_ESTADO = {
+        disponible: 'Disponible',
+        prestado: 'Prestado',
+        reservado: 'Reservado',
+        mantenimiento: 'En Mantenimiento',
+        perdido: 'Perdido',
+    };
+
+    /**
+     * Badge con la cantidad de ejemplares disponibles del libro
+     */
+    function actualizarDisponibles(evento) {
+        const celda = document.getElementById('disponibles-' + evento.isbn);
+        if (!celda) return;
+        const hay = evento.disponibles > 0;
+        const badge = document.createElement('span');
+        badge.className = 'badge ' + (hay ? 'bg-success' : 'bg-danger');
+        const icono = document.createElement('i');
+        icono.className = 'bi ' + (hay ? 'bi-check-circle' : 'bi-x-circle') + ' me-1';
+        badge.append(icono, String(evento.disponibles));
+        celda.replaceChildren(badge);
+    }
+
+    /**
+     * Badge de estado del ejemplar (la fila se oculta si se dio de baja)
+     */
+    function actualizarEstado(evento) {
+        const celda = document.getElementById('estado-' + evento.codigo);
+        if (!celda) return;
+        if (!evento.activo) {
+            celda.closest('tr').remove();
+            return;
+        }
+        const badge = document.createElement('span');
+        badge.className = 'badge ' + (CLASES_ESTADO[evento.estado] || 'bg-danger');
+        badge.textContent = NOMBRES_ESTADO[evento.estado] || evento.estado;
+        celda.replaceChildren(badge);
+    }
+
+    /**
+     * Opciones del formulario de préstamo: los ejemplares disponibles (y los apartados)
+     */
+    function actualizarOpciones(evento) {
+        const select = document.getElementById('prestamo_ejemplar');
+        if (!select) return;
+        const opcion = Array.from(select.options).find(o => o.value === evento.codigo);
+        const disponible = evento.activo && evento.estado === 'disponible';
+        // Los apartados por reserva (optgroup) siguen en la lista mientras estén reservados
+        const apartado = opcion && opcion.parentElement.tagName === 'OPTGROUP' && evento.estado === 'reservado';
+        if (opcion && !disponible && !apartado) {
+            if (opcion.selected) select.value = '';
+            opcion.remove();
+        } else if (!opcion && disponible) {
+            const nueva = document.createElement('option');
+            nueva.value = evento.codigo;
+            nueva.textContent = evento.titulo + ' - ' + evento.autor + ' (' + evento.codigo + ')';
+            select.append(nueva);
+        }
+    }
+
+    document.addEventListener('DOMContentLoaded', function() {
+        if (!script || !window.EventSource) return;
+        const fuente = new EventSource(script.dataset.url);
+
+        fuente.addEventListener('ejemplar', function(mensaje) {
+            const evento = JSON.parse(mensaje.data);
+            actualizarDisponibles(evento);
+            actualizarEstado(evento);
+            actualizarOpciones(evento);
+        });
+
+        // Se perdieron eventos (la conexión estuvo caída demasiado tiempo)
+        fuente.addEventListener('recargar', function() {
+            fuente.close();
+            window.location.reload();
+        });
+    });
+})();
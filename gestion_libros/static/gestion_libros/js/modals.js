@@ -26,6 +26,7 @@ function limpiarModalLibro() {
     document.getElementById('libro_autor').value = '';
     document.getElementById('libro_editorial').value = '';
     document.getElementById('libro_año').value = '';
+    document.getElementById('libro_categoria').value = 'general';
 }
 
 /**
@@ -35,8 +36,9 @@ function limpiarModalLibro() {
  * @param {string} autor - Autor del libro
  * @param {string} editorial - Editorial (puede ser null)
  * @param {number} año - Año de publicación (puede ser null)
+ * @param {string} categoria - Categoría del libro (define la política de préstamo)
  */
-function cargarLibroEnModal(isbn, titulo, autor, editorial, año) {
+function cargarLibroEnModal(isbn, titulo, autor, editorial, año, categoria) {
     // Cambiar título del modal a "Editar"
     document.getElementById('modalLibroTitulo').innerHTML = '<i class="bi bi-pencil me-2"></i>Editar Libro';
     
@@ -50,6 +52,7 @@ function cargarLibroEnModal(isbn, titulo, autor, editorial, año) {
     document.getElementById('libro_autor').value = autor;
     document.getElementById('libro_editorial').value = editorial || '';  // Si es null, usar string vacío
     document.getElementById('libro_año').value = año || '';
+    document.getElementById('libro_categoria').value = categoria || 'general';
 }
 
 // ============================================================
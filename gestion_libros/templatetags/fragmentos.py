@@ -0,0 +1,32 @@
+"""{% fragmento nombre valor1 valor2 ... %} ... {% endfragmento %} (ver gestion_libros/fragmentos.py)"""
+
+from django import template
+
+from .. import fragmentos
+
+
+register = template.Library()
+
+
+class FragmentoNode(template.Node):
+    def __init__(self, nodelist, nombre, partes):
+        self.nodelist = nodelist
+        self.nombre = nombre
+        self.partes = partes
+
+    def render(self, context):
+        nombre = self.nombre.resolve(context)
+        partes = [parte.resolve(context) for parte in self.partes]
+        return fragmentos.renderizar(context, nombre, partes, lambda: self.nodelist.render(context))
+
+
+@register.tag('fragmento')
+def do_fragmento(parser, token):
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' necesita un nombre y al menos un valor que identifique la versión del fragmento"
+        )
+    nodelist = parser.parse(('endfragmento',))
+    parser.delete_first_token()
+    return FragmentoNode(nodelist, parser.compile_filter(bits[1]), [parser.compile_filter(b) for b in bits[2:]])
@@ -3,14 +3,137 @@ Tests para el sistema de gestión de biblioteca.
 Se implementa TDD (Test-Driven Development) para garantizar la calidad del código.
 """
 
-from django.test import TestCase, Client
+import asyncio
+import base64
+import gzip
+import json
+import os
+import pstats
+import re
+import smtplib
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.signals import request_finished, request_started
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count, F, Max
+from django.test import (
+    AsyncClient, Client, LiveServerTestCase, RequestFactory, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
-from django.contrib.auth.models import User
-from datetime import timedelta, date
-from decimal import Decimal
+from proyecto_biblioteca.settings import BASE_DIR, base_de_datos_desde_url
+
+from .archivo import archivar_historial, historial_prestamos
+from .benchmarks import es_base_de_prueba
+from .benchmarks.carga import ClienteHTTP, Mostrador, Resultados, correr_carga, puestos_de_prueba
+from .benchmarks.escenarios import Escenario, escenarios
+from .benchmarks.vistas import comparar, correr
+from .circulacion import ErrorCirculacion, devolver, prestar, registrar_prestamo, reservar
+from .consultas_lentas import normalizar, recorre_tabla, registrar
+from .datos_sinteticos import generar_datos, simular_biblioteca
+from .db import bloquear, con_reintentos
+from .estado_cuenta import COLUMNAS_MULTAS, EscritorPDF, MARGEN, MaquetadorEstadoCuenta
+from .eventos import Cursor, avisar, leer, publicar
+from .instrumentacion import Medicion
+from .metricas import PDF_SEGUNDOS, VISTA_SEGUNDOS, almacen, exportar
+from .models import (
+    Configuracion, ConsultaLenta, Ejemplar, EventoEjemplar, Libro, Multa, MultaArchivada, Notificacion, Perfil,
+    PoliticaPrestamo, Prestamo, PrestamoArchivado, Reserva, Socio,
+)
+from .notificaciones import encolar, entregar, procesar, reclamar
+from .perfilador import MuestreadorPila
+from .recordatorios import enviar_recordatorios
+from .replicas import solo_lectura
+from .singleton import ConfiguracionBiblioteca, obtener_configuracion
+
 
-from .models import Libro, Ejemplar, Socio, Prestamo, Multa
+class CorreoCaido(BaseEmailBackend):
+    """Backend de correo que rechaza todos los envíos (servidor caído)"""
+    
+    def send_messages(self, email_messages):
+        raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+
+
+class CorreoQueSeCorta(BaseEmailBackend):
+    """Backend de correo que envía un mensaje y después pierde el servidor: tampoco se puede reabrir"""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.enviados = []
+    
+    def open(self):
+        if self.enviados:
+            raise smtplib.SMTPConnectError(421, 'Service not available')
+    
+    def send_messages(self, email_messages):
+        if self.enviados:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        self.enviados.extend(email_messages)
+        return len(email_messages)
+
+
+class CorreoQueRechaza(BaseEmailBackend):
+    """Backend de correo que rechaza la dirección de socio0 y corta la conexión una vez; el resto sale"""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.cortes = 1
+    
+    def send_messages(self, email_messages):
+        mensaje, = email_messages
+        if mensaje.to == ['socio0@example.com']:
+            raise smtplib.SMTPRecipientsRefused({'socio0@example.com': (550, b'No such user')})
+        if self.cortes:
+            self.cortes -= 1
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        mail.outbox.append(mensaje)
+        return 1
+
+
+class AjustesTemporales:
+    """Para los TestCase: ajustes, directorios y estado de proceso que se deshacen al terminar cada test"""
+    
+    def directorio_temporal(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        return directorio.name
+    
+    def ajustar(self, **ajustes):
+        """Como @override_settings, pero desde setUp y con valores calculados en el test"""
+        ajuste = self.settings(**ajustes)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+    
+    def metricas_propias(self, **ajustes):
+        """Un archivo de métricas vacío para el test, así los conteos no dependen de los otros tests"""
+        self.ajustar(METRICAS_ARCHIVO=f'{self.directorio_temporal()}/metricas.sqlite3', **ajustes)
+    
+    def reiniciar_configuracion(self):
+        """El Singleton y la cache empiezan vacíos y se vacían de nuevo al terminar"""
+        def reiniciar():
+            ConfiguracionBiblioteca._instancia = None
+            cache.clear()
+        
+        reiniciar()
+        self.addCleanup(reiniciar)
 
 
 # ============================================
@@ -198,8 +321,6 @@ class ReglasNegocioTest(TestCase):
     
     def test_multa_por_retraso(self):
         """Test: Generación de multa por retraso en devolución"""
-        from .singleton import obtener_configuracion
-        
         # Crear préstamo con retraso de 5 días
         prestamo = Prestamo.objects.create(
             socio=self.socio,
@@ -227,8 +348,6 @@ class ReglasNegocioTest(TestCase):
     
     def test_validacion_montos_multas(self):
         """Test: Validar montos de multas dinámicas (daño/pérdida)"""
-        from .singleton import obtener_configuracion
-        
         config = obtener_configuracion()
         
         # Test 1: Monto válido
@@ -256,3 +375,1492 @@ class ReglasNegocioTest(TestCase):
         es_valido, monto, error = config.validar_monto_multa('abc123')
         self.assertFalse(es_valido)
         self.assertIn('inválido', error)
+
+
+# ============================================
+# TESTS DE COMPROBANTES PDF
+# ============================================
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'comprobantes': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'comprobantes-test'},
+})
+class ComprobantesPDFTest(TestCase):
+    """Tests para la cache de comprobantes inmutables y los GET condicionales"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        self.socio = Socio.objects.create(dni='12345678', numero_socio='SOC-001', nombre='Juan Pérez')
+        self.multa = Multa.objects.create(socio=self.socio, monto=Decimal('100.00'), motivo='daño')
+    
+    def test_multa_pendiente_se_renderiza_siempre(self):
+        """Test: Una multa pendiente no tiene ETag ni se cachea"""
+        response = self.client.get(reverse('comprobante_multa_pdf', args=[self.multa.id]))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertNotIn('ETag', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+    
+    def test_multa_pagada_responde_304(self):
+        """Test: Una multa pagada envía ETag y responde 304 si el cliente ya la tiene"""
+        self.multa.marcar_como_pagada()
+        url = reverse('comprobante_multa_pdf', args=[self.multa.id])
+        
+        primera = self.client.get(url)
+        self.assertEqual(primera.status_code, 200)
+        self.assertIn('ETag', primera)
+        self.assertIn('Last-Modified', primera)
+        
+        # El mismo PDF byte a byte (sale de la cache, sin la fecha actual embebida)
+        segunda = self.client.get(url)
+        self.assertEqual(primera.content, segunda.content)
+        
+        condicional = self.client.get(url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(condicional.status_code, 304)
+        self.assertEqual(condicional['ETag'], primera['ETag'])
+    
+    def test_prestamo_devuelto_tiene_etag(self):
+        """Test: Un préstamo activo no es cacheable, uno devuelto sí"""
+        libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        ejemplar = Ejemplar.objects.create(libro=libro, codigo_ejemplar='EJ-001')
+        prestamo = Prestamo.objects.create(socio=self.socio, ejemplar=ejemplar)
+        url = reverse('comprobante_prestamo_pdf', args=[prestamo.id])
+        
+        self.assertNotIn('ETag', self.client.get(url))
+        
+        prestamo.fecha_devolucion_real = timezone.now()
+        prestamo.save()
+        self.assertIn('ETag', self.client.get(url))
+    
+    def test_generar_comprobantes_en_lote(self):
+        """Test: El comando de cierre de mes arma un ZIP con un PDF por comprobante"""
+        self.multa.marcar_como_pagada()
+        hoy = timezone.localdate().isoformat()
+        
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = os.path.join(directorio, 'cierre.zip')
+            call_command('generar_comprobantes', desde=hoy, hasta=hoy, tipo='multas',
+                         salida=salida, procesos=1, stdout=StringIO())
+            
+            with zipfile.ZipFile(salida) as archivo_zip:
+                self.assertEqual(archivo_zip.namelist(), [f'comprobante_multa_{self.multa.id}.pdf'])
+    
+    def test_estado_cuenta_socio_se_transmite(self):
+        """Test: El estado de cuenta se envía como PDF en streaming, página por página"""
+        response = self.client.get(reverse('estado_cuenta_socio_pdf', args=[self.socio.id]))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        pdf = b''.join(response.streaming_content)
+        self.assertTrue(pdf.startswith(b'%PDF-1.4'))
+        self.assertTrue(pdf.rstrip().endswith(b'%%EOF'))
+        self.assertIn(b'/Count 1', pdf)
+    
+    def test_mensaje_al_final_de_la_pagina_pasa_de_pagina(self):
+        """Test: Un mensaje suelto que no entra en la página abre una nueva, como las filas"""
+        maquetador = MaquetadorEstadoCuenta(EscritorPDF(), self.socio, timezone.now())
+        maquetador.portada([])
+        maquetador.seccion('Multas', COLUMNAS_MULTAS)
+        maquetador.y = MARGEN + 10
+        
+        self.assertNotEqual(maquetador.mensaje('El socio no registra multas.'), b'')
+        self.assertEqual(maquetador.numero_pagina, 2)
+        self.assertGreater(maquetador.y, MARGEN + 20)
+
+
+# ============================================
+# TESTS DE CONFIGURACIÓN (SINGLETON PERSISTIDO)
+# ============================================
+
+class ConfiguracionPersistidaTest(AjustesTemporales, TestCase):
+    """Tests para la configuración guardada en la base y cacheada en el Singleton"""
+    
+    def setUp(self):
+        self.reiniciar_configuracion()
+    
+    def test_cambio_se_publica_al_confirmar(self):
+        """Test: Guardar la configuración actualiza el Singleton del proceso"""
+        self.assertEqual(obtener_configuracion().dias_prestamo_default, 15)
+        
+        configuracion = Configuracion.objects.get(pk=1)
+        configuracion.dias_prestamo_default = 21
+        with self.captureOnCommitCallbacks(execute=True):
+            configuracion.save()
+        
+        self.assertEqual(configuracion.version, 2)
+        self.assertEqual(obtener_configuracion().dias_prestamo_default, 21)
+    
+    def test_version_se_incrementa_en_la_base(self):
+        """Test: Guardar una instancia vieja no vuelve atrás la versión que subió otro proceso"""
+        configuracion = Configuracion.objects.get(pk=1)
+        Configuracion.objects.filter(pk=1).update(version=F('version') + 3)  # otro proceso
+        configuracion.dias_prestamo_default = 21
+        configuracion.save(update_fields=['dias_prestamo_default'])
+        
+        self.assertEqual(configuracion.version, 5)
+        self.assertEqual(Configuracion.objects.get(pk=1).version, 5)
+    
+    def test_cambio_de_otro_proceso_se_detecta_por_version(self):
+        """Test: Un cambio hecho por otro proceso se toma al vencer el intervalo"""
+        with self.settings(CONFIGURACION_REFRESCO_SEGUNDOS=0):
+            self.assertEqual(obtener_configuracion().max_prestamos_simultaneos, 3)
+            
+            # Simula otro worker: cambia la fila sin pasar por este proceso
+            Configuracion.objects.filter(pk=1).update(max_prestamos_simultaneos=5, version=F('version') + 1)
+            
+            self.assertEqual(obtener_configuracion().max_prestamos_simultaneos, 5)
+    
+    def test_sin_consultas_dentro_del_intervalo(self):
+        """Test: Dentro del intervalo de refresco no se consulta la base"""
+        obtener_configuracion()
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                obtener_configuracion().calcular_multa_retraso(3)
+    
+    def test_singleton_unico_entre_hilos(self):
+        """Test: Varios hilos creando la configuración a la vez obtienen la misma instancia"""
+        instancias = []
+        hilos = [threading.Thread(target=lambda: instancias.append(ConfiguracionBiblioteca())) for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        
+        self.assertEqual(len({id(instancia) for instancia in instancias}), 1)
+
+
+class PoliticasPrestamoTest(AjustesTemporales, TestCase):
+    """Tests para las políticas de préstamo por categoría"""
+    
+    def setUp(self):
+        self.reiniciar_configuracion()
+        
+        self.client = Client()
+        User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        
+        self.socio = Socio.objects.create(dni='12345678', numero_socio='SOC-001', nombre='Juan Pérez', categoria='estudiante')
+    
+    def crear_politica(self, **campos):
+        with self.captureOnCommitCallbacks(execute=True):
+            return PoliticaPrestamo.objects.create(**campos)
+    
+    def crear_ejemplar(self, codigo, categoria):
+        libro = Libro.objects.create(isbn=f'97801323508{codigo[-2:]}', titulo=f'Libro {codigo}', autor='Autor', categoria=categoria)
+        return Ejemplar.objects.create(libro=libro, codigo_ejemplar=codigo, estado='disponible')
+    
+    def test_precedencia_de_reglas(self):
+        """Test: La regla más específica gana campo por campo"""
+        self.crear_politica(categoria_libro='novedad', dias_prestamo=7, tasa_multa_diaria=Decimal('1.00'))
+        self.crear_politica(categoria_socio='estudiante', dias_prestamo=10, max_prestamos_simultaneos=2)
+        self.crear_politica(categoria_libro='novedad', categoria_socio='investigador', dias_prestamo=5)
+        
+        config = obtener_configuracion()
+        self.assertEqual(config.terminos('general', 'estandar').dias_prestamo, 15)
+        # Socio pisa a libro, pero la tasa del libro se hereda
+        self.assertEqual(config.terminos('novedad', 'estudiante').dias_prestamo, 10)
+        self.assertEqual(config.terminos('novedad', 'estudiante').tasa_multa_diaria, Decimal('1.00'))
+        self.assertEqual(config.terminos('novedad', 'estudiante').max_prestamos_simultaneos, 2)
+        self.assertEqual(config.terminos('novedad', 'investigador').dias_prestamo, 5)
+        
+        with self.assertNumQueries(0):
+            config.terminos('referencia', 'investigador')
+    
+    def test_obra_de_referencia_no_se_presta(self):
+        """Test: Una categoría sin préstamo rechaza el pedido"""
+        self.crear_politica(categoria_libro='referencia', permite_prestamo=False)
+        ejemplar = self.crear_ejemplar('EJ-001', 'referencia')
+        
+        self.client.post(reverse('realizar_prestamo'), {'socio_id': '12345678', 'ejemplar_id': 'EJ-001'})
+        
+        self.assertFalse(Prestamo.objects.filter(ejemplar=ejemplar).exists())
+    
+    def test_dias_y_limite_por_categoria(self):
+        """Test: El préstamo usa los días y el límite de su política"""
+        self.crear_politica(categoria_socio='estudiante', dias_prestamo=7, max_prestamos_simultaneos=1)
+        self.crear_ejemplar('EJ-001', 'general')
+        self.crear_ejemplar('EJ-002', 'general')
+        
+        self.client.post(reverse('realizar_prestamo'), {'socio_id': '12345678', 'ejemplar_id': 'EJ-001'})
+        self.client.post(reverse('realizar_prestamo'), {'socio_id': '12345678', 'ejemplar_id': 'EJ-002'})
+        
+        prestamos = Prestamo.objects.filter(socio=self.socio)
+        self.assertEqual(prestamos.count(), 1)
+        self.assertEqual(prestamos.get().fecha_devolucion_prevista, timezone.now().date() + timedelta(days=7))
+
+
+class CirculacionConcurrenteTest(TestCase):
+    """Tests para el servicio de circulación y la contención de escritura"""
+    
+    def setUp(self):
+        self.socio = Socio.objects.create(dni='12345678', numero_socio='SOC-001', nombre='Juan Pérez')
+        libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        self.ejemplar = Ejemplar.objects.create(libro=libro, codigo_ejemplar='EJ-001', estado='disponible')
+    
+    @skipUnless(connection.vendor == 'sqlite', 'Pragmas propios de SQLite')
+    def test_pragmas_aplicados_a_la_conexion(self):
+        """Test: Cada conexión nueva recibe los pragmas configurados"""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+    
+    @override_settings(TRANSACCIONES_ESPERA_INICIAL=0)
+    def test_reintento_ante_base_bloqueada(self):
+        """Test: Una transacción bloqueada se reintenta y las demás fallas no"""
+        llamadas = []
+        
+        @con_reintentos
+        def escribir():
+            llamadas.append(1)
+            if len(llamadas) < 3:
+                raise OperationalError('database is locked')
+            return 'ok'
+        
+        # Dentro de TestCase ya hay una transacción abierta: se simula que no
+        with mock.patch('gestion_libros.db.connections', {'default': mock.Mock(in_atomic_block=False)}):
+            self.assertEqual(escribir(), 'ok')
+        self.assertEqual(len(llamadas), 3)
+        
+        @con_reintentos
+        def fallar():
+            llamadas.append(1)
+            raise OperationalError('no such table')
+        
+        llamadas.clear()
+        with self.assertRaises(OperationalError):
+            fallar()
+        self.assertEqual(len(llamadas), 1)
+    
+    def test_ejemplar_tomado_por_otro_mostrador(self):
+        """Test: Si otro mostrador ya prestó el ejemplar, el préstamo se rechaza"""
+        registrar_prestamo(self.socio, self.ejemplar, 15)
+        ejemplar_desactualizado = Ejemplar.objects.get(pk=self.ejemplar.pk)
+        ejemplar_desactualizado.estado = 'disponible'
+        
+        with self.assertRaises(ErrorCirculacion):
+            registrar_prestamo(self.socio, ejemplar_desactualizado, 15)
+        self.assertEqual(Prestamo.objects.filter(ejemplar=self.ejemplar).count(), 1)
+    
+    def test_limite_verificado_dentro_de_la_transaccion(self):
+        """Test: El límite del socio se vuelve a verificar al registrar el préstamo"""
+        registrar_prestamo(self.socio, self.ejemplar, 15, max_prestamos=1)
+        otro = Ejemplar.objects.create(libro=self.ejemplar.libro, codigo_ejemplar='EJ-002', estado='disponible')
+        
+        with self.assertRaises(ErrorCirculacion):
+            registrar_prestamo(self.socio, otro, 15, max_prestamos=1)
+        # La transacción se revierte: el segundo ejemplar sigue disponible
+        otro.refresh_from_db()
+        self.assertEqual(otro.estado, 'disponible')
+    
+    def test_bloqueo_de_filas_segun_la_base(self):
+        """Test: select_for_update(skip_locked) solo si la base lo soporta"""
+        consulta = Ejemplar.objects.filter(estado='disponible')
+        features = mock.Mock(has_select_for_update=False)
+        with mock.patch('gestion_libros.db.connections', {'default': mock.Mock(features=features)}):
+            self.assertFalse(bloquear(consulta, saltear_bloqueadas=True).query.select_for_update)
+            
+            features.has_select_for_update = True
+            features.has_select_for_update_skip_locked = True
+            bloqueada = bloquear(consulta, saltear_bloqueadas=True)
+            self.assertTrue(bloqueada.query.select_for_update)
+            self.assertTrue(bloqueada.query.select_for_update_skip_locked)
+    
+    def test_database_url(self):
+        """Test: La configuración de la base se arma desde DATABASE_URL"""
+        sqlite = base_de_datos_desde_url('sqlite:///db.sqlite3')
+        self.assertEqual(sqlite['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(sqlite['NAME'], BASE_DIR / 'db.sqlite3')
+        
+        postgres = base_de_datos_desde_url('postgres://biblio:cl%40ve@db:5433/biblioteca?sslmode=require')
+        self.assertEqual(postgres['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((postgres['NAME'], postgres['USER'], postgres['PASSWORD']), ('biblioteca', 'biblio', 'cl@ve'))
+        self.assertEqual((postgres['HOST'], postgres['PORT']), ('db', '5433'))
+        self.assertEqual(postgres['OPTIONS'], {'sslmode': 'require'})
+        self.assertTrue(postgres['CONN_HEALTH_CHECKS'])
+
+
+class ReplicasLecturaTest(TestCase):
+    """Tests para el ruteo de lecturas a réplicas"""
+    
+    def setUp(self):
+        self.client = Client()
+        User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        
+        self.socio = Socio.objects.create(dni='12345678', numero_socio='SOC-001', nombre='Juan Pérez')
+        libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        Ejemplar.objects.create(libro=libro, codigo_ejemplar='EJ-001', estado='disponible')
+    
+    @override_settings(REPLICAS_LECTURA=['replica'])
+    def test_vista_de_lectura_usa_la_replica(self):
+        """Test: Dentro de @solo_lectura las lecturas van a la réplica y las escrituras al primario"""
+        @solo_lectura
+        def vista(request):
+            return Libro.objects.all().db, Libro.objects.select_for_update().db
+        
+        request = RequestFactory().get('/')
+        request.session = {}
+        self.assertEqual(vista(request), ('replica', 'default'))
+        # Fuera de la vista se vuelve al primario
+        self.assertEqual(Libro.objects.all().db, 'default')
+        
+        # Sesión que escribió hace poco: lee del primario
+        request.session = {'primario_hasta': time.time() + 10}
+        self.assertEqual(vista(request), ('default', 'default'))
+    
+    @override_settings(REPLICAS_LECTURA=['replica'])
+    def test_redirect_despues_de_prestar_lee_del_primario(self):
+        """Test: Después de un préstamo, el listado se lee del primario (lectura propia)"""
+        response = self.client.post(
+            reverse('realizar_prestamo'),
+            {'socio_id': '12345678', 'ejemplar_id': 'EJ-001'},
+            follow=True
+        )
+        
+        # La réplica 'replica' no existe: si el listado no leyera del primario, fallaría
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Clean Code')
+        self.assertGreater(self.client.session['primario_hasta'], time.time())
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'comprobantes': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'comprobantes-test'},
+})
+class ArchivoHistorialTest(AjustesTemporales, TestCase):
+    """Tests para el archivo de préstamos viejos"""
+    
+    def setUp(self):
+        self.client = Client()
+        User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        
+        self.socio = Socio.objects.create(dni='12345678', numero_socio='SOC-001', nombre='Juan Pérez')
+        libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        self.ejemplar = Ejemplar.objects.create(libro=libro, codigo_ejemplar='EJ-001', estado='disponible')
+        
+        hace_tres_años = timezone.now() - timedelta(days=3 * 365)
+        self.viejos = [
+            Prestamo.objects.create(
+                socio=self.socio, ejemplar=self.ejemplar,
+                fecha_inicio=hace_tres_años + timedelta(days=i * 30),
+                fecha_devolucion_prevista=(hace_tres_años + timedelta(days=i * 30 + 15)).date(),
+                fecha_devolucion_real=hace_tres_años + timedelta(days=i * 30 + 20),
+            )
+            for i in range(3)
+        ]
+        self.multa_pagada = Multa.objects.create(
+            socio=self.socio, prestamo=self.viejos[0], monto=Decimal('2.50'), motivo='retraso',
+            pagada=True, fecha=hace_tres_años, fecha_pago=hace_tres_años + timedelta(days=21)
+        )
+        # Con una multa pendiente el préstamo no se archiva
+        Multa.objects.create(socio=self.socio, prestamo=self.viejos[2], monto=Decimal('1.00'), motivo='retraso')
+        self.reciente = Prestamo.objects.create(
+            socio=self.socio, ejemplar=self.ejemplar,
+            fecha_devolucion_prevista=date.today() + timedelta(days=15)
+        )
+    
+    def test_archiva_por_lotes_solo_lo_viejo_y_saldado(self):
+        """Test: Se archivan los préstamos viejos devueltos y sus multas pagadas"""
+        self.assertEqual(archivar_historial(tamaño_lote=1), (2, 1))
+        
+        self.assertEqual(
+            set(PrestamoArchivado.objects.values_list('id', flat=True)),
+            {self.viejos[0].id, self.viejos[1].id}
+        )
+        self.assertEqual(MultaArchivada.objects.get().id, self.multa_pagada.id)
+        self.assertEqual(
+            set(Prestamo.objects.values_list('id', flat=True)),
+            {self.viejos[2].id, self.reciente.id}
+        )
+        self.assertFalse(Multa.objects.filter(id=self.multa_pagada.id).exists())
+    
+    def test_historial_combinado_y_comprobantes(self):
+        """Test: El historial y los comprobantes siguen viendo lo archivado"""
+        esperado = list(Prestamo.objects.order_by('fecha_inicio', 'id').values_list('id', flat=True))
+        archivar_historial()
+        
+        ids = [fila[0] for fila in historial_prestamos(self.socio, 'id')]
+        self.assertEqual(ids, esperado)
+        
+        response = self.client.get(reverse('comprobante_prestamo_pdf', args=[self.viejos[0].id]))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('comprobante_multa_pdf', args=[self.multa_pagada.id]))
+        self.assertEqual(response.status_code, 200)
+    
+    def test_cierre_de_mes_incluye_lo_archivado(self):
+        """Test: generar_comprobantes toma las dos tablas; el listado de préstamos avisa que lo viejo está archivado"""
+        archivar_historial()
+        salida = StringIO()
+        call_command(
+            'generar_comprobantes', desde=(date.today() - timedelta(days=4 * 365)).isoformat(),
+            hasta=date.today().isoformat(), formato='pdf', salida=os.path.join(self.directorio_temporal(), 'cierre.pdf'),
+            stdout=salida,
+        )
+        # 4 préstamos (3 archivados) y la multa pagada (archivada)
+        self.assertIn('✓ 5 comprobantes generados', salida.getvalue())
+        
+        # El PDF único se arma en memoria: un período más grande que --maximo-pdf se rechaza
+        with self.assertRaisesMessage(CommandError, 'más de 4 comprobantes'):
+            call_command(
+                'generar_comprobantes', desde=(date.today() - timedelta(days=4 * 365)).isoformat(),
+                hasta=date.today().isoformat(), formato='pdf', maximo_pdf=4,
+                salida=os.path.join(self.directorio_temporal(), 'cierre.pdf'), stdout=salida,
+            )
+        
+        self.assertContains(self.client.get(reverse('listar_prestamos')), 'se archivan y no aparecen acá')
+
+
+class BajasLogicasTest(TestCase):
+    """Tests para los managers de activos y la baja de libros"""
+    
+    def setUp(self):
+        self.libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        self.ejemplares = [
+            Ejemplar.objects.create(libro=self.libro, codigo_ejemplar=f'EJ-00{i}', estado='disponible')
+            for i in range(1, 3)
+        ]
+        Socio.objects.create(dni='12345678', numero_socio='SOC-001', nombre='Juan Pérez', activo=False)
+    
+    def test_objects_excluye_inactivos(self):
+        """Test: `objects` solo ve lo activo y `objects_all` ve todo"""
+        self.assertFalse(Socio.objects.filter(dni='12345678').exists())
+        self.assertTrue(Socio.objects_all.filter(dni='12345678').exists())
+        # Las relaciones inversas usan el manager por defecto (objects_all)
+        self.ejemplares[0].dar_de_baja()
+        self.assertEqual(self.libro.ejemplares.count(), 2)
+        self.assertEqual(Ejemplar.objects.count(), 1)
+    
+    def test_baja_de_libro_en_cascada(self):
+        """Test: Dar de baja un libro da de baja sus ejemplares en la misma transacción"""
+        with self.assertNumQueries(5):  # savepoint, libro, ejemplares activos, baja de ejemplares, release
+            dados_de_baja = self.libro.dar_de_baja()
+        
+        self.assertEqual([ejemplar.activo for ejemplar in dados_de_baja], [False, False])
+        self.assertFalse(Libro.objects.exists())
+        self.assertFalse(Ejemplar.objects.exists())
+        self.assertEqual(Ejemplar.objects_all.filter(activo=False).count(), 2)
+    
+    @skipUnless(connection.vendor == 'sqlite', 'Formato del plan propio de SQLite')
+    def test_indice_parcial_de_activos(self):
+        """Test: Las consultas de activos usan los índices parciales"""
+        plan = Ejemplar.objects.filter(estado='disponible').explain()
+        self.assertIn('ejemplar_activo_estado_idx', plan)
+        plan = Ejemplar.objects.filter(libro=self.libro, estado='disponible').explain()
+        self.assertIn('ejemplar_activo_libro_idx', plan)
+
+
+class InstrumentacionTest(TestCase):
+    """Tests para el middleware de instrumentación de requests"""
+    
+    def setUp(self):
+        User.objects.create_user(username='testuser', password='testpass123')
+        libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        Ejemplar.objects.create(libro=libro, codigo_ejemplar='EJ-001', estado='disponible')
+    
+    def cliente(self):
+        # El middleware se carga con el primer request de cada cliente
+        cliente = Client()
+        cliente.login(username='testuser', password='testpass123')
+        return cliente
+    
+    @override_settings(INSTRUMENTACION_ACTIVA=True, INSTRUMENTACION_UMBRAL_MS=60000, INSTRUMENTACION_UMBRAL_CONSULTAS=1000)
+    def test_header_server_timing(self):
+        """Test: Cada respuesta informa consultas, tiempo de base, de templates y total"""
+        response = self.cliente().get(reverse('listar_libros'))
+        
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ consultas"')
+        self.assertRegex(timing, r'tpl;dur=[\d.]+')
+        self.assertRegex(timing, r'total;dur=[\d.]+')
+        self.assertGreater(response.wsgi_request.medicion.consultas, 0)
+        self.assertGreater(response.wsgi_request.medicion.tiempo_templates, 0)
+    
+    @override_settings(INSTRUMENTACION_ACTIVA=True, INSTRUMENTACION_UMBRAL_MS=0)
+    def test_request_lento_se_registra(self):
+        """Test: Un request que supera el umbral se loguea con sus consultas repetidas"""
+        with self.assertLogs('gestion_libros.instrumentacion', level='WARNING') as logs:
+            self.cliente().get(reverse('listar_libros'))
+        self.assertIn('GET /libros/', logs.output[0])
+        
+        medicion = Medicion()
+        for _ in range(3):
+            medicion(lambda *args: None, 'SELECT 1 WHERE id = %s', [1], False, {})
+        self.assertEqual(medicion.repetidas(), [('SELECT 1 WHERE id = %s', 3)])
+    
+    @override_settings(INSTRUMENTACION_ACTIVA=False)
+    def test_apagada_no_agrega_header(self):
+        """Test: Con la instrumentación apagada el middleware no se carga"""
+        response = self.cliente().get(reverse('listar_libros'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class MetricasTest(AjustesTemporales, TestCase):
+    """Tests para el registro de métricas y el endpoint /metrics"""
+    
+    def setUp(self):
+        self.metricas_propias(METRICAS_TOKEN='')
+        
+        self.client = Client()
+        self.usuario = User.objects.create_user(username='testuser', password='testpass123', is_staff=True)
+        self.client.login(username='testuser', password='testpass123')
+        
+        self.socio = Socio.objects.create(dni='12345678', numero_socio='SOC-001', nombre='Juan Pérez')
+        libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        Ejemplar.objects.create(libro=libro, codigo_ejemplar='EJ-001', estado='disponible')
+    
+    def test_contadores_de_circulacion(self):
+        """Test: Préstamos, devoluciones y multas se cuentan en /metrics"""
+        self.client.post(reverse('realizar_prestamo'), {'socio_id': '12345678', 'ejemplar_id': 'EJ-001'})
+        prestamo = Prestamo.objects.get()
+        Prestamo.objects.filter(id=prestamo.id).update(fecha_devolucion_prevista=date.today() - timedelta(days=3))
+        self.client.post(reverse('devolver_libro', args=[prestamo.id]), {'estado_fisico': 'bueno'})
+        self.client.post(reverse('pagar_multa', args=[Multa.objects.get().id]))
+        
+        texto = self.client.get(reverse('metricas')).content.decode()
+        self.assertIn('# TYPE biblioteca_prestamos_total counter', texto)
+        self.assertIn('biblioteca_prestamos_total 1\n', texto)
+        self.assertIn('biblioteca_devoluciones_total{estado="bueno"} 1\n', texto)
+        self.assertIn('biblioteca_multas_total{motivo="retraso"} 1\n', texto)
+        self.assertIn('biblioteca_multas_pagadas_total 1\n', texto)
+        self.assertIn('biblioteca_vista_db_segundos_count{vista="realizar_prestamo"} 1\n', texto)
+    
+    def test_histograma_buckets_acumulativos(self):
+        """Test: Una observación cuenta en todos los buckets mayores o iguales"""
+        PDF_SEGUNDOS.observar(0.03, vista='prueba')
+        self.client.get(reverse('comprobante_prestamo_pdf', args=[999]))  # 404: también se mide
+        
+        texto = exportar()
+        self.assertIn('biblioteca_pdf_segundos_count{vista="generar_comprobante_prestamo"} 1\n', texto)
+        self.assertIn('biblioteca_pdf_segundos_bucket{vista="prueba",le="0.025"} 0\n', texto)
+        self.assertIn('biblioteca_pdf_segundos_bucket{vista="prueba",le="0.05"} 1\n', texto)
+        self.assertIn('biblioteca_pdf_segundos_bucket{vista="prueba",le="+Inf"} 1\n', texto)
+        self.assertIn('biblioteca_pdf_segundos_sum{vista="prueba"} 0.03\n', texto)
+        self.assertIn('biblioteca_pdf_segundos_count{vista="prueba"} 1\n', texto)
+    
+    @override_settings(METRICAS_VOLCADO=60)
+    def test_muestras_acumuladas_en_memoria(self):
+        """Test: Las observaciones se escriben juntas al vencer METRICAS_VOLCADO o al leer"""
+        exportar()  # crea el archivo
+        for _ in range(3):
+            VISTA_SEGUNDOS.observar(0.001, vista='prueba')  # cae en todos los buckets
+        archivo = sqlite3.connect(settings.METRICAS_ARCHIVO)
+        self.addCleanup(archivo.close)
+        escritas = "SELECT count(*) FROM muestras WHERE etiquetas = 'vista=\"prueba\"'"
+        self.assertEqual(archivo.execute(escritas).fetchone(), (0,))
+        
+        self.assertIn('biblioteca_vista_segundos_count{vista="prueba"} 3\n', exportar())
+        self.assertEqual(archivo.execute(escritas).fetchone(), (len(VISTA_SEGUNDOS.buckets) + 2,))
+        
+        almacen.reiniciar()
+        self.assertEqual(archivo.execute(escritas).fetchone(), (0,))
+    
+    @override_settings(METRICAS_VOLCADO=0.2)
+    def test_proceso_ocioso_vuelca_al_vencer_el_intervalo(self):
+        """Test: Lo acumulado se escribe al vencer METRICAS_VOLCADO aunque no lleguen más muestras ni lecturas"""
+        exportar()  # crea el archivo y vacía lo pendiente
+        VISTA_SEGUNDOS.observar(0.001, vista='ociosa')
+        archivo = sqlite3.connect(settings.METRICAS_ARCHIVO)
+        self.addCleanup(archivo.close)
+        escritas = "SELECT count(*) FROM muestras WHERE etiquetas = 'vista=\"ociosa\"'"
+        
+        if almacen._temporizador is not None:  # None si el intervalo ya había vencido y se escribió en el acto
+            almacen._temporizador.join(5)
+        self.assertEqual(archivo.execute(escritas).fetchone(), (len(VISTA_SEGUNDOS.buckets) + 2,))
+    
+    def test_acceso_restringido(self):
+        """Test: /metrics pide staff o el token configurado"""
+        self.usuario.is_staff = False
+        self.usuario.save()
+        self.assertEqual(self.client.get(reverse('metricas')).status_code, 403)
+        
+        with self.settings(METRICAS_TOKEN='secreto'):
+            self.assertEqual(Client().get(reverse('metricas')).status_code, 403)
+            response = Client().get(reverse('metricas'), HTTP_AUTHORIZATION='Bearer secreto')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+
+class PerfiladorTest(AjustesTemporales, TestCase):
+    """Tests para el perfilado a pedido de requests"""
+    
+    def setUp(self):
+        self.directorio = self.directorio_temporal()
+        self.ajustar(PERFILADOR_ACTIVO=True, PERFILES_DIR=self.directorio)
+        
+        self.usuario = User.objects.create_user(
+            username='testuser', password='testpass123', is_staff=True, is_superuser=True
+        )
+        self.client = Client()
+        self.client.login(username='testuser', password='testpass123')
+        libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        Ejemplar.objects.create(libro=libro, codigo_ejemplar='EJ-001', estado='disponible')
+    
+    def test_perfil_a_pedido_de_staff(self):
+        """Test: ?perfilar=1 guarda pstats, pilas y el registro con URL y consultas"""
+        response = self.client.get(reverse('listar_libros'), {'perfilar': '1'})
+        
+        perfil = Perfil.objects.get(id=response['X-Perfil'])
+        self.assertEqual(perfil.url, '/libros/?perfilar=1')
+        self.assertEqual(perfil.usuario, self.usuario)
+        self.assertEqual(perfil.estado, 200)
+        self.assertGreater(perfil.consultas, 0)
+        # El .prof se puede abrir con pstats y el .collapsed existe (vacío si el request duró menos que una muestra)
+        pstats.Stats(os.path.join(self.directorio, f'{perfil.archivo}.prof'))
+        self.assertTrue(os.path.exists(os.path.join(self.directorio, f'{perfil.archivo}.collapsed')))
+        
+        # Listado y descarga desde el admin
+        self.assertContains(self.client.get(reverse('admin:gestion_libros_perfil_changelist')), 'pstats')
+        descarga = self.client.get(reverse('admin:gestion_libros_perfil_descargar', args=[perfil.id, 'prof']))
+        self.assertEqual(descarga.status_code, 200)
+    
+    def test_muestreador_de_pila(self):
+        """Test: El muestreador cuenta las pilas del hilo en formato collapsed"""
+        muestreador = MuestreadorPila(threading.get_ident(), 0.001)
+        muestreador.start()
+        time.sleep(0.05)
+        muestreador.detener()
+        
+        self.assertGreater(sum(muestreador.pilas.values()), 0)
+        self.assertIn('test_muestreador_de_pila', next(iter(muestreador.pilas)))
+    
+    def test_solo_staff(self):
+        """Test: Un usuario que no es staff no puede perfilar"""
+        self.usuario.is_staff = False
+        self.usuario.save()
+        response = self.client.get(reverse('listar_libros'), HTTP_X_PERFILAR='1')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Perfil'))
+        self.assertFalse(Perfil.objects.exists())
+
+
+class ConsultasLentasTest(TestCase):
+    """Tests para la captura de consultas lentas con su plan"""
+    
+    def setUp(self):
+        socio = Socio.objects.create(dni='12345678', numero_socio='SOC-001', nombre='Juan Pérez')
+        libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        ejemplar = Ejemplar.objects.create(libro=libro, codigo_ejemplar='EJ-001', estado='disponible')
+        Prestamo.objects.create(socio=socio, ejemplar=ejemplar, fecha_devolucion_prevista=date.today())
+    
+    def test_normalizar_agrupa_consultas_iguales(self):
+        """Test: La huella ignora valores y el largo de las listas IN"""
+        self.assertEqual(
+            normalizar("SELECT * FROM t WHERE id IN (%s, %s, %s) AND nombre = 'Ana'  LIMIT 21"),
+            normalizar("SELECT * FROM t WHERE id IN (%s) AND nombre = 'Juan' LIMIT 5"),
+        )
+        self.assertEqual(normalizar('SELECT * FROM t1 WHERE x = 3'), 'SELECT * FROM t1 WHERE x = ?')
+    
+    @override_settings(CONSULTAS_LENTAS_MS=0)
+    def test_captura_plan_y_p95(self):
+        """Test: Una consulta lenta se guarda una vez por huella con su plan y sus llamadas"""
+        for observacion in ('a', 'b'):
+            list(Prestamo.objects.filter(observaciones__icontains=observacion))
+        
+        consulta = ConsultaLenta.objects.get(sql__contains='FROM "gestion_libros_prestamo" WHERE')
+        self.assertEqual(consulta.llamadas, 2)
+        self.assertEqual(len(consulta.duraciones), 2)
+        self.assertGreaterEqual(consulta.max_ms, consulta.p95_ms)
+        self.assertNotEqual(consulta.plan, '')
+        if connection.vendor == 'sqlite':
+            # Un LIKE sobre observaciones no tiene índice: recorre la tabla
+            self.assertTrue(consulta.escaneo_completo)
+    
+    @override_settings(CONSULTAS_LENTAS_MS=0)
+    def test_se_escriben_despues_de_la_respuesta(self):
+        """Test: En un request se escriben al terminar, aunque la transacción de la vista se deshaga"""
+        request_started.send(sender=self.__class__)
+        try:
+            with transaction.atomic():
+                list(Prestamo.objects.filter(observaciones__icontains='x'))
+                transaction.set_rollback(True)
+            self.assertFalse(ConsultaLenta.objects.exists())
+        finally:
+            request_finished.send(sender=self.__class__)
+        self.assertTrue(ConsultaLenta.objects.filter(sql__contains='FROM "gestion_libros_prestamo" WHERE').exists())
+    
+    def test_maximo_y_p95_redondeados(self):
+        """Test: El máximo se compara con la duración redondeada: el p95 nunca lo supera"""
+        registrar(connection, 'SELECT 1', (), 1.005999)
+        consulta = ConsultaLenta.objects.get()
+        self.assertEqual((consulta.p95_ms, consulta.max_ms), (1.01, 1.01))
+    
+    def test_recorre_tabla(self):
+        """Test: Se detectan los planes que leen tablas completas"""
+        self.assertTrue(recorre_tabla('SCAN gestion_libros_multa'))
+        self.assertTrue(recorre_tabla('Seq Scan on gestion_libros_multa  (cost=0.00..1.01 rows=1 width=8)'))
+        self.assertFalse(recorre_tabla('SEARCH gestion_libros_multa USING INDEX multa_socio_idx (socio_id=?)'))
+        self.assertFalse(recorre_tabla('SCAN gestion_libros_prestamo USING COVERING INDEX prestamo_idx'))
+
+
+class FragmentosCacheadosTest(AjustesTemporales, TestCase):
+    """Tests para la cache de fragmentos de los listados de libros y socios"""
+    
+    def setUp(self):
+        self.metricas_propias()
+        caches['fragmentos'].clear()
+        
+        User.objects.create_user(username='testuser', password='testpass123')
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.login(username='testuser', password='testpass123')
+        self.libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        self.ejemplar = Ejemplar.objects.create(libro=self.libro, codigo_ejemplar='EJ-001', estado='disponible')
+        self.socio = Socio.objects.create(dni='12345678', numero_socio='SOC-001', nombre='Juan Pérez')
+    
+    def conteo(self, fragmento, resultado):
+        linea = f'biblioteca_fragmentos_total{{fragmento="{fragmento}",resultado="{resultado}"}} '
+        valores = [fila[len(linea):] for fila in exportar().splitlines() if fila.startswith(linea)]
+        return int(valores[0]) if valores else 0
+    
+    def test_update_actualiza_la_version(self):
+        """Test: save() y también update() cambian fecha_actualizacion"""
+        antes = self.ejemplar.fecha_actualizacion
+        Ejemplar.objects.filter(pk=self.ejemplar.pk).update(estado='mantenimiento')
+        self.ejemplar.refresh_from_db()
+        self.assertGreater(self.ejemplar.fecha_actualizacion, antes)
+        
+        antes = self.libro.fecha_actualizacion
+        self.libro.dar_de_baja()
+        self.libro.refresh_from_db()
+        self.assertGreater(self.libro.fecha_actualizacion, antes)
+    
+    def test_segunda_visita_sale_de_cache(self):
+        """Test: La tabla se renderiza una vez y después se sirve sin leer los libros"""
+        primera = self.client.get(reverse('listar_libros'))
+        with self.assertNumQueries(4):  # sesión, usuario, ETag y versiones de las filas
+            segunda = self.client.get(reverse('listar_libros'))
+        
+        # Igual salvo el token CSRF, que Django enmascara distinto en cada request
+        sin_token = lambda response: re.sub(r'value="[\w]{64}"', '', response.content.decode())
+        self.assertEqual(sin_token(primera), sin_token(segunda))
+        self.assertContains(segunda, 'EJ-001')
+        self.assertEqual(self.conteo('tabla_libros', 'miss'), 1)
+        self.assertEqual(self.conteo('tabla_libros', 'hit'), 1)
+        self.assertEqual(self.conteo('fila_libro', 'miss'), 1)
+    
+    def test_cambios_invalidan_solo_la_fila(self):
+        """Test: Editar un libro o un ejemplar rearma su fila; las demás salen de la cache"""
+        otro = Libro.objects.create(isbn='9780201633610', titulo='Design Patterns', autor='Gamma et al.')
+        self.client.get(reverse('listar_libros'))
+        
+        self.libro.titulo = 'Clean Code (2da edición)'
+        self.libro.save()
+        self.assertContains(self.client.get(reverse('listar_libros')), 'Clean Code (2da edición)')
+        Ejemplar.objects.filter(pk=self.ejemplar.pk).update(estado='mantenimiento')
+        self.assertContains(self.client.get(reverse('listar_libros')), 'En Mantenimiento')
+        
+        self.assertEqual(self.conteo('tabla_libros', 'miss'), 3)
+        self.assertEqual(self.conteo('fila_libro', 'miss'), 4)  # 2 al principio y 1 por cada cambio
+        self.assertEqual(self.conteo('fila_libro', 'hit'), 2)  # la de `otro`
+        self.assertContains(self.client.get(reverse('listar_libros') + '?q=Design'), otro.titulo)
+    
+    def test_deuda_del_socio_invalida_su_fila(self):
+        """Test: Una multa nueva cambia la versión de la fila del socio aunque el socio no cambie"""
+        self.client.get(reverse('listar_socios'))
+        prestamo = Prestamo.objects.create(
+            socio=self.socio, ejemplar=self.ejemplar, fecha_devolucion_prevista=date.today()
+        )
+        Multa.objects.create(socio=self.socio, prestamo=prestamo, monto=Decimal('150.00'), motivo='retraso')
+        
+        self.assertContains(self.client.get(reverse('listar_socios')), 'Multa: $150')
+        self.assertEqual(self.conteo('fila_socio', 'miss'), 2)
+    
+    def test_cada_sesion_recibe_su_token_csrf(self):
+        """Test: Los formularios cacheados llevan el token CSRF de quien pide la página"""
+        self.client.get(reverse('listar_libros'))
+        
+        otro = Client(enforce_csrf_checks=True)
+        otro.login(username='testuser', password='testpass123')
+        response = otro.get(reverse('listar_libros'))
+        self.assertEqual(self.conteo('tabla_libros', 'hit'), 1)
+        
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode()).group(1)
+        self.assertNotContains(response, 'csrf-token')
+        response = otro.post(
+            reverse('dar_baja_ejemplar', args=['EJ-001']), {'csrfmiddlewaretoken': token}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Ejemplar.objects.filter(codigo_ejemplar='EJ-001').exists())
+
+
+class GetCondicionalTest(TestCase):
+    """Tests para el ETag de las páginas de solo lectura y la compresión"""
+    
+    def setUp(self):
+        User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        self.libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        Ejemplar.objects.create(libro=self.libro, codigo_ejemplar='EJ-001', estado='disponible')
+    
+    def test_sin_cambios_responde_304(self):
+        """Test: Con el mismo ETag se responde 304 con una sola consulta además de sesión y usuario"""
+        response = self.client.get(reverse('listar_libros'))
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+        
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('listar_libros'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+    
+    def test_cambios_cambian_el_etag(self):
+        """Test: Editar un ejemplar (también con update()) o cambiar de usuario cambia el ETag"""
+        etag = self.client.get(reverse('listar_libros'))['ETag']
+        Ejemplar.objects.filter(codigo_ejemplar='EJ-001').update(estado='mantenimiento')
+        response = self.client.get(reverse('listar_libros'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        
+        etag = response['ETag']
+        User.objects.create_user(username='otro', password='testpass123')
+        otro = Client()
+        otro.login(username='otro', password='testpass123')
+        self.assertEqual(otro.get(reverse('listar_libros'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+    
+    def test_mensajes_pendientes_se_muestran(self):
+        """Test: Después de un POST con mensaje la página se vuelve a enviar aunque no cambie"""
+        etag = self.client.get(reverse('listar_libros'))['ETag']
+        self.client.post(reverse('realizar_prestamo'), {'socio_id': '99999999', 'ejemplar_id': 'EJ-001'})
+        
+        response = self.client.get(reverse('listar_libros'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertContains(response, 'No existe un socio con DNI 99999999')
+    
+    def test_compresion_solo_de_texto(self):
+        """Test: El HTML se comprime con gzip; los PDFs no"""
+        response = self.client.get(reverse('listar_libros'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'Clean Code', gzip.decompress(response.content))
+        
+        socio = Socio.objects.create(dni='12345678', numero_socio='SOC-001', nombre='Juan Pérez')
+        response = self.client.get(reverse('estado_cuenta_socio_pdf', args=[socio.id]), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertTrue(response.has_header('ETag'))
+
+
+@override_settings(API_TOKENS=['token-kiosco'])
+class ApiJsonTest(TestCase):
+    """Tests para la API JSON de las terminales de autopréstamo"""
+    
+    def setUp(self):
+        self.client = Client(HTTP_AUTHORIZATION='Bearer token-kiosco')
+        self.libros = [
+            Libro.objects.create(isbn=f'978000000000{i}', titulo=f'Libro {i}', autor='Autor') for i in range(5)
+        ]
+        Ejemplar.objects.create(libro=self.libros[0], codigo_ejemplar='EJ-001', estado='disponible')
+        self.socio = Socio.objects.create(dni='12345678', numero_socio='SOC-001', nombre='Juan Pérez')
+    
+    def test_autenticacion(self):
+        """Test: Sin token ni sesión 401; con sesión se exige CSRF en los POST"""
+        self.assertEqual(Client().get(reverse('api_libros')).status_code, 401)
+        self.assertEqual(Client(HTTP_AUTHORIZATION='Bearer otro').get(reverse('api_libros')).status_code, 401)
+        
+        User.objects.create_user(username='testuser', password='testpass123')
+        sesion = Client(enforce_csrf_checks=True)
+        sesion.login(username='testuser', password='testpass123')
+        self.assertEqual(sesion.get(reverse('api_libros')).status_code, 200)
+        self.assertEqual(sesion.post(reverse('api_prestamos'), '{}', content_type='application/json').status_code, 403)
+    
+    def test_campos_y_cursor(self):
+        """Test: ?campos= devuelve solo esos campos y el cursor recorre todas las filas una vez"""
+        response = self.client.get(reverse('api_libros'), {'campos': 'isbn,disponibles', 'limite': 2})
+        datos = response.json()
+        self.assertEqual(datos['datos'][0], {'isbn': '9780000000000', 'disponibles': 1})
+        
+        isbns = [fila['isbn'] for fila in datos['datos']]
+        while datos['siguiente']:
+            datos = self.client.get(reverse('api_libros'), {'campos': 'isbn', 'limite': 2, 'cursor': datos['siguiente']}).json()
+            isbns += [fila['isbn'] for fila in datos['datos']]
+        self.assertEqual(isbns, sorted(libro.isbn for libro in self.libros))
+        
+        response = self.client.get(reverse('api_libros'), {'campos': 'isbn,precio'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('precio', response.json()['error'])
+    
+    def test_cursor_armado_a_mano(self):
+        """Test: Un cursor que no es una pk válida del recurso es un 400, no un error del servidor"""
+        for pk in ['abc', 2 ** 70, 1.5, None]:
+            cursor = base64.urlsafe_b64encode(json.dumps(pk).encode('utf-8')).decode('ascii')
+            response = self.client.get(reverse('api_prestamos'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, pk)
+            self.assertEqual(response.json()['error'], 'Cursor inválido.')
+    
+    def test_lote_con_una_consulta(self):
+        """Test: ?isbn=a,b,c se responde con una sola consulta IN e informa los que no existen"""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('api_libros'), {'isbn': '9780000000003,9780000000001,9999999999999'})
+        datos = response.json()
+        self.assertEqual([fila['isbn'] for fila in datos['datos']], ['9780000000003', '9780000000001'])
+        self.assertEqual(datos['no_encontrados'], ['9999999999999'])
+    
+    def test_prestamo_y_devolucion(self):
+        """Test: Préstamo y devolución con las reglas de circulación; los errores con su estado HTTP"""
+        url = reverse('api_prestamos')
+        response = self.client.post(url, {'socio': '12345678', 'ejemplar': 'EJ-001'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        prestamo = response.json()['datos']
+        self.assertEqual((prestamo['socio'], prestamo['ejemplar']), ('12345678', 'EJ-001'))
+        
+        # El ejemplar ya está prestado: 409. Socio inexistente: 404
+        response = self.client.post(url, {'socio': '12345678', 'ejemplar': 'EJ-001'}, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        response = self.client.post(url, {'socio': '999', 'ejemplar': 'EJ-001'}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        
+        url = reverse('api_devolucion', args=[prestamo['id']])
+        response = self.client.post(url, {'estado_fisico': 'dañado', 'monto': 'abc'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {'estado_fisico': ['dañado']}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {'estado_fisico': 'dañado', 'monto': 500}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['datos']['fecha_devolucion_real'])
+        self.assertEqual([multa['motivo'] for multa in response.json()['multas']], ['daño'])
+        self.assertEqual(Ejemplar.objects.get(codigo_ejemplar='EJ-001').estado, 'mantenimiento')
+        
+        # La multa pendiente aparece en la deuda del socio
+        response = self.client.get(reverse('api_socios'), {'dni': '12345678', 'campos': 'deuda_pendiente'})
+        self.assertEqual(Decimal(response.json()['datos'][0]['deuda_pendiente']), Decimal('500'))
+
+
+class VistasAsyncTest(TestCase):
+    """Tests para las vistas async (ORM async) atendidas por el handler ASGI"""
+    
+    def setUp(self):
+        User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        self.async_client.cookies = self.client.cookies  # la misma sesión
+        self.libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        self.ejemplar = Ejemplar.objects.create(libro=self.libro, codigo_ejemplar='EJ-001', estado='disponible')
+        self.socio = Socio.objects.create(dni='12345678', numero_socio='SOC-001', nombre='Juan Pérez')
+    
+    @override_settings(INSTRUMENTACION_ACTIVA=True, INSTRUMENTACION_UMBRAL_MS=60000, INSTRUMENTACION_UMBRAL_CONSULTAS=1000)
+    async def test_estadisticas_en_modo_async(self):
+        """Test: Los indicadores del inicio en JSON; el middleware mide las consultas también en async"""
+        response = await self.async_client.get(reverse('estadisticas'))
+        
+        datos = response.json()
+        self.assertEqual((datos['total_libros'], datos['ejemplares_disponibles'], datos['total_socios']), (1, 1, 1))
+        # Sesión, usuario, seis conteos y la suma de multas
+        self.assertIn('desc="9 consultas"', response['Server-Timing'])
+        
+        response = await AsyncClient().get(reverse('estadisticas'))
+        self.assertEqual(response.status_code, 302)
+    
+    async def test_autocompletar_y_disponibilidad(self):
+        """Test: Autocompletado por tipo y disponibilidad con la próxima devolución si no quedan ejemplares"""
+        response = await self.async_client.get(reverse('autocompletar'), {'tipo': 'socios', 'q': 'juan'})
+        self.assertEqual(response.json()['resultados'], [{'dni': '12345678', 'numero_socio': 'SOC-001', 'nombre': 'Juan Pérez'}])
+        response = await self.async_client.get(reverse('autocompletar'), {'tipo': 'libros', 'q': 'c'})
+        self.assertEqual(response.json()['resultados'], [])
+        
+        response = await self.async_client.get(reverse('disponibilidad', args=[self.libro.isbn]))
+        self.assertEqual(response.json()['ejemplares'], ['EJ-001'])
+        
+        await Prestamo.objects.acreate(
+            socio=self.socio, ejemplar=self.ejemplar, fecha_devolucion_prevista=date(2030, 1, 15)
+        )
+        await Ejemplar.objects.filter(pk=self.ejemplar.pk).aupdate(estado='prestado')
+        datos = (await self.async_client.get(reverse('disponibilidad', args=[self.libro.isbn]))).json()
+        self.assertEqual((datos['disponibles'], datos['proxima_devolucion']), (0, '2030-01-15'))
+        
+        response = await self.async_client.get(reverse('disponibilidad', args=['0000000000']))
+        self.assertEqual(response.status_code, 404)
+    
+    def test_comprobante_async(self):
+        """Test: El comprobante (vista async) se genera igual con el cliente WSGI"""
+        prestamo = Prestamo.objects.create(
+            socio=self.socio, ejemplar=self.ejemplar, fecha_devolucion_prevista=date.today() + timedelta(days=7)
+        )
+        response = self.client.get(reverse('comprobante_prestamo_pdf', args=[prestamo.id]))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+
+
+
+class EventosEjemplaresTest(TestCase):
+    """Tests para la disponibilidad en vivo (Server-Sent Events)"""
+    
+    def setUp(self):
+        User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        self.async_client.cookies = self.client.cookies
+        self.libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        self.ejemplar = Ejemplar.objects.create(libro=self.libro, codigo_ejemplar='EJ-001', estado='disponible')
+        self.socio = Socio.objects.create(dni='12345678', numero_socio='SOC-001', nombre='Juan Pérez')
+    
+    @override_settings(EVENTOS_WSGI=True, EVENTOS_DURACION_WSGI=0)
+    def test_prestamo_y_devolucion_publican_eventos(self):
+        """Test: El préstamo y la devolución publican el estado del ejemplar y los disponibles del libro"""
+        prestamo = prestar(self.socio, self.ejemplar)
+        devolver(prestamo, 'bueno')
+        
+        response = self.client.get(reverse('eventos_ejemplares'), {'desde': 0}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response['Content-Type'].startswith('text/event-stream'))
+        self.assertNotIn('Content-Encoding', response)  # gzip retendría los eventos
+        contenido = b''.join(response.streaming_content).decode('utf-8')
+        
+        mensajes = re.findall(r'id: (\d+)\nevent: ejemplar\ndata: (.*)\n\n', contenido)
+        self.assertEqual(len(mensajes), 2)
+        datos = [json.loads(data) for _, data in mensajes]
+        self.assertEqual([(d['estado'], d['disponibles']) for d in datos], [('prestado', 0), ('disponible', 1)])
+        self.assertEqual(datos[0]['isbn'], self.libro.isbn)
+        
+        # Con Last-Event-ID solo llega lo posterior
+        response = self.client.get(reverse('eventos_ejemplares'), HTTP_LAST_EVENT_ID=mensajes[0][0])
+        self.assertEqual(b''.join(response.streaming_content).decode('utf-8').count('event: ejemplar'), 1)
+    
+    def test_baja_de_libro_publica_sus_ejemplares(self):
+        """Test: Dar de baja un libro publica un evento por cada ejemplar que estaba activo"""
+        Ejemplar.objects.create(libro=self.libro, codigo_ejemplar='EJ-002', estado='disponible')
+        Ejemplar.objects.create(libro=self.libro, codigo_ejemplar='EJ-003', estado='mantenimiento', activo=False)
+        
+        self.client.post(reverse('dar_baja_libro', args=[self.libro.isbn]))
+        
+        eventos = EventoEjemplar.objects.order_by('codigo_ejemplar')
+        self.assertEqual(
+            list(eventos.values_list('codigo_ejemplar', 'activo', 'disponibles')),
+            [('EJ-001', False, 0), ('EJ-002', False, 0)],
+        )
+    
+    @override_settings(EVENTOS_WSGI=True, EVENTOS_DURACION_WSGI=0)
+    def test_recargar_si_se_purgaron_eventos(self):
+        """Test: Un cliente que se perdió eventos ya purgados recibe 'recargar'"""
+        primero = publicar(self.ejemplar)
+        publicar(self.ejemplar)
+        EventoEjemplar.objects.filter(pk=primero.pk).delete()
+        
+        response = self.client.get(reverse('eventos_ejemplares'), HTTP_LAST_EVENT_ID=str(primero.pk - 1))
+        contenido = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('event: recargar', contenido)
+        self.assertNotIn('event: ejemplar', contenido)
+        
+        response = self.client.get(reverse('eventos_ejemplares'), {'desde': 'x'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_sin_flujo_con_wsgi(self):
+        """Test: Con WSGI las páginas no abren el flujo y el endpoint responde 204, salvo con EVENTOS_WSGI"""
+        response = self.client.get(reverse('eventos_ejemplares'))
+        self.assertEqual(response.status_code, 204)
+        for pagina in ('listar_libros', 'listar_prestamos'):
+            self.assertNotContains(self.client.get(reverse(pagina)), 'disponibilidad.js')
+        
+        with self.settings(EVENTOS_WSGI=True):
+            self.assertContains(self.client.get(reverse('listar_libros')), 'disponibilidad.js')
+    
+    def test_evento_confirmado_fuera_de_orden(self):
+        """Test: Un evento con id menor que se confirma después que uno mayor se entrega igual"""
+        primero, demorado, ultimo = (publicar(self.ejemplar) for _ in range(3))
+        # Lo que ve otra conexión mientras la transacción de `demorado` sigue abierta
+        EventoEjemplar.objects.filter(pk=demorado.pk).delete()
+        
+        cursor = Cursor(primero.pk)
+        eventos = leer(cursor)
+        self.assertEqual([evento['id'] for evento in eventos], [ultimo.pk])
+        self.assertEqual(cursor.recibir(ultimo.pk), primero.pk)  # Last-Event-ID: antes del hueco
+        
+        demorado.save()  # se confirma
+        eventos = leer(cursor)
+        self.assertEqual([evento['id'] for evento in eventos], [demorado.pk])
+        self.assertEqual(cursor.recibir(demorado.pk), ultimo.pk)
+        self.assertEqual(leer(cursor), [])
+    
+    @override_settings(EVENTOS_DURACION=1, EVENTOS_INTERVALO=0.1)
+    async def test_flujo_async(self):
+        """Test: Con ASGI una conexión abierta recibe los cambios que se publican mientras espera"""
+        response = await self.async_client.get(reverse('eventos_ejemplares'))
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        flujo = aiter(response.streaming_content)
+        self.assertEqual(await anext(flujo), b'retry: 100\n\n')
+        
+        self.ejemplar.estado = 'mantenimiento'
+        await sync_to_async(publicar)(self.ejemplar)
+        avisar()  # lo que hace on_commit al confirmarse la transacción
+        evento = (await anext(flujo)).decode('utf-8')
+        self.assertIn('"estado": "mantenimiento"', evento)
+        self.assertIn('"disponibles": 1', evento)  # el ejemplar no se guardó: sigue disponible en la base
+        
+        # Termina sola al cumplirse EVENTOS_DURACION
+        self.assertEqual([fragmento async for fragmento in flujo], [])
+        
+        response = await AsyncClient().get(reverse('eventos_ejemplares'))
+        self.assertEqual(response.status_code, 302)
+
+class ReservasTest(TestCase):
+    """Tests para las reservas de libros (PROCESO 5)"""
+    
+    def setUp(self):
+        User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        self.libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        self.ejemplar = Ejemplar.objects.create(libro=self.libro, codigo_ejemplar='EJ-001', estado='disponible')
+        self.socios = [
+            Socio.objects.create(dni=f'1000000{i}', numero_socio=f'SOC-00{i}', nombre=f'Socio {i}')
+            for i in range(3)
+        ]
+    
+    def test_reservar_solo_sin_ejemplares_disponibles(self):
+        """Test: No se reserva un libro con ejemplares disponibles ni dos veces el mismo"""
+        with self.assertRaises(ErrorCirculacion):
+            reservar(self.socios[1], self.libro)
+        
+        prestar(self.socios[0], self.ejemplar)
+        reserva = reservar(self.socios[1], self.libro)
+        self.assertEqual(reserva.posicion(), 1)
+        self.assertEqual(reservar(self.socios[2], self.libro).posicion(), 2)
+        with self.assertRaises(ErrorCirculacion):
+            reservar(self.socios[1], self.libro)
+    
+    def test_devolucion_aparta_para_la_primera_de_la_cola(self):
+        """Test: El ejemplar devuelto queda apartado para la primera reserva y solo ese socio lo lleva"""
+        prestamo = prestar(self.socios[0], self.ejemplar)
+        primera = reservar(self.socios[1], self.libro)
+        segunda = reservar(self.socios[2], self.libro)
+        
+        devolver(prestamo, 'bueno')
+        self.ejemplar.refresh_from_db()
+        primera.refresh_from_db()
+        self.assertEqual(self.ejemplar.estado, 'reservado')
+        self.assertEqual((primera.estado, primera.ejemplar_id), ('asignada', self.ejemplar.pk))
+        self.assertEqual(segunda.posicion(), 1)
+        
+        with self.assertRaises(ErrorCirculacion):
+            prestar(self.socios[2], self.ejemplar)
+        prestar(self.socios[1], self.ejemplar)
+        primera.refresh_from_db()
+        self.assertEqual(primera.estado, 'cumplida')
+    
+    def test_cancelar_pasa_el_ejemplar_a_la_siguiente(self):
+        """Test: Al cancelar una reserva asignada el ejemplar pasa a la siguiente, y si no hay queda disponible"""
+        prestamo = prestar(self.socios[0], self.ejemplar)
+        primera = reservar(self.socios[1], self.libro)
+        segunda = reservar(self.socios[2], self.libro)
+        devolver(prestamo, 'bueno')
+        
+        response = self.client.post(reverse('cancelar_reserva', args=[primera.id]))
+        self.assertRedirects(response, reverse('listar_reservas'))
+        segunda.refresh_from_db()
+        self.assertEqual((segunda.estado, segunda.ejemplar_id), ('asignada', self.ejemplar.pk))
+        
+        self.client.post(reverse('cancelar_reserva', args=[segunda.id]))
+        self.ejemplar.refresh_from_db()
+        self.assertEqual(self.ejemplar.estado, 'disponible')
+        self.assertFalse(Reserva.objects.filter(estado__in=Reserva.ACTIVAS).exists())
+    
+    def test_socio_dado_de_baja_no_recibe_el_ejemplar(self):
+        """Test: La cola saltea las reservas de socios inactivos"""
+        prestamo = prestar(self.socios[0], self.ejemplar)
+        primera = reservar(self.socios[1], self.libro)
+        segunda = reservar(self.socios[2], self.libro)
+        Socio.objects_all.filter(pk=self.socios[1].pk).update(activo=False)
+        
+        devolver(prestamo, 'bueno')
+        primera.refresh_from_db()
+        segunda.refresh_from_db()
+        self.assertEqual(primera.estado, 'pendiente')
+        self.assertEqual((segunda.estado, segunda.ejemplar_id), ('asignada', self.ejemplar.pk))
+    
+    def test_baja_de_libro_con_reservas_activas(self):
+        """Test: Un libro con reservas activas no se da de baja hasta cancelarlas"""
+        # Con el ejemplar prestado se puede reservar; al devolverlo queda apartado para la reserva
+        prestamo = prestar(self.socios[0], self.ejemplar)
+        reserva = reservar(self.socios[1], self.libro)
+        devolver(prestamo, 'bueno')
+        
+        self.client.post(reverse('dar_baja_libro', args=[self.libro.isbn]))
+        self.libro.refresh_from_db()
+        self.assertTrue(self.libro.activo)
+        
+        self.client.post(reverse('cancelar_reserva', args=[reserva.id]))
+        self.client.post(reverse('dar_baja_libro', args=[self.libro.isbn]))
+        self.libro.refresh_from_db()
+        self.assertFalse(self.libro.activo)
+    
+    def test_vista_registrar_y_listar(self):
+        """Test: La reserva se registra desde el formulario y aparece en la cola del libro"""
+        self.ejemplar.estado = 'prestado'
+        self.ejemplar.save()
+        response = self.client.post(
+            reverse('registrar_reserva'), {'socio_id': self.socios[1].dni, 'libro_isbn': self.libro.isbn}
+        )
+        self.assertRedirects(response, reverse('listar_reservas'))
+        self.assertEqual(Reserva.objects.get().socio, self.socios[1])
+        
+        response = self.client.get(reverse('listar_reservas'), {'isbn': self.libro.isbn})
+        self.assertContains(response, self.socios[1].nombre)
+        self.assertEqual(response.context['reservas'][0].lugar, 1)
+    
+    def test_admin_sin_alta_de_reservas(self):
+        """Test: El admin de reservas es de solo lectura: no ofrece el formulario de alta"""
+        User.objects.create_superuser('admin', password='admin')
+        self.client.login(username='admin', password='admin')
+        self.assertEqual(self.client.get(reverse('admin:gestion_libros_reserva_add')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('admin:gestion_libros_reserva_changelist')).status_code, 200)
+
+
+class NotificacionesTest(TestCase):
+    """Tests para el outbox de avisos por correo"""
+    
+    def setUp(self):
+        self.libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        self.ejemplar = Ejemplar.objects.create(libro=self.libro, codigo_ejemplar='EJ-001', estado='disponible')
+        self.socio = Socio.objects.create(dni='12345678', numero_socio='SOC-001', nombre='Juan Pérez', email='juan@example.com')
+    
+    def devolver_con_retraso(self):
+        prestamo = prestar(self.socio, self.ejemplar)
+        Prestamo.objects.filter(pk=prestamo.pk).update(fecha_devolucion_prevista=date.today() - timedelta(days=5))
+        prestamo.refresh_from_db()
+        devolver(prestamo, 'bueno')
+    
+    def test_multa_se_envia_una_sola_vez(self):
+        """Test: La multa encola un aviso en la devolución y el worker lo envía una sola vez"""
+        self.devolver_con_retraso()
+        self.assertEqual(len(mail.outbox), 0)  # la devolución no manda correos
+        aviso = Notificacion.objects.get()
+        self.assertEqual((aviso.tipo, aviso.destinatario, aviso.estado), ('multa', 'juan@example.com', 'pendiente'))
+        
+        # Encolar de nuevo la misma clave no lo duplica
+        encolar([(aviso.clave, aviso.tipo, self.socio, aviso.datos)])
+        self.assertEqual(Notificacion.objects.count(), 1)
+        
+        self.assertEqual(procesar(), (1, 0, 0))
+        self.assertEqual(procesar(), (0, 0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Se registró una multa por Retraso en Devolución')
+        self.assertIn('Juan Pérez', mail.outbox[0].body)
+        self.assertEqual(mail.outbox[0].extra_headers['Message-ID'].split('@')[0], f'<notificacion-{aviso.pk}')
+        aviso.refresh_from_db()
+        self.assertEqual((aviso.estado, aviso.intentos), ('enviada', 1))
+    
+    def test_reserva_asignada_y_socio_sin_email(self):
+        """Test: Se avisa al socio cuyo ejemplar quedó apartado; un socio sin email no recibe avisos"""
+        sin_email = Socio.objects.create(dni='87654321', numero_socio='SOC-002', nombre='Ana Gómez')
+        prestamo = prestar(sin_email, self.ejemplar)
+        reservar(self.socio, self.libro)
+        devolver(prestamo, 'bueno')
+        
+        aviso = Notificacion.objects.get()
+        self.assertEqual((aviso.tipo, aviso.socio), ('reserva_asignada', self.socio))
+        self.assertEqual(aviso.datos['codigo_ejemplar'], 'EJ-001')
+    
+    @override_settings(EMAIL_BACKEND='gestion_libros.tests.CorreoCaido', NOTIFICACIONES_REINTENTOS=2)
+    def test_reintentos_con_espera(self):
+        """Test: Un envío fallido se reprograma con espera exponencial y al agotar los reintentos queda fallido"""
+        self.devolver_con_retraso()
+        
+        self.assertEqual(procesar(), (0, 1, 0))
+        aviso = Notificacion.objects.get()
+        self.assertEqual((aviso.estado, aviso.intentos), ('pendiente', 1))
+        self.assertIn('SMTPServerDisconnected', aviso.error)
+        self.assertGreater(aviso.proximo_intento, timezone.now() + timedelta(seconds=50))
+        self.assertEqual(procesar(), (0, 0, 0))  # todavía no venció la espera
+        
+        Notificacion.objects.update(proximo_intento=timezone.now())
+        salida = StringIO()
+        call_command('procesar_outbox', stdout=salida)
+        self.assertIn('1 avisos agotaron los reintentos', salida.getvalue())
+        self.assertEqual(Notificacion.objects.get().estado, 'fallida')
+    
+    def test_reclamo_se_extiende_durante_el_lote(self):
+        """Test: Si el reclamo puede vencer mientras se envía un correo, se extiende para los que faltan"""
+        self.devolver_con_retraso()
+        aviso = Notificacion.objects.get()
+        encolar([('multa:otra', aviso.tipo, self.socio, aviso.datos)])
+        
+        avisos = reclamar(10)
+        with self.assertNumQueries(0):
+            entregar(avisos)
+        
+        Notificacion.objects.update(proximo_intento=timezone.now())
+        with self.settings(NOTIFICACIONES_RECLAMO=5, EMAIL_TIMEOUT=10):
+            avisos = reclamar(10)
+            # Cada envío puede tardar más que el reclamo: se extiende antes de cada uno, para los que faltan
+            with CaptureQueriesContext(connection) as consultas:
+                entregar(avisos)
+        extendidos = [consulta['sql'] for consulta in consultas.captured_queries if consulta['sql'].startswith('UPDATE')]
+        self.assertEqual(len(extendidos), 2)
+        self.assertTrue(extendidos[1].endswith(f'IN ({avisos[1].pk}))'))
+
+
+class RecordatoriosTest(AjustesTemporales, TestCase):
+    """Tests para los recordatorios de devolución"""
+    
+    def setUp(self):
+        self.metricas_propias()
+        self.libro = Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        self.socios = [
+            Socio.objects.create(dni=f'1000000{i}', numero_socio=f'SOC-00{i}', nombre=f'Socio {i}', email=email)
+            for i, email in enumerate(['socio0@example.com', None, 'socio2@example.com'])
+        ]
+        # Socio 0: dos vencidos, uno que vence mañana y uno lejano; socio 1 sin email; socio 2 uno vencido
+        for numero, (socio, dias) in enumerate([(0, -3), (0, -1), (0, 1), (0, 10), (1, -5), (2, -2)]):
+            ejemplar = Ejemplar.objects.create(libro=self.libro, codigo_ejemplar=f'EJ-{numero:03d}', estado='prestado')
+            Prestamo.objects.create(
+                socio=self.socios[socio], ejemplar=ejemplar,
+                fecha_devolucion_prevista=timezone.localdate() + timedelta(days=dias)
+            )
+    
+    def test_un_resumen_por_socio(self):
+        """Test: Cada socio con email recibe un solo correo con sus préstamos vencidos y por vencer"""
+        with self.assertNumQueries(1):
+            resultado = enviar_recordatorios(dias_antes=2, tamaño_lote=1)
+        self.assertEqual(resultado, (2, 0, 4))
+        
+        self.assertEqual([correo.to for correo in mail.outbox], [['socio0@example.com'], ['socio2@example.com']])
+        resumen = mail.outbox[0]
+        self.assertEqual(resumen.subject, 'Tenés 2 préstamo(s) vencido(s) para devolver')
+        self.assertIn('EJ-000', resumen.body)
+        self.assertIn('hace 3 días', resumen.body)
+        self.assertIn('EJ-002', resumen.body)
+        self.assertNotIn('EJ-003', resumen.body)  # vence en 10 días
+    
+    @override_settings(EMAIL_BACKEND='gestion_libros.tests.CorreoQueSeCorta')
+    def test_servidor_caido_a_mitad_de_la_corrida(self):
+        """Test: Un error a mitad de lote no descuenta lo ya enviado y sin conexión el resto cuenta como fallido"""
+        socio = Socio.objects.create(dni='10000003', numero_socio='SOC-003', nombre='Socio 3', email='socio3@example.com')
+        ejemplar = Ejemplar.objects.create(libro=self.libro, codigo_ejemplar='EJ-099', estado='prestado')
+        Prestamo.objects.create(socio=socio, ejemplar=ejemplar, fecha_devolucion_prevista=timezone.localdate())
+        
+        # Lote 1: socio 0 sale y socio 2 falla; la conexión no se reabre y el lote 2 (socio 3) no sale
+        self.assertEqual(enviar_recordatorios(dias_antes=2, tamaño_lote=2), (1, 2, 3))
+        self.assertIn('biblioteca_recordatorios_total{resultado="fallido"} 2\n', exportar())
+    
+    @override_settings(EMAIL_BACKEND='gestion_libros.tests.CorreoQueRechaza')
+    def test_una_direccion_rechazada_no_frena_el_lote(self):
+        """Test: Una dirección rechazada falla solo su correo; si se corta la conexión se reabre y se reintenta"""
+        # socio0 rechazado; el correo de socio2 encuentra la conexión cortada y sale al reintentar
+        self.assertEqual(enviar_recordatorios(dias_antes=2), (1, 1, 1))
+        self.assertEqual([correo.to for correo in mail.outbox], [['socio2@example.com']])
+    
+    def test_comando(self):
+        """Test: El comando simula o envía los recordatorios"""
+        salida = StringIO()
+        call_command('enviar_recordatorios', simular=True, stdout=salida)
+        self.assertIn('Se enviarían 2 recordatorios (4 préstamos)', salida.getvalue())
+        self.assertEqual(len(mail.outbox), 0)
+        
+        call_command('enviar_recordatorios', dias_antes=0, stdout=salida)
+        self.assertIn('2 recordatorios enviados (3 préstamos)', salida.getvalue())
+
+
+class DatosSinteticosTest(TestCase):
+    """Tests para el generador de datos sintéticos"""
+    
+    def test_genera_datos_consistentes(self):
+        """Test: Misma semilla, mismos datos; ningún ejemplar queda con dos préstamos activos"""
+        # Las fechas son relativas al momento de la simulación: se comparan socio y ejemplar
+        simular = lambda: [fila[:3] for fila in simular_biblioteca(20, 2, 10, 200, semilla=3)[Prestamo]]
+        self.assertEqual(simular(), simular())
+        creados = generar_datos(20, 2, 10, 200, semilla=3)
+        
+        self.assertEqual(creados['libros'], 20)
+        self.assertEqual(Ejemplar.objects_all.count(), 40)
+        self.assertEqual(Prestamo.objects.count(), creados['préstamos'])
+        self.assertGreater(creados['préstamos'], 0)
+        activos = Prestamo.objects.filter(fecha_devolucion_real__isnull=True)
+        self.assertFalse(activos.values('ejemplar').annotate(n=Count('id')).filter(n__gt=1).exists())
+        self.assertFalse(Prestamo.objects.filter(fecha_devolucion_real__lt=F('fecha_inicio')).exists())
+        
+        # Los ids se asignaron a mano: el ORM sigue creando después del último
+        socio = Socio.objects.create(dni='99999999', numero_socio='SOC-X', nombre='Nuevo')
+        self.assertGreater(socio.id, Socio.objects_all.exclude(id=socio.id).aggregate(m=Max('id'))['m'])
+    
+    def test_comando_no_pisa_datos_existentes(self):
+        """Test: Sin --borrar, el comando no escribe sobre una base con libros"""
+        Libro.objects.create(isbn='9780132350884', titulo='Clean Code', autor='Robert C. Martin')
+        with self.assertRaises(CommandError):
+            call_command('generar_datos', libros=5, socios=5, prestamos=10, stdout=StringIO())
+        
+        call_command('generar_datos', libros=5, socios=5, prestamos=10, borrar=True, stdout=StringIO())
+        self.assertEqual(Libro.objects_all.count(), 5)
+
+
+@override_settings(CONSULTAS_LENTAS_MS=None)
+class BenchmarkVistasTest(TransactionTestCase):
+    """
+    Tests para los presupuestos de consultas del benchmark de vistas.
+    Sin la transacción de TestCase: cada atomic() sumaría sus SAVEPOINT a la cuenta.
+    """
+    
+    def test_vistas_dentro_del_presupuesto(self):
+        """Test: Todas las URLs responden y ninguna excede su presupuesto de consultas"""
+        generar_datos(30, 2, 20, 300)
+        usuario = User.objects.create_superuser('admin', password='admin')
+        lista = escenarios()
+        
+        resultados = correr(lista, usuario, repeticiones=1)
+        
+        self.assertEqual(comparar(lista, resultados, {}, tolerancia=0), [])
+    
+    def test_regresion_contra_linea_base(self):
+        """Test: Un p50 por encima de la tolerancia cuenta como falla"""
+        escenario = Escenario('index', 9, None)
+        linea_base = {'index': {'consultas': 9, 'p50_ms': 10.0}}
+        
+        self.assertEqual(comparar([escenario], {'index': {'consultas': 9, 'p50_ms': 12.0}}, linea_base, 0.25), [])
+        fallas = comparar([escenario], {'index': {'consultas': 10, 'p50_ms': 13.0}}, linea_base, 0.25)
+        self.assertEqual(len(fallas), 2)
+
+
+@override_settings(CONSULTAS_LENTAS_MS=None)
+class PruebaCargaTest(LiveServerTestCase):
+    """Tests para el generador de carga HTTP contra un servidor real"""
+    
+    def test_mostradores_prestan_y_devuelven(self):
+        """Test: Los mostradores inician sesión, prestan, devuelven y cobran multas sin errores, y al terminar se borra lo de la corrida"""
+        generar_datos(20, 2, 10, 100)
+        multas_de_la_biblioteca = list(Multa.objects.values_list('id', 'pagada'))
+        servidor = urlsplit(self.live_server_url)
+        # Un solo mostrador: el servidor de tests comparte una conexión SQLite entre sus hilos
+        with puestos_de_prueba(1) as (puestos, usuario, clave):
+            self.assertNotEqual(clave, 'carga')
+            resultados = asyncio.run(correr_carga(
+                servidor.hostname, servidor.port, puestos, 'mostrador', duracion=1, usuario=usuario, clave=clave, pausa=0,
+            ))
+            
+            resumen = resultados.resumen()
+            self.assertEqual(dict(resultados.errores), {})
+            self.assertGreater(resumen['prestar']['cantidad'], 0)
+            self.assertGreater(resumen['pagar_multa']['cantidad'], 0)
+            self.assertEqual(resumen['devolver']['cantidad'], resumen['prestar']['cantidad'])
+        
+        # Las multas de la biblioteca no se tocaron y no queda nada de la corrida
+        self.assertEqual(list(Multa.objects.values_list('id', 'pagada')), multas_de_la_biblioteca)
+        self.assertFalse(User.objects.filter(username=usuario).exists())
+        self.assertFalse(Socio.objects_all.filter(nombre__startswith='Prueba de carga').exists())
+        self.assertFalse(Libro.objects_all.filter(isbn__startswith='CARGA').exists())
+    
+    def test_url_solo_con_base_de_prueba(self):
+        """Test: --url no corre sobre una base que no es temporal ni de benchmark"""
+        self.assertTrue(es_base_de_prueba())  # la base de tests, en memoria
+        original = connection.settings_dict['NAME']
+        connection.settings_dict['NAME'] = '/srv/biblioteca/db.sqlite3'
+        try:
+            self.assertFalse(es_base_de_prueba())
+            with self.assertRaises(CommandError):
+                call_command('prueba_carga', url='http://127.0.0.1:8000')
+        finally:
+            connection.settings_dict['NAME'] = original
+        self.assertFalse(User.objects.exists())
+    
+    def test_detecta_mensajes_de_error(self):
+        """Test: Un préstamo rechazado cuenta como error aunque responda 302"""
+        servidor = urlsplit(self.live_server_url)
+        
+        async def prestar_inexistente(puestos, usuario, clave):
+            resultados = Resultados()
+            puesto = Mostrador(ClienteHTTP(servidor.hostname, servidor.port), resultados, puestos[0][0], None, [], 0, None)
+            await puesto.iniciar_sesion(usuario, clave)
+            await puesto.operacion('prestar', 'POST', '/prestamos/nuevo/', {'socio_id': 'X', 'ejemplar_id': 'X'})
+            await puesto.cliente.cerrar()
+            return resultados
+        
+        with puestos_de_prueba(1) as corrida:
+            resultados = asyncio.run(prestar_inexistente(*corrida))
+        self.assertEqual(sum(resultados.errores['prestar'].values()), 1)
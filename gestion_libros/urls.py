@@ -19,8 +19,24 @@ from .views import (
     dar_baja_ejemplar,
     listar_multas,
     pagar_multa,
+    listar_reservas,
+    registrar_reserva,
+    cancelar_reserva,
     generar_comprobante_multa,
     generar_comprobante_prestamo,
+    generar_estado_cuenta_socio,
+    metricas,
+    estadisticas,
+    autocompletar,
+    disponibilidad,
+    eventos_ejemplares,
+    api_libros,
+    api_ejemplares,
+    api_socios,
+    api_prestamos,
+    api_devolucion,
+    api_multas,
+    api_pago_multa,
 )
 
 urlpatterns = [
@@ -32,6 +48,7 @@ urlpatterns = [
     path('socios/', listar_socios, name='listar_socios'),
     path('prestamos/', listar_prestamos, name='listar_prestamos'),
     path('multas/', listar_multas, name='listar_multas'),
+    path('reservas/', listar_reservas, name='listar_reservas'),
     
     # Gestión de libros y ejemplares
     path('libros/nuevo/', registrar_libro, name='registrar_libro'),
@@ -53,7 +70,32 @@ urlpatterns = [
     # PROCESO 4: Gestión de multas
     path('multas/<int:multa_id>/pagar/', pagar_multa, name='pagar_multa'),
     
+    # PROCESO 5: Reservas de libros
+    path('reservas/nueva/', registrar_reserva, name='registrar_reserva'),
+    path('reservas/<int:reserva_id>/cancelar/', cancelar_reserva, name='cancelar_reserva'),
+    
     # PDFs/Comprobantes
     path('multas/<int:multa_id>/pdf/', generar_comprobante_multa, name='comprobante_multa_pdf'),
     path('prestamos/<int:prestamo_id>/pdf/', generar_comprobante_prestamo, name='comprobante_prestamo_pdf'),
+    path('socios/<int:socio_id>/estado-cuenta/', generar_estado_cuenta_socio, name='estado_cuenta_socio_pdf'),
+    
+    # Métricas de operación (formato Prometheus)
+    path('metrics', metricas, name='metricas'),
+    
+    # Consultas rápidas en JSON (vistas async, ver views/consultas.py)
+    path('consultas/estadisticas/', estadisticas, name='estadisticas'),
+    path('consultas/autocompletar/', autocompletar, name='autocompletar'),
+    path('consultas/disponibilidad/<str:isbn>/', disponibilidad, name='disponibilidad'),
+    
+    # Disponibilidad en vivo (Server-Sent Events, ver views/eventos.py)
+    path('eventos/ejemplares/', eventos_ejemplares, name='eventos_ejemplares'),
+    
+    # API JSON para terminales de autopréstamo (ver views/api.py)
+    path('api/v1/libros/', api_libros, name='api_libros'),
+    path('api/v1/ejemplares/', api_ejemplares, name='api_ejemplares'),
+    path('api/v1/socios/', api_socios, name='api_socios'),
+    path('api/v1/prestamos/', api_prestamos, name='api_prestamos'),
+    path('api/v1/prestamos/<int:prestamo_id>/devolucion/', api_devolucion, name='api_devolucion'),
+    path('api/v1/multas/', api_multas, name='api_multas'),
+    path('api/v1/multas/<int:multa_id>/pago/', api_pago_multa, name='api_pago_multa'),
 ]
\ No newline at end of file
@@ -15,7 +15,12 @@ from .libro import (
     dar_baja_libro,
     dar_baja_ejemplar
 )
-from .pdf import generar_comprobante_multa, generar_comprobante_prestamo
+from .pdf import generar_comprobante_multa, generar_comprobante_prestamo, generar_estado_cuenta_socio
+from .metricas import metricas
+from .consultas import estadisticas, autocompletar, disponibilidad
+from .eventos import eventos_ejemplares
+from .reserva import listar_reservas, registrar_reserva, cancelar_reserva
+from .api import api_libros, api_ejemplares, api_socios, api_prestamos, api_devolucion, api_multas, api_pago_multa
 
 __all__ = [
     'index',
@@ -32,7 +37,23 @@ __all__ = [
     'dar_baja_libro',
     'dar_baja_ejemplar',
     'listar_multas',
+    'listar_reservas',
+    'registrar_reserva',
+    'cancelar_reserva',
     'pagar_multa',
     'generar_comprobante_multa',
     'generar_comprobante_prestamo',
+    'generar_estado_cuenta_socio',
+    'metricas',
+    'estadisticas',
+    'autocompletar',
+    'disponibilidad',
+    'eventos_ejemplares',
+    'api_libros',
+    'api_ejemplares',
+    'api_socios',
+    'api_prestamos',
+    'api_devolucion',
+    'api_multas',
+    'api_pago_multa',
 ]
\ No newline at end of file
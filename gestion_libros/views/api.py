@@ -0,0 +1,188 @@
+"""
+API JSON para terminales de autopréstamo y kioscos (/api/v1/).
+
+Lecturas de los cinco recursos (ver api.py) y las escrituras de circulación,
+que usan las mismas reglas que las vistas HTML (circulacion.prestar/devolver):
+
+    POST /api/v1/prestamos/                       {"socio": dni, "ejemplar": código, "dias_prestamo": 14}
+    POST /api/v1/prestamos/<id>/devolucion/       {"estado_fisico": "bueno|dañado|perdido", "monto": "500", "observaciones": ""}
+    POST /api/v1/multas/<id>/pago/
+
+Las respuestas son {"datos": ...} o {"error": mensaje}: 400 datos inválidos,
+401 sin autenticar, 404 no existe, 405 método, 409 una regla de circulación
+lo impide.
+
+Autenticación: `Authorization: Bearer <token>` con un token de API_TOKENS (sin
+CSRF: no hay cookies que un sitio ajeno pueda usar) o la sesión del
+bibliotecario (con CSRF, como cualquier formulario).
+"""
+
+import functools
+import json
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+from .. import api
+from ..circulacion import DatosInvalidos, ErrorCirculacion, devolver, prestar
+from ..metricas import MULTAS_PAGADAS, medir_vista
+from ..models import Ejemplar, Multa, Prestamo, Socio
+from ..replicas import solo_lectura
+
+
+def _token_valido(request):
+    autorizacion = request.headers.get('Authorization', '')
+    return any(constant_time_compare(autorizacion, f'Bearer {token}') for token in settings.API_TOKENS)
+
+
+def _responder(datos, estado=200):
+    return JsonResponse(datos, status=estado, json_dumps_params={'ensure_ascii': False})
+
+
+def _error(mensaje, estado):
+    return _responder({'error': mensaje}, estado)
+
+
+def endpoint(*metodos):
+    """
+    Decorador de las vistas de la API: autenticación (token o sesión), métodos
+    permitidos y errores como JSON.
+    """
+    def decorador(vista):
+        def atender(request, *args, **kwargs):
+            try:
+                return vista(request, *args, **kwargs)
+            except api.ErrorAPI as e:
+                return _error(str(e), e.estado)
+        con_csrf = csrf_protect(atender)
+
+        @csrf_exempt
+        @functools.wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method not in metodos:
+                response = _error(f'Método {request.method} no permitido.', 405)
+                response['Allow'] = ', '.join(metodos)
+                return response
+            if _token_valido(request):
+                return atender(request, *args, **kwargs)
+            if request.user.is_authenticated:
+                return con_csrf(request, *args, **kwargs)
+            return _error('Autenticación requerida.', 401)
+        return envoltura
+    return decorador
+
+
+@solo_lectura
+def _leer(request, recurso):
+    """Una página del recurso o, con ?<clave>=a,b,c, las filas de esas claves"""
+    if recurso.clave in request.GET:
+        datos, no_encontrados = recurso.lote(request.GET)
+        return _responder({'datos': datos, 'no_encontrados': no_encontrados})
+    datos, siguiente = recurso.pagina(request.GET)
+    return _responder({'datos': datos, 'siguiente': siguiente})
+
+
+def _cuerpo(request):
+    """El cuerpo JSON del pedido (un objeto)"""
+    try:
+        datos = json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        raise api.ErrorAPI('El cuerpo no es JSON válido.')
+    if not isinstance(datos, dict):
+        raise api.ErrorAPI('El cuerpo tiene que ser un objeto JSON.')
+    return datos
+
+
+@endpoint('GET')
+@medir_vista
+def api_libros(request):
+    return _leer(request, api.LIBROS)
+
+
+@endpoint('GET')
+@medir_vista
+def api_ejemplares(request):
+    return _leer(request, api.EJEMPLARES)
+
+
+@endpoint('GET')
+@medir_vista
+def api_socios(request):
+    return _leer(request, api.SOCIOS)
+
+
+@endpoint('GET', 'POST')
+@medir_vista
+def api_prestamos(request):
+    """GET: listado de préstamos. POST: PROCESO 1, préstamo de un ejemplar"""
+    if request.method == 'GET':
+        return _leer(request, api.PRESTAMOS)
+
+    datos = _cuerpo(request)
+    dias_prestamo = datos.get('dias_prestamo')
+    if dias_prestamo is not None and (not isinstance(dias_prestamo, int) or isinstance(dias_prestamo, bool)):
+        raise api.ErrorAPI('dias_prestamo tiene que ser un número entero.')
+    try:
+        socio = Socio.objects_all.get(dni=str(datos.get('socio', '')))
+        ejemplar = Ejemplar.objects.select_related('libro').get(codigo_ejemplar=str(datos.get('ejemplar', '')))
+        prestamo = prestar(socio, ejemplar, dias_prestamo)
+    except Socio.DoesNotExist:
+        raise api.ErrorAPI(f'No existe un socio con DNI {datos.get("socio")}.', 404)
+    except Ejemplar.DoesNotExist:
+        raise api.ErrorAPI(f'No existe un ejemplar con código {datos.get("ejemplar")}.', 404)
+    except ErrorCirculacion as e:
+        raise api.ErrorAPI(str(e), 409)
+    return _responder({'datos': api.PRESTAMOS.fila(prestamo.pk)}, estado=201)
+
+
+@endpoint('POST')
+@medir_vista
+def api_devolucion(request, prestamo_id):
+    """PROCESO 2: devolución de un préstamo, con las multas que genera"""
+    datos = _cuerpo(request)
+    estado_fisico = datos.get('estado_fisico', 'bueno')
+    if not isinstance(estado_fisico, str):
+        raise api.ErrorAPI('estado_fisico tiene que ser un texto.')
+    try:
+        prestamo = Prestamo.objects.select_related('socio', 'ejemplar__libro').get(pk=prestamo_id)
+    except Prestamo.DoesNotExist:
+        raise api.ErrorAPI(f'No existe el préstamo {prestamo_id}.', 404)
+    monto = datos.get('monto')
+    try:
+        multas = devolver(
+            prestamo,
+            estado_fisico,
+            monto=None if monto is None else str(monto),
+            observaciones=str(datos.get('observaciones') or ''),
+        )
+    except DatosInvalidos as e:
+        raise api.ErrorAPI(str(e), 400)
+    except ErrorCirculacion as e:
+        raise api.ErrorAPI(str(e), 409)
+    return _responder({
+        'datos': api.PRESTAMOS.fila(prestamo.pk),
+        'multas': [api.MULTAS.fila(multa.pk) for multa in multas if multa],
+    })
+
+
+@endpoint('GET')
+@medir_vista
+def api_multas(request):
+    return _leer(request, api.MULTAS)
+
+
+@endpoint('POST')
+@medir_vista
+def api_pago_multa(request, multa_id):
+    """PROCESO 4: pago de una multa"""
+    try:
+        multa = Multa.objects.get(pk=multa_id)
+    except Multa.DoesNotExist:
+        raise api.ErrorAPI(f'No existe la multa {multa_id}.', 404)
+    if multa.pagada:
+        raise api.ErrorAPI(f'La multa ya fue pagada el {multa.fecha_pago.strftime("%d/%m/%Y")}.', 409)
+    multa.marcar_como_pagada()
+    MULTAS_PAGADAS.inc()
+    return _responder({'datos': api.MULTAS.fila(multa.pk)})
@@ -4,40 +4,66 @@ Este archivo maneja las páginas de listado (catálogo, socios, préstamos, mult
 y las operaciones básicas como préstamos y pagos de multas.
 """
 
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
 from django.db import models
 from datetime import timedelta
-from ..models import Libro, Ejemplar, Socio, Prestamo, Multa
+from ..models import Libro, Ejemplar, Socio, Prestamo, Multa, Reserva
 from ..singleton import obtener_configuracion
+from ..replicas import solo_lectura
+from ..metricas import MULTAS_PAGADAS, medir_vista
+from ..cache_http import condicional
+from .. import eventos, fragmentos
 
 
+# Tablas que muestra cada listado: su versión es el ETag de la página (ver cache_http.py)
+CATALOGO = [(Libro.objects_all, 'fecha_actualizacion'), (Ejemplar.objects_all, 'fecha_actualizacion')]
+SOCIOS = [(Socio.objects_all, 'fecha_actualizacion')]
+PRESTAMOS = [(Prestamo.objects, 'pk', 'fecha_devolucion_real')]
+MULTAS = [(Multa.objects, 'pk', 'fecha_pago')]
+RESERVAS = [(Reserva.objects, 'fecha_actualizacion')]
+
+# Indicadores del inicio: se cuenta cada consulta (también los cuenta la vista async `estadisticas`).
+# Los managers `objects` ya excluyen lo dado de baja (ver models/managers.py)
+INDICADORES = {
+    'total_libros': Libro.objects.all(),
+    'total_ejemplares': Ejemplar.objects.all(),
+    'total_socios': Socio.objects.all(),
+    'prestamos_activos': Prestamo.objects.filter(fecha_devolucion_real__isnull=True),
+    'ejemplares_disponibles': Ejemplar.objects.filter(estado='disponible'),
+    'multas_pendientes': Multa.objects.filter(pagada=False),
+}
+MULTAS_PENDIENTES = Multa.objects.filter(pagada=False)
+
+
+@solo_lectura
+@condicional(CATALOGO + SOCIOS + PRESTAMOS + MULTAS)
 def index(request):
     """Vista principal del sistema"""
-    context = {
-        'total_libros': Libro.objects.filter(activo=True).count(),
-        'total_ejemplares': Ejemplar.objects.filter(activo=True).count(),
-        'total_socios': Socio.objects.filter(activo=True).count(),
-        'prestamos_activos': Prestamo.objects.filter(fecha_devolucion_real__isnull=True).count(),
-        'ejemplares_disponibles': Ejemplar.objects.filter(estado='disponible', activo=True).count(),
-        'multas_pendientes': Multa.objects.filter(pagada=False).count(),
-        'monto_multas_pendientes': Multa.objects.filter(pagada=False).aggregate(
-            total=models.Sum('monto'))['total'] or 0,
-    }
+    context = {nombre: consulta.count() for nombre, consulta in INDICADORES.items()}
+    context['monto_multas_pendientes'] = MULTAS_PENDIENTES.aggregate(total=models.Sum('monto'))['total'] or 0
     return render(request, 'gestion_libros/index.html', context)
 
 
 @login_required
+@solo_lectura
+@medir_vista
+@condicional(CATALOGO)
 def listar_libros(request):
     """
     Lista todos los libros activos con funcionalidad de búsqueda.
     Permite filtrar por ISBN, título, autor o editorial.
     También muestra los ejemplares de cada libro (expandibles).
     """
-    libros_todos = Libro.objects.filter(activo=True)  # Para el select del modal de ejemplares
-    libros = libros_todos  # Empezamos con todos, luego filtramos si hay búsqueda
+    # Solo activos. Los disponibles y la versión de los ejemplares de cada fila salen de la misma consulta
+    libros = Libro.objects.annotate(
+        disponibles=models.Count('ejemplares', filter=models.Q(ejemplares__estado='disponible', ejemplares__activo=True)),
+        cantidad_ejemplares=models.Count('ejemplares'),
+        version_ejemplares=models.Max('ejemplares__fecha_actualizacion'),
+    )
     query = request.GET.get('q', '').strip()
     filtro_tipo = request.GET.get('filtro', 'todos')
     
@@ -59,19 +85,33 @@ def listar_libros(request):
                 models.Q(editorial__icontains=query)
             )
     
+    # La versión de cada fila decide qué fragmentos cacheados siguen sirviendo (ver fragmentos.py).
+    # Si la tabla entera está en cache, los libros y sus ejemplares no llegan a leerse.
+    versiones = list(libros.values_list(
+        'isbn', 'fecha_actualizacion', 'version_ejemplares', 'cantidad_ejemplares', 'disponibles'
+    ))
     context = {
-        'libros': libros,  # Para la tabla (con filtros)
+        'libros': libros.prefetch_related('ejemplares'),  # Para la tabla (con filtros)
+        'version_libros': fragmentos.version(versiones),
         'query': query,
         'filtro_tipo': filtro_tipo,
-        'total_resultados': libros.count()
+        'total_resultados': len(versiones),
+        'categorias_libro': Libro.CATEGORIAS,
+        'eventos_en_vivo': eventos.en_vivo(request),
     }
     return render(request, 'gestion_libros/listar_libros.html', context)
 
 
 @login_required
+@solo_lectura
+@medir_vista
+@condicional(SOCIOS + MULTAS)
 def listar_socios(request):
     """Lista todos los socios con funcionalidad de búsqueda"""
-    socios = Socio.objects.all()
+    # Incluye los inactivos (se filtran con el parámetro estado). La deuda se suma en la misma consulta
+    socios = Socio.objects_all.annotate(
+        deuda_pendiente=models.Sum('multas__monto', filter=models.Q(multas__pagada=False))
+    )
     query = request.GET.get('q', '').strip()
     filtro_tipo = request.GET.get('filtro', 'todos')
     estado_filtro = request.GET.get('estado', 'todos')
@@ -98,20 +138,26 @@ def listar_socios(request):
     elif estado_filtro == 'inactivos':
         socios = socios.filter(activo=False)
     
+    versiones = list(socios.values_list('id', 'fecha_actualizacion', 'deuda_pendiente'))
     context = {
         'socios': socios,
+        'version_socios': fragmentos.version(versiones),
         'query': query,
         'filtro_tipo': filtro_tipo,
         'estado_filtro': estado_filtro,
-        'total_resultados': socios.count()
+        'total_resultados': len(versiones),
+        'categorias_socio': Socio.CATEGORIAS,
     }
     return render(request, 'gestion_libros/listar_socios.html', context)
 
 
 @login_required
+@solo_lectura
+@medir_vista
+@condicional(PRESTAMOS + SOCIOS + CATALOGO + RESERVAS)
 def listar_prestamos(request):
     """Lista todos los préstamos con funcionalidad de búsqueda"""
-    prestamos = Prestamo.objects.all().order_by('-fecha_inicio')
+    prestamos = Prestamo.objects.select_related('socio', 'ejemplar__libro').order_by('-fecha_inicio')
     query = request.GET.get('q', '').strip()
     filtro_tipo = request.GET.get('filtro', 'todos')
     estado_filtro = request.GET.get('estado', 'todos')
@@ -144,8 +190,10 @@ def listar_prestamos(request):
         )
     
     # Datos para modales
-    socios_activos = Socio.objects.filter(activo=True)
-    ejemplares_disponibles = Ejemplar.objects.filter(estado='disponible', activo=True).select_related('libro')
+    socios_activos = Socio.objects.all()
+    ejemplares_disponibles = Ejemplar.objects.filter(estado='disponible').select_related('libro')
+    # Los ejemplares apartados por reservas solo se prestan al socio que reservó
+    apartados = Reserva.objects.filter(estado='asignada').select_related('socio', 'ejemplar__libro').order_by('fecha_asignacion')
     
     context = {
         'prestamos': prestamos,
@@ -155,6 +203,9 @@ def listar_prestamos(request):
         'total_resultados': prestamos.count(),
         'socios': socios_activos,
         'ejemplares': ejemplares_disponibles,
+        'apartados': apartados,
+        'dias_archivo': settings.ARCHIVO_HORIZONTE_DIAS,
+        'eventos_en_vivo': eventos.en_vivo(request),
     }
     return render(request, 'gestion_libros/listar_prestamos.html', context)
 
@@ -175,7 +226,7 @@ def realizar_prestamo(request):
         ejemplar_id = request.POST.get('ejemplar_id')
         
         try:
-            socio = Socio.objects.get(dni=socio_id)
+            socio = Socio.objects_all.get(dni=socio_id)
             ejemplar = Ejemplar.objects.get(codigo_ejemplar=ejemplar_id)
             
             # Validaciones
@@ -231,11 +282,14 @@ def realizar_prestamo(request):
 # GESTIÓN DE MULTAS
 # ============================================================
 @login_required
+@solo_lectura
+@medir_vista
+@condicional(MULTAS + SOCIOS + CATALOGO)
 def listar_multas(request):
     """
     Lista todas las multas del sistema con filtros
     """
-    multas = Multa.objects.all().order_by('-fecha')
+    multas = Multa.objects.select_related('socio', 'prestamo__ejemplar__libro').order_by('-fecha')
     query = request.GET.get('q', '').strip()
     estado_filtro = request.GET.get('estado', 'todos')
     
@@ -263,6 +317,7 @@ def listar_multas(request):
 
 
 @login_required
+@medir_vista
 def pagar_multa(request, multa_id):
     """Marca una multa como pagada (solo POST)"""
     multa = get_object_or_404(Multa, id=multa_id)
@@ -274,6 +329,7 @@ def pagar_multa(request, multa_id):
         messages.warning(request, f'⚠️ Esta multa ya fue pagada el {multa.fecha_pago.strftime("%d/%m/%Y")}.')
     else:
         multa.marcar_como_pagada()
+        MULTAS_PAGADAS.inc()
         messages.success(request, f'✅ Multa de ${multa.monto} pagada. {multa.socio.nombre} puede hacer préstamos.')
     
     return redirect('listar_multas')
\ No newline at end of file
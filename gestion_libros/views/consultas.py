@@ -0,0 +1,118 @@
+"""
+Consultas rápidas para el inicio, los formularios y los kioscos (vistas async).
+
+Son lecturas que pasan casi todo el tiempo esperando a la base: con ASGI cada
+request es una corrutina y mientras espera el servidor atiende a otros, en
+lugar de ocupar un worker. Usan el ORM async (acount, aget, async for) y
+responden JSON.
+
+    GET /consultas/estadisticas/                       indicadores del inicio
+    GET /consultas/autocompletar/?tipo=socios&q=gar    hasta 10 coincidencias
+    GET /consultas/disponibilidad/<isbn>/              ejemplares disponibles del libro
+
+Con WSGI (runserver, gunicorn) también funcionan: Django las ejecuta con
+async_to_sync.
+"""
+
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.db import models
+from django.http import JsonResponse
+
+from ..metricas import medir_vista
+from ..models import Ejemplar, Libro, Prestamo, Socio
+from ..replicas import solo_lectura
+from .base import INDICADORES, MULTAS_PENDIENTES
+
+
+# Resultados del autocompletado y largo mínimo del texto buscado
+LIMITE_AUTOCOMPLETAR = 10
+MINIMO_AUTOCOMPLETAR = 2
+
+# tipo: (consulta, lookups que se combinan con OR, campos de cada resultado)
+AUTOCOMPLETADO = {
+    'libros': (
+        Libro.objects.order_by('titulo'),
+        ['isbn__startswith', 'titulo__icontains', 'autor__icontains'],
+        ['isbn', 'titulo', 'autor'],
+    ),
+    'socios': (
+        Socio.objects.order_by('nombre'),
+        ['dni__startswith', 'numero_socio__istartswith', 'nombre__icontains'],
+        ['dni', 'numero_socio', 'nombre'],
+    ),
+    'ejemplares': (
+        Ejemplar.objects.filter(estado='disponible').order_by('codigo_ejemplar'),
+        ['codigo_ejemplar__istartswith', 'libro__titulo__icontains'],
+        ['codigo_ejemplar', 'libro__titulo'],
+    ),
+}
+
+
+def login_requerido(vista):
+    """login_required para vistas async (el de Django 4.2 solo envuelve vistas sincrónicas)"""
+    @functools.wraps(vista)
+    async def envoltura(request, *args, **kwargs):
+        # request.user se carga de la sesión con consultas: en el hilo del request
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await vista(request, *args, **kwargs)
+    return envoltura
+
+
+@login_requerido
+@solo_lectura
+@medir_vista
+async def estadisticas(request):
+    """Los indicadores del inicio, para tableros que se refrescan solos"""
+    datos = {nombre: await consulta.acount() for nombre, consulta in INDICADORES.items()}
+    total = await MULTAS_PENDIENTES.aaggregate(total=models.Sum('monto'))
+    datos['monto_multas_pendientes'] = total['total'] or 0
+    return JsonResponse(datos)
+
+
+@login_requerido
+@solo_lectura
+@medir_vista
+async def autocompletar(request):
+    """Libros, socios activos o ejemplares disponibles que coinciden con ?q="""
+    tipo = request.GET.get('tipo', 'libros')
+    if tipo not in AUTOCOMPLETADO:
+        return JsonResponse({'error': f'Tipo desconocido: {tipo}.'}, status=400)
+    texto = request.GET.get('q', '').strip()
+    if len(texto) < MINIMO_AUTOCOMPLETAR:
+        return JsonResponse({'resultados': []})
+
+    consulta, lookups, campos = AUTOCOMPLETADO[tipo]
+    condicion = models.Q()
+    for lookup in lookups:
+        condicion |= models.Q(**{lookup: texto})
+    resultados = [fila async for fila in consulta.filter(condicion).values(*campos)[:LIMITE_AUTOCOMPLETAR]]
+    return JsonResponse({'resultados': resultados})
+
+
+@login_requerido
+@solo_lectura
+@medir_vista
+async def disponibilidad(request, isbn):
+    """Ejemplares disponibles de un libro y, si no hay, la próxima devolución prevista"""
+    try:
+        libro = await Libro.objects.aget(isbn=isbn)
+    except Libro.DoesNotExist:
+        return JsonResponse({'error': f'No existe un libro con ISBN {isbn}.'}, status=404)
+
+    disponibles = Ejemplar.objects.filter(libro=libro, estado='disponible')
+    codigos = [codigo async for codigo in disponibles.values_list('codigo_ejemplar', flat=True)]
+    proxima = None
+    if not codigos:
+        activos = Prestamo.objects.filter(ejemplar__libro=libro, fecha_devolucion_real__isnull=True)
+        proxima = (await activos.aaggregate(proxima=models.Min('fecha_devolucion_prevista')))['proxima']
+    return JsonResponse({
+        'isbn': libro.isbn,
+        'titulo': libro.titulo,
+        'disponibles': len(codigos),
+        'ejemplares': codigos,
+        'proxima_devolucion': proxima,
+    })
@@ -5,23 +5,27 @@ PROCESO 2: Devolución de un Libro
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.utils import timezone
-from decimal import Decimal
 from django.db import IntegrityError, DatabaseError
-from ..models import Prestamo, Multa
-from ..singleton import obtener_configuracion
+from ..models import Prestamo, Reserva
+from ..circulacion import DatosInvalidos, ErrorCirculacion, devolver
+from ..metricas import medir_vista
 from django.contrib.auth.decorators import login_required
 
 
 @login_required
+@medir_vista
 def devolver_libro(request, prestamo_id):
     """
     Proceso de devolución de un libro:
     1. Cerrar el préstamo (registrar fecha_devolucion_real)
     2. Cambiar estado del ejemplar según condición física
     3. Aplicar multas si corresponde (retraso, daño, pérdida)
+    4. Si el libro tiene reservas en espera, apartar el ejemplar para la primera
     """
-    prestamo = get_object_or_404(Prestamo, id=prestamo_id)
+    prestamo = get_object_or_404(
+        Prestamo.objects.select_related('socio', 'ejemplar__libro'),
+        id=prestamo_id
+    )
     
     # Verificar que el préstamo esté activo
     if not prestamo.esta_activo():
@@ -29,144 +33,72 @@ def devolver_libro(request, prestamo_id):
         return redirect('listar_prestamos')
     
     if request.method == 'POST':
-        estado_fisico = request.POST.get('estado_fisico')  # 'bueno', 'dañado', 'perdido'
+        estado_fisico = request.POST.get('estado_fisico') or 'bueno'  # 'bueno', 'dañado', 'perdido'
         observaciones = request.POST.get('observaciones', '')
-        
-        # Obtener configuración singleton
-        config = obtener_configuracion()
+        # Daño y pérdida: el bibliotecario ingresa el monto de la multa
+        campo = 'monto_daño' if estado_fisico == 'dañado' else 'monto_perdida'
         
         try:
-            # Registrar fecha de devolución real
-            prestamo.fecha_devolucion_real = timezone.now()
-            if observaciones:
-                prestamo.observaciones = observaciones
-            prestamo.save()
-        
-            # CASO 1: Libro en buen estado
-            if estado_fisico == 'bueno':
-                # Cambiar estado del ejemplar a disponible
-                prestamo.ejemplar.estado = 'disponible'
-                prestamo.ejemplar.save()
-                
-                # Verificar si hay retraso
-                if prestamo.tiene_retraso():
-                    dias_retraso = prestamo.dias_retraso()
-                    monto_multa = config.calcular_multa_retraso(dias_retraso)
-                    
-                    # Crear multa por retraso
-                    Multa.objects.create(
-                        socio=prestamo.socio,
-                        prestamo=prestamo,
-                        monto=monto_multa,
-                        motivo='retraso',
-                        descripcion=f'Retraso de {dias_retraso} días en la devolución del libro "{prestamo.ejemplar.libro.titulo}"'
-                    )
-                    
-                    messages.warning(
-                        request, 
-                        f'⚠ Libro devuelto con retraso.<br>'
-                        f'Días de retraso: {dias_retraso}<br>'
-                        f'Multa aplicada: ${monto_multa}'
-                    )
-                else:
-                    messages.success(request, f'✓ Libro "{prestamo.ejemplar.libro.titulo}" devuelto exitosamente a tiempo.')
+            # Validar, cerrar el préstamo, actualizar el ejemplar y crear las multas (una transacción)
+            multa_retraso, multa_estado = devolver(
+                prestamo, estado_fisico, monto=request.POST.get(campo), observaciones=observaciones
+            )
+        except DatosInvalidos as e:
+            messages.error(request, str(e))
+            return redirect('listar_prestamos')
+        except ErrorCirculacion as e:
+            messages.warning(request, str(e))
+            return redirect('listar_prestamos')
+        except (IntegrityError, DatabaseError) as e:
+            # Capturar errores de base de datos
+            messages.error(request, f'Error al procesar la devolución: {str(e)}. Por favor, intente nuevamente.')
+            return redirect('listar_prestamos')
         
-            # CASO 2: Libro dañado
-            elif estado_fisico == 'dañado':
-                # Obtener monto de multa por daño del formulario
-                monto_daño_str = request.POST.get('monto_daño')
-                
-                # Validar usando el singleton (centralizado - DRY)
-                es_valido, monto_daño, mensaje_error = config.validar_monto_multa(monto_daño_str)
-                
-                if not es_valido:
-                    messages.error(request, f'Monto inválido para la multa por daño: {mensaje_error}')
-                    # Revertir el cambio de fecha de devolución
-                    prestamo.fecha_devolucion_real = None
-                    prestamo.save()
-                    return redirect('listar_prestamos')
-                
-                # Cambiar estado a mantenimiento
-                prestamo.ejemplar.estado = 'mantenimiento'
-                prestamo.ejemplar.observaciones = f'Dañado en devolución - {timezone.now().date()}'
-                prestamo.ejemplar.save()
-                
-                # Crear multa por daño con el monto ingresado por el bibliotecario
-                Multa.objects.create(
-                    socio=prestamo.socio,
-                    prestamo=prestamo,
-                    monto=monto_daño,
-                    motivo='daño',
-                    descripcion=f'Libro "{prestamo.ejemplar.libro.titulo}" devuelto con daños. {observaciones}'
-                )
-                
-                # Verificar también retraso
-                multa_retraso = 0
-                if prestamo.tiene_retraso():
-                    dias_retraso = prestamo.dias_retraso()
-                    multa_retraso = config.calcular_multa_retraso(dias_retraso)
-                    
-                    Multa.objects.create(
-                        socio=prestamo.socio,
-                        prestamo=prestamo,
-                        monto=multa_retraso,
-                        motivo='retraso',
-                        descripcion=f'Retraso de {dias_retraso} días'
-                    )
-                
-                total_multas = monto_daño + multa_retraso
+        # CASO 1: Libro en buen estado
+        if estado_fisico == 'bueno':
+            if multa_retraso:
                 messages.warning(
                     request, 
-                    f'✓ Libro devuelto exitosamente.<br>'
-                    f'🔴 <strong>Estado: DAÑADO</strong><br>'
-                    f'Multa por daño: ${monto_daño}<br>'
-                    f'{"Multa por retraso: $" + str(multa_retraso) + "<br>" if multa_retraso > 0 else ""}'
-                    f'Total de multas: ${total_multas}'
+                    f'⚠ Libro devuelto con retraso.<br>'
+                    f'Días de retraso: {prestamo.dias_retraso()}<br>'
+                    f'Multa aplicada: ${multa_retraso.monto}'
                 )
+            else:
+                messages.success(request, f'✓ Libro "{prestamo.ejemplar.libro.titulo}" devuelto exitosamente a tiempo.')
         
-            # CASO 3: Libro perdido
-            elif estado_fisico == 'perdido':
-                # Obtener monto de multa por pérdida del formulario
-                monto_perdida_str = request.POST.get('monto_perdida')
-                
-                # Validar usando el singleton (centralizado - DRY)
-                es_valido, monto_perdida, mensaje_error = config.validar_monto_multa(monto_perdida_str)
-                
-                if not es_valido:
-                    messages.error(request, f'Monto inválido para la multa por pérdida: {mensaje_error}')
-                    # Revertir el cambio de fecha de devolución
-                    prestamo.fecha_devolucion_real = None
-                    prestamo.save()
-                    return redirect('listar_prestamos')
-                
-                # Cambiar estado a perdido
-                prestamo.ejemplar.estado = 'perdido'
-                prestamo.ejemplar.observaciones = f'Reportado como perdido - {timezone.now().date()}'
-                prestamo.ejemplar.save()
-                
-                # Crear multa por pérdida con el monto ingresado por el bibliotecario
-                Multa.objects.create(
-                    socio=prestamo.socio,
-                    prestamo=prestamo,
-                    monto=monto_perdida,
-                    motivo='perdida',
-                    descripcion=f'Libro "{prestamo.ejemplar.libro.titulo}" reportado como perdido. {observaciones}'
-                )
-                
-                messages.warning(
-                    request, 
-                    f'✓ Devolución registrada exitosamente.<br>'
-                    f'🔴 <strong>Estado: LIBRO PERDIDO</strong><br>'
-                    f'Multa por pérdida: ${monto_perdida}<br>'
-                    f'El socio debe pagar esta multa antes de realizar nuevos préstamos.'
+        # CASO 2: Libro dañado (queda en mantenimiento)
+        elif estado_fisico == 'dañado':
+            monto_retraso = multa_retraso.monto if multa_retraso else 0
+            messages.warning(
+                request, 
+                f'✓ Libro devuelto exitosamente.<br>'
+                f'🔴 <strong>Estado: DAÑADO</strong><br>'
+                f'Multa por daño: ${multa_estado.monto}<br>'
+                f'{"Multa por retraso: $" + str(monto_retraso) + "<br>" if monto_retraso > 0 else ""}'
+                f'Total de multas: ${multa_estado.monto + monto_retraso}'
+            )
+        
+        # CASO 3: Libro perdido
+        else:
+            messages.warning(
+                request, 
+                f'✓ Devolución registrada exitosamente.<br>'
+                f'🔴 <strong>Estado: LIBRO PERDIDO</strong><br>'
+                f'Multa por pérdida: ${multa_estado.monto}<br>'
+                f'El socio debe pagar esta multa antes de realizar nuevos préstamos.'
+            )
+        
+        # El ejemplar quedó apartado para la primera reserva de la cola
+        if prestamo.ejemplar.estado == 'reservado':
+            reserva = Reserva.objects.select_related('socio').filter(ejemplar=prestamo.ejemplar, estado='asignada').first()
+            if reserva:
+                messages.info(
+                    request,
+                    f'📌 El ejemplar {prestamo.ejemplar.codigo_ejemplar} queda apartado para '
+                    f'{reserva.socio.nombre} (DNI {reserva.socio.dni}), que lo había reservado.'
                 )
-            
-            return redirect('listar_prestamos')
         
-        except (IntegrityError, DatabaseError) as e:
-            # Capturar errores de base de datos
-            messages.error(request, f'Error al procesar la devolución: {str(e)}. Por favor, intente nuevamente.')
-            return redirect('listar_prestamos')
+        return redirect('listar_prestamos')
     
     # Si es GET, redirigir
-    return redirect('listar_prestamos')
\ No newline at end of file
+    return redirect('listar_prestamos')
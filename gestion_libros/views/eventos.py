@@ -0,0 +1,42 @@
+"""
+Disponibilidad en vivo de los ejemplares (Server-Sent Events, ver eventos.py).
+
+    GET /eventos/ejemplares/             los cambios desde que se abre la conexión
+    GET /eventos/ejemplares/?desde=<id>  también los posteriores a ese evento
+
+Al reconectarse el navegador manda Last-Event-ID y recibe lo que se perdió.
+Con WSGI responde 204 salvo con EVENTOS_WSGI (ver eventos.en_vivo).
+"""
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+
+from .. import eventos
+from .consultas import login_requerido
+
+
+@login_requerido
+async def eventos_ejemplares(request):
+    """Flujo text/event-stream con los cambios de estado de los ejemplares"""
+    if not eventos.en_vivo(request):
+        # 204: EventSource no se reconecta y no queda un hilo ocupado por pestaña
+        return HttpResponse(status=204)
+
+    desde = request.headers.get('Last-Event-ID') or request.GET.get('desde')
+    if desde is not None:
+        try:
+            desde = int(desde)
+        except ValueError:
+            return HttpResponseBadRequest('desde / Last-Event-ID tiene que ser un número entero.')
+
+    # Con ASGI el flujo espera en el event loop; con WSGI, en el hilo del request
+    if isinstance(request, ASGIRequest):
+        flujo = eventos.atransmitir(desde, settings.EVENTOS_DURACION)
+    else:
+        flujo = eventos.transmitir(desde, settings.EVENTOS_DURACION_WSGI)
+    response = StreamingHttpResponse(flujo, content_type='text/event-stream; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    # nginx: mandar cada evento apenas llega, sin acumularlo en su buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
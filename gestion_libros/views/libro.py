@@ -4,7 +4,10 @@ Vistas para la gestión de libros y ejemplares.
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from ..models import Libro, Ejemplar
+from django.db import transaction
+from ..circulacion import asignar_reserva
+from ..eventos import publicar
+from ..models import Libro, Ejemplar, Prestamo, Reserva
 from django.contrib.auth.decorators import login_required
 
 
@@ -19,6 +22,7 @@ def registrar_libro(request):
     autor = request.POST.get('autor', '').strip()
     editorial = request.POST.get('editorial', '').strip()
     año_publicacion = request.POST.get('año_publicacion', '').strip()
+    categoria = request.POST.get('categoria', '').strip() or 'general'
     
     if not isbn or not titulo or not autor:
         messages.error(request, '❌ ISBN, título y autor son obligatorios.')
@@ -33,8 +37,12 @@ def registrar_libro(request):
         messages.error(request, '❌ El ISBN debe contener solo números.')
         return redirect('listar_libros')
     
-    # Validar que el ISBN no exista (solo al crear)
-    if Libro.objects.filter(isbn=isbn).exists():
+    if categoria not in dict(Libro.CATEGORIAS):
+        messages.error(request, '❌ Categoría de libro inválida.')
+        return redirect('listar_libros')
+    
+    # Validar que el ISBN no exista (solo al crear), incluso entre los dados de baja
+    if Libro.objects_all.filter(isbn=isbn).exists():
         messages.error(request, f'❌ El ISBN {isbn} ya está registrado.')
         return redirect('listar_libros')
     
@@ -44,7 +52,8 @@ def registrar_libro(request):
             titulo=titulo,
             autor=autor,
             editorial=editorial if editorial else None,
-            año_publicacion=int(año_publicacion) if año_publicacion else None
+            año_publicacion=int(año_publicacion) if año_publicacion else None,
+            categoria=categoria
         )
         messages.success(request, f'✅ Libro "{libro.titulo}" registrado.')
     except Exception as e:
@@ -66,13 +75,13 @@ def registrar_ejemplar(request):
         return redirect('listar_libros')
     
     try:
-        libro = Libro.objects.get(isbn=libro_isbn, activo=True)
+        libro = Libro.objects.get(isbn=libro_isbn)
     except Libro.DoesNotExist:
         messages.error(request, f'❌ Libro con ISBN {libro_isbn} no encontrado.')
         return redirect('listar_libros')
     
-    # Generar código automático
-    ultimo_ejemplar = Ejemplar.objects.filter(
+    # Generar código automático (contando los ejemplares dados de baja)
+    ultimo_ejemplar = Ejemplar.objects_all.filter(
         libro=libro,
         codigo_ejemplar__startswith=f'EJ-{libro.isbn}-'
     ).order_by('-codigo_ejemplar').first()
@@ -89,13 +98,21 @@ def registrar_ejemplar(request):
     codigo_ejemplar = f'EJ-{libro.isbn}-{nuevo_numero:03d}'
     
     try:
-        ejemplar = Ejemplar.objects.create(
-            libro=libro,
-            codigo_ejemplar=codigo_ejemplar,
-            estado='disponible',
-            observaciones=observaciones if observaciones else None
-        )
-        messages.success(request, f'✅ Ejemplar {ejemplar.codigo_ejemplar} registrado.')
+        with transaction.atomic():
+            ejemplar = Ejemplar.objects.create(
+                libro=libro,
+                codigo_ejemplar=codigo_ejemplar,
+                estado='disponible',
+                observaciones=observaciones if observaciones else None
+            )
+            # Si el libro tiene reservas en espera, el ejemplar nuevo se aparta para la primera
+            if asignar_reserva(ejemplar):
+                ejemplar.save()
+            publicar(ejemplar)
+        if ejemplar.estado == 'reservado':
+            messages.success(request, f'✅ Ejemplar {ejemplar.codigo_ejemplar} registrado y apartado para la primera reserva.')
+        else:
+            messages.success(request, f'✅ Ejemplar {ejemplar.codigo_ejemplar} registrado.')
     except Exception as e:
         messages.error(request, f'❌ Error: {str(e)}')
     
@@ -105,7 +122,7 @@ def registrar_ejemplar(request):
 @login_required
 def editar_libro(request, isbn):
     """Vista simple para editar un libro (solo POST)"""
-    libro = get_object_or_404(Libro, isbn=isbn)
+    libro = get_object_or_404(Libro.objects_all, isbn=isbn)
     
     if request.method != 'POST':
         return redirect('listar_libros')
@@ -114,16 +131,22 @@ def editar_libro(request, isbn):
     autor = request.POST.get('autor', '').strip()
     editorial = request.POST.get('editorial', '').strip()
     año_publicacion = request.POST.get('año_publicacion', '').strip()
+    categoria = request.POST.get('categoria', '').strip() or libro.categoria
     
     if not titulo or not autor:
         messages.error(request, '❌ El título y autor son obligatorios.')
         return redirect('listar_libros')
     
+    if categoria not in dict(Libro.CATEGORIAS):
+        messages.error(request, '❌ Categoría de libro inválida.')
+        return redirect('listar_libros')
+    
     try:
         libro.titulo = titulo
         libro.autor = autor
         libro.editorial = editorial if editorial else None
         libro.año_publicacion = int(año_publicacion) if año_publicacion else None
+        libro.categoria = categoria
         libro.save()
         messages.success(request, f'✅ Libro "{libro.titulo}" actualizado exitosamente.')
     except Exception as e:
@@ -135,7 +158,7 @@ def editar_libro(request, isbn):
 @login_required
 def dar_baja_libro(request, isbn):
     """Vista simple para dar de baja un libro (solo POST)"""
-    libro = get_object_or_404(Libro, isbn=isbn)
+    libro = get_object_or_404(Libro.objects_all, isbn=isbn)
     
     if request.method != 'POST':
         return redirect('listar_libros')
@@ -145,12 +168,23 @@ def dar_baja_libro(request, isbn):
         return redirect('listar_libros')
     
     # Verificar si tiene préstamos activos
-    prestamos_activos = libro.ejemplares.filter(prestamos__fecha_devolucion_real__isnull=True).count()
+    prestamos_activos = Prestamo.objects.filter(ejemplar__libro=libro, fecha_devolucion_real__isnull=True).count()
     if prestamos_activos > 0:
         messages.error(request, f'❌ No se puede dar de baja. Tiene {prestamos_activos} préstamo(s) activo(s).')
         return redirect('listar_libros')
     
-    libro.dar_de_baja()
+    # Las reservas en espera o con un ejemplar apartado no se cumplirían nunca
+    reservas_activas = libro.reservas.filter(estado__in=Reserva.ACTIVAS).count()
+    if reservas_activas > 0:
+        messages.error(
+            request,
+            f'❌ No se puede dar de baja. Tiene {reservas_activas} reserva(s) activa(s). Cancelalas desde Reservas.'
+        )
+        return redirect('listar_libros')
+    
+    with transaction.atomic():
+        for ejemplar in libro.dar_de_baja():
+            publicar(ejemplar)
     messages.success(request, f'✅ Libro "{libro.titulo}" y sus ejemplares dados de baja.')
     return redirect('listar_libros')
 
@@ -158,7 +192,7 @@ def dar_baja_libro(request, isbn):
 @login_required
 def editar_ejemplar(request, codigo_ejemplar):
     """Vista simple para editar un ejemplar (solo POST)"""
-    ejemplar = get_object_or_404(Ejemplar, codigo_ejemplar=codigo_ejemplar)
+    ejemplar = get_object_or_404(Ejemplar.objects_all, codigo_ejemplar=codigo_ejemplar)
     
     if request.method != 'POST':
         return redirect('listar_libros')
@@ -170,6 +204,14 @@ def editar_ejemplar(request, codigo_ejemplar):
         messages.error(request, '❌ El estado es obligatorio.')
         return redirect('listar_libros')
     
+    # El estado reservado lo maneja la cola de reservas (ver circulacion.asignar_reserva)
+    if ejemplar.estado == 'reservado' and estado != 'reservado':
+        messages.error(request, '❌ El ejemplar está apartado para una reserva. Cancelala desde Reservas.')
+        return redirect('listar_libros')
+    if estado == 'reservado' and ejemplar.estado != 'reservado':
+        messages.error(request, '❌ Un ejemplar solo se aparta desde la cola de reservas.')
+        return redirect('listar_libros')
+    
     # Validar que no se cambie a disponible si tiene préstamo activo
     if estado == 'disponible':
         prestamo_activo = ejemplar.prestamos.filter(fecha_devolucion_real__isnull=True).exists()
@@ -180,7 +222,12 @@ def editar_ejemplar(request, codigo_ejemplar):
     try:
         ejemplar.estado = estado
         ejemplar.observaciones = observaciones if observaciones else None
-        ejemplar.save()
+        with transaction.atomic():
+            # Si vuelve a estar disponible y el libro tiene reservas en espera, se aparta para la primera
+            if estado == 'disponible':
+                asignar_reserva(ejemplar)
+            ejemplar.save()
+            publicar(ejemplar)
         messages.success(request, f'✅ Ejemplar {ejemplar.codigo_ejemplar} actualizado.')
     except Exception as e:
         messages.error(request, f'❌ Error al actualizar: {str(e)}')
@@ -191,7 +238,7 @@ def editar_ejemplar(request, codigo_ejemplar):
 @login_required
 def dar_baja_ejemplar(request, codigo_ejemplar):
     """Vista simple para dar de baja un ejemplar (solo POST)"""
-    ejemplar = get_object_or_404(Ejemplar, codigo_ejemplar=codigo_ejemplar)
+    ejemplar = get_object_or_404(Ejemplar.objects_all, codigo_ejemplar=codigo_ejemplar)
     
     if request.method != 'POST':
         return redirect('listar_libros')
@@ -206,6 +253,12 @@ def dar_baja_ejemplar(request, codigo_ejemplar):
         messages.error(request, f'❌ No se puede dar de baja. Tiene un préstamo activo.')
         return redirect('listar_libros')
     
-    ejemplar.dar_de_baja()
+    if ejemplar.estado == 'reservado':
+        messages.error(request, '❌ No se puede dar de baja. Está apartado para una reserva.')
+        return redirect('listar_libros')
+    
+    with transaction.atomic():
+        ejemplar.dar_de_baja()
+        publicar(ejemplar)
     messages.success(request, f'✅ Ejemplar {ejemplar.codigo_ejemplar} dado de baja.')
     return redirect('listar_libros')
\ No newline at end of file
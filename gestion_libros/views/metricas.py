@@ -0,0 +1,25 @@
+"""
+Vista que exporta las métricas de operación para Prometheus.
+"""
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from ..metricas import exportar
+
+
+def metricas(request):
+    """
+    Métricas en formato de texto de Prometheus.
+    Con METRICAS_TOKEN configurado se accede con el header `Authorization: Bearer <token>`
+    (así lo hace Prometheus); si no, solo usuarios staff con sesión iniciada.
+    """
+    token = settings.METRICAS_TOKEN
+    if token:
+        autorizado = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        autorizado = request.user.is_staff
+    if not autorizado:
+        return HttpResponseForbidden('Acceso denegado.')
+    
+    return HttpResponse(exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
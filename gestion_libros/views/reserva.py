@@ -0,0 +1,119 @@
+"""
+Vistas para las reservas de libros.
+PROCESO 5: Reserva de un Libro sin ejemplares disponibles
+
+Cada libro tiene su cola de reservas por orden de llegada. Cuando un ejemplar
+vuelve a circular se aparta para la primera (ver circulacion.asignar_reserva)
+y aparece en el formulario de préstamo para ese socio.
+"""
+
+from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from ..models import Libro, Reserva, Socio
+from ..circulacion import ErrorCirculacion, cancelar_reserva as cancelar, reservar
+from ..replicas import solo_lectura
+from ..metricas import medir_vista
+from ..cache_http import condicional
+from .base import CATALOGO, RESERVAS, SOCIOS
+
+
+@login_required
+@solo_lectura
+@medir_vista
+@condicional(RESERVAS + SOCIOS + CATALOGO)
+def listar_reservas(request):
+    """
+    Lista las reservas activas (en espera y con ejemplar apartado) por libro,
+    en el orden de la cola. ?isbn= muestra la cola de un libro y completa el
+    formulario de reserva.
+    """
+    reservas = Reserva.objects.filter(estado__in=Reserva.ACTIVAS).select_related(
+        'socio', 'libro', 'ejemplar'
+    ).order_by('libro__titulo', 'libro_id', 'fecha', 'id')
+    isbn = request.GET.get('isbn', '').strip()
+    estado_filtro = request.GET.get('estado', 'todas')
+
+    if isbn:
+        reservas = reservas.filter(libro_id=isbn)
+    if estado_filtro == 'pendientes':
+        reservas = reservas.filter(estado='pendiente')
+    elif estado_filtro == 'asignadas':
+        reservas = reservas.filter(estado='asignada')
+
+    # Posición de cada reserva en espera dentro de la cola de su libro (vienen ordenadas)
+    reservas = list(reservas)
+    posiciones = {}
+    for reserva in reservas:
+        if reserva.estado == 'pendiente':
+            posiciones[reserva.libro_id] = posiciones.get(reserva.libro_id, 0) + 1
+            reserva.lugar = posiciones[reserva.libro_id]
+
+    context = {
+        'reservas': reservas,
+        'isbn': isbn,
+        'estado_filtro': estado_filtro,
+        'total_resultados': len(reservas),
+    }
+    return render(request, 'gestion_libros/listar_reservas.html', context)
+
+
+@login_required
+@medir_vista
+def registrar_reserva(request):
+    """
+    PROCESO 5: Reserva de un libro (solo POST)
+
+    Las validaciones (socio activo, sin ejemplares disponibles, una reserva
+    activa por libro) están en circulacion.reservar.
+    """
+    if request.method != 'POST':
+        return redirect('listar_reservas')
+
+    socio_id = request.POST.get('socio_id', '').strip()
+    libro_isbn = request.POST.get('libro_isbn', '').strip()
+
+    try:
+        socio = Socio.objects_all.get(dni=socio_id)
+        libro = Libro.objects.get(isbn=libro_isbn)
+        reserva = reservar(socio, libro)
+        messages.success(
+            request,
+            f'✅ Reserva registrada.<br>'
+            f'Libro: {libro.titulo}<br>'
+            f'Socio: {socio.nombre}<br>'
+            f'Posición en la cola: {reserva.posicion()}'
+        )
+    except Socio.DoesNotExist:
+        messages.error(request, f'❌ No existe un socio con DNI {socio_id}.')
+    except Libro.DoesNotExist:
+        messages.error(request, f'❌ No existe un libro con ISBN {libro_isbn}.')
+    except ErrorCirculacion as e:
+        messages.error(request, f'❌ {e}')
+
+    return redirect('listar_reservas')
+
+
+@login_required
+@medir_vista
+def cancelar_reserva(request, reserva_id):
+    """Cancela una reserva (solo POST); su ejemplar apartado pasa a la siguiente de la cola"""
+    reserva = get_object_or_404(Reserva.objects.select_related('socio', 'libro'), id=reserva_id)
+
+    if request.method != 'POST':
+        return redirect('listar_reservas')
+
+    try:
+        ejemplar = cancelar(reserva)
+    except ErrorCirculacion as e:
+        messages.warning(request, f'⚠️ {e}')
+        return redirect('listar_reservas')
+
+    mensaje = f'✅ Reserva de {reserva.socio.nombre} por "{reserva.libro.titulo}" cancelada.'
+    if ejemplar is not None:
+        if ejemplar.estado == 'reservado':
+            mensaje += f'<br>El ejemplar {ejemplar.codigo_ejemplar} pasó a la siguiente reserva de la cola.'
+        else:
+            mensaje += f'<br>El ejemplar {ejemplar.codigo_ejemplar} quedó disponible.'
+    messages.success(request, mensaje)
+    return redirect('listar_reservas')
@@ -21,18 +21,24 @@ def registrar_socio(request):
     email = request.POST.get('email', '').strip()
     telefono = request.POST.get('telefono', '').strip()
     direccion = request.POST.get('direccion', '').strip()
+    categoria = request.POST.get('categoria', '').strip() or 'estandar'
     
     if not dni or not nombre:
         messages.error(request, '❌ DNI y nombre son obligatorios.')
         return redirect('listar_socios')
     
-    if Socio.objects.filter(dni=dni).exists():
+    if categoria not in dict(Socio.CATEGORIAS):
+        messages.error(request, '❌ Categoría de socio inválida.')
+        return redirect('listar_socios')
+    
+    # El DNI no se puede repetir ni con un socio dado de baja
+    if Socio.objects_all.filter(dni=dni).exists():
         messages.error(request, f'❌ El DNI {dni} ya está registrado.')
         return redirect('listar_socios')
     
     # Generar número de socio único
     año_actual = timezone.now().year
-    ultimo_socio = Socio.objects.filter(
+    ultimo_socio = Socio.objects_all.filter(
         numero_socio__startswith=f'SOC-{año_actual}'
     ).order_by('-numero_socio').first()
     
@@ -50,6 +56,7 @@ def registrar_socio(request):
             email=email if email else None,
             telefono=telefono if telefono else None,
             direccion=direccion if direccion else None,
+            categoria=categoria,
             activo=True
         )
         messages.success(request, f'✅ Socio "{socio.nombre}" registrado ({socio.numero_socio}).')
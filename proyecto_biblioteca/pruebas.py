@@ -0,0 +1,38 @@
+"""
+Runner de los tests (TEST_RUNNER).
+
+Lo que la aplicación escribe en disco fuera de la base (archivo de métricas,
+cache de comprobantes, perfiles) va a un directorio temporal durante toda la
+corrida, así `manage.py test` no toca los archivos del proyecto y se borra al
+terminar.
+"""
+
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class Runner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.directorio = tempfile.TemporaryDirectory(prefix='biblioteca-tests-')
+        temporal = Path(self.directorio.name)
+        caches = {alias: dict(opciones) for alias, opciones in settings.CACHES.items()}
+        for opciones in caches.values():
+            if opciones['BACKEND'].endswith('FileBasedCache'):
+                opciones['LOCATION'] = temporal / 'cache' / Path(opciones['LOCATION']).name
+        self.ajuste = override_settings(
+            METRICAS_ARCHIVO=temporal / 'metricas.sqlite3',
+            PERFILES_DIR=temporal / 'perfiles',
+            CACHES=caches,
+        )
+        self.ajuste.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.ajuste.disable()
+        self.directorio.cleanup()
+        super().teardown_test_environment(**kwargs)